@@ -0,0 +1,388 @@
+#!/usr/bin/python
+
+"""
+This python script is to download the ONIE image and the license bundles
+served by the ONIE server, through a cache, so that provisioning a site
+again does not download them again.
+
+Every artifact is given as three arguments: its path under the web root,
+its version key and its url. The cache keeps one copy of every file under
+its sha256 and an index of the version keys it was downloaded for; an
+artifact whose name and version are in the index is taken from the cache.
+Missing artifacts are downloaded in parallel into partial files, which are
+resumed with HTTP Range requests when a download is interrupted, checked
+and moved into the cache. The artifacts are then hard linked (or copied)
+into the web root and renamed over the old file, so apache never serves a
+half written image.
+
+Options:
+--root DIR         web root the paths are relative to
+                   (default /var/www/html/images)
+--cache DIR        cache directory (default /var/cache/pn_ztp/artifacts)
+--cookie FILE      curl cookie file sent with the requests
+--jobs N           parallel downloads (default 4)
+--retries N        attempts per download (default 3)
+--sha256 PATH=HEX  expected checksum of the artifact at PATH
+--insecure         do not verify the server certificate, as curl -k
+
+Example Usage:
+python pn_artifacts.py --cookie /tmp/cookie onie-installer 2.5.1-10309 \
+    'https://cloud-web.pluribusnetworks.com/api/download_image1/onie-installer-2.5.1-10309?version=2.5.1-10309'
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import ssl
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    from urllib2 import HTTPError, Request, URLError, urlopen
+except ImportError:
+    from urllib.error import HTTPError, URLError
+    from urllib.request import Request, urlopen
+
+CHUNK = 1024 * 1024
+
+
+def file_sha256(path):
+    """
+    Method to compute the checksum of a file.
+    :param path: Path of the file.
+    :return: The sha256 hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cookie_header(path):
+    """
+    Method to read a cookie file written by curl -c.
+    :param path: Path of the cookie file.
+    :return: Value of the Cookie header.
+    """
+    cookies = []
+    with open(path) as handle:
+        for line in handle:
+            # curl writes HttpOnly cookies, like Django's sessionid, as
+            # comments, which cookielib would skip.
+            if line.startswith('#HttpOnly_'):
+                line = line[len('#HttpOnly_'):]
+            elif line.startswith('#'):
+                continue
+            fields = line.rstrip('\r\n').split('\t')
+            if len(fields) == 7:
+                cookies.append('%s=%s' % (fields[5], fields[6]))
+    return '; '.join(cookies)
+
+
+def write_atomic(path, text):
+    """
+    Method to replace a file in one rename.
+    :param path: The file to write.
+    :param text: Its new content.
+    """
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path),
+                                         prefix='.pn_artifacts')
+    with os.fdopen(handle, 'w') as temp_file:
+        temp_file.write(text)
+    os.rename(temp_path, path)
+
+
+class Artifact(object):
+    """ A file of the web root and where to download it from. """
+
+    def __init__(self, path, version, url, sha256=None):
+        self.path = path
+        self.version = version
+        self.url = url
+        self.sha256 = sha256.lower() if sha256 else None
+        self.source = None
+
+
+class ArtifactCache(object):
+    """ Content addressed store of the downloaded artifacts. """
+
+    def __init__(self, cache_dir, cookie=None, retries=3, insecure=False):
+        self.cache_dir = cache_dir
+        self.objects = os.path.join(cache_dir, 'objects')
+        self.partial = os.path.join(cache_dir, 'partial')
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        for directory in (self.objects, self.partial):
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+        self.headers = {'User-Agent': 'pn_artifacts'}
+        if cookie:
+            self.headers['Cookie'] = cookie_header(cookie)
+        self.retries = max(int(retries), 1)
+        self.context = None
+        if insecure:
+            self.context = ssl.create_default_context()
+            self.context.check_hostname = False
+            self.context.verify_mode = ssl.CERT_NONE
+        self.lock = threading.Lock()
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as handle:
+                self.index = json.load(handle)
+
+    def object_path(self, sha256):
+        return os.path.join(self.objects, sha256)
+
+    def lookup(self, artifact):
+        """
+        Method to find an artifact in the cache.
+        :param artifact: The Artifact.
+        :return: Its sha256 if it is cached, else None.
+        """
+        entry = self.index.get(artifact.path, {}).get(artifact.version)
+        sha256 = artifact.sha256 or (entry or {}).get('sha256')
+        if not sha256 or not os.path.exists(self.object_path(sha256)):
+            return None
+        if artifact.sha256 and entry and entry['sha256'] != artifact.sha256:
+            return None
+        return sha256
+
+    def remember(self, artifact, sha256, size):
+        """
+        Method to add an artifact to the index.
+        :param artifact: The Artifact.
+        :param sha256: Checksum of its content.
+        :param size: Its size in bytes.
+        """
+        with self.lock:
+            self.index.setdefault(artifact.path, {})[artifact.version] = {
+                'sha256': sha256, 'size': size, 'url': artifact.url,
+                'fetched': int(time.time())}
+            write_atomic(self.index_path, json.dumps(self.index, indent=2,
+                                                     sort_keys=True))
+
+    def open_url(self, url, offset):
+        headers = dict(self.headers)
+        if offset:
+            headers['Range'] = 'bytes=%d-' % offset
+        request = Request(url, headers=headers)
+        if self.context is not None:
+            return urlopen(request, timeout=60, context=self.context)
+        return urlopen(request, timeout=60)
+
+    def download(self, artifact):
+        """
+        Method to download an artifact into the cache, resuming the partial
+        file of an earlier attempt.
+        :param artifact: The Artifact.
+        :return: Tuple of (sha256, size).
+        """
+        name = hashlib.sha1((artifact.url + '\n' + artifact.version)
+                            .encode('utf-8')).hexdigest()
+        part = os.path.join(self.partial, name + '.part')
+        error = None
+        for attempt in range(self.retries):
+            if attempt:
+                time.sleep(attempt)
+            offset = os.path.getsize(part) if os.path.exists(part) else 0
+            try:
+                response = self.open_url(artifact.url, offset)
+            except HTTPError as err:
+                if err.code == 416 and offset:
+                    # The partial file holds the whole artifact already.
+                    error = None
+                    break
+                error = err
+                if 400 <= err.code < 500:
+                    break
+                continue
+            except (URLError, IOError, OSError) as err:
+                error = err
+                continue
+            content_range = response.headers.get('Content-Range', '')
+            if response.getcode() == 206 and content_range.startswith(
+                    'bytes %d-' % offset):
+                mode = 'ab'
+            else:
+                # The server sent the whole file, start over.
+                mode, offset = 'wb', 0
+            length = response.headers.get('Content-Length')
+            expected = offset + int(length) if length else None
+            try:
+                with open(part, mode) as handle:
+                    for chunk in iter(lambda: response.read(CHUNK), b''):
+                        handle.write(chunk)
+            except (IOError, OSError) as err:
+                error = err
+                continue
+            finally:
+                response.close()
+            if expected is None or os.path.getsize(part) >= expected:
+                error = None
+                break
+            error = 'connection closed after %d of %d bytes' % (
+                os.path.getsize(part), expected)
+        if error is not None:
+            raise IOError('%s: %s' % (artifact.url, error))
+
+        sha256 = file_sha256(part)
+        if artifact.sha256 and sha256 != artifact.sha256:
+            os.unlink(part)
+            raise IOError('%s: sha256 %s, expected %s' % (
+                artifact.url, sha256, artifact.sha256))
+        size = os.path.getsize(part)
+        os.rename(part, self.object_path(sha256))
+        return sha256, size
+
+    def publish(self, artifact, root):
+        """
+        Method to put an artifact in place under the web root.
+        :param artifact: The Artifact, with its sha256 found.
+        :param root: The web root.
+        :return: False if the file was in place already.
+        """
+        source = self.object_path(artifact.source)
+        path = os.path.join(root, artifact.path)
+        if os.path.exists(path) and os.path.samefile(source, path):
+            return False
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        temp_path = os.path.join(directory, '.%s.pn_artifacts' %
+                                 os.path.basename(path))
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        try:
+            os.link(source, temp_path)
+        except OSError:
+            # The cache is on another file system.
+            shutil.copyfile(source, temp_path)
+        os.chmod(temp_path, 0o644)
+        os.rename(temp_path, path)
+        return True
+
+
+def fetch_all(cache, artifacts, root, jobs=4):
+    """
+    Method to bring the artifacts into the web root, downloading the ones
+    which are not cached in parallel.
+    :param cache: The ArtifactCache.
+    :param artifacts: List of Artifact.
+    :param root: The web root.
+    :param jobs: Parallel downloads.
+    :return: List of error messages, one at least for every artifact which
+    could not be placed.
+    """
+    pending = {}
+    for artifact in artifacts:
+        artifact.source = cache.lookup(artifact)
+        if artifact.source:
+            print('  -Cached %s (%s)' % (artifact.path, artifact.version))
+        else:
+            # The same url and version is downloaded once for all paths.
+            pending.setdefault((artifact.url, artifact.version),
+                               []).append(artifact)
+
+    queue = list(pending.values())
+    errors = []
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                if not queue:
+                    return
+                group = queue.pop(0)
+            started = time.time()
+            try:
+                sha256, size = cache.download(group[0])
+            except (IOError, OSError) as err:
+                with lock:
+                    errors.append('Download failed: %s' % err)
+                continue
+            except Exception as err:
+                # Report anything else too instead of ending the thread.
+                with lock:
+                    errors.append('Download failed: %s: %s' % (
+                        group[0].url, err))
+                continue
+            for artifact in group:
+                artifact.source = sha256
+                cache.remember(artifact, sha256, size)
+            with lock:
+                print('  -Downloaded %s (%s, %d bytes in %.1fs)' % (
+                    ', '.join(artifact.path for artifact in group),
+                    group[0].version, size, time.time() - started))
+
+    threads = [threading.Thread(target=worker)
+               for _ in range(min(max(jobs, 1), len(queue)))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for artifact in artifacts:
+        if not artifact.source:
+            errors.append('Not placed: %s (%s)' % (artifact.path,
+                                                   artifact.version))
+        elif cache.publish(artifact, root):
+            print('  -Placed %s in %s' % (artifact.path, root))
+    return errors
+
+
+def main(argv):
+    """
+    Method to run the artifact manager from the command line.
+    :param argv: The command line arguments.
+    """
+    args = argv[1:]
+    root, cache_dir = '/var/www/html/images', '/var/cache/pn_ztp/artifacts'
+    cookie, jobs, retries, insecure = None, 4, 3, False
+    checksums = {}
+    while args[:1] and args[0].startswith('--'):
+        option = args.pop(0)
+        if option == '--insecure':
+            insecure = True
+            continue
+        if option not in ('--root', '--cache', '--cookie', '--jobs',
+                          '--retries', '--sha256'):
+            exit('Execution Error: Unknown option %s!' % option)
+        if not args:
+            exit('Execution Error: %s needs a value!' % option)
+        value = args.pop(0)
+        if option == '--root':
+            root = value
+        elif option == '--cache':
+            cache_dir = value
+        elif option == '--cookie':
+            cookie = value
+        elif option == '--jobs':
+            jobs = int(value)
+        elif option == '--retries':
+            retries = int(value)
+        elif '=' in value:
+            path, sha256 = value.split('=', 1)
+            if sha256:
+                checksums[path] = sha256
+
+    if not args or len(args) % 3:
+        msg = 'Execution Error: Please provide path, version and url of '
+        msg += 'every artifact!\n'
+        msg += 'Example usage: python pn_artifacts.py onie-installer '
+        msg += '2.5.1-10309 http://server/onie-installer'
+        exit(msg)
+
+    artifacts = [Artifact(args[i], args[i + 1], args[i + 2],
+                          checksums.get(args[i]))
+                 for i in range(0, len(args), 3)]
+    cache = ArtifactCache(cache_dir, cookie, retries, insecure)
+    errors = fetch_all(cache, artifacts, root, jobs)
+    if errors:
+        exit('\n'.join(errors))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,518 @@
+#!/usr/bin/python
+
+"""
+This python script is to run the initial ZTP of every switch of the csv
+file as soon as the switch is up, instead of waiting for all of them.
+
+It watches the DHCP server for the leases of the switches: the dhcpd leases
+file and, as dhcpd keeps no lease for the fixed addresses ztp.sh configures,
+the DHCPACK lines dhcpd logs to syslog. It is woken by inotify where Linux
+provides it and polls the files otherwise. When a switch of the csv file
+gets an address, the script waits until its SSH server answers (ONIE's
+dropbear does not count) and runs the initial ZTP playbook limited to that
+switch. The first switch runs alone, as it creates the fabric the others
+join; after it, up to --jobs switches are provisioned at a time. Only
+leases given from the start of the script on count (--since to also take
+earlier ones), and only the log lines written after it.
+
+The output of every run is written to <logdir>/<hostname>.log and the
+switches provisioned are recorded in <logdir>/pn_ztp_pipeline.json, so
+that the script can be stopped and started again. It exits when every
+switch is provisioned or has failed.
+
+Options:
+--csv FILE           ZTP csv file: mac,ip,hostname,tag[,device_id,speed]
+--playbook FILE      (default /etc/ansible/pn_initial_ztp.yml)
+--inventory FILE     (default /etc/ansible/hosts)
+--ansible-args ARGS  extra ansible-playbook arguments, e.g.
+                     '--vault-password-file /root/.vault'
+--jobs N             switches provisioned at a time (default 4)
+--leases FILE        dhcpd leases file (default /var/lib/dhcp/dhcpd.leases
+                     or /var/lib/dhcpd/dhcpd.leases)
+--log FILE           log with the dhcpd messages (default /var/log/syslog
+                     or /var/log/messages)
+--interval N         seconds between polls (default 2)
+--ssh-timeout N      seconds to wait for SSH after the lease (default 1800)
+--banner TEXT        SSH banner of the switch OS (default OpenSSH)
+--since N            also take leases given up to N seconds before the
+                     start (default 0)
+--logdir DIR         (default /var/log/pn_ztp)
+--reprovision        provision switches recorded as provisioned again
+
+Example Usage:
+python pn_ztp_pipeline.py --csv file.csv
+python pn_ztp_pipeline.py --csv file.csv --jobs 8 \
+    --ansible-args '--vault-password-file /root/.vault'
+"""
+
+import calendar
+import ctypes
+import ctypes.util
+import json
+import os
+import re
+import select
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+ANSIBLE_PLAYBOOK = 'ansible-playbook'
+SSH_PORT = 22
+
+LEASE_BLOCK = re.compile(r'lease\s+(\S+)\s*\{(.*?)\}', re.S)
+LEASE_MAC = re.compile(r'hardware ethernet\s+([0-9a-fA-F:]+);')
+LEASE_STATE = re.compile(r'binding state\s+(\w+);')
+LEASE_STARTS = re.compile(r'starts\s+([^;]+);')
+DHCPACK = re.compile(r'DHCPACK on\s+(\S+)\s+to\s+([0-9a-fA-F:]+)')
+
+# inotify events of the watched directories.
+IN_MODIFY = 0x2
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+
+
+def normalize_mac(mac):
+    """
+    Method to write a mac address the same way as the csv file and dhcpd,
+    which leaves out leading zeros in its log.
+    :param mac: The mac address.
+    :return: Lower case mac address with two digits per byte, or None.
+    """
+    parts = mac.strip().lower().split(':')
+    if len(parts) != 6:
+        return None
+    try:
+        return ':'.join('%02x' % int(part, 16) for part in parts)
+    except ValueError:
+        return None
+
+
+def read_csv(path):
+    """
+    Method to read the switches of the ZTP csv file.
+    :param path: Path of the csv file.
+    :return: Tuple of (switches by mac, skipped lines), the switches being
+    dictionaries of mac, ip and host.
+    """
+    switches = {}
+    skipped = []
+    with open(path) as csv_file:
+        for line in csv_file:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fields = [field.strip() for field in line.split(',')]
+            mac = normalize_mac(fields[0])
+            if mac is None or len(fields) < 4:
+                skipped.append('%s: not mac,ip,hostname,tag' % line)
+            elif not fields[2] or not fields[3]:
+                # ztp.sh puts only the switches with a hostname and a tag in
+                # the inventory.
+                skipped.append('%s: no hostname or tag, not in the '
+                               'inventory' % line)
+            else:
+                switches[mac] = {'mac': mac, 'ip': fields[1],
+                                 'host': fields[2]}
+    return switches, skipped
+
+
+def lease_events(text):
+    """
+    Method to find the active leases of a dhcpd leases file.
+    :param text: Content of the leases file.
+    :return: List of (mac, ip, starts), the latest lease of a mac last.
+    """
+    events = []
+    for ip, block in LEASE_BLOCK.findall(text):
+        mac = LEASE_MAC.search(block)
+        state = LEASE_STATE.search(block)
+        if mac is None or (state is not None and state.group(1) != 'active'):
+            continue
+        starts = LEASE_STARTS.search(block)
+        events.append((normalize_mac(mac.group(1)), ip,
+                       starts.group(1) if starts else ''))
+    return events
+
+
+def lease_time(starts):
+    """
+    Method to read the start time of a lease.
+    :param starts: The starts value of the lease, as '4 2026/10/15 09:12:01'
+    in UTC or 'epoch 1760519521' with db-time-format local.
+    :return: Seconds since the epoch, or None if it cannot be read.
+    """
+    words = starts.split()
+    try:
+        if words[0] == 'epoch':
+            return int(words[1])
+        return calendar.timegm(time.strptime(' '.join(words[1:3]),
+                                             '%Y/%m/%d %H:%M:%S'))
+    except (IndexError, ValueError):
+        return None
+
+
+def log_events(text):
+    """
+    Method to find the DHCPACK messages of dhcpd in log lines.
+    :param text: The log lines.
+    :return: List of (mac, ip).
+    """
+    return [(normalize_mac(mac), ip) for ip, mac in DHCPACK.findall(text)]
+
+
+def ssh_ready(ip, banner, timeout=5):
+    """
+    Method to check whether the SSH server of the switch OS answers.
+    :param ip: Address of the switch.
+    :param banner: Text the SSH banner must contain, '' for any.
+    :param timeout: Seconds to wait for the banner.
+    :return: True if it answers.
+    """
+    try:
+        connection = socket.create_connection((ip, SSH_PORT), timeout)
+    except (socket.error, socket.timeout):
+        return False
+    try:
+        connection.settimeout(timeout)
+        greeting = connection.recv(256).decode('ascii', 'replace')
+    except (socket.error, socket.timeout):
+        return False
+    finally:
+        connection.close()
+    return greeting.startswith('SSH-') and banner in greeting
+
+
+class FileWatcher(object):
+    """ Wakes up when the watched files change, through inotify on Linux
+    and by polling elsewhere. """
+
+    def __init__(self, paths, interval):
+        self.interval = interval
+        self.fd = None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            fd = libc.inotify_init()
+        except (OSError, AttributeError):
+            return
+        if fd < 0:
+            return
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        # dhcpd writes a new leases file and renames it, watch directories.
+        for directory in set(os.path.dirname(os.path.abspath(path))
+                             for path in paths):
+            if libc.inotify_add_watch(fd, directory.encode(), mask) < 0:
+                os.close(fd)
+                return
+        self.fd = fd
+
+    def mode(self):
+        return 'inotify' if self.fd is not None else 'polling'
+
+    def wait(self):
+        """
+        Method to wait for a change, or the poll interval.
+        """
+        if self.fd is None:
+            time.sleep(self.interval)
+            return
+        readable = select.select([self.fd], [], [], self.interval)[0]
+        if readable:
+            os.read(self.fd, 65536)
+
+
+class LeaseSource(object):
+    """ A leases file, read again whenever it changes. Leases which started
+    before the given time are not events. """
+
+    def __init__(self, path, since):
+        self.path = path
+        self.since = since
+        self.stamp = None
+        self.seen = set()
+
+    def events(self):
+        try:
+            status = os.stat(self.path)
+        except OSError:
+            return []
+        stamp = (status.st_ino, status.st_size, status.st_mtime)
+        if stamp == self.stamp:
+            return []
+        self.stamp = stamp
+        with open(self.path) as leases:
+            found = lease_events(leases.read())
+        events = []
+        for mac, ip, starts in found:
+            if (mac, ip, starts) in self.seen:
+                continue
+            self.seen.add((mac, ip, starts))
+            started = lease_time(starts)
+            if started is None or started >= self.since:
+                events.append((mac, ip))
+        return events
+
+
+class LogSource(object):
+    """ A log file, of which the lines appended from now on are read. """
+
+    def __init__(self, path):
+        self.path = path
+        self.inode = None
+        self.offset = 0
+        try:
+            status = os.stat(path)
+            self.inode, self.offset = status.st_ino, status.st_size
+        except OSError:
+            pass
+
+    def events(self):
+        try:
+            status = os.stat(self.path)
+        except OSError:
+            return []
+        if status.st_ino != self.inode or status.st_size < self.offset:
+            # The log was rotated.
+            self.inode, self.offset = status.st_ino, 0
+        if status.st_size == self.offset:
+            return []
+        with open(self.path, 'rb') as log:
+            log.seek(self.offset)
+            data = log.read(status.st_size - self.offset)
+        # Leave a partly written line for the next read.
+        end = data.rfind(b'\n') + 1
+        self.offset += end
+        return log_events(data[:end].decode('utf-8', 'replace'))
+
+
+class Pipeline(object):
+    """ Provisions the switches as their leases come in. """
+
+    def __init__(self, switches, options):
+        self.switches = switches
+        self.options = options
+        self.state_path = os.path.join(options['logdir'],
+                                       'pn_ztp_pipeline.json')
+        self.lock = threading.Lock()
+        self.gate = threading.Condition(self.lock)
+        self.running = 0
+        self.recorded = {}
+        if os.path.exists(self.state_path) and not options['reprovision']:
+            with open(self.state_path) as state_file:
+                self.recorded = json.load(state_file)
+        self.started = time.time()
+        for mac, switch in switches.items():
+            switch['state'] = 'waiting'
+            if self.recorded.get(mac, {}).get('state') == 'done':
+                switch['state'] = 'done'
+                self.say(switch, 'provisioned before, skipped')
+        # The fabric exists once a switch is provisioned.
+        self.seeded = any(switch['state'] == 'done'
+                          for switch in switches.values())
+
+    def say(self, switch, msg):
+        sys.stdout.write('%s %s: %s\n' % (time.strftime('%H:%M:%S'),
+                                          switch['host'], msg))
+        sys.stdout.flush()
+
+    def finished(self):
+        with self.lock:
+            return all(switch['state'] in ('done', 'failed')
+                       for switch in self.switches.values())
+
+    def on_lease(self, mac, ip):
+        """
+        Method to start provisioning a switch when it gets a lease.
+        :param mac: Its mac address.
+        :param ip: The address leased.
+        """
+        switch = self.switches.get(mac)
+        if switch is None:
+            return
+        with self.lock:
+            if switch['state'] not in ('waiting', 'failed'):
+                return
+            switch['state'] = 'leased'
+            switch['leased'] = time.time()
+        if ip != switch['ip']:
+            self.say(switch, 'leased %s, the csv file has %s' % (
+                ip, switch['ip']))
+        else:
+            self.say(switch, 'leased %s, waiting for SSH' % ip)
+        thread = threading.Thread(target=self.provision, args=(switch,))
+        thread.daemon = True
+        thread.start()
+
+    def acquire(self):
+        with self.gate:
+            while (self.running >= self.options['jobs'] or
+                   (not self.seeded and self.running)):
+                self.gate.wait()
+            self.running += 1
+
+    def release(self, ok):
+        with self.gate:
+            self.running -= 1
+            if ok:
+                self.seeded = True
+            self.gate.notify_all()
+
+    def provision(self, switch):
+        """
+        Method to wait for the SSH server of a switch and run the playbook
+        for it.
+        :param switch: The switch.
+        """
+        deadline = switch['leased'] + self.options['ssh_timeout']
+        while not ssh_ready(switch['ip'], self.options['banner']):
+            if time.time() > deadline:
+                self.finish(switch, 'failed', 'SSH did not answer in %ds' %
+                            self.options['ssh_timeout'])
+                return
+            time.sleep(self.options['interval'])
+        self.say(switch, 'SSH is up')
+
+        self.acquire()
+        ok = False
+        try:
+            with self.lock:
+                switch['state'] = 'provisioning'
+            self.say(switch, 'running %s' % os.path.basename(
+                self.options['playbook']))
+            command = [ANSIBLE_PLAYBOOK, '-i', self.options['inventory'],
+                       '--limit', switch['host'], self.options['playbook']]
+            command += self.options['ansible_args']
+            log_path = os.path.join(self.options['logdir'],
+                                    switch['host'] + '.log')
+            with open(log_path, 'w') as log:
+                try:
+                    code = subprocess.call(command, stdout=log,
+                                           stderr=subprocess.STDOUT)
+                except OSError as error:
+                    log.write('%s: %s\n' % (ANSIBLE_PLAYBOOK, error))
+                    code = -1
+            ok = code == 0
+        finally:
+            self.release(ok)
+        if ok:
+            self.finish(switch, 'done', 'provisioned in %ds after the lease' %
+                        (time.time() - switch['leased']))
+        else:
+            self.finish(switch, 'failed', 'playbook failed, see %s' %
+                        log_path)
+
+    def finish(self, switch, state, msg):
+        self.say(switch, msg)
+        with self.lock:
+            switch['state'] = state
+            self.recorded[switch['mac']] = {
+                'host': switch['host'], 'state': state,
+                'seconds': int(time.time() - switch['leased']),
+                'at': int(time.time())}
+            temp_path = self.state_path + '.tmp'
+            with open(temp_path, 'w') as state_file:
+                json.dump(self.recorded, state_file, indent=2,
+                          sort_keys=True)
+            os.rename(temp_path, self.state_path)
+
+    def run(self, sources, watcher):
+        """
+        Method to feed the leases to the switches until all are done.
+        :param sources: List of LeaseSource and LogSource.
+        :param watcher: The FileWatcher of their files.
+        :return: True if every switch was provisioned.
+        """
+        while not self.finished():
+            for source in sources:
+                for mac, ip in source.events():
+                    self.on_lease(mac, ip)
+            if self.finished():
+                break
+            watcher.wait()
+        failed = sorted(switch['host'] for switch in self.switches.values()
+                        if switch['state'] == 'failed')
+        sys.stdout.write('Provisioned %d of %d switches in %ds%s\n' % (
+            len(self.switches) - len(failed), len(self.switches),
+            time.time() - self.started,
+            ', failed: ' + ', '.join(failed) if failed else ''))
+        return not failed
+
+
+def first_existing(paths):
+    for path in paths:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def main(argv):
+    """
+    Method to run the pipeline from the command line.
+    :param argv: The command line arguments.
+    """
+    options = {'csv': None, 'playbook': '/etc/ansible/pn_initial_ztp.yml',
+               'inventory': '/etc/ansible/hosts', 'ansible_args': [],
+               'jobs': 4, 'interval': 2, 'ssh_timeout': 1800,
+               'banner': 'OpenSSH', 'logdir': '/var/log/pn_ztp',
+               'reprovision': False, 'since': 0,
+               'leases': first_existing(['/var/lib/dhcp/dhcpd.leases',
+                                         '/var/lib/dhcpd/dhcpd.leases']),
+               'log': first_existing(['/var/log/syslog',
+                                      '/var/log/messages'])}
+    numbers = ('jobs', 'interval', 'ssh_timeout', 'since')
+    args = argv[1:]
+    while args:
+        option = args.pop(0)
+        key = option[2:].replace('-', '_')
+        if option == '--reprovision':
+            options['reprovision'] = True
+            continue
+        if not option.startswith('--') or key not in options:
+            exit('Execution Error: Unknown option %s!' % option)
+        if not args:
+            exit('Execution Error: %s needs a value!' % option)
+        value = args.pop(0)
+        if key == 'ansible_args':
+            value = shlex.split(value)
+        elif key in numbers:
+            value = int(value)
+        options[key] = value
+
+    if not options['csv']:
+        msg = 'Execution Error: Please provide the ZTP csv file!\n'
+        msg += 'Example usage: python pn_ztp_pipeline.py --csv file.csv'
+        exit(msg)
+    paths = [path for path in (options['leases'], options['log']) if path]
+    if not paths:
+        exit('Execution Error: No dhcpd leases file or log found, please '
+             'provide --leases or --log!')
+    options['jobs'] = max(options['jobs'], 1)
+
+    switches, skipped = read_csv(options['csv'])
+    for line in skipped:
+        print('Skipped %s' % line)
+    if not switches:
+        exit('Execution Error: No switch to provision in %s!' %
+             options['csv'])
+    if not os.path.isdir(options['logdir']):
+        os.makedirs(options['logdir'])
+
+    sources = []
+    if options['leases']:
+        sources.append(LeaseSource(options['leases'],
+                                   time.time() - options['since']))
+    if options['log']:
+        sources.append(LogSource(options['log']))
+    watcher = FileWatcher(paths, options['interval'])
+    print('Waiting for %d switches, watching %s (%s)' % (
+        len(switches), ', '.join(paths), watcher.mode()))
+    pipeline = Pipeline(switches, options)
+    if not pipeline.run(sources, watcher):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
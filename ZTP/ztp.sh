@@ -57,6 +57,7 @@ ${RED}NAME${NC}
 ${RED}SYNOPSIS${NC}
      bash ztp.sh [-h/-help] [-dhcp] [-onie] [-conf file.conf] [-csv file.csv] [-reconfigure_dhcp] 
                  [-skip_ansible] [-all_online] [-all_offline]  [-online_onie] [-offline_onie] [-online_license] [-offline_license] [-checkallsystemsgo]
+                 [-ztp_pipeline]
 
 ${RED}OPTIONS${NC}
 
@@ -91,6 +92,10 @@ ${RED}OPTIONS${NC}
  
      -checkallsystemsgo: This field will check availability of all the hosts mentioned in the CSV file.
 
+     -ztp_pipeline:      This field will run initial ZTP (pn_initial_ztp.yml) on every switch mentioned in the CSV file as soon as
+                         it gets its DHCP lease and SSH answers, instead of waiting for all switches. Options of pn_ztp_pipeline.py
+                         such as --jobs 8 can follow the CSV file.
+
 ${RED}EXAMPLES: ${NC}
      bash ztp.sh -dhcp -conf file.conf
      bash ztp.sh -dhcp -conf file.conf -csv file.csv
@@ -104,6 +109,8 @@ ${RED}EXAMPLES: ${NC}
      bash ztp.sh -onie -conf file.conf -csv file.csv -online_license -skip_ansible
      bash ztp.sh -onie -conf file.conf -csv file.csv -offline_license 
      bash ztp.sh -checkallsystemsgo
+     bash ztp.sh -ztp_pipeline -csv file.csv
+     bash ztp.sh -ztp_pipeline -csv file.csv --jobs 8 --ssh-timeout 3600
 
 ${RED}=> For DHCP : Contents of file.conf:${NC}
 $default_conf_file
@@ -117,6 +124,7 @@ default-url=http://dhcpserverip/images/onie-installer
 username=ansible  #In case of online version
 password=test123  #In case of online version
 onie_image_version=2.5.1-10309 #In case of online version
+#onie_image_sha256=<sha256 of the image> #Optional, checked after download
 
 ${RED}=> For ONIE: Contents of file.csv:${NC}
 $default_csv_file_onie
@@ -304,7 +312,7 @@ dhcpserver()
 
   #check if user has provided -skip_ansible, if no then download the yml files
   if ! [[ "$params" == *"-skip_ansible"* ]]; then
-    ymlfiles=(bgpsetup.yml bgpteardown.yml cli_vault.yml l2setup.yml l2teardown.yml main.yml pn_ebgp.yml pn_fabric.yml pn_fabric_l3_ebgp.yml pn_l2.yml pn_l2_ztp.yml pn_l3.yml pn_l3_ebgp.yml pn_l3_ztp.yml pn_vrrp.yml)
+    ymlfiles=(bgpsetup.yml bgpteardown.yml cli_vault.yml l2setup.yml l2teardown.yml main.yml pn_ebgp.yml pn_fabric.yml pn_fabric_l3_ebgp.yml pn_l2.yml pn_l2_ztp.yml pn_l3.yml pn_l3_ebgp.yml pn_l3_ztp.yml pn_vrrp.yml pn_initial_ztp.yml)
     sudo mkdir -p /etc/ansible
     cd /etc/ansible
     for i in ${ymlfiles[@]}; do
@@ -490,6 +498,26 @@ EOD
   fi
 }
 
+##
+# This function prints the value of a key=value line of the conf file, without a trailing #comment and blanks.
+# Arguments: key
+##
+conf_value()
+{
+  grep "^$1=" $conf_file | head -1 | cut -d = -f2- | sed 's/#.*//' | tr -d '[:space:]'
+}
+
+##
+# This function downloads the ONIE image and activation keys through pn_artifacts.py.
+# Artifacts already downloaded for the same version are taken from its cache in /var/cache/pn_ztp/artifacts,
+# the others are downloaded in parallel, resuming interrupted downloads.
+# Arguments: [--sha256 path=checksum] and path under /var/www/html/images, version and url of every artifact.
+##
+fetch_artifacts()
+{
+  sudo python $script_dir/pn_artifacts.py --insecure --cookie $cookie_file_name "$@"
+}
+
 ##
 # This function configures your server to act as a ONIE.
 # This function will install apache2 and JQ parser.
@@ -521,6 +549,7 @@ onie()
   csrftoken=""
   comma_count=4
   cookie_file_name="/tmp/cookie"
+  artifacts=()
 
   #If command line arguments contains 'online' word , it will configure jq json parser
   if [[ "$params" == *"online"* ]]; then
@@ -539,7 +568,8 @@ onie()
     mkdir -p /var/www/html/images
     mkdir -p /var/www/html/images/license_10g
     mkdir -p /var/www/html/images/license_40g
-    version=`cat $conf_file | grep 'onie_image_version=' | cut -d = -f2`
+    version=`conf_value onie_image_version`
+    onie_sha256=`conf_value onie_image_sha256`
     login_json=`curl -s -X POST https://cloud-web.pluribusnetworks.com/api/login -d login_email=$username\&login_password=$password -k -c $cookie_file_name`
     login_result=`echo $login_json | jq '.success'`
 
@@ -587,10 +617,10 @@ onie()
         i=$((i+1))
         order_detail_id=`echo $order_details_json | jq '.order_details[0].id'`
       done
-      printf "\n\n  -Activation of keys finished. Now downloading Activation key for OrderID:$order_detail_id ..\n"
-      curl -s -X GET https://cloud-web.pluribusnetworks.com/api/offline_bundle/$order_detail_id -b $cookie_file_name -k > /var/www/html/images/license_10g/onvl-activation-keys
-      printf "\n\n  -Activation of keys finished. Now downloading Activation key for OrderID:$order_detail_id_40g ..\n"
-      curl -s -X GET https://cloud-web.pluribusnetworks.com/api/offline_bundle/$order_detail_id_40g -b $cookie_file_name -k > /var/www/html/images/license_40g/onvl-activation-keys
+      printf "\n\n  -Activation of keys finished. Activation keys for OrderID:$order_detail_id and OrderID:$order_detail_id_40g are downloaded with the image.\n"
+      license_key=`echo "${device_id[@]}" | md5sum | cut -c1-8`
+      artifacts+=(license_10g/onvl-activation-keys order-$order_detail_id-$license_key https://cloud-web.pluribusnetworks.com/api/offline_bundle/$order_detail_id)
+      artifacts+=(license_40g/onvl-activation-keys order-$order_detail_id_40g-$license_key https://cloud-web.pluribusnetworks.com/api/offline_bundle/$order_detail_id_40g)
       #copy_activations_keys
     else
       printf "\n  -Device ids are not provided for all switches in CSV file. I can get device ids from the switches.\n   But make sure nvOS is running and DHCP IP is assigned to all switches mentioned in the CSV file.\n   ${RED}Shall I login to switches and get device id Enter (y/n)?:${NC}"
@@ -624,10 +654,10 @@ onie()
           i=$((i+1))
           order_detail_id=`echo $order_details_json | jq '.order_details[0].id'`
         done
-        printf "\n\n  -Activation of keys finished. Now downloading Activation key for OrderID:$order_detail_id ..\n"
-        curl -s -X GET https://cloud-web.pluribusnetworks.com/api/offline_bundle/$order_detail_id -b $cookie_file_name -k > /var/www/html/images/license_10g/onvl-activation-keys
-        printf "\n\n  -Activation of keys finished. Now downloading Activation key for OrderID:$order_detail_id_40g ..\n"
-        curl -s -X GET https://cloud-web.pluribusnetworks.com/api/offline_bundle/$order_detail_id_40g -b $cookie_file_name -k > /var/www/html/images/license_40g/onvl-activation-keys
+        printf "\n\n  -Activation of keys finished. Activation keys for OrderID:$order_detail_id and OrderID:$order_detail_id_40g are downloaded with the image.\n"
+        license_key=`echo "${all_device_id[@]}" | md5sum | cut -c1-8`
+        artifacts+=(license_10g/onvl-activation-keys order-$order_detail_id-$license_key https://cloud-web.pluribusnetworks.com/api/offline_bundle/$order_detail_id)
+        artifacts+=(license_40g/onvl-activation-keys order-$order_detail_id_40g-$license_key https://cloud-web.pluribusnetworks.com/api/offline_bundle/$order_detail_id_40g)
         #copy_activations_keys
 
       else
@@ -638,9 +668,12 @@ onie()
 
     #Copying the image in /var/www/html/image folder
     cd /var/www/html/images
-    printf "\n\n  -Now Downloading image in /var/www/html/images. Make sure you have provided default-url parameter value as http://ip_of_dhcp_server/images/onie-installer. in conf file\n\n"
+    printf "\n\n  -Now Downloading image and activation keys in /var/www/html/images. Make sure you have provided default-url parameter value as http://ip_of_dhcp_server/images/onie-installer. in conf file\n\n"
     sleep 1
-    curl -o onie-installer -H 'Accept-Encoding: gzip, deflate, br' -X GET https://cloud-web.pluribusnetworks.com/api/download_image1/onie-installer-$version\?version\=$version -b $cookie_file_name -k
+    if ! fetch_artifacts --sha256 "onie-installer=$onie_sha256" "${artifacts[@]}" onie-installer "$version" "https://cloud-web.pluribusnetworks.com/api/download_image1/onie-installer-$version?version=$version"; then
+      printf "\n  -Download failed, see the errors above.\n"
+      exit 1
+    fi
     printf "\n  -Downloaded image in /var/www/html/images."
 
 
@@ -654,7 +687,8 @@ onie()
   #Choice: user wants to configure online onie or offline onie
   if [[ "$params" == *"-online_onie"* ]]; then
     mkdir -p /var/www/html/images 
-    version=`cat $conf_file | grep 'onie_image_version=' | cut -d = -f2`
+    version=`conf_value onie_image_version`
+    onie_sha256=`conf_value onie_image_sha256`
 	
     #Api call for logging in and storing the cookie in cookie_file
     #It takes login_username and login_password as arguements
@@ -668,7 +702,10 @@ onie()
     fi
     cd /var/www/html/images
     printf "\n  -Downloading image in /var/www/html/images. Make sure you have provided default-url parameter value as http://ip_of_dhcp_server/images/onie-installer. in conf file"
-    #curl -o onie-installer -H 'Accept-Encoding: gzip, deflate, br' -X GET https://cloud-web.pluribusnetworks.com/api/download_image1/onie-installer-$version\?version\=$version -b $cookie_file_name -k
+    if ! fetch_artifacts --sha256 "onie-installer=$onie_sha256" onie-installer "$version" "https://cloud-web.pluribusnetworks.com/api/download_image1/onie-installer-$version?version=$version"; then
+      printf "\n  -Download failed, see the errors above.\n"
+      exit 1
+    fi
     printf "\n  -Downloaded image in /var/www/html/images.\n"
 
   elif [[ "$params" == *"-offline_onie"* ]]; then
@@ -728,10 +765,10 @@ onie()
         i=$((i+1))
         order_detail_id=`echo $order_details_json | jq '.order_details[0].id'`
       done
-      printf "\n\n  -Activation of keys finished. Now downloading Activation key for OrderID:$order_detail_id ..\n"
-      curl -s -X GET https://cloud-web.pluribusnetworks.com/api/offline_bundle/$order_detail_id -b $cookie_file_name -k > /var/www/html/images/license_10g/onvl-activation-keys
-      printf "\n\n  -Activation of keys finished. Now downloading Activation key for OrderID:$order_detail_id_40g ..\n"
-      curl -s -X GET https://cloud-web.pluribusnetworks.com/api/offline_bundle/$order_detail_id_40g -b $cookie_file_name -k > /var/www/html/images/license_40g/onvl-activation-keys
+      printf "\n\n  -Activation of keys finished. Now downloading Activation keys for OrderID:$order_detail_id and OrderID:$order_detail_id_40g ..\n"
+      license_key=`echo "${device_id[@]}" | md5sum | cut -c1-8`
+      fetch_artifacts license_10g/onvl-activation-keys order-$order_detail_id-$license_key https://cloud-web.pluribusnetworks.com/api/offline_bundle/$order_detail_id \
+        license_40g/onvl-activation-keys order-$order_detail_id_40g-$license_key https://cloud-web.pluribusnetworks.com/api/offline_bundle/$order_detail_id_40g
       #copy_activations_keys
 
     else
@@ -767,10 +804,10 @@ onie()
         done
 		
 	#Downloading the keys to onvl_activation-keys_10g if it is 10g else to onvl_activation-keys_40g if it is 40g
-        printf "\n\n  -Activation of keys finished. Now downloading Activation key for OrderID:$order_detail_id ..\n"
-        curl -s -X GET https://cloud-web.pluribusnetworks.com/api/offline_bundle/$order_detail_id -b $cookie_file_name -k > /etc/pluribuslicense/onvl-activation-keys_10g
-        printf "\n\n  -Activation of keys finished. Now downloading Activation key for OrderID:$order_detail_id_40g ..\n"
-        curl -s -X GET https://cloud-web.pluribusnetworks.com/api/offline_bundle/$order_detail_id_40g -b $cookie_file_name -k > /etc/pluribuslicense/onvl-activation-keys_40g
+        printf "\n\n  -Activation of keys finished. Now downloading Activation keys for OrderID:$order_detail_id and OrderID:$order_detail_id_40g ..\n"
+        license_key=`echo "${all_device_id[@]}" | md5sum | cut -c1-8`
+        fetch_artifacts /etc/pluribuslicense/onvl-activation-keys_10g order-$order_detail_id-$license_key https://cloud-web.pluribusnetworks.com/api/offline_bundle/$order_detail_id \
+          /etc/pluribuslicense/onvl-activation-keys_40g order-$order_detail_id_40g-$license_key https://cloud-web.pluribusnetworks.com/api/offline_bundle/$order_detail_id_40g
         #copy_activations_keys
 
       else
@@ -828,6 +865,28 @@ checkallsystemsgo()
    fi
 }
 
+##
+# This function runs initial ZTP on each switch mentioned in csv file as soon as it is up.
+# pn_ztp_pipeline.py watches the dhcpd leases file and log for the leases of the switches, waits for SSH
+# and runs /etc/ansible/pn_initial_ztp.yml limited to the switch.
+# Arguments: csv file, followed by pn_ztp_pipeline.py options if any.
+##
+ztp_pipeline()
+{
+  params=$@
+  if ! [[ "$params" == *"-csv"* ]]; then
+    printf "\nScript requires .csv file as argument to read switches. Please provide csv file as an argument : ${RED}bash ${0##*/} -ztp_pipeline -csv filename.csv${NC}\n\n"
+    exit 0
+  fi
+  validate_csv "$params"
+  pipeline_args=""
+  if [[ "$params" == *" --"* ]]; then
+    pipeline_args="--${params#* --}"
+  fi
+  printf "\n>Running initial ZTP on the switches as they come up\n\n"
+  sudo python $script_dir/pn_ztp_pipeline.py --csv $csv_file $pipeline_args
+}
+
 ##
 # This is the main function which parses the arguments and depending on that it calls different functions.
 # It configures ONIE OR DHCP OR BOTH according to the user input.
@@ -872,7 +931,8 @@ main()
 default-url=http://ip_of_dhcp_server/images/onie-installer
 username=ansible #In case of online version
 password=test123 #In case of online version
-onie_image_version=2.5.1-10309 #In case of online version"
+onie_image_version=2.5.1-10309 #In case of online version
+#onie_image_sha256=<sha256 of the image> #Optional, checked after download"
 
         echo "$default_conf_file" > /tmp/file.conf
         printf "\n#####Sample Conf file is created in /tmp/file.conf with following contents######\n"
@@ -919,11 +979,14 @@ onie_image_version=2.5.1-10309 #In case of online version"
     exit 0
   elif [[ "$params" == *"-checkallsystemsgo"* ]]; then
     checkallsystemsgo "$params"
+  elif [[ "$params" == *"-ztp_pipeline"* ]]; then
+    ztp_pipeline "$params"
   else
-    printf "\nCurrently ZTP Script provides 3 functions. i.e DHCP, ONIE and check systems availability. So please provide any of the following options as parameter\n"
+    printf "\nCurrently ZTP Script provides 4 functions. i.e DHCP, ONIE, check systems availability and ZTP pipeline. So please provide any of the following options as parameter\n"
     printf "\n1. -dhcp"
     printf "\n2. -onie\n"
     printf "\n3. -checkallsystemsgo"
+    printf "\n4. -ztp_pipeline"
     printf "\nor run command bash ztp.sh -help\n\n"
   fi
 
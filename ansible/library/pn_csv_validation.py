@@ -0,0 +1,155 @@
+#!/usr/bin/python
+""" PN CSV Validation """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_csv_schema import FORMATS, validate_files
+
+DOCUMENTATION = """
+---
+module: pn_csv_validation
+author: 'Pluribus Networks (devops@pluribusnetworks.com)'
+short_description: Module to validate the csv input files.
+description:
+    Validates csv input files before any switch is configured. Every format
+    has its own schema: the number and type of columns, values which must be
+    unique, and subnets which must not overlap. Files validated together are
+    also checked against each other (a vlan or subnet used by two files) and
+    switches they name must be in the inventory.
+    Formats are l2_vrrp, l3_vrrp, fabric_over_l3, dci, third_party_dci,
+    vxlan and cli_commands.
+options:
+    pn_csv_data:
+      description: String containing the data of the csv file.
+      required: False
+      type: str
+    pn_format:
+      description: Format of pn_csv_data.
+      required: False
+      type: str
+    pn_files:
+      description:
+        - List of files validated together, each a dictionary with name,
+          format and data.
+      required: False
+      type: list
+    pn_inventory:
+      description:
+        - List of the switch names of the inventory. Switches named in the
+          files must be in it.
+      required: False
+      type: list
+"""
+
+EXAMPLES = """
+- name: Validate L3 VRRP csv file
+  pn_csv_validation:
+    pn_csv_data: "{{ lookup('file', '{{ csv_file }}') }}"
+    pn_format: l3_vrrp
+    pn_inventory: "{{ groups['all'] }}"
+
+- name: Validate the DCI files together
+  pn_csv_validation:
+    pn_files:
+      - name: "{{ dci_file }}"
+        format: dci
+        data: "{{ lookup('file', '{{ dci_file }}') }}"
+      - name: "{{ third_party_file }}"
+        format: third_party_dci
+        data: "{{ lookup('file', '{{ third_party_file }}') }}"
+    pn_inventory: "{{ groups['all'] }}"
+"""
+
+RETURN = """
+msg:
+  description: It contains output of each validation.
+  returned: always
+  type: str
+changed:
+  description: Indicates whether the validation caused changes on the target.
+  returned: always
+  type: bool
+unreachable:
+  description: Empty string.
+  returned: always
+  type: bool
+failed:
+  description: Indicates if csv validation failed or not.
+  returned: always
+  type: bool
+exception:
+  description: Empty string.
+  returned: always
+  type: str
+task:
+  description: Name of the task getting executed.
+  returned: always
+  type: str
+summary:
+  description: Indicates whether csv file is valid or invalid.
+  returned: always
+  type: str
+"""
+
+
+def main():
+    """ This section is for arguments parsing """
+    module = AnsibleModule(
+        argument_spec=dict(
+            pn_csv_data=dict(required=False, type='str'),
+            pn_format=dict(required=False, type='str',
+                           choices=sorted(FORMATS)),
+            pn_files=dict(required=False, type='list'),
+            pn_inventory=dict(required=False, type='list'),
+        ),
+        required_one_of=[['pn_csv_data', 'pn_files']],
+        required_together=[['pn_csv_data', 'pn_format']],
+        supports_check_mode=True
+    )
+
+    files = []
+    if module.params['pn_csv_data'] is not None:
+        files.append(('csv', module.params['pn_format'],
+                      module.params['pn_csv_data']))
+    for index, item in enumerate(module.params['pn_files'] or [], 1):
+        files.append((item.get('name') or 'file%d' % index,
+                      item.get('format'), item.get('data') or ''))
+
+    errors = validate_files(files, module.params['pn_inventory'])
+
+    if not errors:
+        msg = 'Valid csv file'
+        failed_flag = False
+    else:
+        msg = 'Invalid csv file'
+        failed_flag = True
+
+    module.exit_json(
+        unreachable=False,
+        msg=''.join(error + '\n' for error in errors),
+        summary=msg,
+        exception='',
+        failed=failed_flag,
+        changed=False,
+        task='Validate csv file'
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -19,6 +19,13 @@
 #
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_breakout import (breakout_commands,
+                                              breakout_snapshot,
+                                              plan_breakout, port_ranges,
+                                              wait_breakout)
+from ansible.module_utils.pn_events import ChangeEvents
+from ansible.module_utils.pn_nvos import cli_stats, command_plan, run_command
+from ansible.module_utils.pn_profile import run_main
 import shlex
 import time
 
@@ -40,6 +47,12 @@ options:
         - Provide login password if user is not root.
       required: False
       type: str
+    pn_fabric_facts:
+      description:
+        - pn_fabric fact gathered by pn_fabric_facts. While it is fresh,
+          the fabric discovery shows are answered from it.
+      required: False
+      type: dict
     pn_fabric_name:
       description:
         - Specify name of the fabric.
@@ -162,9 +175,25 @@ failed:
   description: Indicates whether or not the execution failed on the target.
   returned: always
   type: bool
+plan:
+  description: Commands which would be issued, per switch, when run in
+    check mode.
+  returned: check mode
+  type: dict
+cli_stats:
+  description: Calls made to the switches (a batch counts once), the commands
+    they carried, the bytes of output and the seconds spent waiting on them.
+  returned: always
+  type: dict
+events:
+  description: Change events (switch, object, key, action, result, msg), in
+    the order they happened.
+  returned: always
+  type: list
 """
 
 CHANGED_FLAG = []
+EVENTS = ChangeEvents()
 
 
 def pn_cli(module):
@@ -193,7 +222,7 @@ def run_cli(module, cli):
     :return: Output/Error or Success msg depending upon the response from cli.
     """
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_command(module, cli)
     if out:
         return out
 
@@ -218,7 +247,7 @@ def auto_accept_eula(module):
     password = module.params['pn_clipassword']
     cli = ' /usr/bin/cli --quiet --skip-setup eula-show '
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_command(module, cli)
 
     if err:
         cli = '/usr/bin/cli --quiet'
@@ -252,7 +281,6 @@ def assign_inband_ip(module):
     """
     Method to assign in-band ips to switches.
     :param module: The Ansible module to fetch input parameters.
-    :return: String describing if in-band ip got assigned or not.
     """
     global CHANGED_FLAG
     inband_ip = module.params['pn_inband_ip']
@@ -273,9 +301,8 @@ def assign_inband_ip(module):
 
     if 'Setup completed successfully' in run_cli(module, cli):
         CHANGED_FLAG.append(True)
-        return ' %s: In-band ip assigned with ip %s \n' % (current_switch, ip)
-
-    return ''
+        EVENTS.changed(current_switch, 'switch-setup', current_switch,
+                       'modify', 'In-band ip assigned with ip %s' % ip)
 
 
 def create_switch_routes(module, inband_ip):
@@ -300,8 +327,7 @@ def create_switch_routes(module, inband_ip):
             network_ip, gateway_ip
         )
         switch_count += 1
-        cli = shlex.split(cli)
-        module.run_command(cli)
+        run_command(module, cli)
 
 
 def configure_fabric(module, switch):
@@ -309,10 +335,8 @@ def configure_fabric(module, switch):
     Method to configure (create/join) fabric.
     :param module: The Ansible module to fetch input parameters.
     :param switch: Name of the current switch.
-    :return: String describing fabric creation/joining description.
     """
     global CHANGED_FLAG
-    output = ''
     fabric_name = module.params['pn_fabric_name']
     switch_index = module.params['pn_leaf_list'].index(switch)
 
@@ -333,27 +357,27 @@ def configure_fabric(module, switch):
             cli += 'fabric-create name %s ' % fabric_name
             cli += ' fabric-network in-band control-network in-band '
             run_cli(module, cli)
-            output += ' %s: Fabric %s created \n' % (switch, fabric_name)
+            EVENTS.changed(switch, 'fabric', fabric_name, 'create',
+                           'Fabric %s created' % fabric_name)
             CHANGED_FLAG.append(True)
         else:
-            output += ' %s: Fabric %s already exists \n' % (switch, fabric_name)
+            EVENTS.unchanged(switch, 'fabric', fabric_name,
+                             'Fabric %s already exists' % fabric_name)
 
         # Indicate all subnets of the in-band interfaces of switches,
         # that will be part of the fabric.
-        output += fabric_inband_net_create(module, inband_static_part,
-                                           subnet, switch)
+        fabric_inband_net_create(module, inband_static_part, subnet, switch)
     else:
         switch_ip = inband_static_part + str(1) + '.' + str(1)
         # Join existing fabric.
         if 'Already' in join_fabric(module, switch_ip):
-            output += ' %s: Already part of fabric %s \n' % (switch,
-                                                             fabric_name)
+            EVENTS.unchanged(switch, 'fabric', fabric_name,
+                             'Already part of fabric %s' % fabric_name)
         else:
-            output += ' %s: Joined fabric %s \n' % (switch, fabric_name)
+            EVENTS.changed(switch, 'fabric', fabric_name, 'create',
+                           'Joined fabric %s' % fabric_name)
             CHANGED_FLAG.append(True)
 
-    return output
-
 
 def find_clustered_switches(module):
     """
@@ -395,10 +419,8 @@ def fabric_inband_net_create(module, inband_static_part, subnet, switch):
     :param inband_static_part: In-band ip address till second octet.
     :param subnet: Subnet mask of in-band ip address.
     :param switch: Name of the 1st switch in the DC.
-    :return: String describing if fabric in-band network got created or not.
     """
     global CHANGED_FLAG
-    output = ''
     leaf_list = module.params['pn_leaf_list']
     cli = pn_cli(module)
     clicopy = cli
@@ -417,16 +439,16 @@ def fabric_inband_net_create(module, inband_static_part, subnet, switch):
             cli += 'fabric-in-band-network-create network ' + inband_network_ip
             cli += ' netmask ' + subnet
             if 'Success' in run_cli(module, cli):
-                output += ' %s: Fabric in-band network created for %s \n' % (
-                    switch, inband_network_ip
-                )
+                EVENTS.changed(switch, 'fabric-in-band-network',
+                               inband_network_ip, 'create',
+                               'Fabric in-band network created for %s' %
+                               inband_network_ip)
                 CHANGED_FLAG.append(True)
         else:
-            output += ' %s: Fabric in-band network %s already exists \n' % (
-                switch, inband_network_ip
-            )
-
-    return output
+            EVENTS.unchanged(switch, 'fabric-in-band-network',
+                             inband_network_ip,
+                             'Fabric in-band network %s already exists' %
+                             inband_network_ip)
 
 
 def join_fabric(module, switch_ip):
@@ -441,7 +463,7 @@ def join_fabric(module, switch_ip):
 
     cli += ' fabric-info format name no-show-headers'
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_command(module, cli)
 
     if err:
         cli = clicopy
@@ -468,7 +490,6 @@ def create_vrouter(module, switch, bgp_as, router_id, bgp_nic_ip,
     :param in_band_nic_ip: In-band nic ip of this switch.
     :param in_band_nic_netmask: Netmask of in-band nic ip.
     :param fabric_network_address: Fabric network address of the existing fabric
-    :return: String describing if vrouter got created or if it already exists.
     """
     global CHANGED_FLAG
     vrouter_name = switch + '-vrouter'
@@ -490,9 +511,11 @@ def create_vrouter(module, switch, bgp_as, router_id, bgp_nic_ip,
         cli += ' allowas-in '
         run_cli(module, cli)
         CHANGED_FLAG.append(True)
-        return ' %s: Created %s \n' % (switch, vrouter_name)
+        EVENTS.changed(switch, 'vrouter', vrouter_name, 'create',
+                       'Created %s' % vrouter_name)
     else:
-        return ' %s: %s already exists \n' % (switch, vrouter_name)
+        EVENTS.unchanged(switch, 'vrouter', vrouter_name,
+                         '%s already exists' % vrouter_name)
 
 
 def get_l3_port(module, neighbor_name):
@@ -526,7 +549,6 @@ def configure_loopback_interface(module, switch, router_id):
     :param module: The Ansible module to fetch input parameters.
     :param switch: Name of the switch.
     :param router_id: Router id which is same as loopback ip.
-    :return: String describing if loopback interface got configured or not
     """
     global CHANGED_FLAG
     vrouter_name = switch + '-vrouter'
@@ -548,12 +570,13 @@ def configure_loopback_interface(module, switch, router_id):
         run_cli(module, cli)
 
         CHANGED_FLAG.append(True)
-        return ' %s: Configured loopback interface with ip %s \n' % (switch,
-                                                                     router_id)
+        EVENTS.changed(switch, 'vrouter-loopback-interface', router_id,
+                       'create',
+                       'Configured loopback interface with ip %s' % router_id)
     else:
-        return ' %s: Loopback interface %s has been already configured \n' % (
-            switch, router_id
-        )
+        EVENTS.unchanged(switch, 'vrouter-loopback-interface', router_id,
+                         'Loopback interface %s has been already configured'
+                         % router_id)
 
 
 def configure_ebgp_connections(module, switch, third_party_data, bgp_nic_ip):
@@ -563,10 +586,8 @@ def configure_ebgp_connections(module, switch, third_party_data, bgp_nic_ip):
     :param switch: Name of the switch.
     :param third_party_data: Third party BGP data in csv format.
     :param bgp_nic_ip: Ip of first bgp neighbor added.
-    :return: String describing eBGP configuration.
     """
     global CHANGED_FLAG
-    output = ''
     vrouter_name = switch + '-vrouter'
     skip_flag = False
     address = bgp_nic_ip.split('.')
@@ -605,11 +626,12 @@ def configure_ebgp_connections(module, switch, third_party_data, bgp_nic_ip):
                 cli += ' vrouter-interface-add vrouter-name %s ' % vrouter_name
                 cli += ' l3-port %s ip %s ' % (l3_port, ip)
                 run_cli(module, cli)
-                output += ' %s: Added vrouter interface %s \n' % (switch, ip)
+                CHANGED_FLAG.append(True)
+                EVENTS.changed(switch, 'vrouter-interface', ip, 'create',
+                               'Added vrouter interface %s' % ip)
             else:
-                output += ' %s: Vrouter interface %s already added \n' % (
-                    switch, ip
-                )
+                EVENTS.unchanged(switch, 'vrouter-interface', ip,
+                                 'Vrouter interface %s already added' % ip)
 
             cli = clicopy
             cli += ' vrouter-bgp-show vrouter-name %s ' % vrouter_name
@@ -623,8 +645,9 @@ def configure_ebgp_connections(module, switch, third_party_data, bgp_nic_ip):
                                                            remote_as)
                 cli += ' allowas-in '
                 run_cli(module, cli)
-                output += ' %s: Added eBGP neighbor %s \n' % (switch,
-                                                              neighbor_ip)
+                CHANGED_FLAG.append(True)
+                EVENTS.changed(switch, 'vrouter-bgp', neighbor_ip, 'create',
+                               'Added eBGP neighbor %s' % neighbor_ip)
 
                 cli = clicopy
                 cli += ' vrouter-modify name %s ' % vrouter_name
@@ -632,11 +655,8 @@ def configure_ebgp_connections(module, switch, third_party_data, bgp_nic_ip):
                 cli += ' bgp-bestpath-as-path multipath-relax '
                 run_cli(module, cli)
             else:
-                output += ' %s: eBGP neighbor %s already added \n' % (
-                    switch, neighbor_ip
-                )
-
-    return output
+                EVENTS.unchanged(switch, 'vrouter-bgp', neighbor_ip,
+                                 'eBGP neighbor %s already added' % neighbor_ip)
 
 
 def create_vlan(module, vlan_id, switch, scope):
@@ -646,7 +666,6 @@ def create_vlan(module, vlan_id, switch, scope):
     :param vlan_id: vlan id to create.
     :param switch: Name of the switch.
     :param scope: Scope of the vlan to create.
-    :return: String describing vlan creation details.
     """
     global CHANGED_FLAG
     cli = pn_cli(module)
@@ -661,15 +680,12 @@ def create_vlan(module, vlan_id, switch, scope):
                                                            scope)
         run_cli(module, cli)
         CHANGED_FLAG.append(True)
-
-        return ' %s: Vlan id %s with scope %s created \n' % (
-            switch, vlan_id, scope
-        )
-
+        EVENTS.changed(switch, 'vlan', vlan_id, 'create',
+                       'Vlan id %s with scope %s created' % (vlan_id, scope))
     else:
-        return ' %s: Vlan id %s with scope %s already exists \n' % (
-            switch, vlan_id, scope
-        )
+        EVENTS.unchanged(switch, 'vlan', vlan_id,
+                         'Vlan id %s with scope %s already exists' % (
+                             vlan_id, scope))
 
 
 def configure_ibgp_connection(module, switch, local_ip, remote_ip, remote_as):
@@ -680,10 +696,8 @@ def configure_ibgp_connection(module, switch, local_ip, remote_ip, remote_as):
     :param local_ip: Vrouter interface ip of local switch.
     :param remote_ip: Vrouter interface ip of remote switch.
     :param remote_as: Remote-as value of cluster.
-    :return: String describing details of iBGP configuration made.
     """
     global CHANGED_FLAG
-    output = ''
     vrouter_name = switch + '-vrouter'
     vlan_id = module.params['pn_ibgp_vlan']
     cli = pn_cli(module)
@@ -701,12 +715,13 @@ def configure_ibgp_connection(module, switch, local_ip, remote_ip, remote_as):
         )
         cli += ' ip %s vlan %s ' % (local_ip, vlan_id)
         run_cli(module, cli)
-        output += ' %s: Added vrouter interface with ip %s on %s \n' % (
-            switch, local_ip, vrouter_name
-        )
+        EVENTS.changed(switch, 'vrouter-interface', local_ip, 'create',
+                       'Added vrouter interface with ip %s on %s' % (
+                           local_ip, vrouter_name))
         CHANGED_FLAG.append(True)
     else:
-        output += ' %s: iBGP interface %s already added \n' % (switch, local_ip)
+        EVENTS.unchanged(switch, 'vrouter-interface', local_ip,
+                         'iBGP interface %s already added' % local_ip)
 
     remote_ip = remote_ip.split('/')[0]
     cli = clicopy
@@ -722,13 +737,13 @@ def configure_ibgp_connection(module, switch, local_ip, remote_ip, remote_as):
         cli += ' neighbor %s remote-as %s next-hop-self bfd ' % (remote_ip,
                                                                  remote_as)
         run_cli(module, cli)
-        output += ' %s: Added iBGP neighbor %s for %s \n' % (switch, remote_ip,
-                                                             vrouter_name)
+        EVENTS.changed(switch, 'vrouter-bgp', remote_ip, 'create',
+                       'Added iBGP neighbor %s for %s' % (remote_ip,
+                                                         vrouter_name))
         CHANGED_FLAG.append(True)
     else:
-        output += ' %s: iBGP neighbor %s already added \n' % (switch, remote_ip)
-
-    return output
+        EVENTS.unchanged(switch, 'vrouter-bgp', remote_ip,
+                         'iBGP neighbor %s already added' % remote_ip)
 
 
 def create_cluster(module, name, cluster_list):
@@ -737,7 +752,6 @@ def create_cluster(module, name, cluster_list):
     :param module: The Ansible module to fetch input parameters.
     :param name: The name of the cluster to create.
     :param cluster_list: List of cluster switches.
-    :return: String describing if cluster got created or if it already exists.
     """
     global CHANGED_FLAG
     cluster_node1 = cluster_list[0]
@@ -755,9 +769,11 @@ def create_cluster(module, name, cluster_list):
                                                           cluster_node2)
         if 'Success' in run_cli(module, cli):
             CHANGED_FLAG.append(True)
-            return ' %s: %s created successfully \n' % (cluster_node1, name)
+            EVENTS.changed(cluster_node1, 'cluster', name, 'create',
+                           '%s created successfully' % name)
     else:
-        return ' %s: %s already exists \n' % (cluster_node1, name)
+        EVENTS.unchanged(cluster_node1, 'cluster', name,
+                         '%s already exists' % name)
 
 
 def modify_vrouter(module, switch, vrrp_id):
@@ -766,7 +782,6 @@ def modify_vrouter(module, switch, vrrp_id):
     :param module: The Ansible module to fetch input parameters.
     :param switch: Name of the switch.
     :param vrrp_id: vrrp id to be assigned to vrouter.
-    :return: String describing if vrrp id got assigned or not.
     """
     global CHANGED_FLAG
     vrouter_name = switch + '-vrouter'
@@ -781,11 +796,13 @@ def modify_vrouter(module, switch, vrrp_id):
         cli += ' switch %s vrouter-modify name %s ' % (switch, vrouter_name)
         cli += ' hw-vrrp-id %s ' % vrrp_id
         run_cli(module, cli)
-        return ' %s: Assigned vrrp_id %s to %s \n' % (switch, vrrp_id,
-                                                      vrouter_name)
+        CHANGED_FLAG.append(True)
+        EVENTS.changed(switch, 'vrouter', vrouter_name, 'modify',
+                       'Assigned vrrp_id %s to %s' % (vrrp_id, vrouter_name))
     else:
-        return ' %s: Vrrp-id %s already assigned to %s \n' % (switch, vrrp_id,
-                                                              vrouter_name)
+        EVENTS.unchanged(switch, 'vrouter', vrouter_name,
+                         'Vrrp-id %s already assigned to %s' % (
+                             vrrp_id, vrouter_name))
 
 
 def create_vrouter_interface(module, switch, vrrp_ip, vlan_id, vrrp_id,
@@ -800,7 +817,6 @@ def create_vrouter_interface(module, switch, vrrp_ip, vlan_id, vrrp_id,
     :param vrrp_id: vrrp_id to be assigned.
     :param vrrp_priority: priority to be given(110 for active switch).
     :param ip_count: The value of fourth octet in the ip.
-    :return: String describing if vrouter interface got added or not.
     """
     global CHANGED_FLAG
     vrouter_name = switch + '-vrouter'
@@ -827,14 +843,14 @@ def create_vrouter_interface(module, switch, vrrp_ip, vlan_id, vrrp_id,
         cli += ' ip ' + interface_ip
         cli += ' vlan %s if data ' % vlan_id
         run_cli(module, cli)
-        output = ' %s: Added vrouter interface with ip %s to %s \n' % (
-            switch, interface_ip, vrouter_name
-        )
+        EVENTS.changed(switch, 'vrouter-interface', interface_ip, 'create',
+                       'Added vrouter interface with ip %s to %s' % (
+                           interface_ip, vrouter_name))
         CHANGED_FLAG.append(True)
     else:
-        output = ' %s: Vrouter interface %s already exists for %s \n' % (
-            switch, interface_ip, vrouter_name
-        )
+        EVENTS.unchanged(switch, 'vrouter-interface', interface_ip,
+                         'Vrouter interface %s already exists for %s' % (
+                             interface_ip, vrouter_name))
 
     cli = clicopy
     cli += ' vrouter-interface-show vrouter-name %s ip %s vlan %s ' % (
@@ -862,17 +878,15 @@ def create_vrouter_interface(module, switch, vrrp_ip, vlan_id, vrrp_id,
         cli += ' vrrp-primary %s vrrp-priority %s ' % (eth_port[0],
                                                        vrrp_priority)
         run_cli(module, cli)
-        output += ' %s: Added vrouter interface with ip %s to %s \n' % (
-            switch, vip, vrouter_name
-        )
+        EVENTS.changed(switch, 'vrouter-interface', vip, 'create',
+                       'Added vrouter interface with ip %s to %s' % (
+                           vip, vrouter_name))
         CHANGED_FLAG.append(True)
 
     else:
-        output += ' %s: Vrouter interface %s already exists for %s \n' % (
-            switch, vip, vrouter_name
-        )
-
-    return output
+        EVENTS.unchanged(switch, 'vrouter-interface', vip,
+                         'Vrouter interface %s already exists for %s' % (
+                             vip, vrouter_name))
 
 
 def add_vrouter_interface_for_non_cluster_switch(module, vrrp_ip, switch,
@@ -883,7 +897,6 @@ def add_vrouter_interface_for_non_cluster_switch(module, vrrp_ip, switch,
     :param vrrp_ip: Vrouter interface ip to be added.
     :param switch: Name of non clustered switch.
     :param vlan_id: vlan id.
-    :return: String describing if vrouter interface got added or not.
     """
     global CHANGED_FLAG
     vrouter_name = switch + '-vrouter'
@@ -911,23 +924,20 @@ def add_vrouter_interface_for_non_cluster_switch(module, vrrp_ip, switch,
         cli += ' ip ' + gateway_ip
         run_cli(module, cli)
         CHANGED_FLAG.append(True)
-        return ' %s: Added vrouter interface with ip %s on %s \n' % (
-            switch, gateway_ip, vrouter_name
-        )
-
+        EVENTS.changed(switch, 'vrouter-interface', gateway_ip, 'create',
+                       'Added vrouter interface with ip %s on %s' % (
+                           gateway_ip, vrouter_name))
     else:
-        return ' %s: Vrouter interface %s already exists on %s \n' % (
-            switch, gateway_ip, vrouter_name
-        )
+        EVENTS.unchanged(switch, 'vrouter-interface', gateway_ip,
+                         'Vrouter interface %s already exists on %s' % (
+                             gateway_ip, vrouter_name))
 
 
 def configure_vrrp(module):
     """
     Method to configure VRRP L3.
     :param module: The Ansible module to fetch input parameters.
-    :return: Output string of configuration.
     """
-    output = ''
     csv_data = module.params['pn_csv_data']
     csv_data = csv_data.replace(" ", "")
     csv_data_list = csv_data.split('\n')
@@ -950,25 +960,22 @@ def configure_vrrp(module):
             host_count = 1
 
             # Create a cluster and vlan with scope cluster
-            output += create_cluster(module, cluster_name, cluster_list)
-            output += create_vlan(module, vlan_id, cluster_node1, 'cluster')
+            create_cluster(module, cluster_name, cluster_list)
+            create_vlan(module, vlan_id, cluster_node1, 'cluster')
 
             for switch in cluster_list:
-                output += modify_vrouter(module, switch, vrrp_id)
+                modify_vrouter(module, switch, vrrp_id)
                 host_count += 1
                 vrrp_priority = '110' if switch == active_switch else '100'
-                output += create_vrouter_interface(module, switch, vrrp_ip,
-                                                   vlan_id, vrrp_id,
-                                                   str(host_count),
-                                                   vrrp_priority)
+                create_vrouter_interface(module, switch, vrrp_ip, vlan_id,
+                                         vrrp_id, str(host_count),
+                                         vrrp_priority)
         else:
             # Configure VRRP for non clustered switches.
-            output += create_vlan(module, vlan_id, cluster_node1, 'local')
-            output += add_vrouter_interface_for_non_cluster_switch(
+            create_vlan(module, vlan_id, cluster_node1, 'local')
+            add_vrouter_interface_for_non_cluster_switch(
                 module, vrrp_ip, cluster_node1, vlan_id)
 
-    return output
-
 
 def add_vxlan_to_vlan(module, vlan_id, vxlan, switch):
     """
@@ -977,7 +984,6 @@ def add_vxlan_to_vlan(module, vlan_id, vxlan, switch):
     :param vlan_id: vlan id to be modified.
     :param vxlan: vxlan id to be assigned to vlan.
     :param switch: Name of the switch on which vlan is present.
-    :return: String describing if vxlan for added or not.
     """
     global CHANGED_FLAG
     cli = pn_cli(module)
@@ -990,10 +996,13 @@ def add_vxlan_to_vlan(module, vlan_id, vxlan, switch):
         cli += ' switch %s vlan-modify id %s vxlan %s ' % (switch, vlan_id,
                                                            vxlan)
         run_cli(module, cli)
-        return ' %s: Added vxlan %s to vlan %s \n' % (switch, vxlan, vlan_id)
+        CHANGED_FLAG.append(True)
+        EVENTS.changed(switch, 'vlan', vlan_id, 'modify',
+                       'Added vxlan %s to vlan %s' % (vxlan, vlan_id))
     else:
-        return ' %s: Vxlan %s has been added to vlan %s \n' % (switch, vxlan,
-                                                               vlan_id)
+        EVENTS.unchanged(switch, 'vlan', vlan_id,
+                         'Vxlan %s has been added to vlan %s' % (vxlan,
+                                                                 vlan_id))
 
 
 def get_vrouter_interface_ip(module, switch, vlan):
@@ -1030,7 +1039,6 @@ def create_tunnel(module, local_switch, tunnel_name, scope, local_ip, remote_ip,
     :param remote_ip: Remote vrouter interface ip.
     :param peer_switch: Name of the peer clustered switch. In case of
     unclustered switch, this will be None.
-    :return: String describing if tunnel got created or if it already exists.
     """
     global CHANGED_FLAG
     cli = pn_cli(module)
@@ -1050,12 +1058,14 @@ def create_tunnel(module, local_switch, tunnel_name, scope, local_ip, remote_ip,
 
         if 'Success' in run_cli(module, cli):
             CHANGED_FLAG.append(True)
-            return ' %s: %s created successfully \n ' % (local_switch,
-                                                         tunnel_name)
+            EVENTS.changed(local_switch, 'tunnel', tunnel_name, 'create',
+                           '%s created successfully' % tunnel_name)
         else:
-            return ' %s: Could not create %s \n' % (local_switch, tunnel_name)
+            EVENTS.add(local_switch, 'tunnel', tunnel_name, 'create', 'failed',
+                       'Could not create %s' % tunnel_name)
     else:
-        return ' %s: %s already exists \n' % (local_switch, tunnel_name)
+        EVENTS.unchanged(local_switch, 'tunnel', tunnel_name,
+                         '%s already exists' % tunnel_name)
 
 
 def add_vxlan_to_tunnel(module, vxlan, tunnel_name, switch):
@@ -1065,7 +1075,6 @@ def add_vxlan_to_tunnel(module, vxlan, tunnel_name, switch):
     :param vxlan: vxlan id to add to tunnel.
     :param tunnel_name: Name of the tunnel on which vxlan will be added.
     :param switch: Name of the switch on which tunnel exists.
-    :return: String describing if vxlan got added to tunnel or not.
     """
     global CHANGED_FLAG
     cli = pn_cli(module)
@@ -1080,22 +1089,21 @@ def add_vxlan_to_tunnel(module, vxlan, tunnel_name, switch):
                                                                   vxlan)
         if 'Success' in run_cli(module, cli):
             CHANGED_FLAG.append(True)
-            return ' %s: Added vxlan %s to %s \n' % (switch, vxlan, tunnel_name)
+            EVENTS.changed(switch, 'tunnel-vxlan', tunnel_name, 'create',
+                           'Added vxlan %s to %s' % (vxlan, tunnel_name))
         else:
-            return ' %s: Could not add vxlan %s to %s \n' % (switch, vxlan,
-                                                             tunnel_name)
+            EVENTS.add(switch, 'tunnel-vxlan', tunnel_name, 'create', 'failed',
+                       'Could not add vxlan %s to %s' % (vxlan, tunnel_name))
     else:
-        return ' %s: vxlan %s already added to %s \n' % (switch, vxlan,
-                                                         tunnel_name)
+        EVENTS.unchanged(switch, 'tunnel-vxlan', tunnel_name,
+                         'vxlan %s already added to %s' % (vxlan, tunnel_name))
 
 
 def configure_vxlan(module):
     """
     Method to configure vxlan.
     :param module: The Ansible module to fetch input parameters.
-    :return: Output string of configuration.
     """
-    output = ''
     vxlan_switches_list = []
     csv_data = module.params['pn_csv_data']
     csv_data = csv_data.replace(" ", "")
@@ -1109,15 +1117,12 @@ def configure_vxlan(module):
             leaf_switch_2 = elements[3]
             vxlan_id = elements[6]
             vxlan_switches_list.append([leaf_switch_1, leaf_switch_2, vlan_id])
-            output += add_vxlan_to_vlan(module, vlan_id, vxlan_id,
-                                        leaf_switch_1)
-            output += add_vxlan_to_vlan(module, vlan_id, vxlan_id,
-                                        leaf_switch_2)
+            add_vxlan_to_vlan(module, vlan_id, vxlan_id, leaf_switch_1)
+            add_vxlan_to_vlan(module, vlan_id, vxlan_id, leaf_switch_2)
         elif len(elements) == 4:
             vxlan_id = elements[3]
             vxlan_switches_list.append([leaf_switch_1, vlan_id])
-            output += add_vxlan_to_vlan(module, vlan_id, vxlan_id,
-                                        leaf_switch_1)
+            add_vxlan_to_vlan(module, vlan_id, vxlan_id, leaf_switch_1)
 
     for row in csv_data_list:
         elements = row.split(',')
@@ -1151,24 +1156,19 @@ def configure_vxlan(module):
                     remote_ip = get_vrouter_interface_ip(module, switches[0],
                                                          remote_vlan)
 
-                    output += create_tunnel(module, leaf_switch_1, tunnel_name,
-                                            scope, local_ip, remote_ip,
-                                            leaf_switch_2)
-
-                    output += add_vxlan_to_tunnel(module, vxlan_id, tunnel_name,
-                                                  leaf_switch_1)
+                    create_tunnel(module, leaf_switch_1, tunnel_name, scope,
+                                  local_ip, remote_ip, leaf_switch_2)
 
-    return output
+                    add_vxlan_to_tunnel(module, vxlan_id, tunnel_name,
+                                        leaf_switch_1)
 
 
 def configure_ibgp_vrrp_vxlan(module):
     """
     Method to configure iBGP, VRRP and Vxlan for DCI.
     :param module: The Ansible module to fetch input parameters.
-    :return: String describing details of all configurations.
     """
     global CHANGED_FLAG
-    output = ''
     cluster_dict_info = find_clustered_switches(module)
     cluster_list = cluster_dict_info[0]
 
@@ -1182,8 +1182,8 @@ def configure_ibgp_vrrp_vxlan(module):
         subnet_count = 0
 
         # Create local vlans on both cluster nodes.
-        output += create_vlan(module, vlan_id, cluster_node1, vlan_scope)
-        output += create_vlan(module, vlan_id, cluster_node2, vlan_scope)
+        create_vlan(module, vlan_id, cluster_node1, vlan_scope)
+        create_vlan(module, vlan_id, cluster_node2, vlan_scope)
 
         address = ibgp_ip_range.split('.')
         static_part = str(address[0]) + '.' + str(address[1]) + '.'
@@ -1207,29 +1207,25 @@ def configure_ibgp_vrrp_vxlan(module):
                 break
 
         # Configure iBGP connection.
-        output += configure_ibgp_connection(module, cluster_node1, node1_ip,
-                                            node2_ip, bgp_as)
+        configure_ibgp_connection(module, cluster_node1, node1_ip, node2_ip,
+                                  bgp_as)
 
-        output += configure_ibgp_connection(module, cluster_node2, node2_ip,
-                                            node1_ip, bgp_as)
+        configure_ibgp_connection(module, cluster_node2, node2_ip, node1_ip,
+                                  bgp_as)
 
     # Configure VRRP to be used for VTEP HA
-    output += configure_vrrp(module)
+    configure_vrrp(module)
 
     # Configure vxlan tunnels
-    output += configure_vxlan(module)
-
-    return output
+    configure_vxlan(module)
 
 
 def implement_dci(module):
     """
     Method to implement initial DCI setup: fabric creation/join and eBGP.
     :param module: The Ansible module to fetch input parameters.
-    :return: String describing details of DCI implementation.
     """
     global CHANGED_FLAG
-    output = ''
     current_switch = module.params['pn_current_switch']
     bgp_ip = module.params['pn_bgp_ip']
     leaf_list = module.params['pn_leaf_list']
@@ -1279,7 +1275,9 @@ def implement_dci(module):
             break
 
     if neighbor_name is None or neighbor_ip is None or remote_as is None:
-        return ' %s: Could not find remote bgp data \n' % current_switch
+        EVENTS.add(current_switch, 'vrouter-bgp', '', 'none', 'failed',
+                   'Could not find remote bgp data')
+        return
 
     # Calculate bgp-nic-l3-port number connected to first neighbor
     bgp_nic_l3_port = get_l3_port(module, neighbor_name)
@@ -1296,79 +1294,45 @@ def implement_dci(module):
     bgp_nic_ip = n_static_part + n_last_octet + '/' + bgp_subnet
 
     # Create and configure vrouter on this switch.
-    output += create_vrouter(module, current_switch, bgp_as, router_id,
-                             bgp_nic_ip, bgp_nic_l3_port, neighbor_ip,
-                             remote_as, inband_nic_ip, inband_nic_netmask,
-                             fabric_network_address)
+    create_vrouter(module, current_switch, bgp_as, router_id, bgp_nic_ip,
+                   bgp_nic_l3_port, neighbor_ip, remote_as, inband_nic_ip,
+                   inband_nic_netmask, fabric_network_address)
 
     # Configure other eBGP connection to third party switches
-    output += configure_ebgp_connections(module, current_switch,
-                                         third_party_data, bgp_nic_ip)
+    configure_ebgp_connections(module, current_switch, third_party_data,
+                               bgp_nic_ip)
 
     # Configure loopback interface for debugging purpose.
-    output += configure_loopback_interface(module, current_switch, router_id)
+    configure_loopback_interface(module, current_switch, router_id)
 
     # Create a switch routes to all other switches
     if switch_index != 0:
         create_switch_routes(module, inband_ip)
-        time.sleep(10)
+        if not module.check_mode:
+            time.sleep(10)
 
     # Configure fabric
-    output += configure_fabric(module, current_switch)
-
-    return output
+    configure_fabric(module, current_switch)
 
 
 def toggle_40g_local(module):
     """
-    Method to toggle 40g ports to 10g ports.
+    Method to toggle 40g ports to 10g ports. All groups of four are planned
+    from one read of the port tables and converted together, see
+    pn_breakout.
     :param module: The Ansible module to fetch input parameters.
     :return: The output messages for assignment.
     """
     output = ''
     cli = pn_cli(module)
-    clicopy = cli
-    cli += ' lldp-show format local-port no-show-headers '
-    local_ports = run_cli(module, cli).split()
-
-    cli = clicopy
-    cli += ' port-config-show speed 40g '
-    cli += ' format port no-show-headers '
-    ports_40g = run_cli(module, cli)
-    if len(ports_40g) > 0 and ports_40g != 'Success':
-        ports_40g = ports_40g.split()
-        ports_to_modify = list(set(ports_40g) - set(local_ports))
-
-        for port in ports_to_modify:
-            next_port = str(int(port) + 1)
-            cli = clicopy
-            cli += ' port-show port %s format bezel-port' % next_port
-            cli += ' no-show-headers'
-            bezel_port = run_cli(module, cli).split()[0]
+    groups = plan_breakout(*breakout_snapshot(module, cli))
+    for message, command in breakout_commands(groups):
+        output += message
+        output += run_cli(module, cli + command)
 
-            if '.2' in bezel_port:
-                end_port = int(port) + 3
-                range_port = port + '-' + str(end_port)
-
-                cli = clicopy
-                cli += ' port-config-modify port %s ' % port
-                cli += ' disable '
-                output += 'port ' + port + ' disabled'
-                output += run_cli(module, cli)
-
-                cli = clicopy
-                cli += ' port-config-modify port %s ' % port
-                cli += ' speed 10g '
-                output += 'port ' + port + ' converted to 10g'
-                output += run_cli(module, cli)
-
-                cli = clicopy
-                cli += ' port-config-modify port %s ' % range_port
-                cli += ' enable '
-                output += 'port range_port ' + range_port + '  enabled'
-                output += run_cli(module, cli)
-
-        time.sleep(10)
+    if groups and not module.check_mode:
+        if wait_breakout(module, cli, groups) is None:
+            output += 'ports %s are not up yet ' % port_ranges(groups)
 
     return output
 
@@ -1379,6 +1343,7 @@ def main():
         argument_spec=dict(
             pn_cliusername=dict(required=False, type='str'),
             pn_clipassword=dict(required=False, type='str', no_log=True),
+            pn_fabric_facts=dict(required=False, type='dict'),
             pn_fabric_name=dict(required=False, type='str'),
             pn_run_initial_setup=dict(required=True, type='bool'),
             pn_current_switch=dict(required=False, type='str'),
@@ -1397,20 +1362,22 @@ def main():
                                   default='75.75.75.0/30'),
             pn_csv_data=dict(required=False, type='str'),
             pn_third_party_bgp_data=dict(required=False, type='str'),
-        )
+        ),
+        supports_check_mode=True
     )
 
     current_switch = module.params['pn_current_switch']
-    message = ''
     global CHANGED_FLAG
 
     if module.params['pn_run_initial_setup']:
         # Auto accept EULA
         if 'Setup completed successfully' in auto_accept_eula(module):
-            message += ' %s: EULA accepted \n' % current_switch
+            EVENTS.changed(current_switch, 'switch-setup', 'eula', 'enable',
+                           'EULA accepted')
             CHANGED_FLAG.append(True)
         else:
-            message += ' %s: EULA has already been accepted \n' % current_switch
+            EVENTS.unchanged(current_switch, 'switch-setup', 'eula',
+                             'EULA has already been accepted')
 
         # Update switch names to match host names from hosts file
         if 'Updated' in update_switch_names(module, current_switch):
@@ -1418,21 +1385,25 @@ def main():
 
         # Toggle 40g ports to 10g
         if toggle_40g_local(module):
-            message += ' %s: Toggled 40G ports to 10G \n' % current_switch
+            EVENTS.changed(current_switch, 'port-config', '', 'modify',
+                           'Toggled 40G ports to 10G')
             CHANGED_FLAG.append(True)
 
         # Assign in-band ip
-        message += assign_inband_ip(module)
+        assign_inband_ip(module)
 
         # Implement Data Center Interconnect
-        message += implement_dci(module)
+        implement_dci(module)
     else:
         # Configure iBGP, VRRP and vxlan
-        message += configure_ibgp_vrrp_vxlan(module)
+        configure_ibgp_vrrp_vxlan(module)
 
     # Exit the module and return the required JSON
     module.exit_json(
-        stdout=message,
+        plan=command_plan(),
+        cli_stats=cli_stats(),
+        events=EVENTS.events,
+        stdout=EVENTS.text(),
         error='0',
         failed=False,
         changed=True if True in CHANGED_FLAG else False
@@ -1440,5 +1411,5 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    run_main(main)
 
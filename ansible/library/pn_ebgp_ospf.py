@@ -19,6 +19,13 @@
 #
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_bgp_plan import (cluster_snapshot,
+                                                configured_as_map, load_as_map,
+                                                plan_bgp_as, router_id_snapshot)
+from ansible.module_utils.pn_events import ChangeEvents
+from ansible.module_utils.pn_nvos import cli_stats, command_plan, run_command
+from ansible.module_utils.pn_ospf_plan import ospf_snapshot, plan_ospf
+from ansible.module_utils.pn_profile import run_main
 import shlex
 
 DOCUMENTATION = """
@@ -54,6 +61,12 @@ options:
         - Provide login password if user is not root.
       required: False
       type: str
+    pn_fabric_facts:
+      description:
+        - pn_fabric fact gathered by pn_fabric_facts. While it is fresh,
+          the fabric discovery shows are answered from it.
+      required: False
+      type: dict
     pn_spine_list:
       description:
         - Specify list of Spine hosts
@@ -83,6 +96,13 @@ options:
       required: False
       type: str
       default: '65000'
+    pn_bgp_as_map:
+      description:
+        - Specify bgp-as of the switches as returned in bgp_as_map by an
+          earlier run. Switches keep their bgp-as and only the missing ones
+          get planned.
+      required: False
+      type: dict
     pn_routing_protocol:
       description:
         - Specify which routing protocol to specify.
@@ -137,9 +157,29 @@ failed:
   description: Indicates whether or not the execution failed on the target.
   returned: always
   type: bool
+bgp_as_map:
+  description: The bgp-as of every switch, can be passed back as pn_bgp_as_map.
+  returned: when routing protocol is ebgp
+  type: dict
+plan:
+  description: Commands which would be issued, per switch, when run in
+    check mode.
+  returned: check mode
+  type: dict
+cli_stats:
+  description: Calls made to the switches (a batch counts once), the commands
+    they carried, the bytes of output and the seconds spent waiting on them.
+  returned: always
+  type: dict
+events:
+  description: Change events (switch, object, key, action, result, msg), in
+    the order they happened.
+  returned: always
+  type: list
 """
 
 CHANGED_FLAG = []
+EVENTS = ChangeEvents()
 
 
 def pn_cli(module):
@@ -168,7 +208,7 @@ def run_cli(module, cli):
     :return: Output/Error or Success msg depending upon the response from cli.
     """
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_command(module, cli)
     if out:
         return out
 
@@ -188,43 +228,21 @@ def find_dict_bgp_as(module):
     """
     Method to find bgp-as for all switches and store in dictionary.
     :param module: The Ansible module to fetch input parameters.
-    :return: Dictionary containing area_id of all leaf.
+    :return: Dictionary containing switch: bgp_as key value pairs.
     """
-    leaf_list = module.params['pn_leaf_list']
-    spine_list = module.params['pn_spine_list']
-    bgp_as = int(module.params['pn_bgp_as_range'])
-    cluster_leaf_list = []
-    cli = pn_cli(module)
-    clicopy = cli
-    dict_bgp_as = {}
+    spine_list = module.params['pn_spine_list'] or []
+    leaf_list = module.params['pn_leaf_list'] or []
+    as_map = load_as_map(module.params['pn_bgp_as_map'])
 
-    for spine in module.params['pn_spine_list']:
-        dict_bgp_as[spine] = str(bgp_as)
+    if all(switch in as_map for switch in spine_list + leaf_list):
+        return as_map
 
-    cli += ' cluster-show format name no-show-headers'
-    cluster_list = run_cli(module, cli).split()
-
-    if 'Success' not in cluster_list:
-        for cluster in cluster_list:
-
-            cli = clicopy
-            cli += ' cluster-show name %s' % cluster
-            cli += ' format cluster-node-1,cluster-node-2 no-show-headers'
-            cluster_nodes = run_cli(module, cli).split()
-
-            if cluster_nodes[0] in leaf_list and cluster_nodes[1] in leaf_list:
-                bgp_as += 1
-                dict_bgp_as[cluster_nodes[0]] = str(bgp_as)
-                dict_bgp_as[cluster_nodes[1]] = str(bgp_as)
-                cluster_leaf_list.append(cluster_nodes[0])
-                cluster_leaf_list.append(cluster_nodes[1])
-
-    noncluster_leaf_list = list(set(leaf_list) - set(cluster_leaf_list))
-    for leaf in noncluster_leaf_list:
-        bgp_as += 1
-        dict_bgp_as[leaf] = str(bgp_as)
-
-    return dict_bgp_as
+    cli = pn_cli(module)
+    previous = configured_as_map(module, cli)
+    previous.update(as_map)
+    clusters = cluster_snapshot(module, cli)
+    return plan_bgp_as(spine_list, leaf_list, clusters,
+                       module.params['pn_bgp_as_range'], previous)
 
 
 def vrouter_interface_ibgp_add(module, switch_name, interface_ip, neighbor_ip, remote_as):
@@ -235,10 +253,8 @@ def vrouter_interface_ibgp_add(module, switch_name, interface_ip, neighbor_ip, r
     :param interface_ip: Interface ip to create a vrouter interface.
     :param neighbor_ip: Neighbor_ip for the ibgp neighbor.
     :param remote_as: Bgp-as for remote switch.
-    :return: String describing if ibgp neighbours got added or already exists.
     """
     global CHANGED_FLAG
-    output = ''
     vlan_id = module.params['pn_ibgp_vlan']
 
     cli = pn_cli(module)
@@ -252,7 +268,8 @@ def vrouter_interface_ibgp_add(module, switch_name, interface_ip, neighbor_ip, r
                                                               vlan_id)
         run_cli(module, cli)
 
-        output += ' %s: Vlan with id %s created \n' % (switch_name, vlan_id)
+        EVENTS.changed(switch_name, 'vlan', vlan_id, 'create',
+                       'Vlan with id %s created' % vlan_id)
         CHANGED_FLAG.append(True)
 
     cli = clicopy
@@ -272,14 +289,14 @@ def vrouter_interface_ibgp_add(module, switch_name, interface_ip, neighbor_ip, r
         )
         run_cli(module, cli)
 
-        output += ' %s: Added vrouter interface with ip %s on %s \n' % (
-            switch_name, interface_ip, vrouter
-        )
+        EVENTS.changed(switch_name, 'vrouter-interface', interface_ip,
+                       'create', 'Added vrouter interface with ip %s on %s' % (
+                           interface_ip, vrouter))
         CHANGED_FLAG.append(True)
     else:
-        output += ' %s: Vrouter interface %s already exists for %s \n' % (
-            switch_name, interface_ip, vrouter
-        )
+        EVENTS.unchanged(switch_name, 'vrouter-interface', interface_ip,
+                         'Vrouter interface %s already exists for %s' % (
+                             interface_ip, vrouter))
 
     neighbor_ip = neighbor_ip.split('/')[0]
     cli = clicopy
@@ -296,16 +313,14 @@ def vrouter_interface_ibgp_add(module, switch_name, interface_ip, neighbor_ip, r
             cli += ' bfd '
 
         if 'Success' in run_cli(module, cli):
-            output += ' %s: Added iBGP neighbor %s for %s \n' % (switch_name,
-                                                                 neighbor_ip,
-                                                                 vrouter)
+            EVENTS.changed(switch_name, 'vrouter-bgp', neighbor_ip, 'create',
+                           'Added iBGP neighbor %s for %s' % (neighbor_ip,
+                                                             vrouter))
             CHANGED_FLAG.append(True)
     else:
-        output += ' %s: iBGP neighbour %s already exists for %s \n' % (
-            switch_name, neighbor_ip, vrouter
-        )
-
-    return output
+        EVENTS.unchanged(switch_name, 'vrouter-bgp', neighbor_ip,
+                         'iBGP neighbour %s already exists for %s' % (
+                             neighbor_ip, vrouter))
 
 
 def assign_ibgp_interface(module, dict_bgp_as):
@@ -313,9 +328,7 @@ def assign_ibgp_interface(module, dict_bgp_as):
     Method to create interfaces and add ibgp neighbors.
     :param module: The Ansible module to fetch input parameters.
     :param dict_bgp_as: The dictionary containing bgp-as of all switches.
-    :return: The output of vrouter_interface_ibgp_add() method.
     """
-    output = ''
     ibgp_ip_range = module.params['pn_ibgp_ip_range']
     spine_list = module.params['pn_spine_list']
     leaf_list = module.params['pn_leaf_list']
@@ -350,16 +363,15 @@ def assign_ibgp_interface(module, dict_bgp_as):
                 cluster_node_2 = run_cli(module, cli).split()[0]
 
                 remote_as = dict_bgp_as[cluster_node_1]
-                output += vrouter_interface_ibgp_add(module, cluster_node_1,
-                                                     ip1, ip2, remote_as)
-                output += vrouter_interface_ibgp_add(module, cluster_node_2,
-                                                     ip2, ip1, remote_as)
+                vrouter_interface_ibgp_add(module, cluster_node_1,
+                                           ip1, ip2, remote_as)
+                vrouter_interface_ibgp_add(module, cluster_node_2,
+                                           ip2, ip1, remote_as)
 
                 subnet_count += 1
     else:
-        output += ' No leaf clusters present to add iBGP \n'
-
-    return output
+        EVENTS.add('', 'vrouter-bgp', '', 'skip', 'unchanged',
+                   'No leaf clusters present to add iBGP')
 
 
 def add_bgp_neighbor(module, dict_bgp_as):
@@ -368,10 +380,8 @@ def add_bgp_neighbor(module, dict_bgp_as):
     :param module: The Ansible module to fetch input parameters.
     :param vrouter_names: List of vrouter names.
     :param dict_bgp_as: Dictionary containing bgp-as of all switches.
-    :return: String describing if bgp neighbors got added or not.
     """
     global CHANGED_FLAG
-    output = ''
     cli = pn_cli(module)
     clicopy = cli
 
@@ -427,10 +437,9 @@ def add_bgp_neighbor(module, dict_bgp_as):
             already_added = run_cli(module, cli).split()
 
             if vrouter_spine in already_added:
-                output += ' %s: ' % spine
-                output += 'BGP Neighbor %s already exists for %s \n' % (
-                    ip_leaf, vrouter_spine
-                )
+                EVENTS.unchanged(spine, 'vrouter-bgp', ip_leaf,
+                                 'BGP Neighbor %s already exists for %s' % (
+                                     ip_leaf, vrouter_spine))
             else:
                 cli = clicopy
                 cli += ' vrouter-bgp-add vrouter-name ' + vrouter_spine
@@ -440,9 +449,9 @@ def add_bgp_neighbor(module, dict_bgp_as):
                     cli += ' bfd '
 
                 if 'Success' in run_cli(module, cli):
-                    output += ' %s: Added BGP Neighbor %s for %s \n' % (
-                        spine, ip_leaf, vrouter_spine
-                    )
+                    EVENTS.changed(spine, 'vrouter-bgp', ip_leaf, 'create',
+                                   'Added BGP Neighbor %s for %s' % (
+                                       ip_leaf, vrouter_spine))
                     CHANGED_FLAG.append(True)
 
             cli = clicopy
@@ -452,10 +461,9 @@ def add_bgp_neighbor(module, dict_bgp_as):
             already_added = run_cli(module, cli).split()
 
             if vrouter_leaf in already_added:
-                output += ' %s: ' % leaf
-                output += 'BGP Neighbor %s already exists for %s \n' % (
-                    ip_spine, vrouter_leaf
-                )
+                EVENTS.unchanged(leaf, 'vrouter-bgp', ip_spine,
+                                 'BGP Neighbor %s already exists for %s' % (
+                                     ip_spine, vrouter_leaf))
             else:
                 cli = clicopy
                 cli += ' vrouter-bgp-add vrouter-name ' + vrouter_leaf
@@ -473,49 +481,40 @@ def add_bgp_neighbor(module, dict_bgp_as):
                         break
 
                 if 'Success' in run_cli(module, cli):
-                    output += ' %s: Added BGP Neighbor %s for %s \n' % (
-                        leaf, ip_spine, vrouter_leaf
-                    )
+                    EVENTS.changed(leaf, 'vrouter-bgp', ip_spine, 'create',
+                                   'Added BGP Neighbor %s for %s' % (
+                                       ip_spine, vrouter_leaf))
                     CHANGED_FLAG.append(True)
 
-    return output
-
 
 def assign_router_id(module, vrouter_names):
     """
     Method to assign router-id to vrouters which is same as loopback ip.
     :param module: The Ansible module to fetch input parameters.
     :param vrouter_names: List of vrouter names.
-    :return: String describing if router id got assigned or not.
     """
     global CHANGED_FLAG
-    output = ''
     cli = pn_cli(module)
     clicopy = cli
+    router_ids = router_id_snapshot(module, clicopy)
 
-    if len(vrouter_names) > 0:
-        for vrouter in vrouter_names:
-            cli = clicopy
-            cli += ' vrouter-loopback-interface-show vrouter-name ' + vrouter
-            cli += ' format ip no-show-headers '
-            loopback_ip = run_cli(module, cli).split()
-            loopback_ip.remove(vrouter)
-
-            cli = clicopy
-            cli += ' vrouter-modify name %s router-id %s ' % (vrouter,
-                                                              loopback_ip[0])
-            if 'Success' in run_cli(module, cli):
-                cli = clicopy
-                cli += ' vrouter-show name ' + vrouter
-                cli += ' format location no-show-headers '
-                switch = run_cli(module, cli).split()[0]
+    for vrouter in vrouter_names:
+        if vrouter not in router_ids:
+            continue
 
-                output += ' %s: Added router id %s to %s \n' % (switch,
-                                                                loopback_ip[0],
-                                                                vrouter)
-                CHANGED_FLAG.append(True)
+        switch, router_id, current_router_id = router_ids[vrouter]
+        if router_id == current_router_id:
+            EVENTS.unchanged(switch, 'vrouter', vrouter,
+                             'Router id %s already assigned to %s' % (
+                                 router_id, vrouter))
+            continue
 
-    return output
+        cli = clicopy
+        cli += ' vrouter-modify name %s router-id %s ' % (vrouter, router_id)
+        if 'Success' in run_cli(module, cli):
+            EVENTS.changed(switch, 'vrouter', vrouter, 'modify',
+                           'Added router id %s to %s' % (router_id, vrouter))
+            CHANGED_FLAG.append(True)
 
 
 def configure_bgp(module, vrouter_names, dict_bgp_as, bgp_max, bgp_redis):
@@ -526,10 +525,8 @@ def configure_bgp(module, vrouter_names, dict_bgp_as, bgp_max, bgp_redis):
     :param vrouter_names: List of vrouter names.
     :param bgp_max: Maxpath for bgp.
     :param bgp_redis: Bgp redistribute for bgp.
-    :return: String describing if bgp-redistribute got added or not.
     """
     global CHANGED_FLAG
-    output = ''
     cli = pn_cli(module)
     clicopy = cli
 
@@ -543,13 +540,12 @@ def configure_bgp(module, vrouter_names, dict_bgp_as, bgp_max, bgp_redis):
         cli += ' vrouter-modify name %s bgp-as %s bgp-max-paths %s bgp-redistribute %s' % (vrouter,
                                                             dict_bgp_as[switch], bgp_max, bgp_redis)
         if 'Success' in run_cli(module, cli):
-            output += ' %s: Added BGP_REDISTRIBUTE %s BGP_AS %s BGP_MAXPATH %s to %s\n' % (switch,
-                                                          bgp_redis, dict_bgp_as[switch], bgp_max,
-                                                                   vrouter)
+            EVENTS.changed(switch, 'vrouter', vrouter, 'modify',
+                           'Added BGP_REDISTRIBUTE %s BGP_AS %s BGP_MAXPATH '
+                           '%s to %s' % (bgp_redis, dict_bgp_as[switch],
+                                         bgp_max, vrouter))
             CHANGED_FLAG.append(True)
 
-    return output
-
 
 def find_non_clustered_leafs(module):
     """
@@ -578,7 +574,6 @@ def create_cluster(module, switch, name, node1, node2):
     :param name: The name of the cluster to create.
     :param node1: First node of the cluster.
     :param node2: Second node of the cluster.
-    :return: String describing if cluster got created or if it's already exists.
     """
     global CHANGED_FLAG
     cli = pn_cli(module)
@@ -591,18 +586,17 @@ def create_cluster(module, switch, name, node1, node2):
         cli += ' cluster-node-1 %s cluster-node-2 %s ' % (node1, node2)
         if 'Success' in run_cli(module, cli):
             CHANGED_FLAG.append(True)
-            return ' %s: %s created successfully \n' % (switch, name)
+            EVENTS.changed(switch, 'cluster', name, 'create',
+                           '%s created successfully' % name)
     else:
-        return ' %s: %s already exists \n' % (switch, name)
+        EVENTS.unchanged(switch, 'cluster', name, '%s already exists' % name)
 
 
 def create_leaf_clusters(module):
     """
     Method to create cluster between two physically connected leaf switches.
     :param module: The Ansible module to fetch input parameters.
-    :return: Output of create_cluster() method.
     """
-    output = ''
     non_clustered_leafs = find_non_clustered_leafs(module)
     non_clustered_leafs_count = 0
     cli = pn_cli(module)
@@ -638,16 +632,13 @@ def create_leaf_clusters(module):
                 if node2 in non_clustered_leafs:
                     # Cluster creation
                     cluster_name = node1 + '-to-' + node2 + '-cluster'
-                    output += create_cluster(module, node2, cluster_name,
-                                             node1, node2)
+                    create_cluster(module, node2, cluster_name, node1, node2)
 
                     non_clustered_leafs.remove(node2)
                     terminate_flag += 1
 
                 node_count += 1
 
-    return output
-
 
 def configure_ospf_bfd(module, vrouter, ip):
     """
@@ -655,7 +646,6 @@ def configure_ospf_bfd(module, vrouter, ip):
     :param module: The Ansible module to fetch input parameters.
     :param vrouter: The vrouter name to add ospf bfd.
     :param ip: The interface ip to associate the ospf bfd.
-    :return: String describing if OSPF BFD got added or if it already exists.
     """
     global CHANGED_FLAG
     cli = pn_cli(module)
@@ -683,7 +673,9 @@ def configure_ospf_bfd(module, vrouter, ip):
         cli += ' nic %s ospf-bfd enable' % nic_interface[0]
         if 'Success' in run_cli(module, cli):
             CHANGED_FLAG.append(True)
-            return ' %s: Added OSPF BFD to %s \n' % (switch, vrouter)
+            EVENTS.changed(switch, 'vrouter-interface-config',
+                           nic_interface[0], 'create',
+                           'Added OSPF BFD to %s' % vrouter)
 
     elif 'enable' not in ospf_status:
         ospf_status.remove(vrouter)        
@@ -692,47 +684,12 @@ def configure_ospf_bfd(module, vrouter, ip):
         cli += ' nic %s ospf-bfd enable' % nic_interface[0]
         if 'Success' in run_cli(module, cli):
             CHANGED_FLAG.append(True)
-            return ' %s: Modified OSPF BFD to enable for %s \n' % (switch, vrouter)
-    else:
-        return ' %s: OSPF BFD already enabled for %s \n' % (switch, vrouter)
-
-
-def add_ospf_loopback_spine(module, switch, vrouter, ospf_network, ospf_area_id):
-    """
-    Method to add ospf_neighbor for loopback network for spines.
-    :param module: The Ansible module to fetch input parameters.
-    :param switch: The name of the ansible switch to add neighbor.
-    :param vrouter: The vrouter name to add ospf bfd.
-    :param ospf_network: The network for adding the ospf neighbor.
-    :param ospf_area_id: The area_id for the spines loopback neighbor.
-    :return: String describing if OSPF Neighbor got added or if it already exists.
-    """
-    global CHANGED_FLAG
-    output = ''
-    cli = pn_cli(module)
-    clicopy = cli
-
-    cli += ' vrouter-ospf-show'
-    cli += ' network %s format switch no-show-headers ' % ospf_network
-    already_added = run_cli(module, cli).split()
-
-    if vrouter in already_added:
-        output += ' %s: OSPF Neighbor %s already exists for %s \n' % (
-            switch, ospf_network, vrouter
-        )
+            EVENTS.changed(switch, 'vrouter-interface-config',
+                           nic_interface[0], 'enable',
+                           'Modified OSPF BFD to enable for %s' % vrouter)
     else:
-        cli = clicopy
-        cli += ' vrouter-ospf-add vrouter-name ' + vrouter
-        cli += ' network %s ospf-area %s' % (ospf_network,
-                                             ospf_area_id)
-
-        if 'Success' in run_cli(module, cli):
-            output += ' %s: Added OSPF neighbor %s to %s \n' % (
-                switch, ospf_network, vrouter
-            )
-            CHANGED_FLAG.append(True)
-
-    return output
+        EVENTS.unchanged(switch, 'vrouter-interface-config', nic_interface[0],
+                         'OSPF BFD already enabled for %s' % vrouter)
 
 
 def dict_area_id_leaf(module):
@@ -774,130 +731,67 @@ def dict_area_id_leaf(module):
     return dict_area_id
 
 
-def add_ospf_neighbor(module, dict_area_id):
+def apply_ospf_plan(module, ospf_plan):
     """
-    Method to add ospf_neighbor to the vrouters.
+    Method to apply the missing statements of an OSPF plan per vrouter.
     :param module: The Ansible module to fetch input parameters.
-    :param dict_area_id: Dictionary containing area_id of leafs.
-    :return: String describing if ospf neighbors got added or not.
+    :param ospf_plan: Statements returned by plan_ospf().
     """
     global CHANGED_FLAG
-    output = ''
-    cli = pn_cli(module)
-    clicopy = cli
-    leaf_list = module.params['pn_leaf_list']
-    spine_list = module.params['pn_spine_list']
-
-    for spine in spine_list:
-        cli = clicopy
-        cli += ' vrouter-show location %s' % spine
-        cli += ' format name no-show-headers'
-        vrouter_spine = run_cli(module, cli).split()[0]
-
-        if spine_list.index(spine) == 0:
-            cli = clicopy
-            cli += ' vrouter-loopback-interface-show vrouter-name ' + vrouter_spine
-            cli += ' format ip no-show-headers '
-            loopback_ip = run_cli(module, cli).split()
-            loopback_ip.remove(vrouter_spine)
-            vrouter_loopback_ip = loopback_ip[0]
-
-            loopback_ip = loopback_ip[0].split('.')
-            loopback_network = loopback_ip[0] + '.' + loopback_ip[1] + '.'
-            loopback_network += loopback_ip[2] + '.' + '0/24'
-
-        output += add_ospf_loopback_spine(module, spine, vrouter_spine, loopback_network, '0')
-
-        cli = clicopy
-        cli += ' vrouter-interface-show vrouter-name %s ' % vrouter_spine
-        cli += ' format l3-port no-show-headers '
-        port_list = run_cli(module, cli).split()
-        port_list = list(set(port_list))
-        port_list.remove(vrouter_spine)
-
-        for port in port_list:
-            cli = clicopy
-            cli += ' switch %s port-show port %s' % (spine, port)
-            cli += ' format hostname no-show-headers'
-            hostname = run_cli(module, cli).split()[0]
-
-            ospf_area_id = dict_area_id[hostname]
-
-            cli = clicopy
-            cli += ' vrouter-show location %s' % hostname
-            cli += ' format name no-show-headers'
-            vrouter_hostname = run_cli(module, cli).split()[0]
-
-            cli = clicopy
-            cli += ' vrouter-interface-show vrouter-name %s l3-port %s' % (
-                vrouter_spine, port
-            )
-            cli += ' format ip no-show-headers'
-            ip = run_cli(module, cli).split()
-            ip = list(set(ip))
-            ip.remove(vrouter_spine)
-            ip = ip[0]
-
-            ip = ip.split('.')
-            static_part = str(ip[0]) + '.' + str(ip[1]) + '.'
-            static_part += str(ip[2]) + '.'
-            last_octet = str(ip[3]).split('/')
-            netmask = last_octet[1]
+    clicopy = pn_cli(module)
 
-            last_octet_ip_mod = int(last_octet[0]) % 4
-            ospf_last_octet = int(last_octet[0]) - last_octet_ip_mod
-            ospf_network = static_part + str(ospf_last_octet) + '/' + netmask
-
-            leaf_last_octet = int(last_octet[0]) - 1
-            ip_leaf = static_part + str(leaf_last_octet)
-            ip_spine = static_part + last_octet[0]
+    for switch, vrouter, bfd_statements, network_statements in ospf_plan:
+        for nic, ospf_bfd in bfd_statements:
+            if ospf_bfd == 'enable':
+                EVENTS.unchanged(switch, 'vrouter-interface-config', nic,
+                                 'OSPF BFD already enabled for %s' % vrouter)
+                continue
 
             cli = clicopy
-            cli += ' vrouter-ospf-show'
-            cli += ' network %s format switch no-show-headers ' % ospf_network
-            already_added = run_cli(module, cli).split()
-
-            if vrouter_spine in already_added:
-                output += ' %s: OSPF Neighbor %s already exists for %s \n' % (
-                    spine, ospf_network, vrouter_spine
-                )
+            if ospf_bfd is None:
+                cli += ' vrouter-interface-config-add vrouter-name %s' % vrouter
+                action, message = 'create', 'Added OSPF BFD to %s' % vrouter
             else:
-                if module.params['pn_bfd']:
-                    output += configure_ospf_bfd(module, vrouter_spine,
-                                                 ip_spine)
+                cli += ' vrouter-interface-config-modify vrouter-name %s' % (
+                    vrouter)
+                action = 'enable'
+                message = 'Modified OSPF BFD to enable for %s' % vrouter
+            cli += ' nic %s ospf-bfd enable' % nic
 
-                cli = clicopy
-                cli += ' vrouter-ospf-add vrouter-name ' + vrouter_spine
-                cli += ' network %s ospf-area %s' % (ospf_network,
-                                                     ospf_area_id)
+            if 'Success' in run_cli(module, cli):
+                EVENTS.changed(switch, 'vrouter-interface-config', nic, action,
+                               message)
+                CHANGED_FLAG.append(True)
 
-                if 'Success' in run_cli(module, cli):
-                    output += ' %s: Added OSPF neighbor %s to %s \n' % (
-                        spine, ospf_network, vrouter_spine
-                    )
-                    CHANGED_FLAG.append(True)
+        for ospf_network, ospf_area_id, exists in network_statements:
+            if exists:
+                EVENTS.unchanged(switch, 'vrouter-ospf', ospf_network,
+                                 'OSPF Neighbor %s already exists for %s' % (
+                                     ospf_network, vrouter))
+                continue
 
-            if vrouter_hostname in already_added:
-                output += ' %s: OSPF Neighbor %s already exists for %s \n' % (
-                    hostname, ospf_network, vrouter_hostname
-                )
-            else:
-                if module.params['pn_bfd']:
-                    output += configure_ospf_bfd(module, vrouter_hostname,
-                                                 ip_leaf)
+            cli = clicopy
+            cli += ' vrouter-ospf-add vrouter-name ' + vrouter
+            cli += ' network %s ospf-area %s' % (ospf_network, ospf_area_id)
 
-                cli = clicopy
-                cli += ' vrouter-ospf-add vrouter-name ' + vrouter_hostname
-                cli += ' network %s ospf-area %s' % (ospf_network,
-                                                     ospf_area_id)
+            if 'Success' in run_cli(module, cli):
+                EVENTS.changed(switch, 'vrouter-ospf', ospf_network, 'create',
+                               'Added OSPF neighbor %s to %s' % (ospf_network,
+                                                                vrouter))
+                CHANGED_FLAG.append(True)
 
-                if 'Success' in run_cli(module, cli):
-                    output += ' %s: Added OSPF neighbor %s to %s \n' % (
-                        hostname, ospf_network, vrouter_hostname
-                    )
-                    CHANGED_FLAG.append(True)
 
-    return output
+def add_ospf_neighbor(module, dict_area_id):
+    """
+    Method to add ospf_neighbor to the vrouters.
+    :param module: The Ansible module to fetch input parameters.
+    :param dict_area_id: Dictionary containing area_id of leafs.
+    """
+    snapshot = ospf_snapshot(module, pn_cli(module), module.params['pn_bfd'])
+    ospf_plan = plan_ospf(module.params['pn_spine_list'],
+                          module.params['pn_leaf_list'], dict_area_id,
+                          snapshot, module.params['pn_bfd'], '0')
+    apply_ospf_plan(module, ospf_plan)
 
 
 def add_ospf_redistribute(module, vrouter_names):
@@ -905,10 +799,8 @@ def add_ospf_redistribute(module, vrouter_names):
     Method to add ospf_redistribute to the vrouters.
     :param module: The Ansible module to fetch input parameters.
     :param vrouter_names: List of vrouter names.
-    :return: String describing if ospf-redistribute got added or not.
     """
     global CHANGED_FLAG
-    output = ''
     cli = pn_cli(module)
     clicopy = cli
 
@@ -922,12 +814,10 @@ def add_ospf_redistribute(module, vrouter_names):
             cli += ' format location no-show-headers '
             switch = run_cli(module, cli).split()[0]
 
-            output += ' %s: Added OSPF_REDISTRIBUTE to %s \n' % (switch,
-                                                                 vrouter)
+            EVENTS.changed(switch, 'vrouter', vrouter, 'modify',
+                           'Added OSPF_REDISTRIBUTE to %s' % vrouter)
             CHANGED_FLAG.append(True)
 
-    return output
-
 
 def vrouter_leafcluster_ospf_add(module, switch_name, interface_ip,
                                  ospf_network, ospf_area_id):
@@ -938,10 +828,8 @@ def vrouter_leafcluster_ospf_add(module, switch_name, interface_ip,
     :param interface_ip: Interface ip to create a vrouter interface.
     :param ospf_network: Ospf network for the ospf neighbor.
     :ospf_area_id: The area_id for ospf neighborship.
-    :return: String describing if ospf neighbors got added or not.
     """
     global CHANGED_FLAG
-    output = ''
     vlan_id = module.params['pn_iospf_vlan']
 
     cli = pn_cli(module)
@@ -954,8 +842,8 @@ def vrouter_leafcluster_ospf_add(module, switch_name, interface_ip,
         cli += ' switch %s vlan-create id %s scope local ' % (switch_name,
                                                               vlan_id)
         run_cli(module, cli)
-        output = ' %s: Vlan with id %s created successfully \n' % (switch_name,
-                                                                   vlan_id)
+        EVENTS.changed(switch_name, 'vlan', vlan_id, 'create',
+                       'Vlan with id %s created successfully' % vlan_id)
         CHANGED_FLAG.append(True)
 
     cli = clicopy
@@ -974,14 +862,14 @@ def vrouter_leafcluster_ospf_add(module, switch_name, interface_ip,
             vrouter, interface_ip, vlan_id
         )
         run_cli(module, cli)
-        output += ' %s: Added vrouter interface with ip %s on %s \n' % (
-            switch_name, interface_ip, vrouter
-        )
+        EVENTS.changed(switch_name, 'vrouter-interface', interface_ip,
+                       'create', 'Added vrouter interface with ip %s on %s' % (
+                           interface_ip, vrouter))
         CHANGED_FLAG.append(True)
     else:
-        output += ' %s: Vrouter interface %s already exists for %s \n' % (
-            switch_name, interface_ip, vrouter
-        )
+        EVENTS.unchanged(switch_name, 'vrouter-interface', interface_ip,
+                         'Vrouter interface %s already exists for %s' % (
+                             interface_ip, vrouter))
 
     cli = clicopy
     cli += ' vrouter-ospf-show'
@@ -989,33 +877,30 @@ def vrouter_leafcluster_ospf_add(module, switch_name, interface_ip,
     already_added = run_cli(module, cli).split()
 
     if vrouter in already_added:
-        output += ' %s: OSPF Neighbor %s already exists for %s \n' % (switch_name,
-                                                                  ospf_network, vrouter)
+        EVENTS.unchanged(switch_name, 'vrouter-ospf', ospf_network,
+                         'OSPF Neighbor %s already exists for %s' % (
+                             ospf_network, vrouter))
     else:
         interface_ip_without_supernet = interface_ip.split('/')[0]
         if module.params['pn_bfd']:
-            output += configure_ospf_bfd(module, vrouter,
-                                         interface_ip_without_supernet)
+            configure_ospf_bfd(module, vrouter, interface_ip_without_supernet)
         cli = clicopy
         cli += ' vrouter-ospf-add vrouter-name ' + vrouter
         cli += ' network %s ospf-area %s' % (ospf_network, ospf_area_id)
 
         if 'Success' in run_cli(module, cli):
-            output += ' %s: Added OSPF neighbor %s to %s \n' % (switch_name,
-                                                             ospf_network, vrouter)
+            EVENTS.changed(switch_name, 'vrouter-ospf', ospf_network, 'create',
+                           'Added OSPF neighbor %s to %s' % (ospf_network,
+                                                            vrouter))
             CHANGED_FLAG.append(True)
 
-    return output
-
 
 def assign_leafcluster_ospf_interface(module, dict_area_id):
     """
     Method to create interfaces and add ospf neighbor for leaf cluster.
     :param module: The Ansible module to fetch input parameters.
     :param dict_area_id: Dictionary containing area_id of leafs.
-    :return: The output of vrouter_interface_ibgp_add() method.
     """
-    output = ''
     iospf_ip_range = module.params['pn_iospf_ip_range']
     spine_list = module.params['pn_spine_list']
     leaf_list = module.params['pn_leaf_list']
@@ -1051,16 +936,15 @@ def assign_leafcluster_ospf_interface(module, dict_area_id):
                 cluster_node_2 = run_cli(module, cli).split()[0]
 
                 ospf_area_id = dict_area_id[cluster_node_1]
-                output += vrouter_leafcluster_ospf_add(module, cluster_node_1,
-                                                       ip1, ospf_network, ospf_area_id)
-                output += vrouter_leafcluster_ospf_add(module, cluster_node_2,
-                                                       ip2, ospf_network, ospf_area_id)
+                vrouter_leafcluster_ospf_add(module, cluster_node_1, ip1,
+                                             ospf_network, ospf_area_id)
+                vrouter_leafcluster_ospf_add(module, cluster_node_2, ip2,
+                                             ospf_network, ospf_area_id)
 
                 subnet_count += 1
     else:
-        output += ' No leaf clusters present to add iOSPF \n'
-
-    return output
+        EVENTS.add('', 'vrouter-ospf', '', 'skip', 'unchanged',
+                   'No leaf clusters present to add iOSPF')
 
 
 def main():
@@ -1069,9 +953,11 @@ def main():
         argument_spec=dict(
             pn_cliusername=dict(required=False, type='str'),
             pn_clipassword=dict(required=False, type='str', no_log=True),
+            pn_fabric_facts=dict(required=False, type='dict'),
             pn_spine_list=dict(required=False, type='list'),
             pn_leaf_list=dict(required=False, type='list'),
             pn_bgp_as_range=dict(required=False, type='str', default='65000'),
+            pn_bgp_as_map=dict(required=False, type='dict'),
             pn_bgp_redistribute=dict(required=False, type='str',
                                      choices=['none', 'static', 'connected',
                                               'rip', 'ospf'],
@@ -1087,7 +973,8 @@ def main():
             pn_ospf_area_id=dict(required=False, type='str', default='0'),
             pn_routing_protocol=dict(required=False, type='str',
                                      choices=['ebgp', 'ospf'], default='ebgp'),
-        )
+        ),
+        supports_check_mode=True
     )
 
     global CHANGED_FLAG
@@ -1100,30 +987,34 @@ def main():
     cli += ' vrouter-show format name no-show-headers '
     vrouter_names = run_cli(module, cli).split()
 
-    message = assign_router_id(module, vrouter_names)
-    message += create_leaf_clusters(module)
+    assign_router_id(module, vrouter_names)
+    create_leaf_clusters(module)
 
     if routing_protocol == 'ebgp':
         dict_bgp_as = find_dict_bgp_as(module)
-        message += configure_bgp(module,
-                                 vrouter_names, dict_bgp_as,
-           module.params['pn_bgp_maxpath'], module.params['pn_bgp_redistribute'])
-        message += add_bgp_neighbor(module, dict_bgp_as)
-        message += assign_ibgp_interface(module, dict_bgp_as)
+        configure_bgp(module, vrouter_names, dict_bgp_as,
+                      module.params['pn_bgp_maxpath'],
+                      module.params['pn_bgp_redistribute'])
+        add_bgp_neighbor(module, dict_bgp_as)
+        assign_ibgp_interface(module, dict_bgp_as)
     elif routing_protocol == 'ospf':
         dict_area_id = dict_area_id_leaf(module)
-        message += add_ospf_neighbor(module, dict_area_id)
-        message += add_ospf_redistribute(module, vrouter_names)
-        message += assign_leafcluster_ospf_interface(module, dict_area_id)
+        add_ospf_neighbor(module, dict_area_id)
+        add_ospf_redistribute(module, vrouter_names)
+        assign_leafcluster_ospf_interface(module, dict_area_id)
 
     module.exit_json(
-        stdout=message,
+        plan=command_plan(),
+        cli_stats=cli_stats(),
+        events=EVENTS.events,
+        stdout=EVENTS.text(),
         error='0',
         failed=False,
+        bgp_as_map=dict_bgp_as,
         changed=True if True in CHANGED_FLAG else False
     )
 
 
 if __name__ == '__main__':
-    main()
+    run_main(main)
 
@@ -19,6 +19,12 @@
 #
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_bgp_plan import (cluster_snapshot,
+                                                configured_as_map, load_as_map,
+                                                plan_bgp_as, router_id_snapshot)
+from ansible.module_utils.pn_nvos import run_command
+from ansible.module_utils.pn_ospf_plan import ospf_snapshot, plan_ospf
+from ansible.module_utils.pn_profile import run_main
 import shlex
 
 DOCUMENTATION = """
@@ -54,6 +60,12 @@ options:
         - Provide login password if user is not root.
       required: False
       type: str
+    pn_fabric_facts:
+      description:
+        - pn_fabric fact gathered by pn_fabric_facts. While it is fresh,
+          the fabric discovery shows are answered from it.
+      required: False
+      type: dict
     pn_spine_list:
       description:
         - Specify list of Spine hosts
@@ -83,6 +95,13 @@ options:
       required: False
       type: str
       default: '65000'
+    pn_bgp_as_map:
+      description:
+        - Specify bgp-as of the switches as returned in bgp_as_map by an
+          earlier run. Switches keep their bgp-as and only the missing ones
+          get planned.
+      required: False
+      type: dict
     pn_routing_protocol:
       description:
         - Specify which routing protocol to specify.
@@ -137,6 +156,10 @@ failed:
   description: Indicates whether or not the execution failed on the target.
   returned: always
   type: bool
+bgp_as_map:
+  description: The bgp-as of every switch, can be passed back as pn_bgp_as_map.
+  returned: when routing protocol is ebgp
+  type: dict
 """
 
 CHANGED_FLAG = []
@@ -168,7 +191,7 @@ def run_cli(module, cli):
     :return: Output/Error or Success msg depending upon the response from cli.
     """
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_command(module, cli)
     results = []
     if out:
         return out
@@ -194,42 +217,23 @@ def find_dict_bgp_as(module):
     """
     Method to find bgp-as for all switches and store in dictionary.
     :param module: The Ansible module to fetch input parameters.
-    :return: Dictionary containing area_id of all leaf.
+    :return: Dictionary containing switch: bgp_as key value pairs.
     """
-    leaf_list = module.params['pn_new_leaf_list']
-    bgp_as = int(module.params['pn_bgp_as_range'])
-    cluster_leaf_list = []
-    cli = pn_cli(module)
-    clicopy = cli
-    dict_bgp_as = {}
-
-    for spine in module.params['pn_new_spine_list']:
-        dict_bgp_as[spine] = str(bgp_as)
-
-    cli += ' cluster-show format name no-show-headers'
-    cluster_list = run_cli(module, cli).split()
-
-    if 'Success' not in cluster_list:
-        for cluster in cluster_list:
-
-            cli = clicopy
-            cli += ' cluster-show name %s' % cluster
-            cli += ' format cluster-node-1,cluster-node-2 no-show-headers'
-            cluster_nodes = run_cli(module, cli).split()
+    spine_list = ((module.params['pn_spine_list'] or []) +
+                  (module.params['pn_new_spine_list'] or []))
+    leaf_list = ((module.params['pn_leaf_list'] or []) +
+                 (module.params['pn_new_leaf_list'] or []))
+    as_map = load_as_map(module.params['pn_bgp_as_map'])
 
-            if cluster_nodes[0] in leaf_list and cluster_nodes[1] in leaf_list:
-                bgp_as += 1
-                dict_bgp_as[cluster_nodes[0]] = str(bgp_as)
-                dict_bgp_as[cluster_nodes[1]] = str(bgp_as)
-                cluster_leaf_list.append(cluster_nodes[0])
-                cluster_leaf_list.append(cluster_nodes[1])
+    if all(switch in as_map for switch in spine_list + leaf_list):
+        return as_map
 
-    noncluster_leaf_list = list(set(leaf_list) - set(cluster_leaf_list))
-    for leaf in noncluster_leaf_list:
-        bgp_as += 1
-        dict_bgp_as[leaf] = str(bgp_as)
-
-    return dict_bgp_as
+    cli = pn_cli(module)
+    previous = configured_as_map(module, cli)
+    previous.update(as_map)
+    clusters = cluster_snapshot(module, cli)
+    return plan_bgp_as(spine_list, leaf_list, clusters,
+                       module.params['pn_bgp_as_range'], previous)
 
 
 def vrouter_interface_ibgp_add(module, switch_name, interface_ip, neighbor_ip, remote_as):
@@ -632,28 +636,24 @@ def assign_router_id(module, vrouter_names):
     output = ''
     cli = pn_cli(module)
     clicopy = cli
+    router_ids = router_id_snapshot(module, clicopy)
 
-    if len(vrouter_names) > 0:
-        for vrouter in vrouter_names:
-            cli = clicopy
-            cli += ' vrouter-loopback-interface-show vrouter-name ' + vrouter
-            cli += ' format ip no-show-headers '
-            loopback_ip = run_cli(module, cli).split()
-            loopback_ip.remove(vrouter)
+    for vrouter in vrouter_names:
+        if vrouter not in router_ids:
+            continue
 
-            cli = clicopy
-            cli += ' vrouter-modify name %s router-id %s ' % (vrouter,
-                                                              loopback_ip[0])
-            if 'Success' in run_cli(module, cli):
-                cli = clicopy
-                cli += ' vrouter-show name ' + vrouter
-                cli += ' format location no-show-headers '
-                switch = run_cli(module, cli).split()[0]
+        switch, router_id, current_router_id = router_ids[vrouter]
+        if router_id == current_router_id:
+            output += ' %s: Router id %s already assigned to %s \n' % (
+                switch, router_id, vrouter)
+            continue
 
-                output += ' %s: Added router id %s to %s \n' % (switch,
-                                                                loopback_ip[0],
-                                                                vrouter)
-                CHANGED_FLAG.append(True)
+        cli = clicopy
+        cli += ' vrouter-modify name %s router-id %s ' % (vrouter, router_id)
+        if 'Success' in run_cli(module, cli):
+            output += ' %s: Added router id %s to %s \n' % (switch, router_id,
+                                                            vrouter)
+            CHANGED_FLAG.append(True)
 
     return output
 
@@ -837,44 +837,6 @@ def configure_ospf_bfd(module, vrouter, ip):
         return ' %s: OSPF BFD already enabled for %s \n' % (switch, vrouter)
 
 
-def add_ospf_loopback_spine(module, switch, vrouter, ospf_network, ospf_area_id):
-    """
-    Method to add ospf_neighbor for loopback network for spines.
-    :param module: The Ansible module to fetch input parameters.
-    :param switch: The name of the ansible switch to add neighbor.
-    :param vrouter: The vrouter name to add ospf bfd.
-    :param ospf_network: The network for adding the ospf neighbor.
-    :param ospf_area_id: The area_id for the spines loopback neighbor.
-    :return: String describing if OSPF Neighbor got added or if it already exists.
-    """
-    global CHANGED_FLAG
-    output = ''
-    cli = pn_cli(module)
-    clicopy = cli
-
-    cli += ' vrouter-ospf-show'
-    cli += ' network %s format switch no-show-headers ' % ospf_network
-    already_added = run_cli(module, cli).split()
-
-    if vrouter in already_added:
-        output += ' %s: OSPF Neighbor %s already exists for %s \n' % (
-            switch, ospf_network, vrouter
-        )
-    else:
-        cli = clicopy
-        cli += ' vrouter-ospf-add vrouter-name ' + vrouter
-        cli += ' network %s ospf-area %s' % (ospf_network,
-                                             ospf_area_id)
-
-        if 'Success' in run_cli(module, cli):
-            output += ' %s: Added OSPF neighbor %s to %s \n' % (
-                switch, ospf_network, vrouter
-            )
-            CHANGED_FLAG.append(True)
-
-    return output
-
-
 def dict_area_id_leaf(module):
     """
     Method to find area_id for all leaf and store in dictionary.
@@ -932,251 +894,102 @@ def dict_area_id_leaf(module):
     return dict_area_id
 
 
-def add_ospf_neighbor(module, dict_area_id):
+def apply_ospf_plan(module, ospf_plan):
     """
-    Method to add ospf_neighbor to the vrouters.
+    Method to apply the missing statements of an OSPF plan per vrouter.
     :param module: The Ansible module to fetch input parameters.
-    :param dict_area_id: Dictionary containing area_id of leafs.
+    :param ospf_plan: Statements returned by plan_ospf().
     :return: String describing if ospf neighbors got added or not.
     """
-    output = ''
-    output += add_ospf_neighbor_new_spines(module, dict_area_id)
-    output += add_ospf_neighbor_old_spines(module, dict_area_id)
-
-    return output
-
-
-def add_ospf_neighbor_old_spines(module, dict_area_id):
-    """
-    Method to add bgp_neighbor to the vrouters.
-    :param module: The Ansible module to fetch input parameters.
-    :param dict_bgp_as: Dictionary containing bgp-as of all switches.
-    :return: String describing if bgp neighbors got added or not.
-    """
     global CHANGED_FLAG
     output = ''
-    cli = pn_cli(module)
-    clicopy = cli
+    clicopy = pn_cli(module)
 
-    for spine in module.params['pn_spine_list']:
-        cli = clicopy
-        cli += ' vrouter-show location %s' % spine
-        cli += ' format name no-show-headers'
-        vrouter_spine = run_cli(module, cli).split()[0]
-
-        for leaf in module.params['pn_new_leaf_list']:
-            cli = clicopy
-            cli += ' switch %s port-show hostname %s ' % (spine, leaf)
-            cli += ' format port no-show-headers '
-            port_list = run_cli(module, cli).split()
+    for switch, vrouter, bfd_statements, network_statements in ospf_plan:
+        for nic, ospf_bfd in bfd_statements:
+            if ospf_bfd == 'enable':
+                output += ' %s: OSPF BFD already enabled for %s \n' % (
+                    switch, vrouter
+                )
+                continue
 
             cli = clicopy
-            cli += ' vrouter-show location %s' % leaf
-            cli += ' format name no-show-headers'
-            vrouter_leaf = run_cli(module, cli).split()[0]
-
-            ospf_area_id = dict_area_id[leaf]
-
-            if 'Success' not in port_list and len(port_list) > 0:
-                for port in port_list:
-
-                    cli = clicopy
-                    cli += ' vrouter-interface-show vrouter-name %s ' % (
-                        vrouter_spine)
-                    cli += ' l3-port %s format ip no-show-headers ' % port
-                    ip = run_cli(module, cli).split()
-                    ip = list(set(ip))
-                    ip.remove(vrouter_spine)
-                    ip = ip[0]
+            if ospf_bfd is None:
+                cli += ' vrouter-interface-config-add vrouter-name %s' % vrouter
+                message = ' %s: Added OSPF BFD to %s \n' % (switch, vrouter)
+            else:
+                cli += ' vrouter-interface-config-modify vrouter-name %s' % (
+                    vrouter)
+                message = ' %s: Modified OSPF BFD to enable for %s \n' % (
+                    switch, vrouter)
+            cli += ' nic %s ospf-bfd enable' % nic
 
-                    ip = ip.split('.')
-                    static_part = str(ip[0]) + '.' + str(ip[1]) + '.'
-                    static_part += str(ip[2]) + '.'
-                    last_octet = str(ip[3]).split('/')
-                    netmask = last_octet[1]
+            if 'Success' in run_cli(module, cli):
+                output += message
+                CHANGED_FLAG.append(True)
 
-                    last_octet_ip_mod = int(last_octet[0]) % 4
-                    ospf_last_octet = int(last_octet[0]) - last_octet_ip_mod
-                    ospf_network = static_part + str(ospf_last_octet) + '/' + netmask
+        for ospf_network, ospf_area_id, exists in network_statements:
+            if exists:
+                output += ' %s: OSPF Neighbor %s already exists for %s \n' % (
+                    switch, ospf_network, vrouter
+                )
+                continue
 
-                    leaf_last_octet = int(last_octet[0]) - 1
-                    ip_leaf = static_part + str(leaf_last_octet)
-                    ip_spine = static_part + last_octet[0]
+            cli = clicopy
+            cli += ' vrouter-ospf-add vrouter-name ' + vrouter
+            cli += ' network %s ospf-area %s' % (ospf_network, ospf_area_id)
 
-                    cli = clicopy
-                    cli += ' vrouter-ospf-show'
-                    cli += ' network %s format switch no-show-headers ' % ospf_network
-                    already_added = run_cli(module, cli).split()
-        
-                    if vrouter_spine in already_added:
-                        output += ' %s: OSPF Neighbor %s already exists for %s \n' % (
-                            spine, ospf_network, vrouter_spine
-                        )
-                    else:
-                        if module.params['pn_bfd']:
-                            output += configure_ospf_bfd(module, vrouter_spine,
-                                                         ip_spine)
-        
-                        cli = clicopy
-                        cli += ' vrouter-ospf-add vrouter-name ' + vrouter_spine
-                        cli += ' network %s ospf-area %s' % (ospf_network,
-                                                             ospf_area_id)
-        
-                        if 'Success' in run_cli(module, cli):
-                            output += ' %s: Added OSPF neighbor %s to %s \n' % (
-                                spine, ospf_network, vrouter_spine
-                            )
-                            CHANGED_FLAG.append(True)
-        
-                    if vrouter_leaf in already_added:
-                        output += ' %s: OSPF Neighbor %s already exists for %s \n' % (
-                            leaf, ospf_network, vrouter_leaf
-                        )
-                    else:
-                        if module.params['pn_bfd']:
-                            output += configure_ospf_bfd(module, vrouter_leaf,
-                                                         ip_leaf)
-        
-                        cli = clicopy
-                        cli += ' vrouter-ospf-add vrouter-name ' + vrouter_leaf
-                        cli += ' network %s ospf-area %s' % (ospf_network,
-                                                             ospf_area_id)
-        
-                        if 'Success' in run_cli(module, cli):
-                            output += ' %s: Added OSPF neighbor %s to %s \n' % (
-                                leaf, ospf_network, vrouter_leaf
-                            )
-                            CHANGED_FLAG.append(True)
+            if 'Success' in run_cli(module, cli):
+                output += ' %s: Added OSPF neighbor %s to %s \n' % (
+                    switch, ospf_network, vrouter
+                )
+                CHANGED_FLAG.append(True)
 
     return output
 
 
-def add_ospf_neighbor_new_spines(module, dict_area_id):
+def add_ospf_neighbor(module, dict_area_id):
     """
     Method to add ospf_neighbor to the vrouters.
     :param module: The Ansible module to fetch input parameters.
     :param dict_area_id: Dictionary containing area_id of leafs.
     :return: String describing if ospf neighbors got added or not.
     """
-    global CHANGED_FLAG
+    snapshot = ospf_snapshot(module, pn_cli(module), module.params['pn_bfd'])
     output = ''
-    cli = pn_cli(module)
-    clicopy = cli
-    leaf_list = module.params['pn_leaf_list']
-    spine_list = module.params['pn_spine_list']
-    new_leaf_list = module.params['pn_new_leaf_list']
-    new_spine_list = module.params['pn_new_spine_list']
-
-    for spine in new_spine_list:
-        cli = clicopy
-        cli += ' vrouter-show location %s' % spine
-        cli += ' format name no-show-headers'
-        vrouter_spine = run_cli(module, cli).split()[0]
-
-        if new_spine_list.index(spine) == 0:
-            cli = clicopy
-            cli += ' vrouter-loopback-interface-show vrouter-name ' + vrouter_spine
-            cli += ' format ip no-show-headers '
-            loopback_ip = run_cli(module, cli).split()
-            loopback_ip.remove(vrouter_spine)
-            vrouter_loopback_ip = loopback_ip[0]
-
-            loopback_ip = loopback_ip[0].split('.')
-            loopback_network = loopback_ip[0] + '.' + loopback_ip[1] + '.'
-            loopback_network += loopback_ip[2] + '.' + '0/24'
-
-        output += add_ospf_loopback_spine(module, spine, vrouter_spine, loopback_network, '0')
-
-        cli = clicopy
-        cli += ' vrouter-interface-show vrouter-name %s ' % vrouter_spine
-        cli += ' format l3-port no-show-headers '
-        port_list = run_cli(module, cli).split()
-        port_list = list(set(port_list))
-        port_list.remove(vrouter_spine)
+    output += add_ospf_neighbor_new_spines(module, dict_area_id, snapshot)
+    output += add_ospf_neighbor_old_spines(module, dict_area_id, snapshot)
 
-        for port in port_list:
-            cli = clicopy
-            cli += ' switch %s port-show port %s' % (spine, port)
-            cli += ' format hostname no-show-headers'
-            hostname = run_cli(module, cli).split()[0]
-
-            ospf_area_id = dict_area_id[hostname]
-
-            cli = clicopy
-            cli += ' vrouter-show location %s' % hostname
-            cli += ' format name no-show-headers'
-            vrouter_hostname = run_cli(module, cli).split()[0]
-
-            cli = clicopy
-            cli += ' vrouter-interface-show vrouter-name %s l3-port %s' % (
-                vrouter_spine, port
-            )
-            cli += ' format ip no-show-headers'
-            ip = run_cli(module, cli).split()
-            ip = list(set(ip))
-            ip.remove(vrouter_spine)
-            ip = ip[0]
-
-            ip = ip.split('.')
-            static_part = str(ip[0]) + '.' + str(ip[1]) + '.'
-            static_part += str(ip[2]) + '.'
-            last_octet = str(ip[3]).split('/')
-            netmask = last_octet[1]
-
-            last_octet_ip_mod = int(last_octet[0]) % 4
-            ospf_last_octet = int(last_octet[0]) - last_octet_ip_mod
-            ospf_network = static_part + str(ospf_last_octet) + '/' + netmask
-
-            leaf_last_octet = int(last_octet[0]) - 1
-            ip_leaf = static_part + str(leaf_last_octet)
-            ip_spine = static_part + last_octet[0]
-
-            cli = clicopy
-            cli += ' vrouter-ospf-show'
-            cli += ' network %s format switch no-show-headers ' % ospf_network
-            already_added = run_cli(module, cli).split()
-
-            if vrouter_spine in already_added:
-                output += ' %s: OSPF Neighbor %s already exists for %s \n' % (
-                    spine, ospf_network, vrouter_spine
-                )
-            else:
-                if module.params['pn_bfd']:
-                    output += configure_ospf_bfd(module, vrouter_spine,
-                                                 ip_spine)
-
-                cli = clicopy
-                cli += ' vrouter-ospf-add vrouter-name ' + vrouter_spine
-                cli += ' network %s ospf-area %s' % (ospf_network,
-                                                     ospf_area_id)
-
-                if 'Success' in run_cli(module, cli):
-                    output += ' %s: Added OSPF neighbor %s to %s \n' % (
-                        spine, ospf_network, vrouter_spine
-                    )
-                    CHANGED_FLAG.append(True)
+    return output
 
-            if vrouter_hostname in already_added:
-                output += ' %s: OSPF Neighbor %s already exists for %s \n' % (
-                    hostname, ospf_network, vrouter_hostname
-                )
-            else:
-                if module.params['pn_bfd']:
-                    output += configure_ospf_bfd(module, vrouter_hostname,
-                                                 ip_leaf)
 
-                cli = clicopy
-                cli += ' vrouter-ospf-add vrouter-name ' + vrouter_hostname
-                cli += ' network %s ospf-area %s' % (ospf_network,
-                                                     ospf_area_id)
+def add_ospf_neighbor_old_spines(module, dict_area_id, snapshot):
+    """
+    Method to add ospf_neighbor between the old spines and the new leafs.
+    :param module: The Ansible module to fetch input parameters.
+    :param dict_area_id: Dictionary containing area_id of leafs.
+    :param snapshot: Output of ospf_snapshot().
+    :return: String describing if ospf neighbors got added or not.
+    """
+    ospf_plan = plan_ospf(module.params['pn_spine_list'],
+                          module.params['pn_new_leaf_list'], dict_area_id,
+                          snapshot, module.params['pn_bfd'])
+    return apply_ospf_plan(module, ospf_plan)
 
-                if 'Success' in run_cli(module, cli):
-                    output += ' %s: Added OSPF neighbor %s to %s \n' % (
-                        hostname, ospf_network, vrouter_hostname
-                    )
-                    CHANGED_FLAG.append(True)
 
-    return output
+def add_ospf_neighbor_new_spines(module, dict_area_id, snapshot):
+    """
+    Method to add ospf_neighbor between the new spines and all leafs.
+    :param module: The Ansible module to fetch input parameters.
+    :param dict_area_id: Dictionary containing area_id of leafs.
+    :param snapshot: Output of ospf_snapshot().
+    :return: String describing if ospf neighbors got added or not.
+    """
+    leaf_list = (module.params['pn_leaf_list'] +
+                 module.params['pn_new_leaf_list'])
+    ospf_plan = plan_ospf(module.params['pn_new_spine_list'], leaf_list,
+                          dict_area_id, snapshot, module.params['pn_bfd'], '0')
+    return apply_ospf_plan(module, ospf_plan)
 
 
 def add_ospf_redistribute(module, vrouter_names):
@@ -1349,9 +1162,11 @@ def main():
         argument_spec=dict(
             pn_cliusername=dict(required=False, type='str'),
             pn_clipassword=dict(required=False, type='str', no_log=True),
+            pn_fabric_facts=dict(required=False, type='dict'),
             pn_spine_list=dict(required=False, type='list'),
             pn_leaf_list=dict(required=False, type='list'),
             pn_bgp_as_range=dict(required=False, type='str', default='65000'),
+            pn_bgp_as_map=dict(required=False, type='dict'),
             pn_bgp_redistribute=dict(required=False, type='str',
                                      choices=['none', 'static', 'connected',
                                               'rip', 'ospf'],
@@ -1418,11 +1233,12 @@ def main():
         summary=results,
         exception='',
         failed=False,
+        bgp_as_map=dict_bgp_as,
         changed=True if True in CHANGED_FLAG else False,
         task='CLI commands to configure eBGP/OSPF zero touch provisioning'
     )
 
 
 if __name__ == '__main__':
-    main()
+    run_main(main)
 
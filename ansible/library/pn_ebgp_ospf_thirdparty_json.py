@@ -21,6 +21,11 @@
 import shlex
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_bgp_plan import (cluster_snapshot,
+                                                configured_as_map, load_as_map,
+                                                plan_bgp_as, router_id_snapshot)
+from ansible.module_utils.pn_nvos import run_command
+from ansible.module_utils.pn_profile import run_main
 
 DOCUMENTATION = """
 ---
@@ -52,6 +57,12 @@ options:
         - Provide login password if user is not root.
       required: False
       type: str
+    pn_fabric_facts:
+      description:
+        - pn_fabric fact gathered by pn_fabric_facts. While it is fresh,
+          the fabric discovery shows are answered from it.
+      required: False
+      type: dict
     pn_leaf_list:
       description:
         - Specify list of leaf hosts
@@ -76,6 +87,13 @@ options:
       required: False
       type: str
       default: '65000'
+    pn_bgp_as_map:
+      description:
+        - Specify bgp-as of the switches as returned in bgp_as_map by an
+          earlier run. Switches keep their bgp-as and only the missing ones
+          get planned.
+      required: False
+      type: dict
     pn_routing_protocol:
       description:
         - Specify which routing protocol to specify.
@@ -145,6 +163,10 @@ msg:
   description: Indicates whether configuration made was successful or failed.
   returned: always
   type: str
+bgp_as_map:
+  description: The bgp-as of every switch, can be passed back as pn_bgp_as_map.
+  returned: when routing protocol is ebgp
+  type: dict
 """
 
 CHANGED_FLAG = []
@@ -176,7 +198,7 @@ def run_cli(module, cli):
     :return: Output/Error or Success msg depending upon the response from cli.
     """
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_command(module, cli)
     results = []
     if out:
         return out
@@ -206,36 +228,18 @@ def find_bgp_as_dict(module):
     :param module: The Ansible module to fetch input parameters.
     :return: Dictionary containing switch: bgp_as key value pairs.
     """
-    leaf_list = module.params['pn_leaf_list']
-    bgp_as = int(module.params['pn_bgp_as_range'])
-    cluster_leaf_list = []
-    cli = pn_cli(module)
-    clicopy = cli
-    dict_bgp_as = {}
-
-    cli += ' cluster-show format name no-show-headers'
-    cluster_list = run_cli(module, cli).split()
-
-    if 'Success' not in cluster_list:
-        for cluster in cluster_list:
-            cli = clicopy
-            cli += ' cluster-show name %s' % cluster
-            cli += ' format cluster-node-1,cluster-node-2 no-show-headers'
-            cluster_nodes = run_cli(module, cli).split()
+    leaf_list = module.params['pn_leaf_list'] or []
+    as_map = load_as_map(module.params['pn_bgp_as_map'])
 
-            if cluster_nodes[0] in leaf_list and cluster_nodes[1] in leaf_list:
-                bgp_as += 1
-                dict_bgp_as[cluster_nodes[0]] = str(bgp_as)
-                dict_bgp_as[cluster_nodes[1]] = str(bgp_as)
-                cluster_leaf_list.append(cluster_nodes[0])
-                cluster_leaf_list.append(cluster_nodes[1])
-
-    non_clustered_leaf_list = list(set(leaf_list) - set(cluster_leaf_list))
-    for leaf in non_clustered_leaf_list:
-        bgp_as += 1
-        dict_bgp_as[leaf] = str(bgp_as)
+    if all(leaf in as_map for leaf in leaf_list):
+        return as_map
 
-    return dict_bgp_as
+    cli = pn_cli(module)
+    previous = configured_as_map(module, cli)
+    previous.update(as_map)
+    clusters = cluster_snapshot(module, cli)
+    return plan_bgp_as([], leaf_list, clusters,
+                       module.params['pn_bgp_as_range'], previous)
 
 
 def vrouter_interface_ibgp_add(module, switch_name, interface_ip, neighbor_ip,
@@ -454,30 +458,24 @@ def assign_router_id(module, vrouter_names):
     output = ''
     cli = pn_cli(module)
     clicopy = cli
+    router_ids = router_id_snapshot(module, clicopy)
 
-    if len(vrouter_names) > 0:
-        for vrouter in vrouter_names:
-            cli = clicopy
-            cli += ' vrouter-loopback-interface-show vrouter-name ' + vrouter
-            cli += ' format ip no-show-headers '
-            loopback_ip = run_cli(module, cli).split()
-
-            if 'Success' not in loopback_ip and len(loopback_ip) > 0:
-                loopback_ip.remove(vrouter)
-                cli = clicopy
-                cli += ' vrouter-modify name %s router-id %s ' % (
-                    vrouter, loopback_ip[0])
-
-                if 'Success' in run_cli(module, cli):
-                    cli = clicopy
-                    cli += ' vrouter-show name ' + vrouter
-                    cli += ' format location no-show-headers '
-                    switch = run_cli(module, cli).split()[0]
+    for vrouter in vrouter_names:
+        if vrouter not in router_ids:
+            continue
 
-                    output += ' %s: Added router id %s to %s \n' % (
-                        switch, loopback_ip[0], vrouter)
+        switch, router_id, current_router_id = router_ids[vrouter]
+        if router_id == current_router_id:
+            output += ' %s: Router id %s already assigned to %s \n' % (
+                switch, router_id, vrouter)
+            continue
 
-                    CHANGED_FLAG.append(True)
+        cli = clicopy
+        cli += ' vrouter-modify name %s router-id %s ' % (vrouter, router_id)
+        if 'Success' in run_cli(module, cli):
+            output += ' %s: Added router id %s to %s \n' % (switch, router_id,
+                                                            vrouter)
+            CHANGED_FLAG.append(True)
 
     return output
 
@@ -939,8 +937,10 @@ def main():
         argument_spec=dict(
             pn_cliusername=dict(required=False, type='str'),
             pn_clipassword=dict(required=False, type='str', no_log=True),
+            pn_fabric_facts=dict(required=False, type='dict'),
             pn_leaf_list=dict(required=False, type='list'),
             pn_bgp_as_range=dict(required=False, type='str', default='65000'),
+            pn_bgp_as_map=dict(required=False, type='dict'),
             pn_bgp_redistribute=dict(required=False, type='str',
                                      choices=['none', 'static', 'connected',
                                               'rip', 'ospf'],
@@ -961,6 +961,7 @@ def main():
 
     global CHANGED_FLAG
     routing_protocol = module.params['pn_routing_protocol']
+    dict_bgp_as = {}
 
     # Get the list of vrouter names.
     cli = pn_cli(module)
@@ -1002,10 +1003,11 @@ def main():
         summary=results,
         exception='',
         failed=False,
+        bgp_as_map=dict_bgp_as,
         changed=True if True in CHANGED_FLAG else False,
         task='Configure eBGP/OSPF with existing spine switches'
     )
 
 if __name__ == '__main__':
-    main()
+    run_main(main)
 
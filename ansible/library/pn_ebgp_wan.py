@@ -19,6 +19,10 @@
 #
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_events import ChangeEvents
+from ansible.module_utils.pn_nvos import cli_stats, run_command, run_parallel
+from ansible.module_utils.pn_profile import run_main
+from ansible.module_utils.pn_wan_plan import plan_wan_mesh, wan_snapshot
 import shlex
 
 DOCUMENTATION = """
@@ -45,6 +49,12 @@ options:
         - Provide login password if user is not root.
       required: False
       type: str
+    pn_fabric_facts:
+      description:
+        - pn_fabric fact gathered by pn_fabric_facts. While it is fresh,
+          the fabric discovery shows are answered from it.
+      required: False
+      type: dict
     pn_wan_switch_list:
       description:
         - Specify list of wan hosts
@@ -62,6 +72,18 @@ options:
       required: False
       type: str
       default: '85.75.75.0/30'
+    pn_parallel:
+      description:
+        - Maximum number of WAN switches configured at the same time.
+      required: False
+      type: int
+      default: 8
+    pn_batch_size:
+      description:
+        - Maximum number of commands sent to a switch in one cli session.
+      required: False
+      type: int
+      default: 100
 """
 
 EXAMPLES = """
@@ -85,9 +107,20 @@ failed:
   description: Indicates whether or not the execution failed on the target.
   returned: always
   type: bool
+cli_stats:
+  description: Calls made to the switches (a batch counts once), the commands
+    they carried, the bytes of output and the seconds spent waiting on them.
+  returned: always
+  type: dict
+events:
+  description: Change events (switch, object, key, action, result, msg), in
+    the order they happened.
+  returned: always
+  type: list
 """
 
 CHANGED_FLAG = []
+EVENTS = ChangeEvents()
 
 
 def pn_cli(module):
@@ -116,7 +149,7 @@ def run_cli(module, cli):
     :return: Output/Error or Success msg depending upon the response from cli.
     """
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_command(module, cli)
     if out:
         return out
 
@@ -136,10 +169,8 @@ def add_bgp_as(module):
     """
     Method to add bgp_redistribute to the vrouter.
     :param module: The Ansible module to fetch input parameters.
-    :return: String describing if bgp-redistribute got added or not.
     """
     global CHANGED_FLAG
-    output = ''
     cli = pn_cli(module)
     clicopy = cli
     wan_bgp_as = module.params['pn_wan_bgp_as']
@@ -154,210 +185,68 @@ def add_bgp_as(module):
         cli += ' vrouter-modify name %s bgp-as %s ' % (vrouter,
                                                             wan_bgp_as)
         if 'Success' in run_cli(module, cli):
-            output += ' %s: Added %s BGP_AS to %s \n' % (switch, wan_bgp_as,
-                                                                   vrouter)
+            EVENTS.changed(switch, 'vrouter', vrouter, 'modify',
+                           'Added %s BGP_AS to %s' % (wan_bgp_as, vrouter))
             CHANGED_FLAG.append(True)
 
-    return output
-
-
-def create_interface(module, switch, ip, port, vrouter):
-    """
-    Method to create vrouter interface and assign IP to it.
-    :param module: The Ansible module to fetch input parameters.
-    :param switch: The switch name on which vrouter will be created.
-    :param ip: IP address to be assigned to vrouter interfaces.
-    :param port: l3-port for the interface.
-    :return: The output string informing details of vrouter created and
-    interface added or if vrouter already exists.
-    """
-    output = ''
-    global CHANGED_FLAG
-    cli = pn_cli(module)
-    clicopy = cli
-
-    cli += ' vrouter-interface-show l3-port %s ip %s ' % (port, ip)
-    cli += ' format switch no-show-headers '
-    existing_vrouter = run_cli(module, cli).split()
-    existing_vrouter = list(set(existing_vrouter))
-
-    if vrouter not in existing_vrouter:
-        # Add vrouter interface.
-        cli = clicopy
-        cli += ' vrouter-interface-add vrouter-name ' + vrouter
-        cli += ' ip ' + ip
-        cli += ' l3-port ' + port
-        run_cli(module, cli)
-        output += ' %s: Added vrouter interface with ip %s on %s \n' % (
-            switch, ip, vrouter
-        )
-
-        CHANGED_FLAG.append(True)
-    else:
-        output += ' %s: Vrouter interface %s already exists on %s \n' % (
-            switch, ip, vrouter
-        )
-
-    return output
 
-
-def modify_auto_trunk_setting(module, switch, flag):
+def batch_failed(module, target, clis, err):
     """
-    Method to enable/disable auto trunk setting of a switch.
+    Method to fail the module for a command batch which failed on a switch.
     :param module: The Ansible module to fetch input parameters.
-    :param switch: Name of the local switch.
-    :param flag: Enable/disable flag for the cli command.
-    :return: The output of run_cli() method.
-    """
-    cli = pn_cli(module)
-    if flag.lower() == 'enable':
-        cli += ' switch %s system-settings-modify auto-trunk ' % switch
-        return run_cli(module, cli)
-    elif flag.lower() == 'disable':
-        cli += ' switch %s system-settings-modify no-auto-trunk ' % switch
-        return run_cli(module, cli)
-
-
-def delete_trunk(module, switch, switch_port, peer_switch):
+    :param target: The switch the batch ran on.
+    :param clis: The cli strings of the batch.
+    :param err: Error output of the batch.
     """
-    Method to delete a conflicting trunk on a switch.
-    :param module: The Ansible module to fetch input parameters.
-    :param switch: Name of the local switch.
-    :param switch_port: The l3-port which is part of conflicting trunk for l3.
-    :param peer_switch: Name of the peer switch.
-    :return: String describing if trunk got deleted or not.
-    """
-    cli = pn_cli(module)
-    clicopy = cli
-    cli += ' switch %s port-show port %s hostname %s ' % (switch, switch_port,
-                                                          peer_switch)
-    cli += ' format trunk no-show-headers '
-    trunk = run_cli(module, cli).split()
-    trunk = list(set(trunk))
-
-    if len(trunk) > 0 and 'Success' not in trunk:
-        cli = clicopy
-        cli += ' switch %s trunk-delete name %s ' % (switch, trunk[0])
-        if 'Success' in run_cli(module, cli):
-            CHANGED_FLAG.append(True)
-            return ' %s: Deleted %s trunk successfully \n' % (switch, trunk[0])
+    module.exit_json(
+        error='1',
+        failed=True,
+        stderr=err.strip(),
+        msg='Operation Failed on %s: %s' % (target, str(clis)),
+        changed=False
+    )
 
 
 def add_wan_ibgp_interface(module):
     """
     Method to create vrouter interface and add ebgp neighbor for wan switches.
+    The links, trunks, interfaces and neighbors of the whole mesh are read
+    once and planned together, see pn_wan_plan; the changes of every switch
+    are then applied as one batch, different switches concurrently.
     :param module: The Ansible module to fetch input parameters.
-    :return: The output string informing details of vrouter created and
     """
+    global CHANGED_FLAG
     cli = pn_cli(module)
-    clicopy = cli
-
-    bgp_as = module.params['pn_wan_bgp_as']
     wan_switch_list = module.params['pn_wan_switch_list']
-    ip = module.params['pn_wan_ip']
-
-    output = ''
-
-    ip = ip.split('/')[0]
-    ip = ip.split('.')
-    static_part = ip[0] + '.' + ip[1] + '.' + ip[2] + '.'
-    network_count = 0
-    subnet = 4
 
-    # Disable auto trunk on all switches.
-    for switch in wan_switch_list:
-        modify_auto_trunk_setting(module, switch, 'disable')
-
-    while len(wan_switch_list) > 1:
-        wan_switch = wan_switch_list[0]
-        wan_switch_list.remove(wan_switch)
-        host_list = wan_switch_list
+    snapshot = wan_snapshot(module, cli, wan_switch_list)
+    plans, existing = plan_wan_mesh(module, wan_switch_list, snapshot,
+                                    module.params['pn_wan_ip'],
+                                    module.params['pn_wan_bgp_as'])
+    planned = dict((switch, changes) for switch, _, changes in plans)
+
+    # Disable auto trunk on all switches before their links are configured.
+    commands = dict((switch, [cli + ' switch %s system-settings-modify '
+                                    'no-auto-trunk ' % switch])
+                    for switch in wan_switch_list)
+    for switch, clis, _ in plans:
+        commands[switch] += [cli + command for command in clis]
+
+    for result in run_parallel(module, [(switch, commands[switch])
+                                        for switch in wan_switch_list],
+                               module.params['pn_parallel'],
+                               module.params['pn_batch_size']):
+        if result is None:
+            continue
+        switch, clis, rc, out, err = result
+        if rc or err:
+            batch_failed(module, switch, clis, err)
+        for obj, key, action, msg in planned.get(switch, []):
+            EVENTS.changed(switch, obj, key, action, msg)
+            CHANGED_FLAG.append(True)
 
-        cli = clicopy
-        cli += ' vrouter-show location %s format name no-show-headers ' % wan_switch
-        vrouter_switch1 = run_cli(module, cli).split()[0]
-
-        for host_switch in host_list:
-
-            cli = clicopy
-            cli += ' vrouter-show location %s format name no-show-headers ' % host_switch
-            vrouter_switch2 = run_cli(module, cli).split()[0]
-
-            cli = clicopy
-            cli += ' switch %s port-show hostname %s ' % (wan_switch, host_switch)
-            cli += ' format port no-show-headers '
-            port_list = run_cli(module, cli).split()
-        
-            while len(port_list) > 0 and 'Success' not in port_list:
-        
-                network = network_count * subnet
-                lport = port_list[0]
-        
-                ip1 = static_part + str(int(network) + 1)
-                ip2 = static_part + str(int(network) + 2)
-                ip1_interface = ip1 + '/30'
-                ip2_interface = ip2 + '/30'
-
-                delete_trunk(module, wan_switch, lport, host_switch)
-                output += create_interface(module, wan_switch, ip1_interface, lport, vrouter_switch1)
-                port_list.remove(lport)
-        
-                cli = clicopy
-                cli += ' switch %s port-show port %s ' % (wan_switch, lport)
-                cli += ' format rport no-show-headers '
-                rport = run_cli(module, cli).split()[0]
-        
-                delete_trunk(module, host_switch, rport, wan_switch)
-                output += create_interface(module, host_switch, ip2_interface, rport, vrouter_switch2)
-        
-                cli = clicopy
-                cli += ' vrouter-bgp-show remote-as ' + bgp_as
-                cli += ' neighbor %s format switch no-show-headers ' % (
-                    ip2)
-                already_added = run_cli(module, cli).split()
-        
-                if vrouter_switch1 in already_added:
-                    output += ' %s: ' % wan_switch
-                    output += 'BGP Neighbor %s already exists for %s \n' % (
-                        ip2, vrouter_switch1
-                    )
-                else:
-                    cli = clicopy
-                    cli += ' vrouter-bgp-add vrouter-name ' + vrouter_switch1
-                    cli += ' neighbor %s remote-as %s ' % (ip2,
-                                                           bgp_as)
-        
-                    if 'Success' in run_cli(module, cli):
-                        output += ' %s: Added BGP Neighbor %s for %s \n' % (
-                            wan_switch, ip2, vrouter_switch1
-                        )
-                        CHANGED_FLAG.append(True)
-        
-                cli = clicopy
-                cli += ' vrouter-bgp-show remote-as ' + bgp_as
-                cli += ' neighbor %s format switch no-show-headers ' % (
-                    ip1)
-                already_added = run_cli(module, cli).split()
-        
-                if vrouter_switch2 in already_added:
-                    output += ' %s: ' % host_switch
-                    output += 'BGP Neighbor %s already exists for %s \n' % (
-                        ip1, vrouter_switch2
-                    )
-                else:
-                    cli = clicopy
-                    cli += ' vrouter-bgp-add vrouter-name ' + vrouter_switch2
-                    cli += ' neighbor %s remote-as %s ' % (ip1,
-                                                           bgp_as)
-        
-                    if 'Success' in run_cli(module, cli):
-                        output += ' %s: Added BGP Neighbor %s for %s \n' % (
-                            host_switch, ip1, vrouter_switch2
-                        )
-                        CHANGED_FLAG.append(True)
-        
-                network_count += 1
-    return output
+    for switch, obj, key, msg in existing:
+        EVENTS.unchanged(switch, obj, key, msg)
 
 
 def create_vrouter_command(module, switch, vnet_name):
@@ -366,7 +255,6 @@ def create_vrouter_command(module, switch, vnet_name):
     :param module: The Ansible module to fetch input parameters.
     :param switch: The switch name on which vrouter will be created.
     :param vnet_name: The name of the vnet for vrouter creation.
-    :return: String describing if vrouter got created or if it already exists.
     """
     global CHANGED_FLAG
     vrouter_name = switch + '-vrouter'
@@ -384,16 +272,16 @@ def create_vrouter_command(module, switch, vnet_name):
         cli += ' vrouter-create name %s vnet %s ' % (vrouter_name, vnet_name)
         run_cli(module, cli)
         CHANGED_FLAG.append(True)
-        return ' %s: Created vrouter with name %s \n' % (switch, vrouter_name)
+        EVENTS.changed(switch, 'vrouter', vrouter_name, 'create',
+                       'Created vrouter with name %s' % vrouter_name)
     else:
-        return ' %s: Vrouter with name %s already exists \n' % (switch,
-                                                                vrouter_name)
+        EVENTS.unchanged(switch, 'vrouter', vrouter_name,
+                         'Vrouter with name %s already exists' % vrouter_name)
 
 
 def create_vrouter(module):
     # Get the fabric name and create vnet name required for vrouter creation.
     cli = pn_cli(module)
-    output = ''
 
     cli += ' fabric-node-show format fab-name no-show-headers '
     fabric_name = list(set(run_cli(module, cli).split()))[0]
@@ -401,7 +289,7 @@ def create_vrouter(module):
 
     # Create vrouter on all switches.
     for switch in module.params['pn_wan_switch_list']:
-        output += create_vrouter_command(module, switch, vnet_name)
+        create_vrouter_command(module, switch, vnet_name)
 
 
 def main():
@@ -410,21 +298,26 @@ def main():
         argument_spec=dict(
             pn_cliusername=dict(required=False, type='str'),
             pn_clipassword=dict(required=False, type='str', no_log=True),
+            pn_fabric_facts=dict(required=False, type='dict'),
             pn_wan_switch_list=dict(required=False, type='list'),
             pn_wan_bgp_as=dict(required=False, type='str', default='75000'),
             pn_wan_ip=dict(required=False, type='str',
                                   default='85.75.75.0/24'),
+            pn_parallel=dict(required=False, type='int', default=8),
+            pn_batch_size=dict(required=False, type='int', default=100),
         )
     )
 
     global CHANGED_FLAG
 
-    message = create_vrouter(module)
-    message = add_bgp_as(module)
-    message += add_wan_ibgp_interface(module)
+    create_vrouter(module)
+    add_bgp_as(module)
+    add_wan_ibgp_interface(module)
 
     module.exit_json(
-        stdout=message,
+        cli_stats=cli_stats(),
+        events=EVENTS.events,
+        stdout=EVENTS.text(),
         error='0',
         failed=False,
         changed=True if True in CHANGED_FLAG else False
@@ -432,5 +325,5 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    run_main(main)
 
@@ -0,0 +1,117 @@
+#!/usr/bin/python
+""" PN CLI Fabric facts """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_fabric_facts import fabric_facts
+
+DOCUMENTATION = """
+---
+module: pn_fabric_facts
+author: 'Pluribus Networks (devops@pluribusnetworks.com)'
+short_description: Gather the fabric inventory as facts.
+description:
+    Reads fabric nodes, clusters, vrouters, vrouter interfaces, loopbacks,
+    BGP neighbors, OSPF networks and per switch lldp/port tables with one
+    show each and returns them as the pn_fabric fact. Pass the fact to the
+    pn_* fabric modules as pn_fabric_facts to let them skip their own
+    discovery while it is fresh. With a persistent fact cache (jsonfile)
+    the fact is reused across playbook runs.
+options:
+    pn_cliusername:
+      description:
+        - Provide login username if user is not root.
+      required: False
+      type: str
+    pn_clipassword:
+      description:
+        - Provide login password if user is not root.
+      required: False
+      type: str
+    pn_fabric_facts:
+      description:
+        - Previously gathered pn_fabric fact. It is returned unchanged if it
+          is within its ttl and the fabric fab-tid did not change.
+      required: False
+      type: dict
+    pn_facts_ttl:
+      description:
+        - Seconds the gathered facts may be used for.
+      required: False
+      default: 600
+      type: int
+"""
+
+EXAMPLES = """
+- name: Gather fabric facts
+  pn_fabric_facts:
+    pn_cliusername: "{{ USERNAME }}"
+    pn_clipassword: "{{ PASSWORD }}"
+    pn_fabric_facts: "{{ pn_fabric | default(omit) }}"
+    pn_facts_ttl: 600
+
+- name: Configure eBGP
+  pn_ebgp_ospf:
+    pn_cliusername: "{{ USERNAME }}"
+    pn_clipassword: "{{ PASSWORD }}"
+    pn_spine_list: "{{ groups['spine'] }}"
+    pn_leaf_list: "{{ groups['leaf'] }}"
+    pn_fabric_facts: "{{ pn_fabric }}"
+"""
+
+RETURN = """
+ansible_facts:
+  description: pn_fabric with generation (fabric fab-tid), gathered (epoch
+               seconds), ttl and tables (show object to scope, columns and
+               rows).
+  returned: always
+  type: dict
+gathered:
+  description: Indicates whether the facts were read from the fabric or the
+               given ones were still fresh.
+  returned: always
+  type: bool
+"""
+
+
+def main():
+    """ This section is for arguments parsing """
+    module = AnsibleModule(
+        argument_spec=dict(
+            pn_cliusername=dict(required=False, type='str'),
+            pn_clipassword=dict(required=False, type='str', no_log=True),
+            pn_fabric_facts=dict(required=False, type='dict'),
+            pn_facts_ttl=dict(required=False, type='int', default=600),
+        ),
+        supports_check_mode=True
+    )
+
+    facts, gathered = fabric_facts(module, module.params['pn_facts_ttl'])
+
+    module.exit_json(
+        ansible_facts=dict(pn_fabric=facts),
+        gathered=gathered,
+        error='0',
+        failed=False,
+        changed=False
+    )
+
+
+if __name__ == '__main__':
+    main()
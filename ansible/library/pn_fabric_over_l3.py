@@ -19,7 +19,6 @@
 #
 
 import shlex
-import time
 
 DOCUMENTATION = """
 ---
@@ -45,6 +44,12 @@ options:
         - Provide login password if user is not root.
       required: False
       type: str
+    pn_fabric_facts:
+      description:
+        - pn_fabric fact gathered by pn_fabric_facts. While it is fresh,
+          the fabric discovery shows are answered from it.
+      required: False
+      type: dict
     pn_fabric_name:
       description:
         - Specify name of the fabric.
@@ -79,6 +84,13 @@ options:
       required: False
       type: str
       default: '65000'
+    pn_bgp_as_map:
+      description:
+        - Specify bgp-as of the switches as returned by an earlier pn_ebgp_ospf
+          run. Switches keep their bgp-as and only the missing ones get
+          planned.
+      required: False
+      type: dict
     pn_csv_data:
       description:
         - Specify commands to be run on the switches
@@ -129,6 +141,22 @@ RETURN = """
       description: Indicates whether the CLI caused changes on the target.
       returned: always
       type: bool
+    plan:
+      description: Commands which would be issued, per switch, when run in
+        check mode.
+      returned: check mode
+      type: dict
+    cli_stats:
+      description: Calls made to the switches (a batch counts once), the
+        commands they carried, the bytes of output and the seconds spent
+        waiting on them.
+      returned: always
+      type: dict
+    events:
+      description: Change events (switch, object, key, action, result,
+        msg), in the order they happened.
+      returned: always
+      type: list
 """
 
 def pn_cli(module):
@@ -159,7 +187,7 @@ def run_cli(module, cli):
     the response from cli.
     """
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_command(module, cli)
 
     if out:
         return out
@@ -185,7 +213,7 @@ def auto_accept_eula(module):
     password = module.params['pn_clipassword']
     cli = ' /usr/bin/cli --quiet --skip-setup eula-show '
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_command(module, cli)
 
     if err:
         cli = '/usr/bin/cli --quiet'
@@ -220,7 +248,6 @@ def assign_inband_ip(module, inband_ip):
     Method to assign in-band ips to switches.
     :param module: The Ansible module to fetch input parameters.
     :param inband_ip: The network ip for the in-band ips.
-    :return: The output messages for assignment.
     """
     cli = pn_cli(module)
     clicopy = cli
@@ -229,7 +256,6 @@ def assign_inband_ip(module, inband_ip):
     spine_list = module.params['pn_spine_list']
     leaf_list = module.params['pn_leaf_list']
     current_switch = module.params['pn_current_switch']
-    output = ''
     ip_count = 0
 
     if current_switch in spine_list:
@@ -251,8 +277,8 @@ def assign_inband_ip(module, inband_ip):
     cli += 'switch-setup-modify in-band-ip %s ' % ip
 
     if 'Setup completed successfully' in run_cli(module, cli):
-        output += '%s: Inband ip assigned with ip %s \n' % (current_switch, ip)
-    return output
+        EVENTS.changed(current_switch, 'switch-setup', current_switch,
+                       'modify', 'Inband ip assigned with ip %s' % ip)
 
 
 def find_leaf_cluster(module):
@@ -302,13 +328,11 @@ def fabric_inband_net_create(module, inband_static_part):
     :param module: The Ansible module to fetch input parameters.
     :param inband_static_part: It contains ip address of inband ip till third
                                octet.
-    :return: The output messages for fabric-in-band-network-create.
     """
     cli = pn_cli(module)
     clicopy = cli
     global CHANGED_FLAG
     supernet = 4
-    output = ''
     spine_list = module.params['pn_spine_list']
     leaf_list = module.params['pn_leaf_list']
     length_switch = int(len(spine_list)) + int(len(leaf_list))
@@ -326,14 +350,15 @@ def fabric_inband_net_create(module, inband_static_part):
             cli = clicopy
             cli += 'fabric-in-band-network-create network %s' % inband_network_ip
             if 'Success' in  run_cli(module, cli):
-                output += 'Fabric in-band network created with network %s created \n' % inband_network_ip
+                EVENTS.changed('', 'fabric-in-band-network', inband_network_ip,
+                               'create', 'Fabric in-band network created '
+                               'with network %s created' % inband_network_ip)
                 CHANGED_FLAG.append(True)
         else:
-            output += 'Inband network %s already exists \n' % inband_network_ip
+            EVENTS.unchanged('', 'fabric-in-band-network', inband_network_ip,
+                             'Inband network %s already exists' % inband_network_ip)
         switch_num += 1
 
-    return output
-
 
 def join_fabric(module, switch_ip):
     """
@@ -348,7 +373,7 @@ def join_fabric(module, switch_ip):
     cli = clicopy
     cli += ' fabric-info format name no-show-headers'
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_command(module, cli)
 
     if err:
         cli = clicopy
@@ -358,28 +383,22 @@ def join_fabric(module, switch_ip):
     return run_cli(module, cli)
 
 
-def fabric_comm(module, bgp_nic_ip, neighbor_ip, remote_switch, cluster_list,
-                non_cluster_leaf):
+def fabric_comm(module, bgp_nic_ip, neighbor_ip, remote_switch, as_map):
     """
     Method to run fabric-comm command.
     :param module: The Ansible module to fetch input parameters.
     :param bgp_nic_ip: Bgp_nic_ip for the fabric-comm.
     :param neighbor_ip: Neighbor_ip for the fabric-comm.
     :param remote_switch: Remote switch for the fabric-comm.
-    :param cluster_list: Pair of leaf clusters.
-    :param non_cluster_leaf: List of non_cluster leaf.
-    :return: The output of all cli commands.
+    :param as_map: Dictionary containing bgp-as of all switches.
     """
-    output = ''
     global CHANGED_FLAG
     vrouter_name = module.params['pn_current_switch'] + '-vrouter'    
-    bgp_spine = module.params['pn_bgp_as_range']
     spine_list = module.params['pn_spine_list']
     leaf_list = module.params['pn_leaf_list']
     current_switch = module.params['pn_current_switch']
     bgp_redistribute = module.params['pn_bgp_redistribute']
     bgp_max_path = module.params['pn_bgp_max_path']
-    length_non_cluster_leaf = len(non_cluster_leaf)
 
     cli = pn_cli(module)
     clicopy = cli
@@ -404,22 +423,9 @@ def fabric_comm(module, bgp_nic_ip, neighbor_ip, remote_switch, cluster_list,
         ip = static_part + str(gateway_ip)
 
         # remote-as for leaf is always spine1 and for spine is always leaf1
+        bgp_as = as_map[current_switch]
+        remote_as = as_map[remote_switch]
         if current_switch in spine_list:
-            bgp_as = bgp_spine
-            if remote_switch in non_cluster_leaf:
-                remote_as = int(bgp_spine) + 1 + non_cluster_leaf.index(
-                    remote_switch)
-            else:
-                cluster_count = 0
-                stop_flag = 0
-                while cluster_count < len(cluster_list) and stop_flag == 0:
-                    if remote_switch in cluster_list[cluster_count]:
-                        remote_as = int(
-                            length_non_cluster_leaf) + 1 + cluster_count + int(
-                            bgp_spine)
-                        stop_flag += 1
-                    cluster_count += 1
-            remote_as = str(remote_as)
 
             cli = clicopy
             cli += 'port-show hostname %s format port, no-show-headers' % (
@@ -439,23 +445,6 @@ def fabric_comm(module, bgp_nic_ip, neighbor_ip, remote_switch, cluster_list,
             fabric_network_addr = static_part + str(0) + '/' + netmask
 
         else:
-
-            if current_switch in non_cluster_leaf:
-                bgp_as = int(bgp_spine) + 1 + non_cluster_leaf.index(
-                    current_switch)
-            else:
-                cluster_count = 0
-                stop_flag = 0
-                while cluster_count < len(cluster_list) and stop_flag == 0:
-                    if current_switch in cluster_list[cluster_count]:
-                        bgp_as = int(
-                            length_non_cluster_leaf) + 1 + cluster_count + int(
-                            bgp_spine)
-                        stop_flag += 1
-                    cluster_count += 1
-            remote_as = bgp_spine
-            bgp_as = str(bgp_as)
-
             cli = clicopy
             cli += 'port-show hostname %s format port, no-show-headers' % spine_list[0]
             ports = run_cli(module, cli).split()
@@ -483,36 +472,31 @@ def fabric_comm(module, bgp_nic_ip, neighbor_ip, remote_switch, cluster_list,
 
         cli += ' in-band-nic-ip %s in-band-nic-netmask %s bfd' % (ip, netmask)
         cli += ' allowas-in'
-        output += '%s: Fab-comm command executed with output- ' % current_switch
-        output += str(run_cli(module, cli))
+        run_cli(module, cli)
+        EVENTS.changed(current_switch, 'vrouter', vrouter_name, 'create',
+                       'Fab-comm command executed')
         CHANGED_FLAG.append(True)
 
     else:
-        output += '%s: Vrouter already exist \n' % current_switch
-
-    return output
+        EVENTS.unchanged(current_switch, 'vrouter', vrouter_name,
+                         'Vrouter already exist')
 
 
-def add_interface_neighbor(module, interface_ip, neighbor_ip, remote_switch, cluster_list, non_cluster_leaf):
+def add_interface_neighbor(module, interface_ip, neighbor_ip, remote_switch,
+                           as_map):
     """
     Method to create interfaces and add ebgp neighbors.
     :param module: The Ansible module to fetch input parameters.
     :param interface_ip: Interface ip to create a vrouter interface.
     :param neighbor_ip: Neighbor_ip for the bgp neighbor.
     :param remote_switch: Remote switch.
-    :param cluster_list: Pair of leaf clusters.
-    :param non_cluster_leaf: List of non_cluster leaf.
-    :return: The output of all cli commands.
+    :param as_map: Dictionary containing bgp-as of all switches.
     """
-    output = ''
-    length_non_cluster_leaf = len(non_cluster_leaf)
     global CHANGED_FLAG
     cli = pn_cli(module)
     clicopy = cli
 
-    leaf_list = module.params['pn_leaf_list']
     current_switch = module.params['pn_current_switch']
-    bgp_spine = module.params['pn_bgp_as_range']
 
     cli = clicopy
     cli += 'vrouter-show location %s format name no-show-headers' % current_switch
@@ -523,7 +507,9 @@ def add_interface_neighbor(module, interface_ip, neighbor_ip, remote_switch, clu
     ports = run_cli(module, cli).split()
 
     if 'Success' in ports:
-        output += 'No l3 ports between %s and %s \n' % (current_switch, remote_switch)
+        EVENTS.add(current_switch, 'vrouter-interface', interface_ip, 'skip',
+                   'unchanged', 'No l3 ports between %s and %s' % (
+                       current_switch, remote_switch))
     else:
         cli = clicopy
         cli += 'switch %s trunk-show ports %s format trunk-id, no-show-headers ' % (current_switch, ports[0])
@@ -544,32 +530,17 @@ def add_interface_neighbor(module, interface_ip, neighbor_ip, remote_switch, clu
             cli += 'vrouter-interface-add vrouter-name %s ' % vrouter_name[0]
             cli += 'ip %s l3-port %s ' % (interface_ip, l3_port)
             if 'Added' in run_cli(module, cli):
-                output += '%s: Added vrouter interface with ip %s on %s \n' % (
-                    current_switch, interface_ip, vrouter_name[0]
-                    )
+                EVENTS.changed(current_switch, 'vrouter-interface',
+                               interface_ip, 'create',
+                               'Added vrouter interface with ip %s on %s' % (
+                                   interface_ip, vrouter_name[0]))
                 CHANGED_FLAG.append(True)
         else:
-            output += '%s: Vrouter interface %s already exists for %s \n' % (
-                current_switch, interface_ip, vrouter_name[0]
-            )
+            EVENTS.unchanged(current_switch, 'vrouter-interface', interface_ip,
+                             'Vrouter interface %s already exists for %s' % (
+                                 interface_ip, vrouter_name[0]))
     
-        if current_switch in leaf_list:
-            remote_as = bgp_spine
-        else:
-            if remote_switch in non_cluster_leaf:
-                remote_as = int(bgp_spine) + 1 + non_cluster_leaf.index(remote_switch)
-            else:
-                cluster_count = 0
-                stop_flag = 0
-                while cluster_count < len(cluster_list) and stop_flag == 0:
-                    if remote_switch in cluster_list[cluster_count]:
-                        remote_as = int(length_non_cluster_leaf) + 1 + cluster_count + int(bgp_spine)
-                        stop_flag += 1
-                    cluster_count += 1
-            remote_as = str(remote_as)
-            f = open('output.txt', 'a')
-            f.write('%s %s \n' % (remote_switch, remote_as))
-            f.close()
+        remote_as = as_map[remote_switch]
     
         cli = clicopy
         cli += ' vrouter-bgp-show remote-as ' + remote_as
@@ -577,34 +548,30 @@ def add_interface_neighbor(module, interface_ip, neighbor_ip, remote_switch, clu
         already_added = run_cli(module, cli).split()
     
         if vrouter_name[0] in already_added:
-            output += '%s: ' % current_switch
-            output += 'BGP Neighbor %s already exists for %s \n' % (
-                  neighbor_ip, vrouter_name[0]
-                 )
+            EVENTS.unchanged(current_switch, 'vrouter-bgp', neighbor_ip,
+                             'BGP Neighbor %s already exists for %s' % (
+                                 neighbor_ip, vrouter_name[0]))
         else:
             cli = clicopy
             cli += 'vrouter-bgp-add vrouter-name %s ' % vrouter_name[0]
             cli += 'neighbor %s remote-as %s' % (neighbor_ip, remote_as)
             cli += ' allowas-in bfd'
             if 'Success' in run_cli(module, cli):
-                output += '%s: Added BGP Neighbor %s for %s \n' % (
-                        current_switch, neighbor_ip, vrouter_name[0]
-                    )
+                EVENTS.changed(current_switch, 'vrouter-bgp', neighbor_ip,
+                               'create', 'Added BGP Neighbor %s for %s' % (
+                                   neighbor_ip, vrouter_name[0]))
                 CHANGED_FLAG.append(True)
-    return output
 
 
 def configure_fabric_over_l3(module):
     """
     Method to configure fabric in layer3.
     :param module: The Ansible module to fetch input parameters.
-    :return: The output of all cli commands.
     """
     global CHANGED_FLAG
     cli = pn_cli(module)
     clicopy = cli
     supernet = 4
-    output = ''
     inband_ip = module.params['pn_inband_ip']
     bgp_ip = module.params['pn_bgp_ip']
     spine_list = module.params['pn_spine_list']
@@ -612,7 +579,7 @@ def configure_fabric_over_l3(module):
     current_switch = module.params['pn_current_switch']
     fabric_name = module.params['pn_fabric_name']
 
-    output += assign_inband_ip(module, inband_ip)
+    assign_inband_ip(module, inband_ip)
 
     address = bgp_ip.split('.')
     static_part = str(address[0]) + '.' + str(address[1]) + '.'
@@ -625,21 +592,15 @@ def configure_fabric_over_l3(module):
     switch_ip = inband_static_part + str(1)
 
     dict_leaf_info = find_leaf_cluster(module)
-    cluster_leaf = dict_leaf_info[1]
     cluster_list = dict_leaf_info[0]
-    cluster_list = sorted(cluster_list)
-    non_cluster_leaf = list(sorted(set(leaf_list) - set(cluster_leaf)))
-
-    f = open('output.txt', 'a')
-    f.write('%s\n ' % cluster_list)
-    f.write('%s\n' % non_cluster_leaf)
-    f.close()
+    previous = configured_as_map(module, pn_cli(module))
+    previous.update(load_as_map(module.params['pn_bgp_as_map']))
+    as_map = plan_bgp_as(spine_list, leaf_list, sorted(cluster_list),
+                         module.params['pn_bgp_as_range'], previous,
+                         clusters_first=False)
 
     if current_switch in spine_list:
         for leaf in leaf_list:
-            f = open('output.txt', 'a')
-            f.write('%s \n' % (leaf))
-            f.close()
             spine_pos = spine_list.index(current_switch)
             if leaf_list.index(leaf) == 0:
 
@@ -651,25 +612,30 @@ def configure_fabric_over_l3(module):
                     if fabric_name not in existing_fabric:
                         cli = clicopy
                         cli += 'fabric-create name %s ' % fabric_name
-                        output += current_switch + ': ' + str(run_cli(module, cli))
+                        run_cli(module, cli)
+                        EVENTS.changed(current_switch, 'fabric', fabric_name,
+                                       'create', 'Fabric %s created' % fabric_name)
                         CHANGED_FLAG.append(True)
                     else:
-                        output += '%s: Fabric already created \n' % current_switch
+                        EVENTS.unchanged(current_switch, 'fabric', fabric_name,
+                                         'Fabric already created')
 
                 bgp_nic_ip_count = (spine_pos * leaf_count * supernet) + 1
                 neighbor_ip_count = bgp_nic_ip_count + 1
                 bgp_nic_ip = static_part + str(bgp_nic_ip_count) + '/' + str(30)
                 neighbor_ip = static_part + str(neighbor_ip_count)
-                output += fabric_comm(module, bgp_nic_ip, neighbor_ip, leaf, cluster_list, non_cluster_leaf)
+                fabric_comm(module, bgp_nic_ip, neighbor_ip, leaf, as_map)
 
                 if spine_pos == 0:
-                    output += fabric_inband_net_create(module, inband_static_part)
+                    fabric_inband_net_create(module, inband_static_part)
                 else:
                     if 'already in a fabric' in join_fabric(module, switch_ip):
-                        output += '%s: Already a part of fabric \n' % (current_switch)
+                        EVENTS.unchanged(current_switch, 'fabric', fabric_name,
+                                         'Already a part of fabric')
                     else:
-                        output += '%s: Joined fabric \n' % (current_switch)
-                        CHANGED_FLAG.append(True)                        
+                        EVENTS.changed(current_switch, 'fabric', fabric_name,
+                                       'modify', 'Joined fabric')
+                        CHANGED_FLAG.append(True)
 
             else:
                 leaf_pos = leaf_list.index(leaf)
@@ -678,9 +644,8 @@ def configure_fabric_over_l3(module):
                 neighbor_ip_count = interface_ip_count + 1
                 interface_ip = static_part + str(interface_ip_count) + '/' + str(30)
                 neighbor_ip = static_part + str(neighbor_ip_count)
-                output += add_interface_neighbor(module, interface_ip, neighbor_ip,
-                                                 leaf, cluster_list,
-                                                 non_cluster_leaf)
+                add_interface_neighbor(module, interface_ip, neighbor_ip, leaf,
+                                       as_map)
 
     elif current_switch in leaf_list:
         for spine in spine_list:
@@ -691,13 +656,14 @@ def configure_fabric_over_l3(module):
                 neighbor_ip_count = bgp_nic_ip_count - 1
                 bgp_nic_ip = static_part + str(bgp_nic_ip_count) + '/' + str(30)
                 neighbor_ip = static_part + str(neighbor_ip_count)
-                output += fabric_comm(module, bgp_nic_ip, neighbor_ip, spine,
-                                      cluster_list, non_cluster_leaf)
+                fabric_comm(module, bgp_nic_ip, neighbor_ip, spine, as_map)
 
                 if 'already in a fabric' in join_fabric(module, switch_ip):
-                    output += '%s: Already a part of fabric \n' % (current_switch)
+                    EVENTS.unchanged(current_switch, 'fabric', fabric_name,
+                                     'Already a part of fabric')
                 else:
-                    output += '%s: Joined fabric \n' % (current_switch)
+                    EVENTS.changed(current_switch, 'fabric', fabric_name,
+                                   'modify', 'Joined fabric')
                     CHANGED_FLAG.append(True)
 
             else:
@@ -707,71 +673,39 @@ def configure_fabric_over_l3(module):
                 neighbor_ip_count = interface_ip_count - 1
                 interface_ip = static_part + str(interface_ip_count) + '/' + str(30)
                 neighbor_ip = static_part + str(neighbor_ip_count)
-                output += add_interface_neighbor(module, interface_ip, neighbor_ip,
-                                                 spine, cluster_list, non_cluster_leaf)
-
-    return output
+                add_interface_neighbor(module, interface_ip, neighbor_ip, spine,
+                                       as_map)
 
 
 def toggle_40g_local(module):
     """
-    Method to toggle 40g ports to 10g ports.
+    Method to toggle 40g ports to 10g ports. All groups of four are planned
+    from one read of the port tables and converted together, see
+    pn_breakout.
     :param module: The Ansible module to fetch input parameters.
     :return: The output messages for assignment.
     """
     output = ''
     cli = pn_cli(module)
-    clicopy = cli
-    cli += ' lldp-show format local-port no-show-headers '
-    local_ports = run_cli(module, cli).split()
+    groups = plan_breakout(*breakout_snapshot(module, cli))
+    for message, command in breakout_commands(groups):
+        output += message
+        output += run_cli(module, cli + command)
 
-    cli = clicopy
-    cli += ' port-config-show speed 40g '
-    cli += ' format port no-show-headers '
-    ports_40g = run_cli(module, cli)
-    if len(ports_40g) > 0 and ports_40g != 'Success':
-        ports_40g = ports_40g.split()
-        ports_to_modify = list(set(ports_40g) - set(local_ports))
-
-        for port in ports_to_modify:
-            next_port = str(int(port) + 1)
-            cli = clicopy
-            cli += ' port-show port %s format bezel-port' % next_port
-            cli += ' no-show-headers'
-            bezel_port = run_cli(module, cli).split()[0]
-
-            if '.2' in bezel_port:
-                end_port = int(port) + 3
-                range_port = port + '-' + str(end_port)
-    
-                cli = clicopy
-                cli += ' port-config-modify port %s ' % port
-                cli += ' disable '
-                output += 'port ' + port + ' disabled'
-                output += run_cli(module, cli)
-    
-                cli = clicopy
-                cli += ' port-config-modify port %s ' % port
-                cli += ' speed 10g '
-                output += 'port ' + port + ' converted to 10g'
-                output += run_cli(module, cli)
-    
-                cli = clicopy
-                cli += ' port-config-modify port %s ' % range_port
-                cli += ' enable '
-                output += 'port range_port ' + range_port + '  enabled'
-                output += run_cli(module, cli)
-
-        time.sleep(10)
+    if groups and not module.check_mode:
+        if wait_breakout(module, cli, groups) is None:
+            output += 'ports %s are not up yet ' % port_ranges(groups)
 
     return output
 
+
 def main():
     """ This section is for arguments parsing """
     module = AnsibleModule(
         argument_spec=dict(
             pn_cliusername=dict(required=False, type='str'),
             pn_clipassword=dict(required=False, type='str', no_log=True),
+            pn_fabric_facts=dict(required=False, type='dict'),
             pn_fabric_name=dict(required=True, type='str'),
             pn_spine_list=dict(required=True, type='list'),
             pn_leaf_list=dict(required=True, type='list'),
@@ -779,45 +713,54 @@ def main():
                               default='172.16.0.0/24'),
             pn_current_switch=dict(required=True, type='str'),
             pn_bgp_as_range=dict(required=False, type='str', default='65000'),
+            pn_bgp_as_map=dict(required=False, type='dict'),
             pn_bgp_ip=dict(required=False, type='str', default='100.1.1.0/24'),
             pn_eula=dict(required=True, type='bool'),
             pn_bgp_redistribute=dict(required=False, type='str', default='connected'),
             pn_bgp_max_path=dict(required=False, type='str', default='16'),
             pn_csv_data=dict(required=True, type='str'),
             pn_toggle_40g=dict(required=False, type='bool', default=True),
-        )
+        ),
+        supports_check_mode=True
     )
 
     current_switch = module.params['pn_current_switch']
     eula_flag = module.params['pn_eula']
     toggle_40g_flag = module.params['pn_toggle_40g']
-    message = ''
-    global CHANGED_FLAG
+    global CHANGED_FLAG, EVENTS
     CHANGED_FLAG = []
+    EVENTS = ChangeEvents()
 
     if eula_flag:
         # Auto accept EULA
         if 'Setup completed successfully' in auto_accept_eula(module):
-            message += ' %s: EULA accepted \n' % current_switch
+            EVENTS.changed(current_switch, 'switch-setup', 'eula', 'enable',
+                           'EULA accepted')
             CHANGED_FLAG.append(True)
         else:
-            message += ' %s: EULA has already been accepted \n' % current_switch
+            EVENTS.unchanged(current_switch, 'switch-setup', 'eula',
+                             'EULA has already been accepted')
     
         # Update switch names to match host names from hosts file
         if 'Updated' in update_switch_names(module, current_switch):
-            message += ' %s: Updated switch name \n ' % current_switch
+            EVENTS.changed(current_switch, 'switch-setup', 'switch-name',
+                           'modify', 'Updated switch name')
             CHANGED_FLAG.append(True)
     
         # Toggle 40g ports to 10g
         if toggle_40g_flag:
             if toggle_40g_local(module):
-                message += ' %s: Toggled 40G ports to 10G \n' % current_switch
+                EVENTS.changed(current_switch, 'port-config', '', 'modify',
+                               'Toggled 40G ports to 10G')
                 CHANGED_FLAG.append(True)
     else:
-        message += configure_fabric_over_l3(module)
+        configure_fabric_over_l3(module)
 
     module.exit_json(
-        stdout=message,
+        plan=command_plan(),
+        cli_stats=cli_stats(),
+        events=EVENTS.events,
+        stdout=EVENTS.text(),
         error='0',
         failed=False,
         changed=True
@@ -825,7 +768,16 @@ def main():
 
 # AnsibleModule boilerplate
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_bgp_plan import (configured_as_map, load_as_map,
+                                                plan_bgp_as)
+from ansible.module_utils.pn_breakout import (breakout_commands,
+                                              breakout_snapshot,
+                                              plan_breakout, port_ranges,
+                                              wait_breakout)
+from ansible.module_utils.pn_events import ChangeEvents
+from ansible.module_utils.pn_nvos import cli_stats, command_plan, run_command
+from ansible.module_utils.pn_profile import run_main
 
 if __name__ == '__main__':
-    main()
+    run_main(main)
 
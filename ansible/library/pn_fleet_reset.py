@@ -0,0 +1,277 @@
+#!/usr/bin/python
+""" PN Fleet Switch Config Reset """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import shlex
+import threading
+import time
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_nvos import cli_prefix, shell_quote
+from ansible.module_utils.pn_profile import run_main
+from ansible.module_utils.pn_reset import (NVOS_STATUS, RESET_JUST,
+                                           ReadyTimes, nvos_online,
+                                           reset_outcome, wait_ready)
+
+DOCUMENTATION = """
+---
+module: pn_fleet_reset
+author: 'Pluribus Networks (devops@pluribusnetworks.com)'
+short_description: Reset a fleet of switches and wait for nvOSd.
+description:
+    Runs switch-config-reset over ssh on many switches at once, up to
+    pn_wave_size switches at a time, and polls every reset switch until
+    nvOSd is back online; the next switch is reset as soon as one is ready.
+    Polls back off from pn_poll_interval up to pn_poll_max_interval; later
+    switches wait out most of the time the earlier ones needed before they
+    start polling. Returns the time to ready of each switch. Run it from the
+    controller (localhost) with ssh keys deployed on the switches (see
+    pn_autossh).
+options:
+    pn_cliusername:
+      description:
+        - Provide login username if user is not root.
+      required: False
+      type: str
+    pn_clipassword:
+      description:
+        - Provide login password if user is not root.
+      required: False
+      type: str
+    pn_switches:
+      description:
+        - List of switches to reset.
+      required: True
+      type: list
+    pn_switch_hosts:
+      description:
+        - Dictionary of switch name to the address to ssh to. Switches not
+          in it are reached by their name.
+      required: False
+      type: dict
+    pn_ssh_user:
+      description:
+        - User to ssh to the switches as.
+      required: False
+      type: str
+    pn_wave_size:
+      description:
+        - Maximum number of switches reset concurrently.
+      required: False
+      default: 8
+      type: int
+    pn_ready_timeout:
+      description:
+        - Seconds to wait for nvOSd of a switch after its reset.
+      required: False
+      default: 900
+      type: int
+    pn_poll_interval:
+      description:
+        - Initial seconds between readiness polls.
+      required: False
+      default: 2
+      type: int
+    pn_poll_max_interval:
+      description:
+        - Maximum seconds between readiness polls.
+      required: False
+      default: 30
+      type: int
+"""
+
+EXAMPLES = """
+- name: Reset all switches
+  pn_fleet_reset:
+    pn_cliusername: "{{ USERNAME }}"
+    pn_clipassword: "{{ PASSWORD }}"
+    pn_switches: "{{ groups['all'] }}"
+    pn_switch_hosts: "{{ switch_hosts }}"
+    pn_wave_size: 8
+"""
+
+RETURN = """
+summary:
+  description: The outcome of the reset of each switch.
+  returned: always
+  type: list
+time_to_ready:
+  description: Dictionary of switch to the seconds from its reset until
+    nvOSd was back online, null if it did not come back.
+  returned: always
+  type: dict
+msg:
+  description: String describing if the fleet reset was successful or not.
+  returned: always
+  type: str
+changed:
+  description: Indicates whether the CLI caused changes on the target.
+  returned: always
+  type: bool
+failed:
+  description: Indicates whether or not the execution failed on the target.
+  returned: always
+  type: bool
+"""
+
+
+def ssh_command(module, switch, command):
+    """
+    Method to build the ssh invocation of a command on a switch.
+    :param module: The Ansible module to fetch input parameters.
+    :param switch: Name of the switch.
+    :param command: List of the command words to run on the switch.
+    :return: The ssh argv.
+    """
+    host = (module.params['pn_switch_hosts'] or {}).get(switch, switch)
+    if module.params['pn_ssh_user']:
+        host = '%s@%s' % (module.params['pn_ssh_user'], host)
+    return ['ssh', '-o', 'BatchMode=yes', '-o', 'ConnectTimeout=10', host,
+            ' '.join(shell_quote(word) for word in command)]
+
+
+def reset_switch(module, switch, ready_times, results):
+    """
+    Method to reset a switch and wait until nvOSd is back online.
+    :param module: The Ansible module to fetch input parameters.
+    :param switch: Name of the switch.
+    :param ready_times: ReadyTimes shared by the fleet.
+    :param results: Dictionary the result of the switch is stored in.
+    """
+    cli = cli_prefix(module) + ' --no-login-prompt switch-config-reset '
+    started = time.time()
+    rc, out, err = module.run_command(ssh_command(module, switch,
+                                                  shlex.split(cli)))
+    outcome, changed = reset_outcome(rc, out, err)
+    result = {'switch': switch, 'changed': changed, 'failed': True,
+              'time_to_ready': None}
+    results[switch] = result
+    if outcome is None:
+        result['output'] = 'Operation Failed: ' + err.strip()
+        return
+
+    if changed or outcome == RESET_JUST:
+        result['time_to_ready'] = wait_ready(
+            lambda: nvos_online(*module.run_command(
+                ssh_command(module, switch, NVOS_STATUS))),
+            module.params['pn_ready_timeout'],
+            module.params['pn_poll_interval'],
+            module.params['pn_poll_max_interval'],
+            ready_times=ready_times, started=started)
+        if result['time_to_ready'] is None:
+            result['output'] = 'nvOSd did not come back online'
+            return
+        outcome += ' Ready after %d seconds.' % result['time_to_ready']
+
+    result['failed'] = False
+    result['output'] = outcome
+
+
+def reset_fleet(module):
+    """
+    Method to reset the switches, pn_wave_size at a time. A bounded pool of
+    threads picks the switches up in order, so the next switch is reset as
+    soon as one is ready, not once the slowest switch of a wave is.
+    :param module: The Ansible module to fetch input parameters.
+    :return: Dictionary of switch: result.
+    """
+    switches = module.params['pn_switches']
+    workers = max(module.params['pn_wave_size'], 1)
+    ready_times = ReadyTimes()
+    results = {}
+    pending = list(switches)
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                if not pending:
+                    return
+                switch = pending.pop(0)
+            reset_switch(module, switch, ready_times, results)
+
+    threads = [threading.Thread(target=worker)
+               for _ in range(min(workers, len(switches)))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def main():
+    """ This section is for arguments parsing """
+    module = AnsibleModule(
+        argument_spec=dict(
+            pn_cliusername=dict(required=False, type='str'),
+            pn_clipassword=dict(required=False, type='str', no_log=True),
+            pn_switches=dict(required=True, type='list'),
+            pn_switch_hosts=dict(required=False, type='dict'),
+            pn_ssh_user=dict(required=False, type='str'),
+            pn_wave_size=dict(required=False, type='int', default=8),
+            pn_ready_timeout=dict(required=False, type='int', default=900),
+            pn_poll_interval=dict(required=False, type='int', default=2),
+            pn_poll_max_interval=dict(required=False, type='int',
+                                      default=30),
+        ),
+        supports_check_mode=True
+    )
+
+    switches = module.params['pn_switches']
+    if module.check_mode:
+        module.exit_json(
+            summary=[{'switch': switch, 'output': 'Would be reset.'}
+                     for switch in switches],
+            time_to_ready={},
+            failed=False,
+            changed=bool(switches),
+            task='Reset all switches',
+            msg='Check mode, no switch was reset.'
+        )
+
+    results = reset_fleet(module)
+    summary = [dict(switch=switch, output=results[switch]['output'])
+               for switch in switches]
+    time_to_ready = dict((switch, results[switch]['time_to_ready'])
+                         for switch in switches)
+    failed = [switch for switch in switches if results[switch]['failed']]
+    changed = any(results[switch]['changed'] for switch in switches)
+
+    if failed:
+        module.fail_json(
+            summary=summary,
+            time_to_ready=time_to_ready,
+            changed=changed,
+            task='Reset all switches',
+            msg='Reset failed on %s' % ', '.join(failed)
+        )
+
+    module.exit_json(
+        summary=summary,
+        time_to_ready=time_to_ready,
+        failed=False,
+        changed=changed,
+        exception='',
+        task='Reset all switches',
+        msg='Fleet config reset completed successfully.'
+    )
+
+
+if __name__ == '__main__':
+    run_main(main)
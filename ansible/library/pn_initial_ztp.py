@@ -19,9 +19,15 @@
 #
 
 import shlex
-import time
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_breakout import (breakout_commands,
+                                              plan_breakout, port_ranges,
+                                              wait_breakout)
+from ansible.module_utils.pn_events import ChangeEvents
+from ansible.module_utils.pn_nvos import cli_stats, run_command
+from ansible.module_utils.pn_local_state import LocalState
+from ansible.module_utils.pn_profile import run_main
 
 DOCUMENTATION = """
 ---
@@ -174,9 +180,20 @@ failed:
   description: Indicates whether or not the execution failed on the target.
   returned: always
   type: bool
+cli_stats:
+  description: Calls made to the switches (a batch counts once), the commands
+    they carried, the bytes of output and the seconds spent waiting on them.
+  returned: always
+  type: dict
+events:
+  description: Change events (switch, object, key, action, result, msg), in
+    the order they happened.
+  returned: always
+  type: list
 """
 
 CHANGED_FLAG = []
+EVENTS = ChangeEvents()
 
 
 def pn_cli(module):
@@ -205,7 +222,7 @@ def run_cli(module, cli):
     :return: Output/Error or Success msg depending upon the response from cli.
     """
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_command(module, cli)
     if out:
         return out
 
@@ -230,7 +247,7 @@ def auto_accept_eula(module):
     password = module.params['pn_clipassword']
     cli = ' /usr/bin/cli --quiet --skip-setup eula-show '
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_command(module, cli)
 
     if err:
         cli = '/usr/bin/cli --quiet'
@@ -242,21 +259,21 @@ def auto_accept_eula(module):
         return ' EULA has been accepted already '
 
 
-def update_switch_names(module, switch_name):
+def update_switch_names(module, switch_name, state):
     """
     Method to update switch names.
     :param module: The Ansible module to fetch input parameters.
     :param switch_name: Name to assign to the switch.
+    :param state: The LocalState of the switch.
     :return: String describing switch name got modified or not.
     """
-    cli = pn_cli(module)
-    cli += ' switch-setup-show format switch-name '
-    if switch_name in run_cli(module, cli).split()[1]:
+    if switch_name in state.setup.get('switch-name', ''):
         return ' Switch name is same as hostname! '
     else:
         cli = pn_cli(module)
         cli += ' switch-setup-modify switch-name ' + switch_name
         run_cli(module, cli)
+        state.setup['switch-name'] = switch_name
         return ' Updated switch name to match hostname! '
 
 
@@ -264,7 +281,6 @@ def make_switch_setup_static(module):
     """
     Method to assign static values to different switch setup parameters.
     :param module: The Ansible module to fetch input parameters.
-    :return: String describing modified switch setup values.
     """
     global CHANGED_FLAG
     switch = module.params['pn_current_switch']
@@ -277,75 +293,69 @@ def make_switch_setup_static(module):
     ntp_server = module.params['pn_ntp_server']
     cli = pn_cli(module)
     cli += ' switch-setup-modify '
-    output = ''
+    modified = []
 
     if mgmt_ip and mgmt_ip_subnet:
-        ip = mgmt_ip + '/' + mgmt_ip_subnet
-        cli += ' mgmt-ip ' + ip
-        output += ' %s: Modified switch mgmt-ip to %s \n' % (switch, ip)
+        modified.append(('mgmt-ip', mgmt_ip + '/' + mgmt_ip_subnet))
 
     if gateway_ip:
-        cli += ' gateway-ip ' + gateway_ip
-        output += ' %s: Modified switch gateway-ip to %s \n' % (switch,
-                                                                gateway_ip)
+        modified.append(('gateway-ip', gateway_ip))
 
     if dns_ip:
-        cli += ' dns-ip ' + dns_ip
-        output += ' %s: Modified switch dns-ip to %s \n' % (switch, dns_ip)
+        modified.append(('dns-ip', dns_ip))
 
     if dns_secondary_ip:
-        cli += ' dns-secondary-ip ' + dns_secondary_ip
-        output += ' %s: Modified switch dns-secondary-ip to %s \n' % (
-            switch, dns_secondary_ip
-        )
+        modified.append(('dns-secondary-ip', dns_secondary_ip))
 
     if domain_name:
-        cli += ' domain-name ' + domain_name
-        output += ' %s: Modified switch domain-name to %s \n' % (switch,
-                                                                 domain_name)
+        modified.append(('domain-name', domain_name))
 
     if ntp_server:
-        cli += ' ntp-server ' + ntp_server
-        output += ' %s: Modified switch ntp-server to %s \n' % (switch,
-                                                                ntp_server)
+        modified.append(('ntp-server', ntp_server))
 
-    clicopy = cli
-    if clicopy.split('switch-setup-modify')[1] != ' ':
+    if modified:
+        for key, value in modified:
+            cli += ' %s %s ' % (key, value)
         run_cli(module, cli)
         CHANGED_FLAG.append(True)
-
-    return output
+        for key, value in modified:
+            EVENTS.changed(switch, 'switch-setup', key, 'modify',
+                           'Modified switch %s to %s' % (key, value))
 
 
-def modify_stp_local(module, modify_flag):
+def modify_stp_local(module, modify_flag, state):
     """
     Method to enable/disable STP (Spanning Tree Protocol) on a switch.
     :param module: The Ansible module to fetch input parameters.
     :param modify_flag: Enable/disable flag to set.
+    :param state: The LocalState of the switch.
     :return: The output of run_cli() method.
     """
-    cli = pn_cli(module)
-    cli += ' switch-local stp-show format enable '
-    current_state = run_cli(module, cli).split()[1]
-
-    if current_state == 'yes':
+    if state.stp == 'yes':
         cli = pn_cli(module)
         cli += ' switch-local stp-modify ' + modify_flag
-        return run_cli(module, cli)
+        out = run_cli(module, cli)
+        state.stp = 'yes' if modify_flag == 'enable' else 'no'
+        return out
     else:
         return ' Already modified '
 
 
-def configure_control_network(module, network):
+def configure_control_network(module, network, state):
     """
     Method to configure the fabric control network.
     :param module: The Ansible module to fetch input parameters.
     :param network: It can be in-band or management.
+    :param state: The LocalState of the switch.
     :return: The output of run_cli() method.
     """
-    cli = pn_cli(module)
-    cli += ' fabric-info format control-network '
-    current_control_network = run_cli(module, cli).split()[1]
+    if state.fabric is None:
+        # The fabric was just created or joined, ask for its settings.
+        cli = pn_cli(module)
+        cli += ' fabric-info format control-network '
+        current_control_network = run_cli(module, cli).split()[1]
+    else:
+        current_control_network = state.fabric.get('control-network')
 
     if current_control_network != network:
         cli = pn_cli(module)
@@ -355,86 +365,60 @@ def configure_control_network(module, network):
         return ' Already configured '
 
 
-def enable_ports(module):
+def enable_ports(module, state):
     """
     Method to enable all ports of a switch.
     :param module: The Ansible module to fetch input parameters.
+    :param state: The LocalState of the switch.
     :return: The output of run_cli() method or None.
     """
-    cli = pn_cli(module)
-    clicopy = cli
-    cli += ' switch-local port-config-show format enable no-show-headers '
-    if 'off' in run_cli(module, cli).split():
-        cli = clicopy
-        cli += ' switch-local port-config-show format port no-show-headers '
-        out = run_cli(module, cli)
-
-        cli = clicopy
-        cli += ' switch-local port-config-show format port speed 40g '
-        cli += ' no-show-headers '
-        out_40g = run_cli(module, cli)
+    if state.ports_with('enable', 'off'):
         out_remove10g = []
+        for port_number in state.ports_with('speed', '40g'):
+            out_remove10g.append(str(int(port_number) + int(1)))
+            out_remove10g.append(str(int(port_number) + int(2)))
+            out_remove10g.append(str(int(port_number) + int(3)))
 
-        if len(out_40g) > 0 and out_40g != 'Success':
-            out_40g = out_40g.split()
-            out_40g = list(set(out_40g))
-            if len(out_40g) > 0:
-                for port_number in out_40g:
-                    out_remove10g.append(str(int(port_number) + int(1)))
-                    out_remove10g.append(str(int(port_number) + int(2)))
-                    out_remove10g.append(str(int(port_number) + int(3)))
-
+        out = [row['port'] for row in state.ports
+               if row['port'] not in out_remove10g]
         if out:
-            out = out.split()
-            out = set(out) - set(out_remove10g)
-            out = list(out)
-            if out:
-                ports = ','.join(out)
-                cli = clicopy
-                cli += ' switch-local port-config-modify port %s enable ' % (
-                    ports)
-                return run_cli(module, cli)
+            ports = ','.join(out)
+            cli = pn_cli(module)
+            cli += ' switch-local port-config-modify port %s enable ' % (
+                ports)
+            output = run_cli(module, cli)
+            state.set_ports(out, 'enable', 'on')
+            return output
     else:
         return None
 
 
-def create_or_join_fabric(module, fabric_name, fabric_network):
+def create_or_join_fabric(module, fabric_name, fabric_network, state):
     """
     Method to create/join a fabric with default fabric type as mgmt.
     :param module: The Ansible module to fetch input parameters.
     :param fabric_name: Name of the fabric to create/join.
     :param fabric_network: Type of the fabric to create (mgmt/in-band).
     Default value: mgmt
+    :param state: The LocalState of the switch.
     :return: The output of run_cli() method.
     """
     cli = pn_cli(module)
     clicopy = cli
 
-    cli += ' fabric-show format name no-show-headers '
-    existing_fabrics = run_cli(module, cli).split()
-
-    if fabric_name not in existing_fabrics:
+    if fabric_name not in state.fabrics:
         cli = clicopy
         cli += ' fabric-create name ' + fabric_name
         cli += ' fabric-network ' + fabric_network
-    else:
+    elif state.fabric is None or state.fabric.get('name') not in state.fabrics:
         cli = clicopy
-        cli += ' fabric-info format name no-show-headers'
-        cli = shlex.split(cli)
-        rc, out, err = module.run_command(cli)
-
-        if err:
-            cli = clicopy
-            cli += ' fabric-join name ' + fabric_name
-        elif out:
-            present_fabric_name = out.split()
-            if present_fabric_name[1] not in existing_fabrics:
-                cli = clicopy
-                cli += ' fabric-join name ' + fabric_name
-            else:
-                return 'Switch already in the fabric'
+        cli += ' fabric-join name ' + fabric_name
+    else:
+        return 'Switch already in the fabric'
 
-    return run_cli(module, cli)
+    out = run_cli(module, cli)
+    state.fabric = None
+    return out
 
 
 def enable_web_api(module):
@@ -447,66 +431,34 @@ def enable_web_api(module):
     run_cli(module, cli)
 
 
-def toggle_40g_local(module):
+def toggle_40g_local(module, state):
     """
-    Method to toggle 40g ports to 10g ports.
+    Method to toggle 40g ports to 10g ports. All groups of four are planned
+    from the local state and converted together, see pn_breakout.
     :param module: The Ansible module to fetch input parameters.
+    :param state: The LocalState of the switch.
     :return: The output messages for assignment.
     """
     output = ''
-    cli = pn_cli(module)
-    clicopy = cli
-    cli += ' switch-local lldp-show format local-port no-show-headers '
-    local_ports = run_cli(module, cli).split()
-
-    cli = clicopy
-    cli += ' switch-local port-config-show speed 40g '
-    cli += ' format port no-show-headers '
-    ports_40g = run_cli(module, cli)
-    if len(ports_40g) > 0 and ports_40g != 'Success':
-        ports_40g = ports_40g.split()
-        ports_to_modify = list(set(ports_40g) - set(local_ports))
-
-        for port in ports_to_modify:
-            next_port = str(int(port) + 1)
-            cli = clicopy
-            cli += ' switch-local'
-            cli += ' port-show port %s format bezel-port' % next_port
-            cli += ' no-show-headers'
-            bezel_port = run_cli(module, cli).split()[0]
-
-            if '.2' in bezel_port:
-                end_port = int(port) + 3
-                range_port = port + '-' + str(end_port)
-
-                cli = clicopy
-                cli += ' switch-local port-config-modify port %s ' % port
-                cli += ' disable '
-                output += 'port ' + port + ' disabled'
-                output += run_cli(module, cli)
-
-                cli = clicopy
-                cli += ' switch-local port-config-modify port %s ' % port
-                cli += ' speed 10g '
-                output += 'port ' + port + ' converted to 10g'
-                output += run_cli(module, cli)
-
-                cli = clicopy
-                cli += ' switch-local port-config-modify port %s ' % range_port
-                cli += ' enable '
-                output += 'port range_port ' + range_port + '  enabled'
-                output += run_cli(module, cli)
-
-        time.sleep(10)
+    cli = pn_cli(module) + ' switch-local '
+    groups = plan_breakout(state.ports, state.bezel, state.lldp_ports)
+    for message, command in breakout_commands(groups):
+        output += message
+        output += run_cli(module, cli + command)
+
+    if groups:
+        state.set_ports([str(port) for port in groups], 'speed', '10g')
+        if wait_breakout(module, cli, groups) is None:
+            output += 'ports %s are not up yet ' % port_ranges(groups)
 
     return output
 
 
-def assign_inband_ip(module):
+def assign_inband_ip(module, state):
     """
     Method to assign in-band ips to switches.
     :param module: The Ansible module to fetch input parameters.
-    :return: String describing in-band ip got assigned or not.
+    :param state: The LocalState of the switch.
     """
     global CHANGED_FLAG
     address = module.params['pn_inband_ip'].split('.')
@@ -531,23 +483,24 @@ def assign_inband_ip(module):
         ip = static_part + str(ip_count) + '/' + subnet
 
         # Get existing in-band ip.
-        cli = pn_cli(module)
-        clicopy = cli
-        cli += ' switch-local switch-setup-show format in-band-ip '
-        existing_inband_ip = run_cli(module, cli)
+        existing_inband_ip = state.setup.get('in-band-ip', '')
 
         if ip not in existing_inband_ip:
-            cli = clicopy
+            cli = pn_cli(module)
             cli += ' switch-local switch-setup-modify '
             cli += ' in-band-ip ' + ip
             run_cli(module, cli)
+            state.setup['in-band-ip'] = ip
             CHANGED_FLAG.append(True)
-            return ' %s: Assigned in-band ip %s \n' % (switch, ip)
+            EVENTS.changed(switch, 'switch-setup', 'in-band-ip', 'modify',
+                           'Assigned in-band ip %s' % ip)
         else:
-            return ' %s: In-band ip %s has been already assigned \n' % (switch,
-                                                                        ip)
+            EVENTS.unchanged(switch, 'switch-setup', 'in-band-ip',
+                             'In-band ip %s has been already assigned' % ip)
+        return
 
-    return ' %s: Could not assign in-band ip \n' % switch
+    EVENTS.add(switch, 'switch-setup', 'in-band-ip', 'modify', 'failed',
+               'Could not assign in-band ip')
 
 
 def main():
@@ -587,83 +540,94 @@ def main():
     control_network = module.params['pn_fabric_control_network']
     toggle_40g_flag = module.params['pn_toggle_40g']
     current_switch = module.params['pn_current_switch']
-    message = ''
     global CHANGED_FLAG
 
     # Auto accept EULA
     if 'Setup completed successfully' in auto_accept_eula(module):
-        message += ' %s: EULA accepted \n' % current_switch
+        EVENTS.changed(current_switch, 'switch-setup', 'eula', 'enable',
+                       'EULA accepted')
         CHANGED_FLAG.append(True)
     else:
-        message += ' %s: EULA has already been accepted \n' % current_switch
+        EVENTS.unchanged(current_switch, 'switch-setup', 'eula',
+                         'EULA has already been accepted')
+
+    # Read the local state all following steps decide on, in one go.
+    state = LocalState(module, pn_cli(module))
 
     # Update switch names to match host names from hosts file
-    if 'Updated' in update_switch_names(module, current_switch):
+    if 'Updated' in update_switch_names(module, current_switch, state):
         CHANGED_FLAG.append(True)
 
     # Make switch setup static
     if module.params['pn_static_setup']:
-        output = make_switch_setup_static(module)
-        if output != '':
-            message += output
+        make_switch_setup_static(module)
 
     # Create/join fabric
     if 'already in the fabric' in create_or_join_fabric(module, fabric_name,
-                                                        fabric_network):
-        message += ' %s: Already a part of fabric %s \n' % (current_switch,
-                                                            fabric_name)
+                                                        fabric_network, state):
+        EVENTS.unchanged(current_switch, 'fabric', fabric_name,
+                         'Already a part of fabric %s' % fabric_name)
     else:
-        message += ' %s: Joined fabric %s \n' % (current_switch,
-                                                 fabric_name)
+        EVENTS.changed(current_switch, 'fabric', fabric_name, 'modify',
+                       'Joined fabric %s' % fabric_name)
         CHANGED_FLAG.append(True)
 
     # Configure fabric control network to either mgmt or in-band
-    if 'Success' in configure_control_network(module, control_network):
-        message += ' %s: Configured fabric control network to %s \n' % (
-            current_switch, control_network)
+    if 'Success' in configure_control_network(module, control_network,
+                                              state):
+        EVENTS.changed(current_switch, 'fabric-network', control_network,
+                       'modify', 'Configured fabric control network to %s' %
+                       control_network)
         CHANGED_FLAG.append(True)
     else:
-        message += ' %s: Fabric is already in %s control network \n' % (
-            current_switch, control_network)
+        EVENTS.unchanged(current_switch, 'fabric-network', control_network,
+                         'Fabric is already in %s control network' %
+                         control_network)
 
     # Enable web api if flag is True
     if module.params['pn_web_api']:
         enable_web_api(module)
 
     # Disable STP
-    if 'Success' in modify_stp_local(module, 'disable'):
-        message += ' %s: STP disabled \n' % current_switch
+    if 'Success' in modify_stp_local(module, 'disable', state):
+        EVENTS.changed(current_switch, 'stp', '', 'disable', 'STP disabled')
         CHANGED_FLAG.append(True)
     else:
-        message += ' %s: STP is already disabled \n' % current_switch
+        EVENTS.unchanged(current_switch, 'stp', '', 'STP is already disabled')
 
     # Enable ports
-    if enable_ports(module):
-        message += ' %s: Ports enabled \n' % current_switch
+    if enable_ports(module, state):
+        EVENTS.changed(current_switch, 'port-config', '', 'enable',
+                       'Ports enabled')
         CHANGED_FLAG.append(True)
     else:
-        message += ' %s: Ports are already enabled \n' % current_switch
+        EVENTS.unchanged(current_switch, 'port-config', '',
+                         'Ports are already enabled')
 
     # Toggle 40g ports to 10g
     if toggle_40g_flag:
-        if toggle_40g_local(module):
-            message += ' %s: Toggled 40G ports to 10G \n' % current_switch
+        if toggle_40g_local(module, state):
+            EVENTS.changed(current_switch, 'port-config', '', 'modify',
+                           'Toggled 40G ports to 10G')
             CHANGED_FLAG.append(True)
 
     # Assign in-band ips.
-    message += assign_inband_ip(module)
+    assign_inband_ip(module, state)
 
     # Enable STP if flag is True
     if module.params['pn_stp']:
-        if 'Success' in modify_stp_local(module, 'enable'):
-            message += ' %s: STP enabled \n' % current_switch
+        if 'Success' in modify_stp_local(module, 'enable', state):
+            EVENTS.changed(current_switch, 'stp', '', 'enable', 'STP enabled')
             CHANGED_FLAG.append(True)
         else:
-            message += ' %s: STP is already enabled \n' % current_switch
+            EVENTS.unchanged(current_switch, 'stp', '',
+                             'STP is already enabled')
 
     # Exit the module and return the required JSON
     module.exit_json(
-        stdout=message,
+        cli_stats=cli_stats(),
+        events=EVENTS.events,
+        stdout=EVENTS.text(),
         error='0',
         failed=False,
         changed=True if True in CHANGED_FLAG else False
@@ -671,5 +635,5 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    run_main(main)
 
@@ -19,8 +19,13 @@
 #
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_breakout import (breakout_commands,
+                                              plan_breakout, port_ranges,
+                                              wait_breakout)
+from ansible.module_utils.pn_nvos import run_command
+from ansible.module_utils.pn_local_state import LocalState
+from ansible.module_utils.pn_profile import run_main
 import shlex
-import time
 
 DOCUMENTATION = """
 ---
@@ -206,7 +211,7 @@ def run_cli(module, cli):
     task = 'Accept EULA, Disable STP, enable ports and create/join fabric'
     results = []
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_command(module, cli)
 
     if out:
         return out
@@ -239,7 +244,7 @@ def auto_accept_eula(module):
     password = module.params['pn_clipassword']
     cli = ' /usr/bin/cli --quiet --skip-setup eula-show '
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_command(module, cli)
 
     if err:
         cli = '/usr/bin/cli --quiet'
@@ -251,21 +256,21 @@ def auto_accept_eula(module):
         return ' EULA has been accepted already '
 
 
-def update_switch_names(module, switch_name):
+def update_switch_names(module, switch_name, state):
     """
     Method to update switch names.
     :param module: The Ansible module to fetch input parameters.
     :param switch_name: Name to assign to the switch.
+    :param state: The LocalState of the switch.
     :return: String describing switch name got modified or not.
     """
-    cli = pn_cli(module)
-    cli += ' switch-setup-show format switch-name '
-    if switch_name in run_cli(module, cli).split()[1]:
+    if switch_name in state.setup.get('switch-name', ''):
         return ' Switch name is same as hostname! '
     else:
         cli = pn_cli(module)
         cli += ' switch-setup-modify switch-name ' + switch_name
         run_cli(module, cli)
+        state.setup['switch-name'] = switch_name
         return ' Updated switch name to match hostname! '
 
 
@@ -308,35 +313,39 @@ def make_switch_setup_static(module):
         run_cli(module, cli)
 
 
-def modify_stp_local(module, modify_flag):
+def modify_stp_local(module, modify_flag, state):
     """
     Method to enable/disable STP (Spanning Tree Protocol) on a switch.
     :param module: The Ansible module to fetch input parameters.
     :param modify_flag: Enable/disable flag to set.
+    :param state: The LocalState of the switch.
     :return: The output of run_cli() method.
     """
-    cli = pn_cli(module)
-    cli += ' switch-local stp-show format enable '
-    current_state = run_cli(module, cli).split()[1]
-
-    if current_state == 'yes':
+    if state.stp == 'yes':
         cli = pn_cli(module)
         cli += ' switch-local stp-modify ' + modify_flag
-        return run_cli(module, cli)
+        out = run_cli(module, cli)
+        state.stp = 'yes' if modify_flag == 'enable' else 'no'
+        return out
     else:
         return ' Already modified '
 
 
-def configure_control_network(module, network):
+def configure_control_network(module, network, state):
     """
     Method to configure the fabric control network.
     :param module: The Ansible module to fetch input parameters.
     :param network: It can be in-band or management.
+    :param state: The LocalState of the switch.
     :return: The output of run_cli() method.
     """
-    cli = pn_cli(module)
-    cli += ' fabric-info format control-network '
-    current_control_network = run_cli(module, cli).split()[1]
+    if state.fabric is None:
+        # The fabric was just created or joined, ask for its settings.
+        cli = pn_cli(module)
+        cli += ' fabric-info format control-network '
+        current_control_network = run_cli(module, cli).split()[1]
+    else:
+        current_control_network = state.fabric.get('control-network')
 
     if current_control_network != network:
         cli = pn_cli(module)
@@ -346,86 +355,60 @@ def configure_control_network(module, network):
         return ' Already configured '
 
 
-def enable_ports(module):
+def enable_ports(module, state):
     """
     Method to enable all ports of a switch.
     :param module: The Ansible module to fetch input parameters.
+    :param state: The LocalState of the switch.
     :return: The output of run_cli() method or None.
     """
-    cli = pn_cli(module)
-    clicopy = cli
-    cli += ' switch-local port-config-show format enable no-show-headers '
-    if 'off' in run_cli(module, cli).split():
-        cli = clicopy
-        cli += ' switch-local port-config-show format port no-show-headers '
-        out = run_cli(module, cli)
-
-        cli = clicopy
-        cli += ' switch-local port-config-show format port speed 40g '
-        cli += ' no-show-headers '
-        out_40g = run_cli(module, cli)
+    if state.ports_with('enable', 'off'):
         out_remove10g = []
+        for port_number in state.ports_with('speed', '40g'):
+            out_remove10g.append(str(int(port_number) + int(1)))
+            out_remove10g.append(str(int(port_number) + int(2)))
+            out_remove10g.append(str(int(port_number) + int(3)))
 
-        if len(out_40g) > 0 and out_40g != 'Success':
-            out_40g = out_40g.split()
-            out_40g = list(set(out_40g))
-            if len(out_40g) > 0:
-                for port_number in out_40g:
-                    out_remove10g.append(str(int(port_number) + int(1)))
-                    out_remove10g.append(str(int(port_number) + int(2)))
-                    out_remove10g.append(str(int(port_number) + int(3)))
-
+        out = [row['port'] for row in state.ports
+               if row['port'] not in out_remove10g]
         if out:
-            out = out.split()
-            out = set(out) - set(out_remove10g)
-            out = list(out)
-            if out:
-                ports = ','.join(out)
-                cli = clicopy
-                cli += ' switch-local port-config-modify port %s enable ' % (
-                    ports)
-                return run_cli(module, cli)
+            ports = ','.join(out)
+            cli = pn_cli(module)
+            cli += ' switch-local port-config-modify port %s enable ' % (
+                ports)
+            output = run_cli(module, cli)
+            state.set_ports(out, 'enable', 'on')
+            return output
     else:
         return None
 
 
-def create_or_join_fabric(module, fabric_name, fabric_network):
+def create_or_join_fabric(module, fabric_name, fabric_network, state):
     """
     Method to create/join a fabric with default fabric type as mgmt.
     :param module: The Ansible module to fetch input parameters.
     :param fabric_name: Name of the fabric to create/join.
     :param fabric_network: Type of the fabric to create (mgmt/in-band).
     Default value: mgmt
+    :param state: The LocalState of the switch.
     :return: The output of run_cli() method.
     """
     cli = pn_cli(module)
     clicopy = cli
 
-    cli += ' fabric-show format name no-show-headers '
-    existing_fabrics = run_cli(module, cli).split()
-
-    if fabric_name not in existing_fabrics:
+    if fabric_name not in state.fabrics:
         cli = clicopy
         cli += ' fabric-create name ' + fabric_name
         cli += ' fabric-network ' + fabric_network
-    else:
+    elif state.fabric is None or state.fabric.get('name') not in state.fabrics:
         cli = clicopy
-        cli += ' fabric-info format name no-show-headers'
-        cli = shlex.split(cli)
-        rc, out, err = module.run_command(cli)
-
-        if err:
-            cli = clicopy
-            cli += ' fabric-join name ' + fabric_name
-        elif out:
-            present_fabric_name = out.split()
-            if present_fabric_name[1] not in existing_fabrics:
-                cli = clicopy
-                cli += ' fabric-join name ' + fabric_name
-            else:
-                return 'Switch already in the fabric'
+        cli += ' fabric-join name ' + fabric_name
+    else:
+        return 'Switch already in the fabric'
 
-    return run_cli(module, cli)
+    out = run_cli(module, cli)
+    state.fabric = None
+    return out
 
 
 def enable_web_api(module):
@@ -438,65 +421,34 @@ def enable_web_api(module):
     run_cli(module, cli)
 
 
-def toggle_40g_local(module):
+def toggle_40g_local(module, state):
     """
-    Method to toggle 40g ports to 10g ports.
+    Method to toggle 40g ports to 10g ports. All groups of four are planned
+    from the local state and converted together, see pn_breakout.
     :param module: The Ansible module to fetch input parameters.
+    :param state: The LocalState of the switch.
     :return: The output messages for assignment.
     """
     output = ''
-    cli = pn_cli(module)
-    clicopy = cli
-    cli += ' switch-local lldp-show format local-port no-show-headers '
-    local_ports = run_cli(module, cli).split()
-
-    cli = clicopy
-    cli += ' switch-local port-config-show speed 40g '
-    cli += ' format port no-show-headers '
-    ports_40g = run_cli(module, cli)
-    if len(ports_40g) > 0 and ports_40g != 'Success':
-        ports_40g = ports_40g.split()
-        ports_to_modify = list(set(ports_40g) - set(local_ports))
-
-        for port in ports_to_modify:
-            next_port = str(int(port) + 1)
-            cli = clicopy
-            cli += ' switch-local'
-            cli += ' port-show port %s format bezel-port' % next_port
-            cli += ' no-show-headers'
-            bezel_port = run_cli(module, cli).split()[0]
-
-            if '.2' in bezel_port:
-                end_port = int(port) + 3
-                range_port = port + '-' + str(end_port)
-
-                cli = clicopy
-                cli += ' switch-local port-config-modify port %s ' % port
-                cli += ' disable '
-                output += 'port ' + port + ' disabled'
-                output += run_cli(module, cli)
-
-                cli = clicopy
-                cli += ' switch-local port-config-modify port %s ' % port
-                cli += ' speed 10g '
-                output += 'port ' + port + ' converted to 10g'
-                output += run_cli(module, cli)
-
-                cli = clicopy
-                cli += ' switch-local port-config-modify port %s ' % range_port
-                cli += ' enable '
-                output += 'port range_port ' + range_port + '  enabled'
-                output += run_cli(module, cli)
-
-        time.sleep(10)
+    cli = pn_cli(module) + ' switch-local '
+    groups = plan_breakout(state.ports, state.bezel, state.lldp_ports)
+    for message, command in breakout_commands(groups):
+        output += message
+        output += run_cli(module, cli + command)
+
+    if groups:
+        state.set_ports([str(port) for port in groups], 'speed', '10g')
+        if wait_breakout(module, cli, groups) is None:
+            output += 'ports %s are not up yet ' % port_ranges(groups)
 
     return output
 
 
-def assign_inband_ip(module):
+def assign_inband_ip(module, state):
     """
     Method to assign in-band ips to switches.
     :param module: The Ansible module to fetch input parameters.
+    :param state: The LocalState of the switch.
     :return: String describing in-band ip got assigned or not.
     """
     global CHANGED_FLAG
@@ -522,16 +474,14 @@ def assign_inband_ip(module):
         ip = static_part + str(ip_count) + '/' + subnet
 
         # Get existing in-band ip.
-        cli = pn_cli(module)
-        clicopy = cli
-        cli += ' switch-local switch-setup-show format in-band-ip '
-        existing_inband_ip = run_cli(module, cli)
+        existing_inband_ip = state.setup.get('in-band-ip', '')
 
         if ip not in existing_inband_ip:
-            cli = clicopy
+            cli = pn_cli(module)
             cli += ' switch-local switch-setup-modify '
             cli += ' in-band-ip ' + ip
             run_cli(module, cli)
+            state.setup['in-band-ip'] = ip
             CHANGED_FLAG.append(True)
             return 'Assigned in-band ip ' + ip
         else:
@@ -595,8 +545,11 @@ def main():
 
     results.append(json_msg)
 
+    # Read the local state all following steps decide on, in one go.
+    state = LocalState(module, pn_cli(module))
+
     # Update switch names to match host names from hosts file
-    if 'Updated' in update_switch_names(module, current_switch):
+    if 'Updated' in update_switch_names(module, current_switch, state):
         CHANGED_FLAG.append(True)
 
     # Make switch setup static
@@ -605,7 +558,7 @@ def main():
 
     # Create/join fabric
     if 'already in the fabric' in create_or_join_fabric(module, fabric_name,
-                                                        fabric_network):
+                                                        fabric_network, state):
         json_msg = {
             'switch': current_switch,
             'output': u'Already a part of fabric {}'.format(fabric_name)
@@ -623,7 +576,8 @@ def main():
     results.append(json_msg)
 
     # Configure fabric control network to either mgmt or in-band
-    if 'Success' in configure_control_network(module, control_network):
+    if 'Success' in configure_control_network(module, control_network,
+                                              state):
         json_msg = {
             'switch': current_switch,
             'output': u'Already a part of fabric {}'.format(control_network)
@@ -649,7 +603,7 @@ def main():
         enable_web_api(module)
 
     # Disable STP
-    if 'Success' in modify_stp_local(module, 'disable'):
+    if 'Success' in modify_stp_local(module, 'disable', state):
         json_msg = {
             'switch': current_switch,
             'output': 'STP disabled'
@@ -666,7 +620,7 @@ def main():
     results.append(json_msg)
 
     # Enable ports
-    if enable_ports(module):
+    if enable_ports(module, state):
         json_msg = {
             'switch': current_switch,
             'output': 'Ports enabled'
@@ -684,7 +638,7 @@ def main():
 
     # Toggle 40g ports to 10g
     if toggle_40g_flag:
-        if toggle_40g_local(module):
+        if toggle_40g_local(module, state):
             json_msg = {
                 'switch': current_switch,
                 'output': 'Toggled 40G ports to 10G'
@@ -694,7 +648,7 @@ def main():
             results.append(json_msg)
 
     # Assign in-band ips.
-    out = assign_inband_ip(module)
+    out = assign_inband_ip(module, state)
     json_msg = {
         'switch': current_switch,
         'output': out
@@ -704,7 +658,7 @@ def main():
 
     # Enable STP if flag is True
     if module.params['pn_stp']:
-        if 'Success' in modify_stp_local(module, 'enable'):
+        if 'Success' in modify_stp_local(module, 'enable', state):
             json_msg = {
                 'switch': current_switch,
                 'output': 'STP enabled'
@@ -732,5 +686,5 @@ def main():
     )
 
 if __name__ == '__main__':
-    main()
+    run_main(main)
 
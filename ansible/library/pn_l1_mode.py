@@ -119,7 +119,7 @@ def run_cli(module, cli):
     the response from cli.
     """
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_command(module, cli)
 
     if out:
         return out
@@ -259,7 +259,9 @@ def main():
 
 # AnsibleModule boilerplate
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_nvos import run_command
+from ansible.module_utils.pn_profile import run_main
 
 if __name__ == '__main__':
-    main()
+    run_main(main)
 
@@ -19,6 +19,11 @@
 #
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_fingerprint import Fingerprints
+from ansible.module_utils.pn_events import (ChangeEvents, events_result,
+                                            failure_result)
+from ansible.module_utils.pn_nvos import cli_stats, command_plan, run_command
+from ansible.module_utils.pn_profile import run_main
 import shlex
 
 DOCUMENTATION = """
@@ -40,6 +45,12 @@ options:
         - Provide login password if user is not root.
       required: False
       type: str
+    pn_fabric_facts:
+      description:
+        - pn_fabric fact gathered by pn_fabric_facts. While it is fresh,
+          the fabric discovery shows are answered from it.
+      required: False
+      type: dict
     pn_spine_list:
       description:
         - Specify list of Spine hosts.
@@ -62,6 +73,20 @@ options:
       required: False
       default: False
       type: bool
+    pn_fingerprint_file:
+      description:
+        - File to record per switch input and state digests in. Switches
+          unchanged since the last run are skipped.
+      required: False
+      type: str
+    pn_output:
+      description:
+        - Render the result as text (stdout) or as json (msg, summary and
+          task, as the former pn_l2_ztp_json).
+      required: False
+      default: text
+      choices: ['text', 'json']
+      type: str
 """
 
 EXAMPLES = """
@@ -76,8 +101,17 @@ EXAMPLES = """
 RETURN = """
 stdout:
   description: The set of responses for each command.
-  returned: always
+  returned: pn_output is text
   type: str
+summary:
+  description: It contains output of each configuration along with switch name.
+  returned: pn_output is json
+  type: list
+events:
+  description: Change events (switch, object, key, action, result, msg), in
+    the order they happened.
+  returned: always
+  type: list
 changed:
   description: Indicates whether the CLI caused changes on the target.
   returned: always
@@ -86,10 +120,31 @@ failed:
   description: Indicates whether or not the execution failed on the target.
   returned: always
   type: bool
+plan:
+  description: Commands which would be issued, per switch, when run in
+    check mode.
+  returned: check mode
+  type: dict
+cli_stats:
+  description: Calls made to the switches (a batch counts once), the commands
+    they carried, the bytes of output and the seconds spent waiting on them.
+  returned: always
+  type: dict
 """
 
 
 CHANGED_FLAG = []
+EVENTS = ChangeEvents()
+TASK = 'CLI command to configure L2 zero touch provisioning'
+
+# Tables configured by this module, digested per switch.
+STATE_SHOWS = (
+    ' cluster-show format name,cluster-node-1,cluster-node-2 ',
+    ' trunk-show format name,ports ',
+    ' vlag-show format name,port,peer-port ',
+    ' stp-show format enable ',
+    ' fabric-info format fabric-network ',
+)
 
 
 def pn_cli(module):
@@ -118,36 +173,43 @@ def run_cli(module, cli):
     :return: Output/Error or Success msg depending upon the response from cli.
     """
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_command(module, cli)
     if out:
         return out
 
     if err:
         module.exit_json(
-            error='1',
             failed=True,
-            stderr=err.strip(),
-            msg='Operation Failed: ' + str(cli),
-            changed=False
+            changed=False,
+            **failure_result(module, EVENTS, TASK,
+                             'L2 ZTP configuration failed', cli, err)
         )
     else:
         return 'Success'
 
 
-def modify_stp(module, modify_flag):
+def skipped(switch):
+    EVENTS.add(switch, 'switch', switch, 'skip', 'unchanged',
+               'Unchanged since last run, skipped')
+
+
+def modify_stp(module, modify_flag, fingerprints):
     """
     Method to enable/disable STP (Spanning Tree Protocol) on all switches.
     :param module: The Ansible module to fetch input parameters.
     :param modify_flag: Enable/disable flag to set.
-    :return: The output of run_cli() method.
+    :param fingerprints: Fingerprints of the switches.
     """
     global CHANGED_FLAG
-    output = ''
     cli = pn_cli(module)
     clicopy = cli
 
     for switch in (module.params['pn_spine_list'] +
                    module.params['pn_leaf_list']):
+        if fingerprints.unchanged(switch):
+            skipped(switch)
+            continue
+
         cli = clicopy
         cli += ' switch %s stp-show format enable ' % switch
         current_state = run_cli(module, cli).split()[1]
@@ -156,12 +218,10 @@ def modify_stp(module, modify_flag):
             cli += ' switch ' + switch
             cli += ' stp-modify ' + modify_flag
             if 'Success' in run_cli(module, cli):
-                output += ' %s: STP enabled \n' % switch
+                EVENTS.changed(switch, 'stp', switch, 'enable', 'STP enabled')
                 CHANGED_FLAG.append(True)
         else:
-            output += ' %s: STP is already enabled \n' % switch
-
-    return output
+            EVENTS.unchanged(switch, 'stp', switch, 'STP is already enabled')
 
 
 def create_cluster(module, switch, name, node1, node2):
@@ -172,7 +232,6 @@ def create_cluster(module, switch, name, node1, node2):
     :param name: The name of the cluster to create.
     :param node1: First node of the cluster.
     :param node2: Second node of the cluster.
-    :return: The output of run_cli() method.
     """
     global CHANGED_FLAG
     cli = pn_cli(module)
@@ -185,9 +244,10 @@ def create_cluster(module, switch, name, node1, node2):
         cli += ' cluster-node-1 %s cluster-node-2 %s ' % (node1, node2)
         if 'Success' in run_cli(module, cli):
             CHANGED_FLAG.append(True)
-            return ' %s: %s created successfully \n' % (switch, name)
+            EVENTS.changed(switch, 'cluster', name, 'create',
+                           '%s created successfully' % name)
     else:
-        return ' %s: %s already exists \n' % (switch, name)
+        EVENTS.unchanged(switch, 'cluster', name, '%s already exists' % name)
 
 
 def get_ports(module, switch, peer_switch):
@@ -211,12 +271,10 @@ def create_trunk(module, switch, name, ports):
     :param switch: Name of the local switch.
     :param name: The name of the trunk to create.
     :param ports: List of connected ports.
-    :return: The output of run_cli() method.
     """
     global CHANGED_FLAG
     cli = pn_cli(module)
     clicopy = cli
-    msg  = ''
     cli += ' switch %s trunk-show format name no-show-headers ' % switch
     trunk_list = run_cli(module, cli).split()
     if name not in trunk_list:
@@ -226,9 +284,11 @@ def create_trunk(module, switch, name, ports):
         cli += ' ports %s ' % ports_string
         run_cli(module, cli)
         CHANGED_FLAG.append(True)
-        return ' %s: %s trunk created successfully \n' % (switch, name)
+        EVENTS.changed(switch, 'trunk', name, 'create',
+                       '%s trunk created successfully' % name)
     else:
-        return ' %s: %s trunk already exists \n' % (switch, name)
+        EVENTS.unchanged(switch, 'trunk', name,
+                         '%s trunk already exists' % name)
 
 
 def find_non_clustered_leafs(module, leaf_list):
@@ -260,7 +320,6 @@ def create_vlag(module, switch, name, peer_switch, port, peer_port):
     :param peer_switch: Name of the peer switch.
     :param port: Name of the trunk on local switch.
     :param peer_port: Name of the trunk on peer switch.
-    :return: String describing if vlag got created or if it already exists.
     """
     global CHANGED_FLAG
     cli = pn_cli(module)
@@ -274,9 +333,11 @@ def create_vlag(module, switch, name, peer_switch, port, peer_port):
                                                                     peer_port)
         if 'Success' in run_cli(module, cli):
             CHANGED_FLAG.append(True)
-            return ' %s: %s vlag configured successfully \n' % (switch, name)
+            EVENTS.changed(switch, 'vlag', name, 'create',
+                           '%s vlag configured successfully' % name)
     else:
-        return ' %s: %s vlag is already configured \n' % (switch, name)
+        EVENTS.unchanged(switch, 'vlag', name,
+                         '%s vlag is already configured' % name)
 
 
 def configure_trunk(module, cluster_node, switch_list):
@@ -297,9 +358,9 @@ def configure_trunk(module, cluster_node, switch_list):
     src_ports = list(set(src_ports))
     name = (cluster_node + '-to-' + switch_names)[:59]
 
-    output = create_trunk(module, cluster_node, name, src_ports)
+    create_trunk(module, cluster_node, name, src_ports)
 
-    return output + name
+    return name
 
 
 def configure_trunk_vlag_for_clustered_leafs(module, non_clustered_leafs,
@@ -310,11 +371,9 @@ def configure_trunk_vlag_for_clustered_leafs(module, non_clustered_leafs,
     :param module: The Ansible module to fetch input parameters.
     :param non_clustered_leafs: The list of non clustered leaf switches.
     :param spine_list: The list of spine switches.
-    :return: Output of create_cluster() and create_vlag() methods.
     """
     cli = pn_cli(module)
     clicopy = cli
-    output = ''
     non_clustered_leafs_count = 0
     while non_clustered_leafs_count == 0:
         if len(non_clustered_leafs) == 0:
@@ -347,46 +406,36 @@ def configure_trunk_vlag_for_clustered_leafs(module, non_clustered_leafs,
                     # Cluster creation
                     cluster_name = (node1 + '-to-' + node2 + '-cluster')[:59]
 
-                    output += create_cluster(module, node2, cluster_name,
-                                             node1, node2)
+                    create_cluster(module, node2, cluster_name, node1, node2)
 
                     non_clustered_leafs.remove(node2)
 
                     # Trunk creation (leaf to spines)
-                    trunk_message1 = configure_trunk(module, node1, spine_list).split('\n')
-                    trunk_message2 = configure_trunk(module, node2, spine_list).split('\n')
-                    trunk_name1 = trunk_message1[1]
-                    trunk_name2 = trunk_message2[1]
-                    output += trunk_message1[0] + '\n'
-                    output += trunk_message2[0] + '\n'
+                    trunk_name1 = configure_trunk(module, node1, spine_list)
+                    trunk_name2 = configure_trunk(module, node2, spine_list)
                     # Vlag creation (leaf to spines)
                     vlag_name = (node1 + '-' + node2 + '-to-' + 'spine')[:59]
 
-                    output += create_vlag(module, node1, vlag_name, node2,
-                                          trunk_name1, trunk_name2)
+                    create_vlag(module, node1, vlag_name, node2, trunk_name1,
+                                trunk_name2)
 
                     leafs_list = [node1, node2]
                     spine1 = str(spine_list[0])
                     spine2 = str(spine_list[1])
 
                     # Trunk creation (spine to leafs)
-                    trunk_message1 = configure_trunk(module, spine1, leafs_list).split('\n')
-                    trunk_message2 = configure_trunk(module, spine2, leafs_list).split('\n')
-                    trunk_name1 = trunk_message1[1]
-                    trunk_name2 = trunk_message2[1]
-                    output += trunk_message1[0] + '\n'
-                    output += trunk_message2[0] + '\n'
+                    trunk_name1 = configure_trunk(module, spine1, leafs_list)
+                    trunk_name2 = configure_trunk(module, spine2, leafs_list)
 
                     # Vlag creation (spine to leafs)
-                    name =  ('spine-to-' + node1 + '-' + node2)[:59]
+                    name = ('spine-to-' + node1 + '-' + node2)[:59]
 
-                    output += create_vlag(module, spine1, name, spine2,
-                                          trunk_name1, trunk_name2)
+                    create_vlag(module, spine1, name, spine2, trunk_name1,
+                                trunk_name2)
 
                     terminate_flag += 1
 
                 node_count += 1
-    return output
 
 
 def configure_trunk_non_clustered_leafs(module, non_clustered_leafs,
@@ -396,39 +445,28 @@ def configure_trunk_non_clustered_leafs(module, non_clustered_leafs,
     :param module: The Ansible module to fetch input parameters.
     :param non_clustered_leafs: The list of all non clustered leaf switches.
     :param spine_list: The list of all spine switches.
-    :return: Output of configure_trunk() method.
     """
-    output = ''
     for leaf in non_clustered_leafs:
         # Trunk creation (leaf to spines)
-        trunk_message = configure_trunk(module, leaf, spine_list).split('\n')
-        output += trunk_message[0] + '\n'
+        configure_trunk(module, leaf, spine_list)
 
         spine1 = str(spine_list[0])
         spine2 = str(spine_list[1])
 
         # Trunk creation (spine to leafs)
-        trunk_message1 = configure_trunk(module, spine1, [leaf]).split('\n')
-        trunk_message2 = configure_trunk(module, spine2, [leaf]).split('\n')
-        trunk_name1 = trunk_message1[1]
-        trunk_name2 = trunk_message2[1]
-        output += trunk_message1[0] + '\n'
-        output += trunk_message2[0] + '\n'
+        trunk_name1 = configure_trunk(module, spine1, [leaf])
+        trunk_name2 = configure_trunk(module, spine2, [leaf])
 
         # Vlag creation (spine to leafs)
         name = ('spine-to-' + leaf)[:59]
 
-        output += create_vlag(module, spine1, name, spine2, trunk_name1,
-                              trunk_name2)
-
-    return output
+        create_vlag(module, spine1, name, spine2, trunk_name1, trunk_name2)
 
 
 def configure_auto_vlag(module):
     """
     Method to create and configure vlag.
     :param module: The Ansible module to fetch input parameters.
-    :return: String describing output of configuration.
     """
     spine_list = module.params['pn_spine_list']
     leaf_list = module.params['pn_leaf_list']
@@ -436,33 +474,34 @@ def configure_auto_vlag(module):
     spine2 = spine_list[1]
 
     # Create cluster between two spines.
-    output = create_cluster(module, spine1, 'spine-cluster', spine1, spine2)
+    create_cluster(module, spine1, 'spine-cluster', spine1, spine2)
 
     # Configure trunk, vlag for clustered leaf switches.
-    output += configure_trunk_vlag_for_clustered_leafs(module,
-                                                       list(leaf_list),
-                                                       spine_list)
+    configure_trunk_vlag_for_clustered_leafs(module, list(leaf_list),
+                                             spine_list)
 
     # Configure trunk, vlag for non clustered leaf switches.
     non_clustered_leafs = find_non_clustered_leafs(module, leaf_list)
-    output += configure_trunk_non_clustered_leafs(module, non_clustered_leafs,
-                                                  spine_list)
-    return output
+    configure_trunk_non_clustered_leafs(module, non_clustered_leafs,
+                                        spine_list)
 
 
-def update_fabric_network_to_inband(module):
+def update_fabric_network_to_inband(module, fingerprints):
     """
     Method to update fabric network type to in-band
     :param module: The Ansible module to fetch input parameters.
-    :return: The output of run_cli() method.
+    :param fingerprints: Fingerprints of the switches.
     """
     global CHANGED_FLAG
-    output = ''
     cli = pn_cli(module)
     clicopy = cli
 
     for switch in (module.params['pn_spine_list'] +
                    module.params['pn_leaf_list']):
+        if fingerprints.unchanged(switch):
+            skipped(switch)
+            continue
+
         cli = clicopy
         cli += ' fabric-info format fabric-network '
         fabric_network = run_cli(module, cli).split()[1]
@@ -471,12 +510,12 @@ def update_fabric_network_to_inband(module):
             cli += ' switch ' + switch
             cli += ' fabric-local-modify fabric-network in-band '
             if 'Success' in run_cli(module, cli):
-                output += ' %s: Updated fabric network to in-band \n' % switch
+                EVENTS.changed(switch, 'fabric-network', switch, 'modify',
+                               'Updated fabric network to in-band')
                 CHANGED_FLAG.append(True)
         else:
-            output += ' %s: Fabric network is already in-band \n' % switch
-
-    return output
+            EVENTS.unchanged(switch, 'fabric-network', switch,
+                             'Fabric network is already in-band')
 
 
 def main():
@@ -485,36 +524,52 @@ def main():
         argument_spec=dict(
             pn_cliusername=dict(required=False, type='str'),
             pn_clipassword=dict(required=False, type='str', no_log=True),
+            pn_fabric_facts=dict(required=False, type='dict'),
             pn_spine_list=dict(required=False, type='list'),
             pn_leaf_list=dict(required=False, type='list'),
             pn_update_fabric_to_inband=dict(required=False, type='bool',
                                             default=False),
             pn_stp=dict(required=False, type='bool', default=False),
-        )
+            pn_fingerprint_file=dict(required=False, type='str'),
+            pn_output=dict(required=False, type='str', default='text',
+                           choices=['text', 'json']),
+        ),
+        supports_check_mode=True
     )
 
     global CHANGED_FLAG
-
-    # L2 setup (auto-vlag).
-    message = configure_auto_vlag(module)
+    switch_list = module.params['pn_spine_list'] + module.params['pn_leaf_list']
+    fingerprints = Fingerprints(module, 'pn_l2_ztp', switch_list,
+                                STATE_SHOWS)
+
+    # L2 setup (auto-vlag), it spans all the switches.
+    if fingerprints.all_unchanged(switch_list):
+        for switch in switch_list:
+            skipped(switch)
+    else:
+        configure_auto_vlag(module)
 
     # Update fabric network to in-band if flag is True.
     if module.params['pn_update_fabric_to_inband']:
-        message += update_fabric_network_to_inband(module)
+        update_fabric_network_to_inband(module, fingerprints)
 
     # Enable STP if flag is True.
     if module.params['pn_stp']:
-        message += modify_stp(module, 'enable')
+        modify_stp(module, 'enable', fingerprints)
+
+    fingerprints.save(EVENTS.events)
 
     # Exit the module and return the required JSON.
     module.exit_json(
-        stdout=message,
-        error='0',
+        plan=command_plan(),
+        cli_stats=cli_stats(),
         failed=False,
-        changed=True if True in CHANGED_FLAG else False
+        changed=True if True in CHANGED_FLAG else False,
+        **events_result(module, EVENTS, TASK,
+                        'L2 ZTP configuration executed successfully')
     )
 
 
 if __name__ == '__main__':
-    main()
+    run_main(main)
 
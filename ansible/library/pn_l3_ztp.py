@@ -19,6 +19,10 @@
 #
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_events import (ChangeEvents, events_result,
+                                            failure_result)
+from ansible.module_utils.pn_nvos import cli_stats, command_plan, run_command
+from ansible.module_utils.pn_profile import run_main
 import shlex
 
 DOCUMENTATION = """
@@ -40,6 +44,12 @@ options:
         - Provide login password if user is not root.
       required: False
       type: str
+    pn_fabric_facts:
+      description:
+        - pn_fabric fact gathered by pn_fabric_facts. While it is fresh,
+          the fabric discovery shows are answered from it.
+      required: False
+      type: dict
     pn_net_address:
       description:
         - Specify network address to be used in configuring link IPs for layer3.
@@ -109,6 +119,14 @@ options:
       required: False
       default: False
       type: bool
+    pn_output:
+      description:
+        - Render the result as text (stdout) or as json (msg, summary and
+          task, as the former pn_l3_ztp_json).
+      required: False
+      default: text
+      choices: ['text', 'json']
+      type: str
 """
 
 EXAMPLES = """
@@ -124,8 +142,17 @@ EXAMPLES = """
 RETURN = """
 stdout:
   description: The set of responses for each command.
-  returned: always
+  returned: pn_output is text
   type: str
+summary:
+  description: It contains output of each configuration along with switch name.
+  returned: pn_output is json
+  type: list
+events:
+  description: Change events (switch, object, key, action, result, msg), in
+    the order they happened.
+  returned: always
+  type: list
 changed:
   description: Indicates whether the CLI caused changes on the target.
   returned: always
@@ -134,10 +161,24 @@ failed:
   description: Indicates whether or not the execution failed on the target.
   returned: always
   type: bool
+plan:
+  description: Commands which would be issued, per switch, when run in
+    check mode.
+  returned: check mode
+  type: dict
+cli_stats:
+  description: Calls made to the switches (a batch counts once), the commands
+    they carried, the bytes of output and the seconds spent waiting on them.
+  returned: always
+  type: dict
 """
 
 
 CHANGED_FLAG = []
+EVENTS = ChangeEvents()
+TASK = 'Configure L3 ZTP'
+# The json output names the task differently when a command failed.
+FAILURE_TASK = 'CLI commands to configure L3 zero touch provisioning'
 
 
 def pn_cli(module):
@@ -166,17 +207,16 @@ def run_cli(module, cli):
     :return: Output/Error or Success msg depending upon the response from cli.
     """
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_command(module, cli)
     if out:
         return out
 
     if err:
         module.exit_json(
-            error='1',
             failed=True,
-            stderr=err.strip(),
-            msg='Operation Failed: ' + str(cli),
-            changed=False
+            changed=False,
+            **failure_result(module, EVENTS, FAILURE_TASK,
+                             'L3 ZTP configuration failed', cli, err)
         )
     else:
         return 'Success'
@@ -187,9 +227,7 @@ def modify_stp(module, modify_flag):
     Method to enable/disable STP (Spanning Tree Protocol) on all switches.
     :param module: The Ansible module to fetch input parameters.
     :param modify_flag: Enable/disable flag to set.
-    :return: The output of run_cli() method.
     """
-    output = ''
     cli = pn_cli(module)
     clicopy = cli
 
@@ -203,21 +241,17 @@ def modify_stp(module, modify_flag):
             cli += ' switch ' + switch
             cli += ' stp-modify ' + modify_flag
             if 'Success' in run_cli(module, cli):
-                output += ' %s: STP enabled \n' % switch
+                EVENTS.changed(switch, 'stp', switch, 'enable', 'STP enabled')
                 CHANGED_FLAG.append(True)
         else:
-            output += ' %s: STP is already enabled \n' % switch
-
-    return output
+            EVENTS.unchanged(switch, 'stp', switch, 'STP is already enabled')
 
 
 def update_fabric_network_to_inband(module):
     """
     Method to update fabric network type to in-band
     :param module: The Ansible module to fetch input parameters.
-    :return: The output of run_cli() method.
     """
-    output = ''
     cli = pn_cli(module)
     clicopy = cli
 
@@ -231,12 +265,12 @@ def update_fabric_network_to_inband(module):
             cli += ' switch ' + switch
             cli += ' fabric-local-modify fabric-network in-band '
             if 'Success' in run_cli(module, cli):
-                output += ' %s: Updated fabric network to in-band \n' % switch
+                EVENTS.changed(switch, 'fabric-network', switch, 'modify',
+                               'Updated fabric network to in-band')
                 CHANGED_FLAG.append(True)
         else:
-            output += ' %s: Fabric network is already in in-band \n' % switch
-
-    return output
+            EVENTS.unchanged(switch, 'fabric-network', switch,
+                             'Fabric network is already in in-band')
 
 
 def calculate_link_ip_addresses(address_str, cidr_str, supernet_str):
@@ -314,7 +348,6 @@ def create_vrouter(module, switch, vnet_name):
     :param module: The Ansible module to fetch input parameters.
     :param switch: The switch name on which vrouter will be created.
     :param vnet_name: The name of the vnet for vrouter creation.
-    :return: String describing if vrouter got created or if it already exists.
     """
     global CHANGED_FLAG
     vrouter_name = switch + '-vrouter'
@@ -332,10 +365,11 @@ def create_vrouter(module, switch, vnet_name):
         cli += ' vrouter-create name %s vnet %s ' % (vrouter_name, vnet_name)
         run_cli(module, cli)
         CHANGED_FLAG.append(True)
-        return ' %s: Created vrouter with name %s \n' % (switch, vrouter_name)
+        EVENTS.changed(switch, 'vrouter', vrouter_name, 'create',
+                       'Created vrouter with name %s' % vrouter_name)
     else:
-        return ' %s: Vrouter with name %s already exists \n' % (switch,
-                                                                vrouter_name)
+        EVENTS.unchanged(switch, 'vrouter', vrouter_name,
+                         'Vrouter with name %s already exists' % vrouter_name)
 
 
 def create_interface(module, switch, ip, port):
@@ -345,10 +379,7 @@ def create_interface(module, switch, ip, port):
     :param switch: The switch name on which vrouter will be created.
     :param ip: IP address to be assigned to vrouter interfaces.
     :param port: l3-port for the interface.
-    :return: The output string informing details of vrouter created and
-    interface added or if vrouter already exists.
     """
-    output = ''
     global CHANGED_FLAG
     cli = pn_cli(module)
     clicopy = cli
@@ -368,9 +399,9 @@ def create_interface(module, switch, ip, port):
         cli += ' ip ' + ip
         cli += ' l3-port ' + port
         run_cli(module, cli)
-        output += ' %s: Added vrouter interface with ip %s on %s \n' % (
-            switch, ip, vrouter_name
-        )
+        EVENTS.changed(switch, 'vrouter-interface', ip, 'create',
+                       'Added vrouter interface with ip %s on %s' % (
+                           ip, vrouter_name))
 
         # Add BFD config to vrouter interface.
         if module.params['pn_bfd']:
@@ -385,15 +416,14 @@ def create_interface(module, switch, ip, port):
             cli += ' bfd-min-rx ' + module.params['pn_bfd_min_rx']
             cli += ' bfd-multiplier ' + module.params['pn_bfd_multiplier']
             run_cli(module, cli)
-            output += ' %s: Added BFD config to %s \n' % (switch, vrouter_name)
+            EVENTS.changed(switch, 'vrouter-interface-config', nic, 'create',
+                           'Added BFD config to %s' % vrouter_name)
 
         CHANGED_FLAG.append(True)
     else:
-        output += ' %s: Vrouter interface %s already exists on %s \n' % (
-            switch, ip, vrouter_name
-        )
-
-    return output
+        EVENTS.unchanged(switch, 'vrouter-interface', ip,
+                         'Vrouter interface %s already exists on %s' % (
+                             ip, vrouter_name))
 
 
 def modify_auto_trunk_setting(module, switch, flag):
@@ -420,7 +450,6 @@ def delete_trunk(module, switch, switch_port, peer_switch):
     :param switch: Name of the local switch.
     :param switch_port: The l3-port which is part of conflicting trunk for l3.
     :param peer_switch: Name of the peer switch.
-    :return: String describing if trunk got deleted or not.
     """
     cli = pn_cli(module)
     clicopy = cli
@@ -434,7 +463,8 @@ def delete_trunk(module, switch, switch_port, peer_switch):
         cli += ' switch %s trunk-delete name %s ' % (switch, trunk[0])
         if 'Success' in run_cli(module, cli):
             CHANGED_FLAG.append(True)
-            return ' %s: Deleted %s trunk successfully \n' % (switch, trunk[0])
+            EVENTS.changed(switch, 'trunk', trunk[0], 'delete',
+                           'Deleted %s trunk successfully' % trunk[0])
 
 
 def assign_loopback_ip(module, loopback_address):
@@ -442,10 +472,8 @@ def assign_loopback_ip(module, loopback_address):
     Method to add loopback interface to vrouters.
     :param module: The Ansible module to fetch input parameters.
     :param loopback_address: The loopback ip to be assigned.
-    :return: String describing if loopback ips got assigned or not.
     """
     global CHANGED_FLAG
-    output = ''
     address = loopback_address.split('.')
     static_part = str(address[0]) + '.' + str(address[1]) + '.'
     static_part += str(address[2]) + '.'
@@ -475,35 +503,34 @@ def assign_loopback_ip(module, loopback_address):
                     cli += vrouter
                     cli += ' ip ' + ip
                     run_cli(module, cli)
-                    output += ' %s: Added loopback ip %s to %s \n' % (
-                        switch, ip, vrouter
-                    )
+                    EVENTS.changed(switch, 'vrouter-loopback-interface', ip,
+                                   'create', 'Added loopback ip %s to %s' % (
+                                       ip, vrouter))
                     CHANGED_FLAG.append(True)
                 else:
-                    output += ' %s: Loopback ip %s for %s already exists \n' % (
-                        switch, ip, vrouter
-                    )
+                    EVENTS.unchanged(switch, 'vrouter-loopback-interface', ip,
+                                     'Loopback ip %s for %s already exists' % (
+                                         ip, vrouter))
 
                 vrouter_count += 1
             else:
-                output += ' Not enough loopback ips available for vrouters \n'
+                EVENTS.add('', 'vrouter-loopback-interface', vrouter, 'skip',
+                           'unchanged',
+                           'Not enough loopback ips available for vrouters')
     else:
-        output += ' No vrouters exists to assign loopback ips \n'
-
-    return output
+        EVENTS.add('', 'vrouter-loopback-interface', '', 'skip', 'unchanged',
+                   'No vrouters exists to assign loopback ips')
 
 
 def auto_configure_link_ips(module):
     """
     Method to auto configure link IPs for layer3 fabric.
     :param module: The Ansible module to fetch input parameters.
-    :return: String describing output of configuration.
     """
     spine_list = module.params['pn_spine_list']
     leaf_list = module.params['pn_leaf_list']
     fabric_loopback = module.params['pn_assign_loopback']
     supernet = module.params['pn_supernet']
-    output = ''
 
     cli = pn_cli(module)
     clicopy = cli
@@ -528,7 +555,7 @@ def auto_configure_link_ips(module):
 
     # Create vrouter on all switches.
     for switch in switch_names:
-        output += create_vrouter(module, switch, vnet_name)
+        create_vrouter(module, switch, vnet_name)
 
     for spine in spine_list:
         for leaf in leaf_list:
@@ -544,7 +571,7 @@ def auto_configure_link_ips(module):
                 lport = leaf_port[0]
                 ip = available_ips[0]
                 delete_trunk(module, leaf, lport, spine)
-                output += create_interface(module, leaf, ip, lport)
+                create_interface(module, leaf, ip, lport)
 
                 leaf_port.remove(lport)
                 available_ips.remove(ip)
@@ -556,7 +583,7 @@ def auto_configure_link_ips(module):
                 rport = run_cli(module, cli)
 
                 delete_trunk(module, spine, rport, leaf)
-                output += create_interface(module, spine, ip, rport)
+                create_interface(module, spine, ip, rport)
                 available_ips.remove(ip)
 
                 ip_count = 0
@@ -568,14 +595,12 @@ def auto_configure_link_ips(module):
 
     if fabric_loopback:
         # Assign loopback ip to vrouters.
-        output += assign_loopback_ip(module, module.params['pn_loopback_ip'])
+        assign_loopback_ip(module, module.params['pn_loopback_ip'])
 
     for switch in switch_names:
         # Enable auto trunk.
         modify_auto_trunk_setting(module, switch, 'enable')
 
-    return output
-
 
 def main():
     """ This section is for arguments parsing """
@@ -583,6 +608,7 @@ def main():
         argument_spec=dict(
             pn_cliusername=dict(required=False, type='str'),
             pn_clipassword=dict(required=False, type='str', no_log=True),
+            pn_fabric_facts=dict(required=False, type='dict'),
             pn_net_address=dict(required=False, type='str'),
             pn_cidr=dict(required=False, type='str'),
             pn_supernet=dict(required=False, type='str'),
@@ -597,30 +623,34 @@ def main():
             pn_bfd_min_rx=dict(required=False, type='str'),
             pn_bfd_multiplier=dict(required=False, type='str'),
             pn_stp=dict(required=False, type='bool', default=False),
-        )
+            pn_output=dict(required=False, type='str', default='text',
+                           choices=['text', 'json']),
+        ),
+        supports_check_mode=True
     )
 
     global CHANGED_FLAG
 
     # L3 setup (link ips)
-    message = auto_configure_link_ips(module)
+    auto_configure_link_ips(module)
 
     # Update fabric network to in-band if flag is True
     if module.params['pn_update_fabric_to_inband']:
-        message += update_fabric_network_to_inband(module)
+        update_fabric_network_to_inband(module)
 
     # Enable STP if flag is True
     if module.params['pn_stp']:
-        message += modify_stp(module, 'enable')
+        modify_stp(module, 'enable')
 
     # Exit the module and return the required JSON
     module.exit_json(
-        stdout=message,
-        error='0',
+        plan=command_plan(),
+        cli_stats=cli_stats(),
         failed=False,
-        changed=True if True in CHANGED_FLAG else False
+        changed=True if True in CHANGED_FLAG else False,
+        **events_result(module, EVENTS, TASK, 'L3 ZTP configuration succeeded')
     )
 
 if __name__ == '__main__':
-    main()
+    run_main(main)
 
@@ -19,7 +19,6 @@
 #
 
 import shlex
-import re
 
 DOCUMENTATION = """
 ---
@@ -47,6 +46,18 @@ options:
         - Specify commands to be run on the switches.
         required: True
         type: str
+    pn_parallel:
+      description:
+        - Maximum number of switches the commands are run on concurrently.
+      required: False
+      default: 8
+      type: int
+    pn_batch_size:
+      description:
+        - Maximum number of commands sent to a switch in one cli process.
+      required: False
+      default: 100
+      type: int
 """
 
 EXAMPLES = """
@@ -95,13 +106,14 @@ def run_cli(module, cli):
     :return: Output/Error or Success msg depending upon the response from cli.
     """
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_command(module, cli)
     results = []
     if out:
         return out
 
     if err:
-        json_msg = {'switch': '', 'output': u'Operation Failed: {}'.format(str(cli))}
+        json_msg = {'switch': '',
+                    'output': u'Operation Failed: {}'.format(command_text(cli))}
         results.append(json_msg)
         module.exit_json(
             unreachable=False,
@@ -117,99 +129,72 @@ def run_cli(module, cli):
         return 'Success'
 
 
+def batch_failed(module, target, clis, err):
+    """
+    Method to fail the module for a command batch which failed on a switch.
+    :param module: The Ansible module to fetch input parameters.
+    :param target: The switch the batch ran on.
+    :param clis: The cli strings of the batch.
+    :param err: Error output of the batch.
+    """
+    failed = failed_command(clis, err)
+    if failed is None:
+        failed = 'one of %d commands' % len(clis)
+    else:
+        failed = command_text(failed)
+    results = [{'switch': target,
+                'output': u'Operation Failed: {}'.format(failed)}]
+    module.exit_json(
+        unreachable=False,
+        failed=True,
+        exception='',
+        summary=results,
+        task='Module to execute commands from a file',
+        stderr=err.strip(),
+        msg='Commands execution from file failed',
+        changed=False
+    )
+
+
 def execute_commands(module, commands_data):
     """
-    This method executes the cli commands from a local file.
+    Method to execute the cli commands from a local file. The file is
+    compiled once into stages; within a stage the command list of every
+    switch is sent as one batch and different switches run concurrently.
     :param module: The Ansible module to fetch input parameters.
     :param commands_data: Cli commands in the form of string.
     :return: Output/Error or Success message depending upon the response.
     """
-    output = ''
-    commands_list = commands_data.split('\n')
-    line_count = 0
+    output = []
     cli = pn_cli(module)
-    clicopy = cli
-
-    while line_count < len(commands_list):
-        if commands_list[line_count] == "":
-            line_count += 1
-
-        # Execute commands from [ALL] group.
-        # It will be executed on all switches.
-        elif re.match("(^\[ALL.*)", commands_list[line_count]) is not None:
-            line_count += 1
-            cli = clicopy
-            cli += " fabric-node-show format name no-show-headers "
-            switch_list = run_cli(module, cli).split()
-
-            while (line_count < len(commands_list) and
-                           re.match("(^\[switch.*)",
-                                    commands_list[line_count]) is None and
-                           re.match("(^\[fabric.*)",
-                                    commands_list[line_count]) is None):
-                if commands_list[line_count] != "":
-                    command = commands_list[line_count]
-                    for switch in switch_list:
-                        cli = clicopy
-                        cli += ' switch %s ' % switch
-                        cli += str(command)
-                        return_msg = run_cli(module, cli)
-                        output += switch + ': ' + cli + ' executed '
-                        output += 'with message %s \n' % return_msg
-
-                line_count += 1
-
-        # Execute commands from [fabric] group.
-        # It will be executed fabric wide on first switch from hosts file.
-        elif re.match("(^\[fabric.*)", commands_list[line_count]) is not None:
-            line_count += 1
-            while (line_count < len(commands_list) and
-                           re.match("(^\[switch.*)",
-                                    commands_list[line_count]) is None and
-                           re.match("(^\[ALL.*)",
-                                    commands_list[line_count]) is None):
-                if commands_list[line_count] != "":
-                    command = commands_list[line_count]
-                    cli = clicopy
-                    cli += str(command)
-                    return_msg = run_cli(module, cli)
-                    output += 'fabric_wide' + ': ' + cli + ' executed '
-                    output += 'with message %s \n' % return_msg
-                line_count += 1
-
-        # Execute commands from [switch] group.
-        # It will be executed on mentioned switches.
-        elif re.match("(^\[switch.*)", commands_list[line_count]) is not None:
-            switch_to_run = commands_list[line_count].split(",")
-            switch_to_run[0] = switch_to_run[0].split(" ")[1]
-            last_arg = len(switch_to_run) - 1
-            switch_to_run[last_arg] = switch_to_run[last_arg].split("]")[0]
-            line_count += 1
-
-            while (line_count < len(commands_list) and
-                           re.match("(^\[ALL.*)",
-                                    commands_list[line_count]) is None and
-                           re.match("(^\[switch.*)",
-                                    commands_list[line_count]) is None and
-                           re.match("(^\[fabric.*)",
-                                    commands_list[line_count]) is None):
-                if commands_list[line_count] != "":
-                    command = commands_list[line_count]
-                    for switch in switch_to_run:
-                        switch = switch.replace(" ", "")
-                        cli = clicopy
-                        cli += ' switch %s ' % switch
-                        cli += str(command)
-                        return_msg = run_cli(module, cli)
-                        output += switch + ': ' + cli + ' executed '
-                        output += 'with message %s \n' % return_msg
-                line_count += 1
-
-        # It will take care of comments at the top if any
-        else:
-            line_count += 1
-
-    return output
+    fabric_nodes = []
+
+    def all_switches():
+        if not fabric_nodes:
+            fabric_nodes.extend(run_cli(
+                module, cli + ' fabric-node-show format name no-show-headers '
+            ).split())
+        return fabric_nodes
+
+    for stage in compile_commands(commands_data):
+        plans = stage_plans(stage, cli, all_switches)
+        for result in run_parallel(module, plans,
+                                   module.params['pn_parallel'],
+                                   module.params['pn_batch_size']):
+            if result is None:
+                continue
+            target, clis, rc, out, err = result
+            if rc or err:
+                batch_failed(module, target, clis, err)
+            # The batch output (of shows) belongs to the last command.
+            for number, command in enumerate(clis, 1):
+                return_msg = 'Success'
+                if number == len(clis) and out.strip():
+                    return_msg = ' '.join(out.split())
+                output.append('%s: %s executed with message %s \n' % (
+                    target, command, return_msg))
+
+    return ''.join(output)
 
 
 def main():
@@ -219,6 +204,8 @@ def main():
             pn_cliusername=dict(required=False, type='str'),
             pn_clipassword=dict(required=False, type='str', no_log=True),
             pn_commands_file=dict(required=True, type='str'),
+            pn_parallel=dict(required=False, type='int', default=8),
+            pn_batch_size=dict(required=False, type='int', default=100),
         )
     )
 
@@ -246,7 +233,12 @@ def main():
 
 # AnsibleModule boilerplate
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_commands_file import (command_text,
+                                                   compile_commands,
+                                                   failed_command, stage_plans)
+from ansible.module_utils.pn_nvos import run_command, run_parallel
+from ansible.module_utils.pn_profile import run_main
 
 if __name__ == '__main__':
-    main()
+    run_main(main)
 
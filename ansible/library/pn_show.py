@@ -46,8 +46,18 @@ options:
   pn_command:
     description:
       - The C(pn_command) takes a CLI show command as value.
-    required: true
+        Either pn_command or pn_commands is required.
+    required: False
     type: str
+  pn_commands:
+    description:
+      - List of show commands run over one cli session. An item is a show
+        command or a dictionary with command, columns (list or comma
+        separated), filters (dictionary), index_by (a column to return the
+        rows as a dictionary keyed by, the last row wins for a repeated
+        key) and name (the key of the result, the command by default).
+    required: False
+    type: list
   pn_parameters:
     description:
       - Display output using a specific parameter. Use 'all' to display possible
@@ -57,6 +67,54 @@ options:
     description:
       - Specify formatting options.
     type: str
+  pn_filters:
+    description:
+      - Dictionary of column values the switch filters the rows by,
+        e.g. vlan 10.
+    required: False
+    type: dict
+  pn_stream:
+    description:
+      - Read the output row by row instead of returning it as text. Only
+        counts, the kept rows and the output file path are returned.
+        Requires pn_output_file or pn_limit.
+    required: False
+    default: False
+    type: bool
+  pn_where:
+    description:
+      - Dictionary of column values (or lists of values) the streamed rows
+        must have.
+    required: False
+    type: dict
+  pn_columns:
+    description:
+      - Columns to keep of each streamed row.
+    required: False
+    type: list
+  pn_limit:
+    description:
+      - Number of matching rows to stop streaming at.
+    required: False
+    type: int
+  pn_count_by:
+    description:
+      - Columns to count the matching rows by.
+    required: False
+    type: list
+  pn_output_file:
+    description:
+      - File on the switch to write the matching rows to. Use the fetch
+        module to bring it to the controller.
+    required: False
+    type: str
+  pn_output_format:
+    description:
+      - Format of pn_output_file.
+    required: False
+    default: jsonl
+    choices: ['csv', 'jsonl']
+    type: str
 """
 
 EXAMPLES = """
@@ -75,6 +133,31 @@ EXAMPLES = """
 - name: run the cluster-show command
   pn_show:
     pn_command: 'cluster-show'
+
+- name: read the health check tables
+  pn_show:
+    pn_commands:
+      - command: 'vlan-show'
+        columns: ['id', 'scope', 'ports']
+        index_by: 'id'
+      - command: 'vrouter-show'
+        columns: 'name,location,state'
+        index_by: 'name'
+      - command: 'cluster-show'
+        columns: ['name', 'cluster-node-1', 'cluster-node-2', 'state']
+  register: health
+
+- name: dump the l2 table of vlan 10 to a file
+  pn_show:
+    pn_command: 'l2-table-show'
+    pn_parameters: 'mac,vlan,ports,state'
+    pn_filters:
+      vlan: 10
+    pn_stream: True
+    pn_where:
+      state: 'active'
+    pn_count_by: ['ports']
+    pn_output_file: '/tmp/l2-table.jsonl'
 """
 
 RETURN = """
@@ -92,6 +175,37 @@ changed:
   description: Indicates whether the CLI caused any change on the target.
   returned: always(False)
   type: bool
+results:
+  description: Dictionary of pn_commands name to its rows, each a
+    dictionary keyed by column name, or to a dictionary of rows when
+    index_by is given.
+  returned: pn_commands
+  type: dict
+rows_read:
+  description: Number of rows the show printed.
+  returned: pn_stream
+  type: int
+rows_matched:
+  description: Number of rows matching pn_where.
+  returned: pn_stream
+  type: int
+counts:
+  description: Dictionary of pn_count_by column to the number of matching
+    rows per value.
+  returned: pn_stream
+  type: dict
+truncated:
+  description: Indicates whether streaming stopped at pn_limit.
+  returned: pn_stream
+  type: bool
+output_file:
+  description: Path of the file the matching rows were written to.
+  returned: pn_stream with pn_output_file
+  type: str
+rows:
+  description: The matching rows.
+  returned: pn_stream without pn_output_file
+  type: list
 """
 
 
@@ -159,6 +273,98 @@ def run_cli(module, cli):
         )
 
 
+def show_commands(module, cli):
+    """
+    This method runs the pn_commands shows in one cli session and exits with
+    their rows.
+    :param module: The Ansible module to fetch input parameters.
+    :param cli: the cli prefix from pn_cli().
+    """
+    names = []
+    clis = []
+    index_by = []
+    for item in module.params['pn_commands']:
+        if not isinstance(item, dict):
+            item = {'command': item}
+        if not item.get('command'):
+            module.fail_json(msg='pn_commands item without command: %s' % item)
+        columns = item.get('columns') or 'all'
+        if isinstance(columns, (list, tuple)):
+            columns = ','.join(columns)
+
+        show = cli + ' %s ' % item['command']
+        for column, value in (item.get('filters') or {}).items():
+            show += ' %s %s ' % (column, value)
+        show += ' format %s ' % columns
+        names.append(item.get('name') or item['command'])
+        clis.append(show)
+        index_by.append(item.get('index_by'))
+
+    results = {}
+    errors = {}
+    for name, key, (rc, rows, err) in zip(names, index_by,
+                                          run_shows(module, clis)):
+        if rc or err:
+            errors[name] = (err or 'rc %s' % rc).strip()
+            rows = []
+        results[name] = (dict((row.get(key), row) for row in rows)
+                         if key else rows)
+
+    if errors:
+        module.fail_json(
+            msg='%d of %d shows failed' % (len(errors), len(clis)),
+            stderr=errors,
+            results=results,
+            changed=False
+        )
+
+    module.exit_json(
+        command=names,
+        msg='%d shows' % len(clis),
+        results=results,
+        changed=False
+    )
+
+
+def stream_cli(module, cli):
+    """
+    This method reads the output of the show command row by row and exits
+    with aggregates and the path of the written rows.
+    :param module: The Ansible module to fetch input parameters.
+    :param cli: the complete cli string to be executed on the target node(s).
+    """
+    command = module.params['pn_command']
+    if not (module.params['pn_output_file'] or
+            module.params['pn_limit'] is not None):
+        module.fail_json(msg='pn_stream requires pn_output_file or pn_limit')
+
+    result = stream_show(module, cli,
+                         where=module.params['pn_where'],
+                         columns=module.params['pn_columns'],
+                         limit=module.params['pn_limit'],
+                         count_by=module.params['pn_count_by'],
+                         output_file=module.params['pn_output_file'],
+                         output_format=module.params['pn_output_format'])
+    rc = result.pop('rc')
+    err = result.pop('err')
+    if rc or err:
+        module.exit_json(
+            command=command,
+            msg='%s: ' % command,
+            stderr=err.strip(),
+            changed=False,
+            **result
+        )
+
+    module.exit_json(
+        command=command,
+        msg='%s: %d of %d rows matched' % (command, result['rows_matched'],
+                                          result['rows_read']),
+        changed=False,
+        **result
+    )
+
+
 def main():
     """ This section is for arguments parsing """
     module = AnsibleModule(
@@ -166,10 +372,22 @@ def main():
             pn_cliusername=dict(required=True, type='str'),
             pn_clipassword=dict(required=True, type='str'),
             pn_cliswitch=dict(required=False, type='str'),
-            pn_command=dict(required=True, type='str'),
+            pn_command=dict(required=False, type='str'),
+            pn_commands=dict(required=False, type='list'),
             pn_parameters=dict(default='all', type='str'),
-            pn_options=dict(type='str')
-        )
+            pn_options=dict(type='str'),
+            pn_filters=dict(required=False, type='dict'),
+            pn_stream=dict(required=False, type='bool', default=False),
+            pn_where=dict(required=False, type='dict'),
+            pn_columns=dict(required=False, type='list'),
+            pn_limit=dict(required=False, type='int'),
+            pn_count_by=dict(required=False, type='list'),
+            pn_output_file=dict(required=False, type='str'),
+            pn_output_format=dict(required=False, type='str',
+                                  default='jsonl', choices=['csv', 'jsonl'])
+        ),
+        required_one_of=[['pn_command', 'pn_commands']],
+        mutually_exclusive=[['pn_command', 'pn_commands']]
     )
 
     # Accessing the arguments
@@ -180,16 +398,28 @@ def main():
     # Building the CLI command string
     cli = pn_cli(module)
 
-    cli += ' %s format %s ' % (command, parameters)
+    if module.params['pn_commands']:
+        show_commands(module, cli)
+
+    cli += ' %s ' % command
+    for column, value in (module.params['pn_filters'] or {}).items():
+        cli += ' %s %s ' % (column, value)
+    cli += ' format %s ' % parameters
 
     if options:
         cli += options
 
+    if module.params['pn_stream']:
+        stream_cli(module, cli)
+
     run_cli(module, cli)
 
 # AnsibleModule boilerplate
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_nvos import run_shows
+from ansible.module_utils.pn_profile import run_main
+from ansible.module_utils.pn_show_stream import stream_show
 
 if __name__ == '__main__':
-    main()
+    run_main(main)
 
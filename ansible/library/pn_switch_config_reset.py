@@ -20,6 +20,9 @@
 
 import shlex
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_nvos import run_command
+from ansible.module_utils.pn_profile import run_main
+from ansible.module_utils.pn_reset import NVOS_STATUS, nvos_online, wait_ready
 
 DOCUMENTATION = """
 ---
@@ -40,6 +43,24 @@ options:
         - Provide login password if user is not root.
       required: False
       type: str
+    pn_current_switch:
+      description:
+        - Name of the switch on which this task is currently getting executed.
+      required: False
+      type: str
+    pn_wait_ready:
+      description:
+        - Flag to indicate if the module should return only once nvOSd is
+          back online, instead of leaving the wait to the playbook.
+      required: False
+      default: False
+      type: bool
+    pn_ready_timeout:
+      description:
+        - Seconds to wait for nvOSd after the reset.
+      required: False
+      default: 900
+      type: int
 """
 
 EXAMPLES = """
@@ -47,6 +68,12 @@ EXAMPLES = """
   pn_switch_config_reset:
     pn_cliusername: "{{ USERNAME }}"
     pn_clipassword: "{{ PASSWORD }}"
+
+- name: Switch config reset and wait for nvOSd
+  pn_switch_config_reset:
+    pn_cliusername: "{{ USERNAME }}"
+    pn_clipassword: "{{ PASSWORD }}"
+    pn_wait_ready: True
 """
 
 RETURN = """
@@ -58,9 +85,23 @@ changed:
   description: Indicates whether the CLI caused changes on the target.
   returned: always
   type: bool
+time_to_ready:
+  description: Seconds from the reset until nvOSd was back online.
+  returned: when pn_wait_ready is set and the switch was reset
+  type: float
 """
 
 
+def wait_for_nvos(module):
+    """
+    Method to wait until nvOSd is back online after the reset.
+    :param module: The Ansible module to fetch input parameters.
+    :return: Seconds until it was online, None on timeout.
+    """
+    return wait_ready(lambda: nvos_online(*module.run_command(NVOS_STATUS)),
+                      module.params['pn_ready_timeout'])
+
+
 def main():
     """ This section is for arguments parsing """
     module = AnsibleModule(
@@ -68,6 +109,8 @@ def main():
             pn_cliusername=dict(required=False, type='str'),
             pn_clipassword=dict(required=False, type='str', no_log=True),
             pn_current_switch=dict(required=False, type='str'),
+            pn_wait_ready=dict(required=False, type='bool', default=False),
+            pn_ready_timeout=dict(required=False, type='int', default=900),
         )
     )
 
@@ -83,7 +126,19 @@ def main():
     cli += ' --no-login-prompt switch-config-reset '
 
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_command(module, cli)
+
+    time_to_ready = None
+    if module.params['pn_wait_ready'] and (
+            not err or 'nvOSd not running' in err):
+        time_to_ready = wait_for_nvos(module)
+        if time_to_ready is None:
+            module.fail_json(
+                msg='nvOSd did not come back online within %s seconds' % (
+                    module.params['pn_ready_timeout']),
+                changed=not err,
+                task='Reset all switches'
+            )
 
     if err:
         if 'User authorization failed' in err:
@@ -100,8 +155,12 @@ def main():
             )
         elif 'nvOSd not running' in err:
             stdout_msg = 'Switch has been just reset. '
-            stdout_msg += 'Please wait for nvOSd to reboot completely.'
+            if time_to_ready is None:
+                stdout_msg += 'Please wait for nvOSd to reboot completely.'
+            else:
+                stdout_msg += 'nvOSd is back online.'
             module.exit_json(
+                time_to_ready=time_to_ready,
                 summary=[{
                     'switch': current_switch,
                     'output': stdout_msg,
@@ -126,6 +185,7 @@ def main():
             )
     else:
         module.exit_json(
+            time_to_ready=time_to_ready,
             summary=[{
                 'switch': current_switch,
                 'output': 'Switch config reset completed successfully.',
@@ -139,4 +199,4 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    run_main(main)
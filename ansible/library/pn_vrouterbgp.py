@@ -219,22 +219,9 @@ def check_cli(module, cli):
     # Global flags
     global VROUTER_EXISTS, NEIGHBOR_EXISTS
 
-    # Check for vRouter
-    check_vrouter = cli + ' vrouter-show format name no-show-headers '
-    check_vrouter = shlex.split(check_vrouter)
-    out = module.run_command(check_vrouter)[1]
-    out = out.split()
-
-    VROUTER_EXISTS = True if vrouter_name in out else False
-
-    # Check for BGP neighbors
-    show = cli + ' vrouter-bgp-show vrouter-name %s ' % vrouter_name
-    show += 'format neighbor no-show-headers'
-    show = shlex.split(show)
-    out = module.run_command(show)[1]
-    out = out.split()
-
-    NEIGHBOR_EXISTS = True if neighbor in out else False
+    state = vrouter_state(module, cli, vrouter_name)
+    VROUTER_EXISTS = state.exists
+    NEIGHBOR_EXISTS = VROUTER_EXISTS and state.neighbor_exists(neighbor)
 
 
 def run_cli(module, cli):
@@ -459,6 +446,7 @@ def main():
     run_cli(module, cli)
 # Ansible boiler-plate
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_vrouter_state import vrouter_state
 
 if __name__ == '__main__':
     main()
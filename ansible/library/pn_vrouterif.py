@@ -208,29 +208,15 @@ def check_cli(module, cli):
     # Global flags
     global VROUTER_EXISTS, INTERFACE_EXISTS, NIC_EXISTS
 
-    # Check for vRouter
-    check_vrouter = cli + ' vrouter-show format name no-show-headers '
-    check_vrouter = shlex.split(check_vrouter)
-    out = module.run_command(check_vrouter)[1]
-    out = out.split()
-
-    VROUTER_EXISTS = True if vrouter_name in out else False
+    state = vrouter_state(module, cli, vrouter_name)
+    VROUTER_EXISTS = state.exists
 
     if interface_ip:
-        # Check for interface and VRRP and fetch nic for VRRP
-        show = cli + ' vrouter-interface-show vrouter-name %s ' % vrouter_name
-        show += 'ip %s format ip,nic no-show-headers' % interface_ip
-        show = shlex.split(show)
-        out = module.run_command(show)[1]
-        INTERFACE_EXISTS = True if out else False
+        INTERFACE_EXISTS = VROUTER_EXISTS and state.interface_exists(
+            interface_ip)
 
     if nic_str:
-        # Check for nic
-        show = cli + ' vrouter-interface-show vrouter-name %s ' % vrouter_name
-        show += ' format nic no-show-headers'
-        show = shlex.split(show)
-        out = module.run_command(show)[1]
-        NIC_EXISTS = True if nic_str in out else False
+        NIC_EXISTS = VROUTER_EXISTS and state.nic_exists(nic_str)
 
 
 def get_nic(module, cli):
@@ -248,20 +234,9 @@ def get_nic(module, cli):
 
     global VRRP_EXISTS
 
-    # Check for interface and VRRP and fetch nic for VRRP
-    show = cli + ' vrouter-interface-show vrouter-name %s ' % vrouter_name
-    show += 'ip %s format ip,nic no-show-headers' % interface_ip
-    show = shlex.split(show)
-    out = module.run_command(show)[1]
-    out = out.split()
-
-    if len(out) > 3:
-        VRRP_EXISTS = True
-        return None
-    else:
-        nic = out[2]
-        VRRP_EXISTS = False
-        return nic
+    state = vrouter_state(module, cli, vrouter_name)
+    VRRP_EXISTS, nic = state.vrrp_primary(interface_ip)
+    return nic
 
 
 def run_cli(module, cli):
@@ -379,6 +354,12 @@ def main():
                     msg=('VRRP interface on %s already exists. Check '
                          'the IP addresses' % vrouter_name)
                 )
+            if vrrp_primary is None:
+                module.exit_json(
+                    skipped=True,
+                    msg=('No primary interface with ip %s on %s' %
+                         (interface_ip, vrouter_name))
+                )
             cli += ' %s vrouter-name %s ' % (command, vrouter_name)
             cli += (' ip %s vrrp-primary %s vrrp-id %s '
                     % (interface_ip, vrrp_primary, str(vrrp_id)))
@@ -444,6 +425,7 @@ def main():
     run_cli(module, cli)
 # Ansible boiler-plate
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_vrouter_state import vrouter_state
 
 if __name__ == '__main__':
     main()
@@ -147,22 +147,10 @@ def check_cli(module, cli):
     # Global flags
     global VROUTER_EXISTS, LB_INTERFACE_EXISTS
 
-    # Check for vRouter
-    check_vrouter = cli + ' vrouter-show format name no-show-headers '
-    check_vrouter = shlex.split(check_vrouter)
-    out = module.run_command(check_vrouter)[1]
-    out = out.split()
-
-    VROUTER_EXISTS = True if vrouter_name in out else False
-
-    # Check for loopback interface
-    show = (cli + ' vrouter-loopback-interface-show vrouter-name %s format ip '
-            'no-show-headers' % vrouter_name)
-    show = shlex.split(show)
-    out = module.run_command(show)[1]
-    out = out.split()
-
-    LB_INTERFACE_EXISTS = True if interface_ip in out else False
+    state = vrouter_state(module, cli, vrouter_name)
+    VROUTER_EXISTS = state.exists
+    LB_INTERFACE_EXISTS = VROUTER_EXISTS and state.loopback_exists(
+        interface_ip)
 
 
 def run_cli(module, cli):
@@ -264,14 +252,8 @@ def main():
             # To remove loopback interface, we need the index.
             # If index is not specified, get the Loopback interface index
             # using the given interface ip.
-            get_index = cli
-            get_index += (' vrouter-loopback-interface-show vrouter-name %s ip '
-                          '%s ' % (vrouter_name, interface_ip))
-            get_index += 'format index no-show-headers'
-
-            get_index = shlex.split(get_index)
-            out = module.run_command(get_index)[1]
-            index = out.split()[1]
+            state = vrouter_state(module, cli, vrouter_name)
+            index = state.loopback_index(interface_ip)
 
         cli += ' %s vrouter-name %s index %s' % (command, vrouter_name, index)
 
@@ -297,6 +279,7 @@ def main():
 
 # Ansible boiler-plate
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_vrouter_state import vrouter_state
 
 if __name__ == '__main__':
     main()
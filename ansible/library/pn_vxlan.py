@@ -19,6 +19,10 @@
 #
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_fingerprint import Fingerprints
+from ansible.module_utils.pn_events import ChangeEvents
+from ansible.module_utils.pn_nvos import cli_stats, command_plan, run_command
+from ansible.module_utils.pn_profile import run_main
 import re
 import shlex
 
@@ -42,6 +46,12 @@ options:
         - Provide login password if user is not root.
       required: False
       type: str
+    pn_fabric_facts:
+      description:
+        - pn_fabric fact gathered by pn_fabric_facts. While it is fresh,
+          the fabric discovery shows are answered from it.
+      required: False
+      type: dict
     pn_leaf_list:
       description:
         - Specify list of leaf hosts
@@ -52,6 +62,12 @@ options:
         - String containing vrrp data parsed from csv file.
       required: False
       type: str
+    pn_fingerprint_file:
+      description:
+        - File to record per switch input and state digests in. When no leaf
+          changed since the last run the configuration is skipped.
+      required: False
+      type: str
 """
 
 EXAMPLES = """
@@ -72,10 +88,34 @@ changed:
   description: Indicates whether the CLI caused changes on the target.
   returned: always
   type: bool
+plan:
+  description: Commands which would be issued, per switch, when run in
+    check mode.
+  returned: check mode
+  type: dict
+cli_stats:
+  description: Calls made to the switches (a batch counts once), the commands
+    they carried, the bytes of output and the seconds spent waiting on them.
+  returned: always
+  type: dict
+events:
+  description: Change events (switch, object, key, action, result, msg), in
+    the order they happened.
+  returned: always
+  type: list
 """
 
 
 CHANGED_FLAG = []
+EVENTS = ChangeEvents()
+
+# Tables configured by this module, digested per switch.
+STATE_SHOWS = (
+    ' vlan-show format id,vxlan ',
+    ' tunnel-show format name,local-ip,remote-ip,vrouter-name ',
+    ' tunnel-vxlan-show format name,vxlan ',
+    ' trunk-show format name,ports ',
+)
 
 
 def pn_cli(module):
@@ -106,7 +146,7 @@ def run_cli(module, cli):
     the response from cli.
     """
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_command(module, cli)
 
     if out:
         return out
@@ -129,12 +169,12 @@ def add_vxlan_to_vlan(module, vlan_id, vxlan):
     :param module: The Ansible module to fetch input parameters.
     :param vlan_id: vlan id to be modified.
     :param vxlan: vxlan id to be assigned to vlan.
-    :return: String describing if vxlan for added or not.
     """
     cli = pn_cli(module)
     cli += ' vlan-modify id %s vxlan %s ' % (vlan_id, vxlan)
     run_cli(module, cli)
-    return ' Added vxlan %s to vlan %s! ' % (vxlan, vlan_id)
+    EVENTS.changed('', 'vlan', vlan_id, 'modify',
+                   'Added vxlan %s to vlan %s' % (vxlan, vlan_id))
 
 
 def create_tunnel(module, tunnel_name, local_ip, remote_ip, vrouter_name,
@@ -147,7 +187,6 @@ def create_tunnel(module, tunnel_name, local_ip, remote_ip, vrouter_name,
     :param remote_ip: Remote vrouter interface ip.
     :param vrouter_name: Name of the vrouter.
     :param switch: Name of the switch on which tuneel will be created.
-    :return: String describing if tunnel got created or if it already exists.
     """
     global CHANGED_FLAG
     cli = pn_cli(module)
@@ -163,14 +202,18 @@ def create_tunnel(module, tunnel_name, local_ip, remote_ip, vrouter_name,
                                                                vrouter_name)
         if 'Success' in run_cli(module, cli):
             CHANGED_FLAG.append(True)
-            return ' %s on %s created successfully! ' % (tunnel_name,
-                                                         vrouter_name)
+            EVENTS.changed(switch, 'tunnel', tunnel_name, 'create',
+                           '%s on %s created successfully' % (tunnel_name,
+                                                              vrouter_name))
         else:
             CHANGED_FLAG.append(False)
-            return ' Could not create %s! ' % tunnel_name
+            EVENTS.add(switch, 'tunnel', tunnel_name, 'create', 'failed',
+                       'Could not create %s' % tunnel_name)
     else:
         CHANGED_FLAG.append(False)
-        return ' %s on %s already exists! ' % (tunnel_name, vrouter_name)
+        EVENTS.unchanged(switch, 'tunnel', tunnel_name,
+                         '%s on %s already exists' % (tunnel_name,
+                                                      vrouter_name))
 
 
 def get_vrouter_name(module, switch_name):
@@ -227,30 +270,25 @@ def configure_vtep_for_clustered_leafs(module, local_switch, vlan, vxlan):
     :param local_switch: Name of the local switch.
     :param vlan: vlan id.
     :param vxlan: Vxlan to add to tunnel.
-    :return: String describing output of configuration.
     """
     non_clustered_leafs = find_non_clustered_leafs(module)
     local_ip = get_vrouter_interface_ip(module, local_switch, vlan)
-    output = ''
     if non_clustered_leafs:
         for leaf in non_clustered_leafs:
             # local to remote tunnel
             vrouter_name = get_vrouter_name(module, local_switch)
             remote_ip = get_loopback_ip(module, leaf)
             tunnel_name = local_switch + '-to-' + leaf + '-tunnel'
-            output += create_tunnel(module, tunnel_name, local_ip,
-                                    remote_ip, vrouter_name, local_switch)
-            output += add_vxlan_to_tunnel(module, vxlan, tunnel_name,
-                                          local_switch)
+            create_tunnel(module, tunnel_name, local_ip, remote_ip,
+                          vrouter_name, local_switch)
+            add_vxlan_to_tunnel(module, vxlan, tunnel_name, local_switch)
 
             # Remote to local tunnel
             vrouter_name = get_vrouter_name(module, leaf)
             tunnel_name = leaf + '-to-' + local_switch + '-tunnel'
-            output += create_tunnel(module, tunnel_name, remote_ip,
-                                    local_ip, vrouter_name, leaf)
-            output += add_vxlan_to_tunnel(module, vxlan, tunnel_name, leaf)
-
-    return output
+            create_tunnel(module, tunnel_name, remote_ip, local_ip,
+                          vrouter_name, leaf)
+            add_vxlan_to_tunnel(module, vxlan, tunnel_name, leaf)
 
 
 def configure_vtep_for_non_clustered_leafs(module, local_switch, vlan, vxlan):
@@ -260,11 +298,9 @@ def configure_vtep_for_non_clustered_leafs(module, local_switch, vlan, vxlan):
     :param local_switch: Name of the local switch.
     :param vlan: vlan id.
     :param vxlan: Vxlan to add to tunnel.
-    :return: String describing output of configuration.
     """
     non_clustered_leafs = find_non_clustered_leafs(module)
     local_ip = get_loopback_ip(module, local_switch)
-    output = ''
     for leaf in module.params['pn_leaf_list']:
         if leaf != local_switch:
             # local to remote tunnel
@@ -275,19 +311,16 @@ def configure_vtep_for_non_clustered_leafs(module, local_switch, vlan, vxlan):
 
             vrouter_name = get_vrouter_name(module, local_switch)
             tunnel_name = local_switch + '-to-' + leaf + '-tunnel'
-            output += create_tunnel(module, tunnel_name, local_ip,
-                                    remote_ip, vrouter_name, local_switch)
-            output += add_vxlan_to_tunnel(module, vxlan, tunnel_name,
-                                          local_switch)
+            create_tunnel(module, tunnel_name, local_ip, remote_ip,
+                          vrouter_name, local_switch)
+            add_vxlan_to_tunnel(module, vxlan, tunnel_name, local_switch)
 
             # Remote to local tunnel
             vrouter_name = get_vrouter_name(module, leaf)
             tunnel_name = leaf + '-to-' + local_switch + '-tunnel'
-            output += create_tunnel(module, tunnel_name, remote_ip,
-                                    local_ip, vrouter_name, leaf)
-            output += add_vxlan_to_tunnel(module, vxlan, tunnel_name, leaf)
-
-    return output
+            create_tunnel(module, tunnel_name, remote_ip, local_ip,
+                          vrouter_name, leaf)
+            add_vxlan_to_tunnel(module, vxlan, tunnel_name, leaf)
 
 
 def add_vxlan_to_tunnel(module, vxlan, tunnel_name, switch):
@@ -297,7 +330,6 @@ def add_vxlan_to_tunnel(module, vxlan, tunnel_name, switch):
     :param vxlan: vxlan id to add to tunnel.
     :param tunnel_name: Name of the tunnel on which vxlan will be added.
     :param switch: Name of the switch on which tunnel exists.
-    :return: String describing if vxlan got added to tunnel or not.
     """
     global CHANGED_FLAG
     cli = pn_cli(module)
@@ -312,13 +344,16 @@ def add_vxlan_to_tunnel(module, vxlan, tunnel_name, switch):
                                                                   vxlan)
         if 'Success' in run_cli(module, cli):
             CHANGED_FLAG.append(True)
-            return ' Added vxlan %s to %s! ' % (vxlan, tunnel_name)
+            EVENTS.changed(switch, 'tunnel-vxlan', tunnel_name, 'create',
+                           'Added vxlan %s to %s' % (vxlan, tunnel_name))
         else:
             CHANGED_FLAG.append(False)
-            return ' Could not add vxlan %s to %s! ' % (vxlan, tunnel_name)
+            EVENTS.add(switch, 'tunnel-vxlan', tunnel_name, 'create', 'failed',
+                       'Could not add vxlan %s to %s' % (vxlan, tunnel_name))
     else:
         CHANGED_FLAG.append(False)
-        return ' vxlan %s already added to %s! ' % (vxlan, tunnel_name)
+        EVENTS.unchanged(switch, 'tunnel-vxlan', tunnel_name,
+                         'vxlan %s already added to %s' % (vxlan, tunnel_name))
 
 
 def add_ports_to_vxlan_loopback_trunk(module, ports):
@@ -359,9 +394,7 @@ def configure_vxlan(module, csv_data):
     Method to parse vxlan data from csv file and configure it.
     :param module: The Ansible module to fetch input parameters.
     :param csv_data: vxlan data in comma separated format.
-    :return: String describing output of vxlan configuration.
     """
-    output = ''
     csv_data = csv_data.replace(" ", "")
     csv_data_list = csv_data.split('\n')
     for row in csv_data_list:
@@ -372,22 +405,20 @@ def configure_vxlan(module, csv_data):
             leaf_switch_2 = elements[3]
             vxlan_id = elements[6]
             loopback_port = elements[7]
-            output += add_vxlan_to_vlan(module, vlan_id, vxlan_id)
-            output += configure_vtep_for_clustered_leafs(module, leaf_switch_1,
-                                                         vlan_id, vxlan_id)
-            output += configure_vtep_for_clustered_leafs(module, leaf_switch_2,
-                                                         vlan_id, vxlan_id)
+            add_vxlan_to_vlan(module, vlan_id, vxlan_id)
+            configure_vtep_for_clustered_leafs(module, leaf_switch_1, vlan_id,
+                                               vxlan_id)
+            configure_vtep_for_clustered_leafs(module, leaf_switch_2, vlan_id,
+                                               vxlan_id)
             add_ports_to_vxlan_loopback_trunk(module, loopback_port)
         elif len(elements) == 5:
             vxlan_id = elements[3]
             loopback_port = elements[4]
-            output += add_vxlan_to_vlan(module, vlan_id, vxlan_id)
-            output += configure_vtep_for_non_clustered_leafs(
-                module, leaf_switch_1, vlan_id, vxlan_id)
+            add_vxlan_to_vlan(module, vlan_id, vxlan_id)
+            configure_vtep_for_non_clustered_leafs(module, leaf_switch_1,
+                                                   vlan_id, vxlan_id)
             add_ports_to_vxlan_loopback_trunk(module, loopback_port)
 
-    return output
-
 
 def main():
     """ This section is for arguments parsing """
@@ -395,17 +426,34 @@ def main():
         argument_spec=dict(
             pn_cliusername=dict(required=False, type='str'),
             pn_clipassword=dict(required=False, type='str', no_log=True),
+            pn_fabric_facts=dict(required=False, type='dict'),
             pn_leaf_list=dict(required=False, type='list'),
             pn_csv_data=dict(required=True, type='str'),
-        )
+            pn_fingerprint_file=dict(required=False, type='str'),
+        ),
+        supports_check_mode=True
     )
 
-    global CHANGED_FLAG
+    global CHANGED_FLAG, EVENTS
     CHANGED_FLAG = []
-    message = configure_vxlan(module, module.params['pn_csv_data'])
+    EVENTS = ChangeEvents()
+    # Tunnels are built between every pair of leafs, so each leaf depends on
+    # the whole csv and the configuration is only skipped as a whole.
+    leaf_list = module.params['pn_leaf_list']
+    fingerprints = Fingerprints(module, 'pn_vxlan', leaf_list, STATE_SHOWS)
+    if fingerprints.all_unchanged(leaf_list):
+        for leaf in leaf_list:
+            EVENTS.add(leaf, 'switch', leaf, 'skip', 'unchanged',
+                       'Unchanged since last run, skipped')
+    else:
+        configure_vxlan(module, module.params['pn_csv_data'])
+    fingerprints.save(EVENTS.events)
 
     module.exit_json(
-        stdout=message,
+        plan=command_plan(),
+        cli_stats=cli_stats(),
+        events=EVENTS.events,
+        stdout=EVENTS.text(),
         error='0',
         failed=False,
         msg='Configured VXLAN successfully.',
@@ -414,5 +462,5 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    run_main(main)
 
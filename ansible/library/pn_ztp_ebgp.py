@@ -71,7 +71,7 @@ def run_cli(module, cli):
     """
 
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_command(module, cli)
     if out:
         return out
 
@@ -424,6 +424,7 @@ def main():
         argument_spec=dict(
             pn_cliusername=dict(required=False, type='str'),
             pn_clipassword=dict(required=False, type='str', no_log=True),
+            pn_fabric_facts=dict(required=False, type='dict'),
             pn_cliswitch=dict(required=False, type='str'),
             pn_fabric_name=dict(required=False, type='str'),
             pn_fabric_network=dict(required=False, type='str',
@@ -485,7 +486,9 @@ def main():
 
 # AnsibleModule boilerplate
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_nvos import run_command
+from ansible.module_utils.pn_profile import run_main
 
 if __name__ == '__main__':
-    main()
+    run_main(main)
 
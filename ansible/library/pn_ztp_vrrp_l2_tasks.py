@@ -39,6 +39,12 @@ options:
         - Provide login password if user is not root.
       required: False
       type: str
+    pn_fabric_facts:
+      description:
+        - pn_fabric fact gathered by pn_fabric_facts. While it is fresh,
+          the fabric discovery shows are answered from it.
+      required: False
+      type: dict
     pn_fabric_name:
       description:
         - Specify name of the fabric.
@@ -83,6 +89,13 @@ options:
       required: False
       default: '100'
       type: str
+    pn_batch_size:
+      description:
+        - Specify the number of vlan and interface creations sent to the
+          switch in one batch.
+      required: False
+      default: 100
+      type: int
 """
 
 EXAMPLES = """
@@ -109,6 +122,21 @@ changed:
   description: Indicates whether the CLI caused changes on the target.
   returned: always
   type: bool
+plan:
+  description: Commands which would be issued, per switch, when run in
+    check mode.
+  returned: check mode
+  type: dict
+cli_stats:
+  description: Calls made to the switches (a batch counts once), the commands
+    they carried, the bytes of output and the seconds spent waiting on them.
+  returned: always
+  type: dict
+events:
+  description: Change events (switch, object, key, action, result, msg), in
+    the order they happened.
+  returned: always
+  type: list
 """
 
 
@@ -142,7 +170,7 @@ def run_cli(module, cli):
     :return: Output/Error or Success msg depending upon the response from cli.
     """
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_command(module, cli)
     if out:
         return out
 
@@ -158,6 +186,32 @@ def run_cli(module, cli):
         return 'Success'
 
 
+def run_cli_batch(module, clis, what):
+    """
+    Method to execute change commands in batches of pn_batch_size, logging
+    the progress after every batch.
+    :param module: The Ansible module to fetch input parameters.
+    :param clis: List of complete cli strings.
+    :param what: Description of the commands used in the progress messages.
+    :return: Output/Error or Success msg depending upon the response from cli.
+    """
+    def progress(done, total):
+        module.log(msg='%s: %d of %d done' % (what, done, total))
+
+    rc, out, err = run_batch(module, clis, module.params['pn_batch_size'],
+                             progress)
+    if rc or err:
+        module.exit_json(
+            error='1',
+            failed=True,
+            stderr=(err or out).strip(),
+            msg='Operation Failed: ' + what,
+            changed=True if True in CHANGED_FLAG else False
+        )
+
+    return out or 'Success'
+
+
 def create_vlan(module, start, end):
     """
     Method to create vlans
@@ -167,31 +221,28 @@ def create_vlan(module, start, end):
     :return: List of created vlans.
     """
     global CHANGED_FLAG
-    vlan = []
-    output = ''
     cli = pn_cli(module)
     clicopy = cli
     clicopy += ' vlan-show format id no-show-headers '
-    already_vlan_id = run_cli(module, clicopy).split()
-    already_vlan_id = list(set(already_vlan_id))
-
-    vlan_id = int(start)
-    while vlan_id < int(end):
-        id_str = str(vlan_id)
-        vlan.append(id_str)
-        if id_str not in already_vlan_id:
-            clicopy = cli
-            clicopy += ' vlan-create id '
-            clicopy += id_str
-            clicopy += ' scope fabric '
-            output += run_cli(module, clicopy)
-            output += ' vlan with id ' + id_str + ' created! '
-            CHANGED_FLAG.append(True)
-        else:
-            output += ' vlan with id ' + id_str + ' already exists! '
-            CHANGED_FLAG.append(False)
+    already_vlan_id = set(run_cli(module, clicopy).split())
+
+    vlan = [str(vlan_id) for vlan_id in range(int(start), int(end))]
+    missing = [vlan_id for vlan_id in vlan if vlan_id not in already_vlan_id]
+
+    if missing:
+        run_cli_batch(module, [cli + ' vlan-create id %s scope fabric ' % vlan_id
+                               for vlan_id in missing], 'vlan-create')
+        CHANGED_FLAG.append(True)
+    else:
+        CHANGED_FLAG.append(False)
 
-        vlan_id += 1
+    for vlan_id in vlan:
+        if vlan_id in missing:
+            EVENTS.changed('', 'vlan', vlan_id, 'create',
+                           'Created vlan %s with scope fabric' % vlan_id)
+        else:
+            EVENTS.unchanged('', 'vlan', vlan_id,
+                             'Vlan %s already exists' % vlan_id)
 
     return vlan
 
@@ -202,11 +253,8 @@ def create_l2_vrouter(module, switch, vrrp_id):
     :param module: The Ansible module to fetch input parameters.
     :param switch: The switch name on which vrouter will be created.
     :param vrrp_id: The vrrp_id to be assigned.
-    :return: The output string informing details of vrouter created and
-    interface added or if vrouter already exists.
     """
     global CHANGED_FLAG
-    output = ''
     switch_temp = switch
     vrouter_name = switch_temp + '-vrouter'
     vnet_name = module.params['pn_fabric_name'] + '-global'
@@ -224,93 +272,125 @@ def create_l2_vrouter(module, switch, vrrp_id):
         cli += ' vrouter-create name %s vnet %s hw-vrrp-id %s enable ' % (
             vrouter_name, vnet_name, vrrp_id)
         run_cli(module, cli)
-        output += ' Created vrouter %s on switch %s! ' % (vrouter_name, switch)
+        EVENTS.changed(switch, 'vrouter', vrouter_name, 'create',
+                       'Created vrouter %s' % vrouter_name)
         CHANGED_FLAG.append(True)
     else:
-        output += ' Vrouter name %s on switch %s already exists! ' % (
-            vrouter_name, switch)
+        EVENTS.unchanged(switch, 'vrouter', vrouter_name,
+                         'Vrouter name %s already exists' % vrouter_name)
         CHANGED_FLAG.append(False)
 
-    return output
+
+def vrouter_interfaces(module):
+    """
+    Method to read the interfaces of all vrouters with a single show.
+    :param module: The Ansible module to fetch input parameters.
+    :return: Dictionary of (vrouter, vlan, ip): nic.
+    """
+    cli = pn_cli(module)
+    cli += ' vrouter-interface-show format vrouter-name,vlan,ip,nic '
+    rc, rows, err = run_show(module, cli)
+    if rc or err:
+        return {}
+    return dict(((row['vrouter-name'], row.get('vlan', ''), row.get('ip', '')),
+                 row.get('nic', '')) for row in rows)
 
 
-def create_l2_interface(module, switch, ip, vlan_id, vrrp_id, ip_count,
-                        vrrp_priority):
+def create_l2_interfaces(module, spine_list, vlan, vrrp_ip, vrrp_id,
+                         active_switch):
     """
-    Method to add vrouter interface and assign IP to it along with
-    vrrp_id and vrrp_priority.
+    Method to add the vrouter interfaces and the vrrp interfaces of every
+    vlan to the spine vrouters. Vrouters, existing interfaces and nics are
+    read once; the missing interfaces are added in batches, first the
+    vrouter interfaces and then the vrrp interfaces which need their nic as
+    vrrp-primary.
     :param module: The Ansible module to fetch input parameters.
-    :param switch: The switch name on which vrouter will be created.
-    :param ip: IP address to be assigned to vrouter interface.
-    :param vlan_id: vlan_id to be assigned
+    :param spine_list: List of spine switches.
+    :param vlan: List of vlan ids.
+    :param vrrp_ip: The vrrp_ip needed to be assigned, $ replaced by vlan.
     :param vrrp_id: vrrp id to be assigned.
-    :param vrrp_priority: priority to be given(110 for active switch).
-    :param ip_count: The value of fourth octet in the ip
-    :return: The output string informing details of vrouter created and
-    interface added or if vrouter already exists.
+    :param active_switch: The name of the active switch.
     """
     global CHANGED_FLAG
-    output = ''
+    added = 0
     cli = pn_cli(module)
     clicopy = cli
-    cli += ' vrouter-show location %s format name no-show-headers ' % switch
-    vrouter_name = run_cli(module, cli).split()
+    cli += ' vrouter-show format name,location '
+    rc, rows, err = run_show(module, cli)
+    vrouters = dict((row.get('location'), row['name']) for row in rows)
 
-    ip_addr = ip.split('.')
-    fourth = ip_addr[3].split('/')
-    subnet = fourth[1]
-
-    first = ip_addr[0] + '.' + ip_addr[1] + '.' + ip_addr[2] + '.'
-    ip1 = first + '1' + '/' + subnet
-    ip2 = first + ip_count + '/' + subnet
-
-    cli = clicopy
-    cli += ' vrouter-interface-show vlan %s ip %s ' % (vlan_id, ip2)
-    cli += ' format switch no-show-headers '
-    existing_vrouter = run_cli(module, cli).split()
-    existing_vrouter = list(set(existing_vrouter))
-
-    if vrouter_name[0] not in existing_vrouter:
-        cli = clicopy
-        cli += ' vrouter-interface-add vrouter-name ' + vrouter_name[0]
-        cli += ' ip ' + ip2
-        cli += ' vlan %s if data ' % vlan_id
-        run_cli(module, cli)
-        output += ' Added vrouter interface with ip %s ' % ip2
-        CHANGED_FLAG.append(True)
-    else:
-        output += ' Interface already exists for vrouter %s! ' % vrouter_name[0]
-        CHANGED_FLAG.append(False)
-
-    cli = clicopy
-    cli += ' vrouter-interface-show vrouter-name %s ip %s vlan %s ' % (
-        vrouter_name[0], ip2, vlan_id)
-    cli += ' format nic no-show-headers '
-    eth_port = run_cli(module, cli).split()
-    eth_port.remove(vrouter_name[0])
-
-    cli = clicopy
-    cli += ' vrouter-interface-show vlan %s ip %s vrrp-primary %s ' % (
-        vlan_id, ip1, eth_port[0])
-    cli += ' format switch no-show-headers '
-    existing_vrouter = run_cli(module, cli).split()
-    existing_vrouter = list(set(existing_vrouter))
-
-    if vrouter_name[0] not in existing_vrouter:
+    vrrp_ip_segment = vrrp_ip.split('.')
+    subnet = vrrp_ip_segment[3].split('/')[1]
+    plan = []
+    host_count = 1
+    for spine in spine_list:
+        host_count += 1
+        if spine not in vrouters:
+            EVENTS.add(spine, 'vrouter-interface', '', 'skip', 'unchanged',
+                       'No vrouter found on switch %s' % spine)
+            continue
+        vrrp_priority = '110' if spine == active_switch else '100'
+        for vlan_id in vlan:
+            first = vrrp_ip_segment[0] + '.' + vrrp_ip_segment[1] + '.'
+            first += vlan_id + '.'
+            plan.append((spine, vrouters[spine], vlan_id,
+                         first + str(host_count) + '/' + subnet,
+                         first + '1' + '/' + subnet, vrrp_priority))
+
+    interfaces = vrouter_interfaces(module)
+    clis = []
+    adds = []
+    for switch, vrouter_name, vlan_id, ip2, ip1, vrrp_priority in plan:
+        if (vrouter_name, vlan_id, ip2) not in interfaces:
+            cli = clicopy
+            cli += ' vrouter-interface-add vrouter-name ' + vrouter_name
+            cli += ' ip ' + ip2
+            cli += ' vlan %s if data ' % vlan_id
+            clis.append(cli)
+            adds.append((switch, ip2, 'Added vrouter interface with ip %s '
+                         'on %s' % (ip2, vrouter_name)))
+        else:
+            EVENTS.unchanged(switch, 'vrouter-interface', ip2,
+                             'Vrouter interface %s already exists on %s' % (
+                                 ip2, vrouter_name))
+
+    if clis:
+        run_cli_batch(module, clis, 'vrouter-interface-add')
+        for switch, ip, msg in adds:
+            EVENTS.changed(switch, 'vrouter-interface', ip, 'create', msg)
+        added += len(clis)
+        interfaces = vrouter_interfaces(module)
+
+    clis = []
+    adds = []
+    for switch, vrouter_name, vlan_id, ip2, ip1, vrrp_priority in plan:
+        if (vrouter_name, vlan_id, ip1) in interfaces:
+            EVENTS.unchanged(switch, 'vrouter-interface', ip1,
+                             'Vrrp interface %s already exists on %s' % (
+                                 ip1, vrouter_name))
+            continue
+        eth_port = interfaces.get((vrouter_name, vlan_id, ip2))
+        if not eth_port:
+            EVENTS.add(switch, 'vrouter-interface', ip1, 'skip', 'unchanged',
+                       'No interface with ip %s found on vrouter %s' % (
+                           ip2, vrouter_name))
+            continue
         cli = clicopy
-        cli += ' vrouter-interface-add vrouter-name ' + vrouter_name[0]
+        cli += ' vrouter-interface-add vrouter-name ' + vrouter_name
         cli += ' ip ' + ip1
         cli += ' vlan %s if data vrrp-id %s ' % (vlan_id, vrrp_id)
-        cli += ' vrrp-primary %s vrrp-priority %s ' % (eth_port[0],
-                                                       vrrp_priority)
-        run_cli(module, cli)
-        output += ' Added vrouter interface with ip %s ' % ip1
-        CHANGED_FLAG.append(True)
-    else:
-        output += ' Interface already exists for vrouter %s! ' % vrouter_name[0]
-        CHANGED_FLAG.append(False)
+        cli += ' vrrp-primary %s vrrp-priority %s ' % (eth_port, vrrp_priority)
+        clis.append(cli)
+        adds.append((switch, ip1, 'Added vrrp interface with ip %s on %s' % (
+            ip1, vrouter_name)))
+
+    if clis:
+        run_cli_batch(module, clis, 'vrouter-interface-add vrrp')
+        for switch, ip, msg in adds:
+            EVENTS.changed(switch, 'vrouter-interface', ip, 'create', msg)
+        added += len(clis)
 
-    return output
+    CHANGED_FLAG.append(True if added else False)
 
 
 def configure_vrrp(module, vrrp_id, no_interface, vrrp_ip, active_switch,
@@ -323,37 +403,18 @@ def configure_vrrp(module, vrrp_id, no_interface, vrrp_ip, active_switch,
     :param vrrp_ip: The vrrp_ip needed to be assigned.
     :param active_switch: The name of the active switch.
     :param vlan_range: The vlan_range for creating the vlans.
-    :return: It returns the output of the configuration
     """
-    output = ''
     spine_list = module.params['pn_spine_list']
     vlan_range_split = vlan_range.split('-')
     start = vlan_range_split[0]
     end_no_interface = int(start) + int(no_interface)
     vlan = create_vlan(module, start, end_no_interface)
 
-    output += ' vlans starting with %s to %s created! ' % (
-        str(start), str(end_no_interface))
-
     for spine in spine_list:
-        output += create_l2_vrouter(module, spine, vrrp_id)
+        create_l2_vrouter(module, spine, vrrp_id)
 
-    vrrp_ip_segment = vrrp_ip.split('.')
-    host_count = 1
-    for spine in spine_list:
-        host_count += 1
-        if spine == active_switch:
-            vrrp_priority = '110'
-        else:
-            vrrp_priority = '100'
-
-        for vlan_id in vlan:
-            ip = vrrp_ip_segment[0] + '.' + vrrp_ip_segment[1] + '.'
-            ip += vlan_id + '.' + vrrp_ip_segment[3]
-            output += create_l2_interface(module, spine, ip, vlan_id, vrrp_id,
-                                          str(host_count), vrrp_priority)
-
-    return output
+    create_l2_interfaces(module, spine_list, vlan, vrrp_ip, vrrp_id,
+                         active_switch)
 
 
 def main():
@@ -363,6 +424,7 @@ def main():
         argument_spec=dict(
             pn_cliusername=dict(required=False, type='str'),
             pn_clipassword=dict(required=False, type='str', no_log=True),
+            pn_fabric_facts=dict(required=False, type='dict'),
             pn_fabric_name=dict(required=True, type='str'),
             pn_spine_list=dict(required=False, type='list'),
             pn_leaf_list=dict(required=False, type='list'),
@@ -371,21 +433,27 @@ def main():
                             dafault='101.101.$.0/24'),
             pn_active_switch=dict(required=False, type='str'),
             pn_vlan_range=dict(required=False, type='str', default='101-200'),
-            pn_vrrp_no_interface=dict(required=False, type='str', default='100')
+            pn_vrrp_no_interface=dict(required=False, type='str', default='100'),
+            pn_batch_size=dict(required=False, type='int', default=100),
 
-        )
+        ),
+        supports_check_mode=True
     )
 
-    global CHANGED_FLAG
+    global CHANGED_FLAG, EVENTS
     CHANGED_FLAG = []
-    message = configure_vrrp(module, module.params['pn_vrrp_id'],
-                             module.params['pn_vrrp_no_interface'],
-                             module.params['pn_vrrp_ip'],
-                             module.params['pn_active_switch'],
-                             module.params['pn_vlan_range'])
+    EVENTS = ChangeEvents()
+    configure_vrrp(module, module.params['pn_vrrp_id'],
+                   module.params['pn_vrrp_no_interface'],
+                   module.params['pn_vrrp_ip'],
+                   module.params['pn_active_switch'],
+                   module.params['pn_vlan_range'])
 
     module.exit_json(
-        stdout=message,
+        plan=command_plan(),
+        cli_stats=cli_stats(),
+        events=EVENTS.events,
+        stdout=EVENTS.text(),
         error='0',
         failed=False,
         msg='VRRP Layer 2 Setup completed successfully',
@@ -395,7 +463,11 @@ def main():
 
 # AnsibleModule boilerplate
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_events import ChangeEvents
+from ansible.module_utils.pn_nvos import (cli_stats, command_plan, run_batch,
+                                          run_command, run_show)
+from ansible.module_utils.pn_profile import run_main
 
 if __name__ == '__main__':
-    main()
+    run_main(main)
 
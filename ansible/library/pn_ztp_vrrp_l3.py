@@ -19,6 +19,10 @@
 #
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_fingerprint import Fingerprints
+from ansible.module_utils.pn_events import ChangeEvents
+from ansible.module_utils.pn_nvos import cli_stats, command_plan, run_command
+from ansible.module_utils.pn_profile import run_main
 import shlex
 
 DOCUMENTATION = """
@@ -38,6 +42,12 @@ options:
         - Provide login password if user is not root.
       required: False
       type: str
+    pn_fabric_facts:
+      description:
+        - pn_fabric fact gathered by pn_fabric_facts. While it is fresh,
+          the fabric discovery shows are answered from it.
+      required: False
+      type: dict
     pn_spine_list:
       description:
         - Specify list of Spine hosts
@@ -53,6 +63,12 @@ options:
         - String containing vrrp data parsed from csv file.
       required: False
       type: str
+    pn_fingerprint_file:
+      description:
+        - File to record per switch input and state digests in. Switches
+          unchanged since the last run are skipped.
+      required: False
+      type: str
 """
 
 EXAMPLES = """
@@ -78,9 +94,34 @@ failed:
   description: Indicates whether or not the execution failed on the target.
   returned: always
   type: bool
+plan:
+  description: Commands which would be issued, per switch, when run in
+    check mode.
+  returned: check mode
+  type: dict
+cli_stats:
+  description: Calls made to the switches (a batch counts once), the commands
+    they carried, the bytes of output and the seconds spent waiting on them.
+  returned: always
+  type: dict
+events:
+  description: Change events (switch, object, key, action, result, msg), in
+    the order they happened.
+  returned: always
+  type: list
 """
 
 CHANGED_FLAG = []
+EVENTS = ChangeEvents()
+
+# Tables configured by this module, digested per switch.
+STATE_SHOWS = (
+    ' vlan-show format id ',
+    ' cluster-show format name,cluster-node-1,cluster-node-2 ',
+    ' vrouter-show format name,location,hw-vrrp-id ',
+    ' vrouter-interface-show format vrouter-name,ip,vlan,vrrp-id,'
+    'vrrp-priority ',
+)
 
 
 def pn_cli(module):
@@ -110,7 +151,7 @@ def run_cli(module, cli):
     the response from cli.
     """
     cli = shlex.split(cli)
-    rc, out, err = module.run_command(cli)
+    rc, out, err = run_command(module, cli)
     if out:
         return out
 
@@ -145,7 +186,6 @@ def create_vlan(module, vlan_id, switch):
     :param module: The Ansible module to fetch input parameters.
     :param vlan_id: vlan id to be created.
     :param switch: Name of the switch on which vlan creation will be executed.
-    :return: String describing if vlan got created or if it already exists.
     """
     global CHANGED_FLAG
     cli = pn_cli(module)
@@ -159,14 +199,14 @@ def create_vlan(module, vlan_id, switch):
         cli += ' vlan-create id %s scope fabric ' % vlan_id
         run_cli(module, cli)
         CHANGED_FLAG.append(True)
-        return ' %s: Vlan id %s with scope fabric created successfully \n' % (
-            switch, vlan_id
-        )
+        EVENTS.changed(switch, 'vlan', vlan_id, 'create',
+                       'Vlan id %s with scope fabric created successfully' %
+                       vlan_id)
 
     else:
-        return ' %s: Vlan id %s with scope fabric already exists \n' % (
-            switch, vlan_id
-        )
+        EVENTS.unchanged(switch, 'vlan', vlan_id,
+                         'Vlan id %s with scope fabric already exists' %
+                         vlan_id)
 
 
 def create_vrouter(module, switch, vrrp_id, vnet_name):
@@ -176,10 +216,8 @@ def create_vrouter(module, switch, vrrp_id, vnet_name):
     :param switch: The switch name on which vrouter will be created.
     :param vrrp_id: The vrrp_id to be assigned.
     :param vnet_name: The name of the vnet for vrouter creation.
-    :return: String describing if vrouter got created or if it already exists.
     """
     global CHANGED_FLAG
-    output = ''
     vrouter_name = str(switch) + '-vrouter'
     cli = pn_cli(module)
     cli += ' switch ' + switch
@@ -195,7 +233,8 @@ def create_vrouter(module, switch, vrrp_id, vnet_name):
         cli += ' vrouter-create name %s vnet %s hw-vrrp-id %s enable ' % (
             vrouter_name, vnet_name, vrrp_id)
         run_cli(module, cli)
-        output = ' %s: Created vrouter with name %s \n' % (switch, vrouter_name)
+        EVENTS.changed(switch, 'vrouter', vrouter_name, 'create',
+                       'Created vrouter with name %s' % vrouter_name)
         CHANGED_FLAG.append(True)
     else:
         cli = clicopy
@@ -208,9 +247,14 @@ def create_vrouter(module, switch, vrrp_id, vnet_name):
             cli += ' vrouter-modify name %s hw-vrrp-id %s ' % (vrouter_name,
                                                                vrrp_id)
             run_cli(module, cli)
+            EVENTS.changed(switch, 'vrouter', vrouter_name, 'modify',
+                           'Assigned hw-vrrp-id %s to %s' % (vrrp_id,
+                                                             vrouter_name))
             CHANGED_FLAG.append(True)
-
-    return output
+        else:
+            EVENTS.unchanged(switch, 'vrouter', vrouter_name,
+                             'Vrouter with name %s already exists' %
+                             vrouter_name)
 
 
 def create_vrouter_interface(module, switch, ip, vlan_id, vrrp_id,
@@ -225,7 +269,6 @@ def create_vrouter_interface(module, switch, ip, vlan_id, vrrp_id,
     :param vrrp_id: vrrp_id to be assigned.
     :param vrrp_priority: priority to be given(110 for active switch).
     :param ip_count: The value of fourth octet in the ip
-    :return: String describing if vrouter interface got added or not.
     """
     global CHANGED_FLAG
     vrouter_name = get_vrouter_name(module, switch)
@@ -251,14 +294,14 @@ def create_vrouter_interface(module, switch, ip, vlan_id, vrrp_id,
         cli += ' ip ' + ip2
         cli += ' vlan %s if data ' % vlan_id
         run_cli(module, cli)
-        output = ' %s: Added vrouter interface with ip %s to %s \n' % (
-            switch, ip2, vrouter_name
-        )
+        EVENTS.changed(switch, 'vrouter-interface', ip2, 'create',
+                       'Added vrouter interface with ip %s to %s' % (
+                           ip2, vrouter_name))
         CHANGED_FLAG.append(True)
     else:
-        output = ' %s: Vrouter interface %s already exists for %s \n' % (
-            switch, ip2, vrouter_name
-        )
+        EVENTS.unchanged(switch, 'vrouter-interface', ip2,
+                         'Vrouter interface %s already exists for %s' % (
+                             ip2, vrouter_name))
 
     cli = clicopy
     cli += ' vrouter-interface-show vrouter-name %s ip %s vlan %s ' % (
@@ -285,17 +328,15 @@ def create_vrouter_interface(module, switch, ip, vlan_id, vrrp_id,
         cli += ' vrrp-primary %s vrrp-priority %s ' % (eth_port[0],
                                                        vrrp_priority)
         run_cli(module, cli)
-        output += ' %s: Added vrouter interface with ip %s to %s \n' % (
-            switch, ip_vip, vrouter_name
-        )
+        EVENTS.changed(switch, 'vrouter-interface', ip_vip, 'create',
+                       'Added vrouter interface with ip %s to %s' % (
+                           ip_vip, vrouter_name))
         CHANGED_FLAG.append(True)
 
     else:
-        output += ' %s: Vrouter interface %s already exists for %s \n' % (
-            switch, ip_vip, vrouter_name
-        )
-
-    return output
+        EVENTS.unchanged(switch, 'vrouter-interface', ip_vip,
+                         'Vrouter interface %s already exists for %s' % (
+                             ip_vip, vrouter_name))
 
 
 def create_cluster(module, switch, name, node1, node2):
@@ -306,7 +347,6 @@ def create_cluster(module, switch, name, node1, node2):
     :param name: The name of the cluster to create.
     :param node1: First node of the cluster.
     :param node2: Second node of the cluster.
-    :return: The output of run_cli() method.
     """
     global CHANGED_FLAG
     cli = pn_cli(module)
@@ -319,9 +359,10 @@ def create_cluster(module, switch, name, node1, node2):
         cli += ' cluster-node-1 %s cluster-node-2 %s ' % (node1, node2)
         if 'Success' in run_cli(module, cli):
             CHANGED_FLAG.append(True)
-            return ' %s: %s created successfully \n' % (switch, name)
+            EVENTS.changed(switch, 'cluster', name, 'create',
+                           '%s created successfully' % name)
     else:
-        return ' %s: %s already exists \n' % (switch, name)
+        EVENTS.unchanged(switch, 'cluster', name, '%s already exists' % name)
 
 
 def create_vrouter_without_vrrp(module, switch, vnet_name):
@@ -330,7 +371,6 @@ def create_vrouter_without_vrrp(module, switch, vnet_name):
     :param module: The Ansible module to fetch input parameters.
     :param switch: The switch name on which vrouter will be created.
     :param vnet_name: The name of the vnet for vrouter creation.
-    :return: String describing if vrouter got created or if it already exists.
     """
     global CHANGED_FLAG
     vrouter_name = str(switch) + '-vrouter'
@@ -347,13 +387,12 @@ def create_vrouter_without_vrrp(module, switch, vnet_name):
         cli = clicopy
         cli += ' vrouter-create name %s vnet %s ' % (vrouter_name, vnet_name)
         run_cli(module, cli)
-        output = ' %s: Created vrouter with name %s \n' % (switch, vrouter_name)
+        EVENTS.changed(switch, 'vrouter', vrouter_name, 'create',
+                       'Created vrouter with name %s' % vrouter_name)
         CHANGED_FLAG.append(True)
     else:
-        output = ' %s: Vrouter with name %s already exists \n' % (switch,
-                                                                  vrouter_name)
-
-    return output
+        EVENTS.unchanged(switch, 'vrouter', vrouter_name,
+                         'Vrouter with name %s already exists' % vrouter_name)
 
 
 def configure_vrrp_for_non_cluster_leafs(module, ip, non_cluster_leaf, vlan_id):
@@ -363,7 +402,6 @@ def configure_vrrp_for_non_cluster_leafs(module, ip, non_cluster_leaf, vlan_id):
     :param ip: IP address for the default gateway
     :param non_cluster_leaf: Name of non-cluster leaf switch.
     :param vlan_id: The vlan id to be assigned.
-    :return: String describing whether interfaces got added or not.
     """
     global CHANGED_FLAG
     vrouter_name = get_vrouter_name(module, non_cluster_leaf)
@@ -390,14 +428,14 @@ def configure_vrrp_for_non_cluster_leafs(module, ip, non_cluster_leaf, vlan_id):
         cli += ' ip ' + ip_gateway
         run_cli(module, cli)
         CHANGED_FLAG.append(True)
-        return ' %s: Added vrouter interface with ip %s on %s \n' % (
-            non_cluster_leaf, ip_gateway, vrouter_name
-        )
+        EVENTS.changed(non_cluster_leaf, 'vrouter-interface', ip_gateway,
+                       'create', 'Added vrouter interface with ip %s on %s' % (
+                           ip_gateway, vrouter_name))
 
     else:
-        return ' %s: Vrouter interface %s already exists on %s \n' % (
-            non_cluster_leaf, ip_gateway, vrouter_name
-        )
+        EVENTS.unchanged(non_cluster_leaf, 'vrouter-interface', ip_gateway,
+                         'Vrouter interface %s already exists on %s' % (
+                             ip_gateway, vrouter_name))
 
 
 def configure_vrrp_for_clustered_switches(module, vrrp_id, vrrp_ip,
@@ -410,7 +448,6 @@ def configure_vrrp_for_clustered_switches(module, vrrp_id, vrrp_ip,
     :param active_switch: The name of the active switch.
     :param vlan_id: vlan id to be assigned.
     :param switch_list: List of clustered switches.
-    :return: The output of the configuration.
     """
     node1 = switch_list[0]
     node2 = switch_list[1]
@@ -418,22 +455,19 @@ def configure_vrrp_for_clustered_switches(module, vrrp_id, vrrp_ip,
         
     host_count = 1
 
-    output = create_cluster(module, node2, name, node1, node2)
-    output += create_vlan(module, vlan_id, node2)
+    create_cluster(module, node2, name, node1, node2)
+    create_vlan(module, vlan_id, node2)
 
     vnet_name = get_global_vnet_name(module)
 
     for switch in switch_list:
-        output += create_vrouter(module, switch, vrrp_id, vnet_name)
+        create_vrouter(module, switch, vrrp_id, vnet_name)
 
     for switch in switch_list:
         host_count += 1
         vrrp_priority = '110' if switch == active_switch else '100'
-        output += create_vrouter_interface(module, switch, vrrp_ip, vlan_id,
-                                           vrrp_id, str(host_count),
-                                           vrrp_priority)
-
-    return output
+        create_vrouter_interface(module, switch, vrrp_ip, vlan_id, vrrp_id,
+                                 str(host_count), vrrp_priority)
 
 
 def configure_vrrp_for_non_clustered_switches(module, vlan_id, ip,
@@ -444,33 +478,60 @@ def configure_vrrp_for_non_clustered_switches(module, vlan_id, ip,
     :param vlan_id: vlan id to be assigned.
     :param ip: Ip address to be assigned.
     :param non_cluster_leaf: Name of non-clustered leaf switch.
-    :return: Output string of configuration.
     """
     vnet_name = get_global_vnet_name(module)
-    output = create_vrouter_without_vrrp(module, non_cluster_leaf, vnet_name)
-    output += create_vlan(module, vlan_id, non_cluster_leaf)
-    output += configure_vrrp_for_non_cluster_leafs(module, ip,
-                                                   non_cluster_leaf, vlan_id)
-    return output
+    create_vrouter_without_vrrp(module, non_cluster_leaf, vnet_name)
+    create_vlan(module, vlan_id, non_cluster_leaf)
+    configure_vrrp_for_non_cluster_leafs(module, ip, non_cluster_leaf, vlan_id)
+
+
+def csv_rows(csv_data):
+    """
+    Method to split the vrrp csv data into rows.
+    :param csv_data: String containing vrrp data passed from csv file.
+    :return: List of rows, each a list of its elements.
+    """
+    csv_data = csv_data.replace(" ", "")
+    return [row.split(',') for row in csv_data.split('\n')]
+
+
+def row_switches(elements):
+    """
+    Method to find the leaf switches a vrrp csv row configures.
+    :param elements: The elements of the csv row.
+    :return: List of leaf switches.
+    """
+    if len(elements) > 5:
+        return [str(elements[2]), str(elements[3])]
+    return [str(elements[2])]
+
+
+def skipped(switch):
+    EVENTS.add(switch, 'switch', switch, 'skip', 'unchanged',
+               'Unchanged since last run, skipped')
 
 
-def configure_vrrp(module, csv_data):
+def configure_vrrp(module, csv_data, fingerprints):
     """
     Method to configure VRRP L3.
     :param module: The Ansible module to fetch input parameters.
     :param csv_data: String containing vrrp data passed from csv file.
-    :return: Output string of configuration.
+    :param fingerprints: Fingerprints of the switches.
     """
-    output = ''
     vnet_name = get_global_vnet_name(module)
     for switch in module.params['pn_spine_list']:
-        output += create_vrouter_without_vrrp(module, switch, vnet_name)
+        if fingerprints.unchanged(switch):
+            skipped(switch)
+            continue
+        create_vrouter_without_vrrp(module, switch, vnet_name)
 
-    csv_data = csv_data.replace(" ", "")
-    csv_data_list = csv_data.split('\n')
     # Parse csv file data and configure VRRP.
-    for row in csv_data_list:
-        elements = row.split(',')
+    for elements in csv_rows(csv_data):
+        if fingerprints.all_unchanged(row_switches(elements)):
+            for switch in row_switches(elements):
+                skipped(switch)
+            continue
+
         switch_list = []
         vlan_id = elements[0]
         vrrp_ip = elements[1]
@@ -481,18 +542,13 @@ def configure_vrrp(module, csv_data):
             active_switch = str(elements[5])
             switch_list.append(leaf_switch_1)
             switch_list.append(leaf_switch_2)
-            output += configure_vrrp_for_clustered_switches(module, vrrp_id,
-                                                            vrrp_ip,
-                                                            active_switch,
-                                                            vlan_id,
-                                                            switch_list)
+            configure_vrrp_for_clustered_switches(module, vrrp_id, vrrp_ip,
+                                                  active_switch, vlan_id,
+                                                  switch_list)
 
         else:
-            output += configure_vrrp_for_non_clustered_switches(module, vlan_id,
-                                                                vrrp_ip,
-                                                                leaf_switch_1)
-
-    return output
+            configure_vrrp_for_non_clustered_switches(module, vlan_id, vrrp_ip,
+                                                      leaf_switch_1)
 
 
 def get_global_vnet_name(module):
@@ -513,17 +569,35 @@ def main():
         argument_spec=dict(
             pn_cliusername=dict(required=False, type='str'),
             pn_clipassword=dict(required=False, type='str', no_log=True),
+            pn_fabric_facts=dict(required=False, type='dict'),
             pn_spine_list=dict(required=False, type='list'),
             pn_leaf_list=dict(required=False, type='list'),
             pn_csv_data=dict(required=True, type='str'),
-        )
+            pn_fingerprint_file=dict(required=False, type='str'),
+        ),
+        supports_check_mode=True
     )
 
     global CHANGED_FLAG
-    message = configure_vrrp(module, module.params['pn_csv_data'])
+    csv_data = module.params['pn_csv_data']
+    switch_list = list(module.params['pn_spine_list'])
+    inputs = {}
+    for elements in csv_rows(csv_data):
+        for switch in row_switches(elements):
+            if switch not in switch_list:
+                switch_list.append(switch)
+            inputs.setdefault(switch, []).append(elements)
+
+    fingerprints = Fingerprints(module, 'pn_ztp_vrrp_l3', switch_list,
+                                STATE_SHOWS, inputs, ignore=('pn_csv_data',))
+    configure_vrrp(module, csv_data, fingerprints)
+    fingerprints.save(EVENTS.events)
 
     module.exit_json(
-        stdout=message,
+        plan=command_plan(),
+        cli_stats=cli_stats(),
+        events=EVENTS.events,
+        stdout=EVENTS.text(),
         error='0',
         failed=False,
         changed=True if True in CHANGED_FLAG else False
@@ -531,5 +605,5 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    run_main(main)
 
@@ -0,0 +1,195 @@
+""" BGP AS and router-id planning for the pn_* fabric modules """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+# The AS map is computed from the inventory groups and one cluster snapshot:
+#
+#   - every spine shares the base AS (pn_bgp_as_range),
+#   - a leaf cluster (both nodes in the leaf list) gets one AS,
+#   - every other leaf gets its own AS.
+#
+# Leaf units are numbered in the order the modules have always used: the
+# pn_ebgp_ospf family numbers the clusters first, in cluster-show order, and
+# then the other leafs, while pn_fabric_over_l3 numbers the other leafs first
+# and then the clusters. The other leafs are taken in name order, so the same
+# inventory always yields the same map. The previous map is read from the
+# configured vrouters (configured_as_map) and from pn_bgp_as_map: switches
+# keep the AS they already have and new units are numbered above the highest
+# AS in use, so adding switches never renumbers the existing ones.
+
+import json
+
+from ansible.module_utils.pn_nvos import run_show
+
+
+def cluster_snapshot(module, cli):
+    """
+    Method to read every cluster and its nodes with a single show.
+    :param module: The Ansible module to fetch input parameters.
+    :param cli: The cli prefix returned by the module's pn_cli().
+    :return: List of (cluster name, node1, node2) tuples.
+    """
+    cli += ' cluster-show format name,cluster-node-1,cluster-node-2 '
+    rc, rows, err = run_show(module, cli)
+    if rc or err:
+        return []
+    return [(row['name'], row['cluster-node-1'], row['cluster-node-2'])
+            for row in rows]
+
+
+def configured_as_map(module, cli):
+    """
+    Method to read the bgp-as of the vrouters configured already.
+    :param module: The Ansible module to fetch input parameters.
+    :param cli: The cli prefix returned by the module's pn_cli().
+    :return: Dictionary of switch: bgp-as (as string).
+    """
+    rc, rows, err = run_show(module,
+                             cli + ' vrouter-show format location,bgp-as ')
+    if rc or err:
+        return {}
+    return dict((row['location'], row['bgp-as']) for row in rows
+                if row.get('location') and row.get('bgp-as', '').isdigit())
+
+
+def leaf_units(leaf_list, clusters, clusters_first=True):
+    """
+    Method to group leafs into the units that share one AS.
+    :param leaf_list: List of leaf switches.
+    :param clusters: List of (cluster name, node1, node2) tuples.
+    :param clusters_first: Whether the clusters come before the other leafs.
+    :return: List of leaf tuples, the clusters in the given order and the
+    other leafs in name order.
+    """
+    leafs = set(leaf_list)
+    clustered = set()
+    cluster_units = []
+    for cluster in clusters:
+        node1, node2 = cluster[-2], cluster[-1]
+        if (node1 in leafs and node2 in leafs and
+                node1 not in clustered and node2 not in clustered):
+            cluster_units.append((node1, node2))
+            clustered.update((node1, node2))
+
+    single_units = [(leaf,) for leaf in sorted(leafs - clustered)]
+    if clusters_first:
+        return cluster_units + single_units
+    return single_units + cluster_units
+
+
+def plan_bgp_as(spine_list, leaf_list, clusters, bgp_as_range, previous=None,
+                clusters_first=True):
+    """
+    Method to compute the bgp-as of every switch.
+    :param spine_list: List of spine switches.
+    :param leaf_list: List of leaf switches.
+    :param clusters: List of (cluster name, node1, node2) tuples.
+    :param bgp_as_range: The AS assigned to the spines.
+    :param previous: Optional map from an earlier run to keep stable.
+    :param clusters_first: Whether new clusters are numbered before the
+    other leafs.
+    :return: Dictionary of switch: bgp-as (as string).
+    """
+    previous = previous or {}
+    spine_as = int(bgp_as_range)
+    as_map = {}
+    for spine in spine_list or []:
+        as_map[spine] = str(spine_as)
+
+    units = leaf_units(leaf_list or [], clusters, clusters_first)
+    used = set([spine_as])
+    pending = []
+    for unit in units:
+        known = [int(previous[leaf]) for leaf in unit if leaf in previous]
+        if known and known[0] not in used:
+            for leaf in unit:
+                as_map[leaf] = str(known[0])
+            used.add(known[0])
+        else:
+            pending.append(unit)
+
+    next_as = max(used) + 1
+    for unit in pending:
+        for leaf in unit:
+            as_map[leaf] = str(next_as)
+        next_as += 1
+
+    return as_map
+
+
+def plan_router_ids(vrouter_rows, loopback_rows):
+    """
+    Method to compute the router-id of every vrouter from its loopback ip.
+    :param vrouter_rows: Rows of vrouter-show with name, location and
+    router-id.
+    :param loopback_rows: Rows of vrouter-loopback-interface-show with
+    vrouter-name and ip.
+    :return: Dictionary of vrouter: (switch, router-id, current router-id).
+    """
+    loopbacks = {}
+    for row in loopback_rows:
+        loopbacks.setdefault(row['vrouter-name'], row['ip'].split('/')[0])
+
+    plan = {}
+    for row in vrouter_rows:
+        vrouter = row['name']
+        if vrouter in loopbacks:
+            plan[vrouter] = (row.get('location', ''), loopbacks[vrouter],
+                             row.get('router-id', ''))
+    return plan
+
+
+def router_id_snapshot(module, cli):
+    """
+    Method to read vrouters and their loopbacks with one show each and plan
+    their router-ids.
+    :param module: The Ansible module to fetch input parameters.
+    :param cli: The cli prefix returned by the module's pn_cli().
+    :return: Output of plan_router_ids().
+    """
+    rc, vrouters, err = run_show(
+        module, cli + ' vrouter-show format name,location,router-id ')
+    if rc or err:
+        return {}
+    rc, loopbacks, err = run_show(
+        module, cli + ' vrouter-loopback-interface-show format vrouter-name,ip ')
+    if rc or err:
+        return {}
+    return plan_router_ids(vrouters, loopbacks)
+
+
+def dump_as_map(as_map):
+    """
+    Method to export an AS map as JSON.
+    :param as_map: Dictionary of switch: bgp-as.
+    :return: JSON string with sorted keys.
+    """
+    return json.dumps(as_map, sort_keys=True, indent=2)
+
+
+def load_as_map(data):
+    """
+    Method to import an AS map given as dictionary or JSON string.
+    :param data: The map or its JSON form.
+    :return: Dictionary of switch: bgp-as (as string).
+    """
+    if not data:
+        return {}
+    if not isinstance(data, dict):
+        data = json.loads(data)
+    return dict((switch, str(bgp_as)) for switch, bgp_as in data.items())
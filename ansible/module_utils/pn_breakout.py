@@ -0,0 +1,144 @@
+""" 40G to 10G breakout planning for the pn_* modules """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+# A 40G port N without an LLDP neighbor is broken out into the four 10G
+# ports N to N+3 when the bezel port of N+1 is a sub-port (N.2). The port
+# config, bezel port and LLDP tables are read once and every group is
+# planned from them. All groups are then converted with three range based
+# commands (disable the 40G ports, set them to 10g, enable the 10G ranges)
+# and, instead of sleeping a fixed time, port-config-show is polled until
+# every port of the groups is listed at 10g and enabled. port-show is no use
+# for this: the groups are the ports without an LLDP neighbor, which often
+# have no link and are then left out of port-show altogether, while
+# port-config-show lists every port of the switch.
+
+import time
+
+from ansible.module_utils.pn_nvos import run_show, run_shows
+
+BREAKOUT_SHOWS = (
+    ('ports', ' port-config-show format port,speed '),
+    ('bezel', ' port-show format port,bezel-port '),
+    ('lldp', ' lldp-show format local-port '),
+)
+
+
+def breakout_snapshot(module, cli):
+    """
+    Method to read the tables the breakout is planned from.
+    :param module: The Ansible module to fetch input parameters.
+    :param cli: The cli prefix, including the switch scope if any.
+    :return: Tuple of (port config rows, dictionary of port: bezel-port,
+    list of ports with an LLDP neighbor).
+    """
+    results = run_shows(module, [cli + show for _, show in BREAKOUT_SHOWS])
+    rows = {}
+    for (name, _), (rc, show_rows, err) in zip(BREAKOUT_SHOWS, results):
+        rows[name] = [] if rc or err else show_rows
+    bezel = dict((row.get('port'), row.get('bezel-port', ''))
+                 for row in rows['bezel'])
+    lldp_ports = [row.get('local-port') for row in rows['lldp']]
+    return rows['ports'], bezel, lldp_ports
+
+
+def plan_breakout(ports, bezel, lldp_ports):
+    """
+    Method to find the 40G ports to break out.
+    :param ports: Rows of port-config-show with port and speed.
+    :param bezel: Dictionary of port: bezel-port.
+    :param lldp_ports: Ports with an LLDP neighbor, which are left alone.
+    :return: Sorted list of the first port of every group of four.
+    """
+    connected = set(lldp_ports)
+    groups = set()
+    for row in ports:
+        port = row.get('port', '')
+        if (row.get('speed') == '40g' and port.isdigit() and
+                port not in connected and
+                '.2' in bezel.get(str(int(port) + 1), '')):
+            groups.add(int(port))
+    return sorted(groups)
+
+
+def port_ranges(ports):
+    """
+    Method to write port numbers the way port-config-modify takes them.
+    :param ports: Iterable of port numbers.
+    :return: String like '49-56,61'.
+    """
+    ranges = []
+    for port in sorted(set(ports)):
+        if ranges and port == ranges[-1][1] + 1:
+            ranges[-1][1] = port
+        else:
+            ranges.append([port, port])
+    return ','.join(str(first) if first == last else '%d-%d' % (first, last)
+                    for first, last in ranges)
+
+
+def group_ports(groups):
+    return [port for first in groups for port in range(first, first + 4)]
+
+
+def breakout_commands(groups):
+    """
+    Method to build the commands converting the groups.
+    :param groups: Output of plan_breakout().
+    :return: List of (message, command without the cli prefix).
+    """
+    if not groups:
+        return []
+    first_ports = port_ranges(groups)
+    all_ports = port_ranges(group_ports(groups))
+    return [
+        ('ports %s disabled ' % first_ports,
+         ' port-config-modify port %s disable ' % first_ports),
+        ('ports %s converted to 10g ' % first_ports,
+         ' port-config-modify port %s speed 10g ' % first_ports),
+        ('ports %s enabled ' % all_ports,
+         ' port-config-modify port %s enable ' % all_ports),
+    ]
+
+
+def wait_breakout(module, cli, groups, timeout=30, interval=1,
+                  sleep=time.sleep, clock=time.time):
+    """
+    Method to poll port-config-show until the broken out ports are set up.
+    :param module: The Ansible module to fetch input parameters.
+    :param cli: The cli prefix, including the switch scope if any.
+    :param groups: Output of plan_breakout().
+    :param timeout: Seconds to give up after.
+    :param interval: Seconds between polls.
+    :return: Seconds it took, None on timeout.
+    """
+    expected = set(str(port) for port in group_ports(groups))
+    show = cli + ' port-config-show port %s format port,speed,enable ' % (
+        port_ranges(group_ports(groups)))
+    started = clock()
+    while True:
+        rc, rows, err = run_show(module, show)
+        if not rc and not err:
+            ready = set(row.get('port') for row in rows
+                        if row.get('speed') == '10g' and
+                        row.get('enable') == 'on')
+            if expected <= ready:
+                return round(clock() - started, 1)
+        if clock() - started >= timeout:
+            return None
+        sleep(interval)
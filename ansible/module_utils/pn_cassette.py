@@ -0,0 +1,300 @@
+""" Record and replay of cli sessions for the pn_* modules """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+# A cassette is a file of JSON lines, gzip compressed when its name ends in
+# .gz, with one entry per call a module made to its transport:
+#
+#   {"op": "run", "cmd": "switch sw1 vlan-create id 10 scope fabric",
+#    "rc": 0, "out": "", "err": "", "ms": 41}
+#
+# op is run, batch (cmd holds one command per line), show (rows instead of
+# out) or stream, a show whose output the module reads while the cli prints
+# it: out holds the lines read before the module stopped the stream and err
+# everything the cli wrote to stderr. Credentials given with --user are never
+# written.
+#
+# In record mode the calls go to the switch and every answer is appended to
+# the cassette, which is truncated when the module starts. In replay mode no
+# switch is needed: calls are answered from the cassette, the n-th call of a
+# command getting the n-th recorded answer of that command, optionally after
+# the recorded latency times a factor. A call which was not recorded fails.
+# Calls made in a different order, or not made at all, are written to
+# <cassette>.replay.json when the module exits, which tells when a change to
+# a module changed its sequence of cli calls. Every transport of a module
+# shares the cassette of its path, see Cassette.
+
+import atexit
+import gzip
+import io
+import json
+import threading
+import time
+
+
+def command_text(command):
+    """
+    Method to return the text a command is recorded under.
+    :param command: The CliCommand.
+    :return: Options, switch scope and command words, without credentials.
+    """
+    words = list(command.options)
+    if command.switch == 'local':
+        words.append('switch-local')
+    elif command.switch:
+        words += ['switch', command.switch]
+    return ' '.join(words + list(command.words))
+
+
+def open_cassette(path, mode):
+    """
+    Method to open a cassette for text lines, compressed or not.
+    :param path: Path of the cassette.
+    :param mode: r or w.
+    :return: File object.
+    """
+    if not path.endswith('.gz'):
+        return open(path, mode)
+    # gzip files are binary on Python 2, where str is bytes already.
+    return gzip.open(path, mode + ('b' if str is bytes else 't'))
+
+
+def load_cassette(path):
+    """
+    Method to read the entries of a cassette.
+    :param path: Path of the cassette.
+    :return: List of entries in recorded order.
+    """
+    handle = open_cassette(path, 'r')
+    try:
+        return [json.loads(line) for line in handle if line.strip()]
+    finally:
+        handle.close()
+
+
+class Cassette(object):
+    """ The calls recorded to, or replayed from, one cassette file. The
+    transports of a module recording to the same path share one Cassette, so
+    their calls end up in one file in the order they were made. """
+
+    def __init__(self, path, mode='replay', latency=0):
+        """
+        :param path: Path of the cassette.
+        :param mode: record or replay.
+        :param latency: Factor applied to the recorded latencies on replay,
+        0 to answer at once.
+        """
+        self.path = path
+        self.mode = mode
+        self.latency = float(latency or 0)
+        self.lock = threading.Lock()
+        if mode == 'record':
+            self.handle = open_cassette(path, 'w')
+            atexit.register(self.close)
+        else:
+            self.entries = load_cassette(path)
+            self.answers = {}
+            for position, entry in enumerate(self.entries):
+                self.answers.setdefault((entry['op'], entry['cmd']),
+                                        []).append(position)
+            self.replayed = set()
+            self.calls = 0
+            self.expected = 0
+            self.divergences = []
+            atexit.register(self.report)
+
+    def write(self, op, cmd, result, seconds):
+        """
+        Method to append a call to the cassette.
+        :param op: run, batch, show or stream.
+        :param cmd: The recorded command text.
+        :param result: Tuple of (rc, out or rows, err).
+        :param seconds: Time the call took.
+        """
+        entry = {'op': op, 'cmd': cmd, 'rc': result[0], 'err': result[2],
+                 'ms': int(round(seconds * 1000))}
+        entry['rows' if op == 'show' else 'out'] = result[1]
+        line = json.dumps(entry, sort_keys=True, separators=(',', ':'))
+        with self.lock:
+            self.handle.write(line + '\n')
+            self.handle.flush()
+
+    def record(self, op, cmd, call):
+        started = time.time()
+        result = call()
+        self.write(op, cmd, result, time.time() - started)
+        return result
+
+    def replay(self, op, cmd):
+        with self.lock:
+            call = self.calls
+            self.calls += 1
+            positions = self.answers.get((op, cmd))
+            if not positions:
+                self.divergences.append({'call': call, 'op': op, 'cmd': cmd,
+                                         'problem': 'not recorded'})
+                return 1, [] if op == 'show' else '', \
+                    'Not in cassette %s: %s' % (self.path, cmd)
+            position = positions.pop(0)
+            self.replayed.add(position)
+            if position != self.expected:
+                self.divergences.append({'call': call, 'op': op, 'cmd': cmd,
+                                         'problem': 'recorded as call %d'
+                                                    % position})
+            self.expected = position + 1
+            entry = self.entries[position]
+        if self.latency:
+            time.sleep(entry.get('ms', 0) / 1000.0 * self.latency)
+        return (entry['rc'], entry['rows'] if op == 'show' else entry['out'],
+                entry['err'])
+
+    def call(self, op, cmd, call):
+        if self.mode == 'record':
+            return self.record(op, cmd, call)
+        return self.replay(op, cmd)
+
+    def report(self):
+        """
+        Method to write how the replayed calls differed from the recorded
+        ones, if they did.
+        """
+        missing = [{'call': position, 'op': entry['op'], 'cmd': entry['cmd'],
+                    'problem': 'not made'}
+                   for position, entry in enumerate(self.entries)
+                   if position not in self.replayed]
+        if not self.divergences and not missing:
+            return
+        with open(self.path + '.replay.json', 'w') as handle:
+            json.dump({'cassette': self.path, 'calls': self.calls,
+                       'recorded': len(self.entries),
+                       'divergences': self.divergences + missing},
+                      handle, indent=2, sort_keys=True)
+
+    def close(self):
+        if self.mode != 'record':
+            return
+        with self.lock:
+            if not self.handle.closed:
+                self.handle.close()
+
+
+class RecordedLines(object):
+    """ The stdout of a streamed show, keeping the lines read from it. """
+
+    def __init__(self, stdout):
+        self.stdout = stdout
+        self.lines = []
+
+    def readline(self):
+        line = self.stdout.readline()
+        self.lines.append(line)
+        return line
+
+    def close(self):
+        self.stdout.close()
+
+
+class CassetteStream(object):
+    """ A streamed show being recorded or replayed, standing in for the cli
+    process. """
+
+    def __init__(self, cmd, errors, process=None, out='', rc=0):
+        """
+        :param cmd: The recorded command text.
+        :param errors: File the cli writes its errors to.
+        :param process: The running cli process when recording.
+        :param out: The recorded output when replaying.
+        :param rc: The recorded return code when replaying.
+        """
+        self.cmd = cmd
+        self.errors = errors
+        self.process = process
+        self.rc = rc
+        self.started = time.time()
+        if process is not None:
+            self.stdout = RecordedLines(process.stdout)
+        else:
+            self.stdout = io.StringIO(out)
+
+
+class CassetteTransport(object):
+    """ Wraps a transport to record its calls to, or replay them from, a
+    cassette. """
+
+    def __init__(self, transport, cassette):
+        """
+        :param transport: The transport calls are recorded from, not used in
+        replay mode.
+        :param cassette: The Cassette of the module.
+        """
+        self.transport = transport
+        self.name = transport.name
+        self.cassette = cassette
+
+    def __getattr__(self, name):
+        return getattr(self.transport, name)
+
+    def run(self, command):
+        return self.cassette.call('run', command_text(command),
+                                  lambda: self.transport.run(command))
+
+    def batch(self, commands):
+        return self.cassette.call('batch', '\n'.join(command_text(command)
+                                                     for command in commands),
+                                  lambda: self.transport.batch(commands))
+
+    def show(self, command):
+        return self.cassette.call('show', command_text(command),
+                                  lambda: self.transport.show(command))
+
+    def stream(self, command, errors):
+        """
+        Method to start a streamed show, recording the lines the module
+        reads, or to answer it from the cassette without any cli.
+        :param command: The CliCommand to run.
+        :param errors: File the cli writes its errors to.
+        :return: A CassetteStream, to hand to stop_stream().
+        """
+        cmd = command_text(command)
+        if self.cassette.mode == 'record':
+            return CassetteStream(cmd, errors,
+                                  process=self.transport.stream(command,
+                                                                errors))
+        rc, out, err = self.cassette.replay('stream', cmd)
+        errors.write(err)
+        return CassetteStream(cmd, errors, out=out, rc=rc)
+
+    def stop_stream(self, stream):
+        """
+        Method to stop a streamed show and record what it returned.
+        :param stream: The CassetteStream returned by stream().
+        :return: Tuple of (rc, err) as the wrapped transport returns it.
+        """
+        if stream.process is None:
+            return stream.rc, ''
+        rc, timeout = self.transport.stop_stream(stream.process)
+        stream.errors.seek(0)
+        self.cassette.write('stream', stream.cmd,
+                            (rc, ''.join(stream.stdout.lines),
+                             stream.errors.read() + timeout),
+                            time.time() - stream.started)
+        return rc, timeout
+
+    def close(self):
+        self.cassette.close()
+        self.transport.close()
@@ -0,0 +1,151 @@
+""" Commands file compiler for the pn_run_cli_commands modules """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+# A commands file is made of sections:
+#
+#   [ALL]              commands run on every fabric node,
+#   [switch s1, s2]    commands run on the listed switches,
+#   [fabric]           commands run once, fabric wide, on the managed node.
+#
+# Lines before the first section are comments. The file is compiled once
+# into stages. Consecutive [ALL] and [switch] sections form one stage with a
+# command list per switch, in file order; the lists of different switches
+# do not depend on each other and are run concurrently. A [fabric] section
+# is a stage of its own, so fabric wide commands still run after everything
+# above them and before everything below them.
+#
+# A failed batch is reported by the command the cli complained about, not
+# by the whole batch: the cli strings carry the --user credentials.
+
+import re
+
+from ansible.module_utils.pn_nvos import CliCommand
+
+SECTION = re.compile(r'^\[(ALL|fabric|switch)([^\]]*)\]?')
+
+FABRIC = 'fabric_wide'
+
+
+def compile_commands(commands_data):
+    """
+    Method to compile a commands file into stages.
+    :param commands_data: Cli commands in the form of string.
+    :return: List of stages, each a list of (switches, command) where
+    switches is None for fabric wide commands, 'ALL' for every fabric node
+    or the list of switches.
+    """
+    stages = []
+    section = None
+    for line in commands_data.split('\n'):
+        match = SECTION.match(line)
+        if match:
+            kind, names = match.groups()
+            if kind == 'fabric':
+                section = None
+                stages.append([])
+            else:
+                if kind == 'ALL':
+                    section = 'ALL'
+                else:
+                    section = [name.strip() for name in names.split(',')
+                               if name.strip()]
+                if not stages or stages[-1] and stages[-1][0][0] is None:
+                    stages.append([])
+            continue
+
+        if line == '' or not stages:
+            continue
+        stages[-1].append((section, line))
+
+    return [stage for stage in stages if stage]
+
+
+def stage_plans(stage, cli, fabric_nodes):
+    """
+    Method to turn a stage into per switch command lists.
+    :param stage: One stage returned by compile_commands().
+    :param cli: The cli prefix returned by the module's pn_cli().
+    :param fabric_nodes: Function returning the names of all fabric nodes.
+    :return: List of (switch or FABRIC, list of cli strings), switches in
+    the order they first appear in the stage.
+    """
+    plans = []
+    index = {}
+    for switches, command in stage:
+        if switches is None:
+            targets = [FABRIC]
+        elif switches == 'ALL':
+            targets = fabric_nodes()
+        else:
+            targets = switches
+
+        for switch in targets:
+            if switch not in index:
+                index[switch] = len(plans)
+                plans.append((switch, []))
+            if switch == FABRIC:
+                plans[index[switch]][1].append(cli + command)
+            else:
+                plans[index[switch]][1].append(
+                    cli + ' switch %s ' % switch + command)
+    return plans
+
+
+def command_text(cli):
+    """
+    Method to render a cli string for messages, without the cli binary and
+    its global options, so without the --user credentials.
+    :param cli: The cli string or its list of words.
+    :return: The switch scope and the command words.
+    """
+    command = CliCommand(cli)
+    words = list(command.words)
+    if command.switch == 'local':
+        words.insert(0, 'switch-local')
+    elif command.switch:
+        words[:0] = ['switch', command.switch]
+    return ' '.join(words)
+
+
+def failed_command(clis, err):
+    """
+    Method to find the command of a failed batch. The cli prefixes its
+    errors with the command name ("vlan-create: ..."); of the commands with
+    that name the one sharing most words with the error line is taken.
+    :param clis: The cli strings of the batch.
+    :param err: Error output of the batch.
+    :return: The failed cli string, None when no error line names a command
+    of the batch.
+    """
+    commands = [CliCommand(cli) for cli in clis]
+    for line in err.splitlines():
+        name, sep, text = line.partition(':')
+        if not sep:
+            continue
+        words = set(text.split())
+        best, score = None, -1
+        for cli, command in zip(clis, commands):
+            if command.verb != name.strip():
+                continue
+            shared = len(words.intersection(command.words[1:]))
+            if shared > score:
+                best, score = cli, shared
+        if best is not None:
+            return best
+    return None
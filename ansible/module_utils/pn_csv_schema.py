@@ -0,0 +1,348 @@
+""" Declarative validation of the csv input files of the pn_* modules """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+# The fabric modules read their csv input row by row while configuring and
+# crash on a bad row after the rows above it were applied. validate_files()
+# checks every file up front against the schema of its format:
+#
+#   shapes   number of columns: the column names and types of such a row,
+#   unique   columns whose value may appear once per file,
+#   shared   columns whose value may appear in one file only, when several
+#            files are validated together (a vlan used by the L2 and the L3
+#            VRRP file),
+#   subnets  columns holding networks, which must not overlap or contain one
+#            another across all files,
+#   rules    checks across the columns of a row.
+#
+# Duplicates are found through dictionaries of value: first location and
+# subnet overlaps with one sort and sweep over the network intervals, so a
+# 10k row file is validated well within a second. Switch columns must name a
+# switch of the inventory when one is given.
+
+import socket
+import struct
+
+try:
+    from ansible.module_utils.pn_commands_file import SECTION
+except ImportError:
+    from pn_commands_file import SECTION
+
+
+def parse_int(value, low, high):
+    if not value.isdigit() or not low <= int(value) <= high:
+        return None
+    return int(value)
+
+
+def parse_ip(value):
+    try:
+        if value.count('.') != 3:
+            return None
+        return struct.unpack('!I', socket.inet_aton(value))[0]
+    except (socket.error, OSError):
+        return None
+
+
+def parse_subnet(value):
+    """
+    Method to parse a network.
+    :param value: The network as a.b.c.d/len.
+    :return: Tuple of (first, last) address as integers, None if invalid.
+    """
+    if value.count('/') != 1:
+        return None
+    address, bits = value.split('/')
+    number = parse_ip(address)
+    bits = parse_int(bits, 0, 32)
+    if number is None or bits is None:
+        return None
+    size = 1 << (32 - bits)
+    first = number & ~(size - 1) & 0xffffffff
+    return first, first + size - 1
+
+
+# Column types: a parser returning None for an invalid value.
+TYPES = {
+    'vlan': lambda value: parse_int(value, 1, 4094),
+    'vrrp_id': lambda value: parse_int(value, 1, 255),
+    'asn': lambda value: parse_int(value, 1, 4294967295),
+    'vxlan': lambda value: parse_int(value, 1, 16777215),
+    'port': lambda value: value if value.replace(',', '').replace(
+        '-', '').isdigit() else None,
+    'ip': parse_ip,
+    'subnet': parse_subnet,
+    'switch': lambda value: None if value.isdigit() else value,
+    'name': lambda value: value or None,
+}
+
+# A column is (name, type) or (name, type, True) when it may be empty.
+L3_VRRP_CLUSTER = (('vlan', 'vlan'), ('subnet', 'subnet'),
+                   ('switch', 'switch'), ('switch2', 'switch'),
+                   ('vrrp_id', 'vrrp_id'), ('active_switch', 'switch'))
+
+FORMATS = {
+    'l2_vrrp': {
+        'shapes': {3: (('subnet', 'subnet'), ('vlan', 'vlan'),
+                       ('active_switch', 'switch'))},
+        'unique': ('vlan', 'subnet'),
+        'shared': ('vlan',),
+        'subnets': ('subnet',),
+    },
+    'l3_vrrp': {
+        'shapes': {3: L3_VRRP_CLUSTER[:3], 6: L3_VRRP_CLUSTER},
+        'unique': ('vlan', 'subnet'),
+        'shared': ('vlan',),
+        'subnets': ('subnet',),
+        'rules': ('active_in_cluster', 'distinct_cluster_nodes'),
+    },
+    'fabric_over_l3': {
+        'shapes': {
+            3: L3_VRRP_CLUSTER[:3],
+            6: L3_VRRP_CLUSTER[:3] + tuple(
+                column + (True,) for column in L3_VRRP_CLUSTER[3:]),
+        },
+        'unique': ('vlan', 'subnet'),
+        'shared': ('vlan',),
+        'subnets': ('subnet',),
+        # The last column is not read by pn_fabric_over_l3 and need not
+        # name a cluster node.
+        'rules': ('distinct_cluster_nodes',),
+    },
+    'dci': {
+        'shapes': {
+            4: L3_VRRP_CLUSTER[:3] + (('vxlan', 'vxlan'),),
+            6: L3_VRRP_CLUSTER,
+            7: L3_VRRP_CLUSTER + (('vxlan', 'vxlan'),),
+        },
+        # Subnets of the same layer 2 domain share one vxlan.
+        'unique': ('vlan', 'subnet'),
+        'shared': ('vlan', 'vxlan'),
+        'subnets': ('subnet',),
+        'rules': ('active_in_cluster', 'distinct_cluster_nodes'),
+    },
+    'third_party_dci': {
+        'shapes': {5: (('neighbor', 'name'), ('ip', 'ip'), ('remote_as', 'asn'),
+                       ('bgp_as', 'asn'), ('switch', 'switch'))},
+        'unique': ('ip',),
+    },
+    'vxlan': {
+        'shapes': {
+            5: L3_VRRP_CLUSTER[:3] + (('vxlan', 'vxlan'), ('port', 'port')),
+            8: L3_VRRP_CLUSTER + (('vxlan', 'vxlan'), ('port', 'port')),
+        },
+        'unique': ('vlan', 'vxlan'),
+        'shared': ('vxlan',),
+        'rules': ('active_in_cluster', 'distinct_cluster_nodes'),
+    },
+    'cli_commands': {'sections': True},
+}
+
+
+def rule_active_in_cluster(row):
+    if row.get('switch2') and row.get('active_switch') not in (
+            row['switch'], row['switch2']):
+        return 'active switch %s is not a node of the cluster' % (
+            row.get('active_switch'))
+    return None
+
+
+def rule_distinct_cluster_nodes(row):
+    if row.get('switch2') and row['switch'] == row['switch2']:
+        return 'cluster nodes must be different switches'
+    return None
+
+
+RULES = {
+    'active_in_cluster': rule_active_in_cluster,
+    'distinct_cluster_nodes': rule_distinct_cluster_nodes,
+}
+
+
+class Validation(object):
+    """ Errors and indexes of the files validated together. """
+
+    def __init__(self, inventory=None):
+        self.inventory = set(inventory) if inventory else None
+        self.errors = []
+        self.shared = {}
+        self.networks = []
+
+    def error(self, location, message):
+        self.errors.append('%s:%d: %s' % (location[0], location[1], message))
+
+    def check_switch(self, location, switch):
+        if self.inventory is not None and switch not in self.inventory:
+            self.error(location, 'switch %s is not in the inventory' % switch)
+
+    def validate_rows(self, name, schema, data):
+        """
+        Method to validate the rows of a csv file.
+        :param name: Name of the file, for messages.
+        :param schema: The schema of its format, see FORMATS.
+        :param data: The file content.
+        """
+        shapes = dict((size, [(column[0], TYPES[column[1]],
+                               len(column) > 2 and column[2], column[1])
+                              for column in columns])
+                      for size, columns in schema['shapes'].items())
+        unique = schema.get('unique', ())
+        shared = schema.get('shared', ())
+        subnets = schema.get('subnets', ())
+        rules = [RULES[rule] for rule in schema.get('rules', ())]
+        seen = dict((column, {}) for column in unique)
+        sizes = ', '.join(str(size) for size in sorted(shapes))
+
+        for number, line in enumerate(data.split('\n'), 1):
+            line = line.replace(' ', '').strip()
+            if not line or line.startswith('#'):
+                continue
+            location = (name, number)
+            values = line.split(',')
+            while len(values) not in shapes and len(values) > 1 and \
+                    not values[-1]:
+                # Trailing commas of rows padded to the widest shape.
+                values.pop()
+            columns = shapes.get(len(values))
+            if columns is None:
+                self.error(location, 'invalid number of columns %d, expected '
+                                     '%s' % (len(values), sizes))
+                continue
+
+            row = {}
+            valid = True
+            for value, (column, parse, optional, kind) in zip(values,
+                                                              columns):
+                if not value and optional:
+                    continue
+                parsed = parse(value)
+                if parsed is None:
+                    self.error(location, 'invalid %s %r' % (column, value))
+                    valid = False
+                    continue
+                row[column] = value
+                if kind == 'switch':
+                    self.check_switch(location, value)
+                if column in subnets:
+                    self.networks.append((parsed[0], parsed[1], value,
+                                          location))
+            if not valid:
+                continue
+
+            for rule in rules:
+                message = rule(row)
+                if message:
+                    self.error(location, message)
+
+            for column in unique:
+                key = row.get(column)
+                if key is None:
+                    continue
+                if key in seen[column]:
+                    self.error(location, 'duplicate %s %s, first at line %d'
+                               % (column, key, seen[column][key][1]))
+                else:
+                    seen[column][key] = location
+
+            for column in shared:
+                key = row.get(column)
+                if key is None:
+                    continue
+                first = self.shared.setdefault((column, key), location)
+                if first[0] != name:
+                    self.error(location, '%s %s is also used in %s line %d' % (
+                        column, key, first[0], first[1]))
+
+    def validate_sections(self, name, data):
+        """
+        Method to validate a cli commands file.
+        :param name: Name of the file, for messages.
+        :param data: The file content.
+        """
+        in_section = False
+        for number, line in enumerate(data.split('\n'), 1):
+            location = (name, number)
+            if not line.strip():
+                if line:
+                    self.error(location, 'empty line with spaces')
+                continue
+            match = SECTION.match(line)
+            if match:
+                in_section = True
+                kind, names = match.groups()
+                if kind == 'switch':
+                    switches = [switch.strip() for switch in names.split(',')
+                                if switch.strip()]
+                    if not switches:
+                        self.error(location, 'no switch in section')
+                    for switch in switches:
+                        self.check_switch(location, switch)
+                continue
+            if line.startswith('#') and not in_section:
+                continue
+            if line.startswith('['):
+                self.error(location, 'unknown section %s' % line.strip())
+            elif not in_section:
+                self.error(location, 'command outside of a section')
+            elif '-' not in line.split()[0]:
+                self.error(location, 'invalid command %s' % line.strip())
+
+    def check_subnets(self):
+        """
+        Method to find overlapping or containing subnets with one sweep over
+        the intervals sorted by their first address. Equal subnets are
+        reported as duplicates by the unique indexes instead.
+        """
+        widest = None
+        for first, last, value, location in sorted(self.networks):
+            if widest is not None and first <= widest[1]:
+                if (first, last) != widest[:2]:
+                    self.error(location, 'subnet %s overlaps %s at %s line %d'
+                               % (value, widest[2], widest[3][0],
+                                  widest[3][1]))
+                elif location[0] != widest[3][0]:
+                    self.error(location, 'subnet %s is also used in %s line %d'
+                               % (value, widest[3][0], widest[3][1]))
+                elif value != widest[2]:
+                    self.error(location, 'subnet %s is the same network as %s '
+                                         'at line %d' % (value, widest[2],
+                                                         widest[3][1]))
+            if widest is None or last > widest[1]:
+                widest = (first, last, value, location)
+
+
+def validate_files(files, inventory=None):
+    """
+    Method to validate csv files together.
+    :param files: List of (name, format, content).
+    :param inventory: Names of the switches of the inventory, None to skip
+    the check.
+    :return: List of error strings, empty if all files are valid.
+    """
+    validation = Validation(inventory)
+    for name, file_format, data in files:
+        schema = FORMATS.get(file_format)
+        if schema is None:
+            validation.errors.append('%s: unknown format %s' % (name,
+                                                                 file_format))
+        elif schema.get('sections'):
+            validation.validate_sections(name, data)
+        else:
+            validation.validate_rows(name, schema, data)
+    validation.check_subnets()
+    return validation.errors
@@ -0,0 +1,312 @@
+""" Deadlines, cancellation and a circuit breaker for cli processes """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+# A wedged nvOSd, or a cli waiting for an answer on stdin, used to hold the
+# task (and its fork) until the global Ansible timeout. Every cli process is
+# now started in its own process group, with stdin closed unless the command
+# reads from it, and given a deadline that depends on its verb. At the
+# deadline the whole group is terminated, then killed, and the command
+# fails with TIMEOUT_RC. Processes still running when the module exits are
+# cancelled the same way.
+#
+# The circuit breaker counts consecutive timeouts per switch. Once a switch
+# reached the limit no further command is sent to it; they fail right away
+# with a message naming the switch, so a fabric wide run is bounded by the
+# deadline instead of waiting on the same dead switch over and over. A module
+# fails on its first timed out command, so the counts are kept in a file
+# across module runs. After BREAKER_RESET seconds without a timeout the
+# switch is tried again; a command which completes closes its circuit.
+
+import atexit
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+# Exit status of a command stopped at its deadline, as timeout(1) uses.
+TIMEOUT_RC = 124
+
+# Default deadlines in seconds. Verbs not listed use the show or change
+# default.
+SHOW_DEADLINE = 120
+CHANGE_DEADLINE = 300
+VERB_DEADLINES = {
+    'fabric-create': 600,
+    'fabric-join': 600,
+    'switch-config-reset': 120,
+    'software-upgrade': 1800,
+}
+
+# Consecutive timeouts after which a switch is no longer sent commands.
+BREAKER_LIMIT = 3
+
+# Seconds after its last timeout at which an open circuit is tried again.
+BREAKER_RESET = 600
+
+# Seconds between terminating and killing a process group.
+KILL_GRACE = 5
+
+# Popen arguments starting a process in its own session (and so its own
+# process group). preexec_fn is not safe with threads on Python 3.
+if sys.version_info[0] < 3:
+    NEW_SESSION = {'preexec_fn': os.setsid}
+else:
+    NEW_SESSION = {'start_new_session': True}
+
+
+def parse_deadlines(value):
+    """
+    Method to parse per verb deadlines.
+    :param value: String like 'fabric-join=900,port-show=60'.
+    :return: Dictionary of verb: seconds.
+    """
+    deadlines = {}
+    for item in (value or '').split(','):
+        if '=' in item:
+            verb, seconds = item.split('=', 1)
+            deadlines[verb.strip()] = float(seconds)
+    return deadlines
+
+
+def load_timeouts(path):
+    """
+    Method to read the breaker file.
+    :param path: Path of the breaker file.
+    :return: Dictionary of switch: [consecutive timeouts, time of the last].
+    """
+    try:
+        with open(path) as breaker_file:
+            return json.load(breaker_file)
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+class CircuitOpen(Exception):
+    """ Raised for a command to a switch whose circuit is open. """
+
+
+class DeadlineRunner(object):
+    """ Runs cli processes with deadlines and tracks timeouts per switch. """
+
+    def __init__(self, deadline=None, deadlines=None,
+                 breaker_limit=BREAKER_LIMIT, breaker_path=None,
+                 breaker_reset=BREAKER_RESET):
+        """
+        :param deadline: Seconds every command gets, overriding the defaults.
+        :param deadlines: Dictionary of verb: seconds, overriding the rest.
+        :param breaker_limit: Consecutive timeouts which open the circuit of
+        a switch, 0 to never open it.
+        :param breaker_path: File keeping the timeouts across module runs,
+        None to keep them for this process only.
+        :param breaker_reset: Seconds after which an open circuit is tried
+        again.
+        """
+        self.deadline = float(deadline) if deadline else None
+        self.deadlines = deadlines or {}
+        self.breaker_limit = int(breaker_limit)
+        self.breaker_path = breaker_path
+        self.breaker_reset = float(breaker_reset)
+        self.lock = threading.Lock()
+        # Switch: [consecutive timeouts, time of the last one].
+        self.timeouts = load_timeouts(breaker_path) if breaker_path else {}
+        # Running process: (argv, deadline, target, expired event, timers).
+        self.running = {}
+        atexit.register(self.cancel)
+
+    def deadline_for(self, verb, is_show):
+        """
+        Method to return the deadline of a command.
+        :param verb: The command verb, e.g. vlan-create.
+        :param is_show: Whether the command is a show.
+        :return: Seconds.
+        """
+        if verb in self.deadlines:
+            return self.deadlines[verb]
+        if self.deadline:
+            return self.deadline
+        if verb in VERB_DEADLINES:
+            return VERB_DEADLINES[verb]
+        return SHOW_DEADLINE if is_show else CHANGE_DEADLINE
+
+    def open_circuits(self):
+        """
+        Method to list the switches no more commands are sent to.
+        :return: Dictionary of switch: consecutive timeouts.
+        """
+        with self.lock:
+            return dict((switch, count)
+                        for switch, (count, last) in self.timeouts.items()
+                        if self.is_open(count, last))
+
+    def is_open(self, count, last):
+        return (self.breaker_limit and count >= self.breaker_limit and
+                time.time() - last < self.breaker_reset)
+
+    def check_circuit(self, target):
+        with self.lock:
+            count, last = self.timeouts.get(target, (0, 0))
+        if self.is_open(count, last):
+            raise CircuitOpen('Not sent to %s: it timed out %d times in a '
+                              'row' % (target, count))
+
+    def record(self, target, timed_out):
+        with self.lock:
+            if timed_out:
+                count = self.timeouts.get(target, (0, 0))[0] + 1
+                self.timeouts[target] = [count, time.time()]
+            elif target in self.timeouts:
+                del self.timeouts[target]
+            else:
+                return
+            if self.breaker_path:
+                self.save(target)
+
+    def save(self, target):
+        """
+        Method to write the timeouts of a switch to the breaker file, keeping
+        what other module runs wrote for the other switches.
+        :param target: The switch whose timeouts changed.
+        """
+        timeouts = load_timeouts(self.breaker_path)
+        if target in self.timeouts:
+            timeouts[target] = self.timeouts[target]
+        else:
+            timeouts.pop(target, None)
+        temp_path = '%s.%d.tmp' % (self.breaker_path, os.getpid())
+        try:
+            with open(temp_path, 'w') as breaker_file:
+                json.dump(timeouts, breaker_file, sort_keys=True)
+            os.rename(temp_path, self.breaker_path)
+        except (IOError, OSError):
+            pass
+
+    @staticmethod
+    def kill_group(process, sig, expired=None):
+        if expired is not None:
+            expired.set()
+        try:
+            os.killpg(process.pid, sig)
+        except OSError:
+            pass
+
+    def cancel(self):
+        """
+        Method to stop every cli process still running.
+        """
+        with self.lock:
+            running = list(self.running)
+        for process in running:
+            self.kill_group(process, signal.SIGKILL)
+
+    def spawn(self, argv, deadline=SHOW_DEADLINE, target='local',
+              stderr=subprocess.PIPE):
+        """
+        Method to start a cli process within a deadline, for callers which
+        read its output while it runs. Its stdin is closed.
+        :param argv: The command line.
+        :param deadline: Seconds after which the process group is stopped.
+        :param target: The switch the command is for, for the breaker.
+        :param stderr: Where its errors go.
+        :return: The process, to hand to stop() once its output is read.
+        """
+        self.check_circuit(target)
+        process = self.start(argv, deadline, target, stderr)
+        process.stdin.close()
+        return process
+
+    def start(self, argv, deadline, target, stderr=subprocess.PIPE):
+        process = subprocess.Popen(argv, stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE, stderr=stderr,
+                                   universal_newlines=True, **NEW_SESSION)
+        expired = threading.Event()
+        # Terminate the group at the deadline, kill it KILL_GRACE later.
+        timers = [threading.Timer(deadline, self.kill_group,
+                                  (process, signal.SIGTERM, expired)),
+                  threading.Timer(deadline + KILL_GRACE, self.kill_group,
+                                  (process, signal.SIGKILL))]
+        for timer in timers:
+            timer.daemon = True
+            timer.start()
+        with self.lock:
+            self.running[process] = (argv, deadline, target, expired, timers)
+        return process
+
+    def finish(self, process, err):
+        """
+        Method to forget a process which exited and report its deadline.
+        :param process: The process returned by start().
+        :param err: What it wrote to stderr.
+        :return: Tuple of (rc, err), rc being TIMEOUT_RC and err naming the
+        deadline if the process was stopped at it.
+        """
+        with self.lock:
+            argv, deadline, target, expired, timers = self.running.pop(
+                process)
+        for timer in timers:
+            timer.cancel()
+        self.record(target, expired.is_set())
+        if expired.is_set():
+            words = list(argv)
+            if '--user' in words[:-1]:
+                words[words.index('--user') + 1] = '********'
+            return TIMEOUT_RC, '%sTimed out after %ss on %s: %s' % (
+                err, int(deadline), target, ' '.join(words))
+        return process.returncode, err
+
+    def stop(self, process):
+        """
+        Method to stop a process started by spawn(), if it still runs.
+        :param process: The process.
+        :return: Tuple of (rc, err) as finish() returns it, err holding only
+        the deadline message as stderr went where spawn() was told.
+        """
+        if process.poll() is None:
+            self.kill_group(process, signal.SIGTERM)
+        process.stdout.close()
+        process.wait()
+        return self.finish(process, '')
+
+    def execute(self, argv, data=None, deadline=CHANGE_DEADLINE,
+                target='local'):
+        """
+        Method to run a cli process within a deadline.
+        :param argv: The command line.
+        :param data: Text written to its stdin, None to close stdin.
+        :param deadline: Seconds after which the process group is stopped.
+        :param target: The switch the command is for, for the breaker.
+        :return: Tuple of (rc, out, err).
+        """
+        try:
+            self.check_circuit(target)
+        except CircuitOpen as error:
+            return 1, '', str(error)
+
+        try:
+            process = self.start(argv, deadline, target)
+        except OSError as error:
+            return 127, '', str(error)
+        out, err = '', ''
+        try:
+            out, err = process.communicate(data or '')
+        finally:
+            rc, err = self.finish(process, err)
+        return rc, out, err
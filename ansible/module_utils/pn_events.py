@@ -0,0 +1,141 @@
+""" Change events reported by the pn_* modules """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+# The fabric modules reported what they did by appending ' switch: message'
+# lines to one string, which the _json copies of the modules then split
+# again per switch into a summary list. A module now records one event per
+# change instead, all of the same shape:
+#
+#   {"switch": "sw1", "object": "vlag", "key": "spine-to-leaf1",
+#    "action": "create", "result": "changed",
+#    "msg": "spine-to-leaf1 vlag configured successfully"}
+#
+# action is one of ACTIONS, result one of RESULTS and msg the text line of
+# the event. The result carries the events as they are, and renders them
+# either as the usual stdout text or, with pn_output (PN_OUTPUT) set to
+# json, as the msg/summary/task result of the former _json modules. The
+# pn_json callback streams the events of every result.
+
+from ansible.module_utils.pn_nvos import cli_stats, module_setting
+
+ACTIONS = ('create', 'delete', 'modify', 'enable', 'disable', 'skip', 'none')
+RESULTS = ('changed', 'unchanged', 'failed')
+
+
+class ChangeEvents(object):
+    """ The events of a module run, in order. """
+
+    def __init__(self):
+        self.events = []
+
+    def add(self, switch, obj, key, action, result, msg):
+        """
+        Method to record an event.
+        :param switch: The switch it happened on, '' for the fabric.
+        :param obj: Type of the object, e.g. vlag, trunk, vrouter.
+        :param key: Name or address of the object.
+        :param action: One of ACTIONS.
+        :param result: One of RESULTS.
+        :param msg: The text line of the event.
+        """
+        self.events.append({'switch': switch, 'object': obj, 'key': key,
+                            'action': action, 'result': result, 'msg': msg})
+
+    def changed(self, switch, obj, key, action, msg):
+        self.add(switch, obj, key, action, 'changed', msg)
+
+    def unchanged(self, switch, obj, key, msg):
+        self.add(switch, obj, key, 'none', 'unchanged', msg)
+
+    def extend(self, events):
+        self.events.extend(events)
+
+    def any_changed(self):
+        return any(event['result'] == 'changed' for event in self.events)
+
+    def text(self):
+        """
+        Method to render the events as the modules' stdout.
+        :return: One ' switch: msg ' line per event.
+        """
+        return ''.join(' %s: %s \n' % (event['switch'], event['msg'])
+                       if event['switch'] else ' %s \n' % event['msg']
+                       for event in self.events)
+
+    def summary(self):
+        """
+        Method to render the events as the summary of the _json modules.
+        :return: List of {'switch', 'output'}.
+        """
+        return [{'switch': event['switch'], 'output': event['msg']}
+                for event in self.events]
+
+
+def output_format(module):
+    """
+    Method to return how the module renders its events.
+    :param module: The Ansible module to fetch input parameters.
+    :return: text or json.
+    """
+    return 'json' if module_setting(module, 'output') == 'json' else 'text'
+
+
+def events_result(module, events, task, msg):
+    """
+    Method to build the result keys reporting a successful run.
+    :param module: The Ansible module to fetch input parameters.
+    :param events: The ChangeEvents of the run.
+    :param task: Task description of the json output.
+    :param msg: Message of the json output.
+    :return: Dictionary of result keys.
+    """
+    result = {'events': events.events}
+    if output_format(module) == 'json':
+        result.update(summary=events.summary(), task=task, msg=msg,
+                      exception='', unreachable=False)
+    else:
+        result.update(stdout=events.text(), error='0')
+    return result
+
+
+def failure_result(module, events, task, msg, cli, err):
+    """
+    Method to build the result keys reporting a failed command.
+    :param module: The Ansible module to fetch input parameters.
+    :param events: The ChangeEvents of the run.
+    :param task: Task description of the json output.
+    :param msg: Message of the json output.
+    :param cli: The failed command, as a list.
+    :param err: Its error output.
+    :return: Dictionary of result keys, cli_stats naming the switches the
+    circuit breaker stopped.
+    """
+    words = list(cli)
+    if '--user' in words[:-1]:
+        words[words.index('--user') + 1] = '********'
+    failed = 'Operation Failed: ' + ' '.join(words)
+    events.add('', 'command', ' '.join(words), 'none', 'failed', failed)
+    result = {'events': events.events, 'cli_stats': cli_stats()}
+    if output_format(module) == 'json':
+        result.update(summary=[{'switch': '', 'output': failed}], task=task,
+                      msg=msg, stderr=err.strip(), exception='',
+                      unreachable=False)
+    else:
+        result.update(error='1', stderr=err.strip(), msg=failed)
+    return result
@@ -0,0 +1,105 @@
+""" Fabric inventory facts for the pn_* fabric modules """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+# pn_fabric_facts reads the fabric inventory with one show per table and
+# returns it as the pn_fabric fact:
+#
+#   generation  fab-tid of the fabric when the facts were read
+#   gathered    epoch seconds when the facts were read
+#   ttl         seconds the facts may be used for
+#   tables      <show object>: {scope, columns, rows}
+#
+# Fabric scoped tables are the same on every node and are read once.
+# Switch scoped tables are read from every fabric node and carry a 'switch'
+# column. A module given the fact as pn_fabric_facts serves its show
+# commands from these tables as long as they are fresh (see pn_nvos).
+
+import time
+
+from ansible.module_utils.pn_nvos import (cli_prefix, fabric_generation,
+                                          facts_tables, run_show)
+
+FABRIC_TABLES = (
+    ('fabric-node', 'name,fab-name,mgmt-ip,in-band-ip,fab-tid,state'),
+    ('cluster', 'name,cluster-node-1,cluster-node-2'),
+    ('vrouter', 'name,location,router-id,bgp-as,hw-vrrp-id'),
+    ('vrouter-interface', 'vrouter-name,nic,ip,l3-port,vlan,vrrp-id,'
+                          'vrrp-primary,vrrp-priority'),
+    ('vrouter-loopback-interface', 'vrouter-name,index,ip'),
+    ('vrouter-bgp', 'vrouter-name,neighbor,remote-as'),
+    ('vrouter-ospf', 'vrouter-name,network,ospf-area'),
+)
+
+SWITCH_TABLES = (
+    ('lldp', 'local-port,chassis-id,port-id,sys-name'),
+    ('port', 'port,hostname,status'),
+)
+
+
+def gather_fabric_facts(module, ttl):
+    """
+    Method to read the fabric inventory.
+    :param module: The Ansible module to fetch input parameters.
+    :param ttl: Seconds the facts may be used for.
+    :return: The pn_fabric fact.
+    """
+    cli = cli_prefix(module)
+    tables = {}
+    for name, columns in FABRIC_TABLES:
+        rc, rows, err = run_show(module, cli + ' %s-show format %s ' % (
+            name, columns))
+        if rc or err:
+            module.fail_json(msg='%s-show failed' % name, stderr=err)
+        tables[name] = {'scope': 'fabric', 'columns': columns.split(','),
+                        'rows': rows}
+
+    switches = [row['name'] for row in tables['fabric-node']['rows']]
+    for name, columns in SWITCH_TABLES:
+        rows = []
+        for switch in switches:
+            rc, switch_rows, err = run_show(
+                module, cli + ' switch %s %s-show format %s ' % (
+                    switch, name, columns))
+            for row in switch_rows if not rc else []:
+                row['switch'] = switch
+                rows.append(row)
+        tables[name] = {'scope': 'switch',
+                        'columns': ['switch'] + columns.split(','),
+                        'rows': rows}
+
+    return {
+        'generation': fabric_generation(
+            tables['fabric-node']['rows']),
+        'gathered': int(time.time()),
+        'ttl': int(ttl),
+        'tables': tables,
+    }
+
+
+def fabric_facts(module, ttl):
+    """
+    Method to return the facts given as pn_fabric_facts if they are still
+    fresh, else read them again.
+    :param module: The Ansible module to fetch input parameters.
+    :param ttl: Seconds new facts may be used for.
+    :return: Tuple of (pn_fabric fact, True if it was read again).
+    """
+    if facts_tables(module):
+        return module.params['pn_fabric_facts'], False
+    return gather_fabric_facts(module, ttl), True
@@ -0,0 +1,191 @@
+""" Per switch input/state fingerprints for the pn_* fabric modules """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+# A module configuring a converged fabric again still runs every
+# idempotency show. With pn_fingerprint_file set, the module records two
+# digests per switch after a successful run:
+#
+#   input  the module parameters and the inputs relevant to the switch
+#          (CSV rows, inventory),
+#   state  the rows of the switch tables the module configures.
+#
+# On the next run a switch whose input and state digests are both unchanged
+# is skipped. The state is read with one show per table and switch (fabric
+# wide vrouter/cluster tables are read once and split per switch), and only
+# for the switches whose input is unchanged, so a no-op rerun costs a show
+# per table and switch instead of a show per object. After the run only the
+# switches the module reported changes on are read again; the others keep
+# the state read at the start. A change the events attribute to a peer only
+# makes the next run configure the switch again, it never skips one wrongly.
+
+import hashlib
+import json
+import os
+
+from ansible.module_utils.pn_nvos import CliCommand, cli_prefix, run_show
+
+# Parameters which never change what a module configures.
+IGNORED_PARAMS = ('pn_cliusername', 'pn_clipassword', 'pn_fabric_facts',
+                  'pn_fingerprint_file')
+
+
+def digest(data):
+    """
+    Method to compute the digest of JSON serializable data.
+    :param data: The data.
+    :return: Hex sha1 of its canonical JSON form.
+    """
+    text = json.dumps(data, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def load_fingerprints(path):
+    """
+    Method to read the fingerprint file.
+    :param path: Path of the fingerprint file.
+    :return: Dictionary of module: switch: {input, state}.
+    """
+    try:
+        with open(path) as fingerprint_file:
+            return json.load(fingerprint_file)
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+class Fingerprints(object):
+    """ Input and state digests of the switches a module configures. """
+
+    def __init__(self, module, name, switches, shows, inputs=None,
+                 ignore=()):
+        """
+        :param module: The Ansible module to fetch input parameters.
+        :param name: The module name the digests are stored under.
+        :param switches: List of switches the module configures.
+        :param shows: Show commands (without cli prefix) of the tables the
+        module configures.
+        :param inputs: Dictionary of switch: inputs relevant to it.
+        :param ignore: Parameters left out of the input digest because
+        inputs already carries their relevant part.
+        """
+        self.module = module
+        self.name = name
+        self.switches = list(switches)
+        self.shows = shows
+        self.path = module.params.get('pn_fingerprint_file')
+        self.inputs = {}
+        self.read_states = {}
+        self.unchanged_switches = set()
+        if not self.path:
+            return
+
+        params = dict((key, value) for key, value in module.params.items()
+                      if key not in IGNORED_PARAMS + tuple(ignore))
+        inputs = inputs or {}
+        for switch in self.switches:
+            self.inputs[switch] = digest([params, inputs.get(switch)])
+
+        previous = load_fingerprints(self.path).get(name, {})
+        candidates = [switch for switch in self.switches
+                      if previous.get(switch, {}).get('input') ==
+                      self.inputs[switch]]
+        self.read_states = self.states(candidates)
+        for switch in candidates:
+            if previous[switch]['state'] == self.read_states[switch]:
+                self.unchanged_switches.add(switch)
+
+    def states(self, switches):
+        """
+        Method to compute the state digest of switches.
+        :param switches: List of switches.
+        :return: Dictionary of switch: state digest.
+        """
+        cli = cli_prefix(self.module)
+        rows = dict((switch, []) for switch in switches)
+        locations = None
+        for show in self.shows:
+            command = CliCommand(cli + show)
+            if command.object == 'cluster':
+                for row in run_show(self.module, cli + show)[1]:
+                    for node in (row.get('cluster-node-1'),
+                                 row.get('cluster-node-2')):
+                        if node in rows:
+                            rows[node].append([show, row])
+            elif command.object.startswith('vrouter'):
+                if locations is None:
+                    locations = dict(
+                        (row['name'], row.get('location')) for row in
+                        run_show(self.module,
+                                 cli + ' vrouter-show format name,location ')[1])
+                for row in run_show(self.module, cli + show)[1]:
+                    switch = locations.get(row.get('vrouter-name',
+                                                   row.get('name')))
+                    if switch in rows:
+                        rows[switch].append([show, row])
+            else:
+                for switch in switches:
+                    for row in run_show(self.module, cli + ' switch %s %s' % (
+                            switch, show))[1]:
+                        rows[switch].append([show, row])
+
+        return dict((switch, digest(sorted(rows[switch], key=digest)))
+                    for switch in switches)
+
+    def unchanged(self, switch):
+        return switch in self.unchanged_switches
+
+    def all_unchanged(self, switches):
+        return bool(switches) and all(self.unchanged(switch)
+                                      for switch in switches)
+
+    def save(self, events=None):
+        """
+        Method to store the digests of the switches configured in this run.
+        Nothing is stored in check mode.
+        :param events: Events of the run (see pn_events); without them every
+        configured switch is read again.
+        """
+        if not self.path or getattr(self.module, 'check_mode', False):
+            return
+
+        configured = [switch for switch in self.switches
+                      if not self.unchanged(switch)]
+        if not configured:
+            return
+
+        changed = set(event['switch'] for event in events or []
+                      if event['result'] == 'changed')
+        if events is None or '' in changed:
+            # A fabric wide change may touch any switch.
+            changed = set(configured)
+        states = dict(self.read_states)
+        states.update(self.states([switch for switch in configured
+                                   if switch in changed or
+                                   switch not in states]))
+
+        fingerprints = load_fingerprints(self.path)
+        stored = fingerprints.setdefault(self.name, {})
+        for switch in configured:
+            stored[switch] = {'input': self.inputs[switch],
+                              'state': states[switch]}
+
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as fingerprint_file:
+            json.dump(fingerprints, fingerprint_file, sort_keys=True,
+                      indent=2)
+        os.rename(temp_path, self.path)
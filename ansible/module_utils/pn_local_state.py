@@ -0,0 +1,93 @@
+""" One-shot local state probe for the pn_initial_ztp modules """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+# Initial ZTP runs with serial: 1, one switch after the other, and every
+# step used to start its own cli process to read the piece of local state it
+# decides on. LocalState reads switch setup, STP, the known fabrics, the port
+# config table, bezel ports and LLDP neighbors once, in a single cli session,
+# right after the EULA is accepted. Fabric info is read on its own: it fails
+# on a switch which is not part of a fabric yet, which would otherwise break
+# the shared session, and is the only show allowed to fail: the module fails
+# on any other, instead of deciding on an empty table. The steps decide from
+# this snapshot and record what
+# they change, so later steps see the new state without asking the switch
+# again.
+
+import shlex
+
+from ansible.module_utils.pn_nvos import run_show, run_shows
+
+LOCAL_SHOWS = (
+    ('setup', ' switch-setup-show format switch-name,in-band-ip '),
+    ('stp', ' switch-local stp-show format enable '),
+    ('fabrics', ' fabric-show format name '),
+    ('ports', ' switch-local port-config-show format port,enable,speed '),
+    ('bezel', ' switch-local port-show format port,bezel-port '),
+    ('lldp', ' switch-local lldp-show format local-port '),
+)
+
+
+class LocalState(object):
+    """ The local state of the switch initial ZTP decides on. """
+
+    def __init__(self, module, cli):
+        """
+        :param module: The Ansible module to fetch input parameters.
+        :param cli: The cli prefix returned by the module's pn_cli().
+        """
+        results = run_shows(module, [cli + show for _, show in LOCAL_SHOWS])
+        rows = {}
+        for (name, show), (rc, show_rows, err) in zip(LOCAL_SHOWS, results):
+            if rc or err:
+                words = shlex.split(cli + show)
+                if '--user' in words[:-1]:
+                    words[words.index('--user') + 1] = '********'
+                module.fail_json(msg='Operation Failed: ' + ' '.join(words),
+                                 stderr=err.strip())
+            rows[name] = show_rows
+
+        self.setup = rows['setup'][0] if rows['setup'] else {}
+        self.stp = rows['stp'][0].get('enable', '') if rows['stp'] else ''
+        rc, fabric, err = run_show(
+            module, cli + ' fabric-info format name,control-network ')
+        self.fabric = fabric[0] if fabric and not rc and not err else None
+        self.fabrics = [row.get('name', '') for row in rows['fabrics']]
+        self.ports = rows['ports']
+        self.bezel = dict((row.get('port'), row.get('bezel-port', ''))
+                          for row in rows['bezel'])
+        self.lldp_ports = [row.get('local-port') for row in rows['lldp']]
+
+    def ports_with(self, column, value):
+        """
+        Method to list the ports of the port config table with a value.
+        :param column: The port-config-show column.
+        :param value: The value to look for.
+        :return: List of port numbers, in table order.
+        """
+        return [row['port'] for row in self.ports
+                if row.get(column) == value]
+
+    def set_ports(self, ports, column, value):
+        """
+        Method to record a port-config-modify of the given ports.
+        """
+        ports = set(ports)
+        for row in self.ports:
+            if row['port'] in ports:
+                row[column] = value
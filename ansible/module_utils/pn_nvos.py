@@ -0,0 +1,1187 @@
+""" Shared Netvisor command layer for the pn_* modules """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+# Every pn_* module builds its commands as '/usr/bin/cli --quiet ...' strings
+# and hands them to its own run_cli(). run_cli() executes them through
+# run_command() below, which picks a transport for the switch:
+#
+#   cli  - spawn /usr/bin/cli on the managed node (default).
+#   rest - talk to the nvOS web service (enabled by pn_initial_ztp's
+#          pn_web_api flag) over a persistent HTTP(S) connection.
+#
+# The transport is selected with a pn_transport module parameter when the
+# module declares one, otherwise with environment variables which can be set
+# per play through the 'environment' keyword:
+#
+#   PN_TRANSPORT        cli (default) or rest
+#   PN_WEB_API_HOST     switch to connect to (required for rest)
+#   PN_WEB_API_PORT     port of the web service
+#   PN_WEB_API_SCHEME   https (default) or http
+#   PN_WEB_API_VERIFY   set to 'false' to skip certificate validation
+#   PN_WEB_API_TIMEOUT  socket timeout in seconds (default 30)
+#
+# Cli processes get a deadline per verb (see pn_deadline) after which their
+# process group is killed, and a switch which timed out several times in a
+# row is not sent further commands:
+#
+#   PN_CLI_TIMEOUT      seconds for every command, instead of the defaults
+#   PN_CLI_TIMEOUTS     per verb seconds, e.g. fabric-join=900,port-show=60
+#   PN_CLI_BREAKER      consecutive timeouts which stop a switch (default 3,
+#                       0 to never stop one)
+#   PN_CLI_BREAKER_FILE file keeping the timeouts across module runs
+#                       (default pn_cli_breaker.json in the temp directory)
+#   PN_CLI_BREAKER_RESET
+#                       seconds after which a stopped switch is tried again
+#                       (default 600)
+#
+# The calls of a module can be recorded to a cassette and replayed from it
+# without switches (see pn_cassette):
+#
+#   PN_CASSETTE         path of the cassette, one per module run
+#   PN_CASSETTE_MODE    record or replay (default)
+#   PN_CASSETTE_LATENCY factor applied to the recorded latencies on replay
+#                       (default 0, answer at once)
+#
+# Modules which declare pn_fabric_facts accept the pn_fabric fact gathered by
+# pn_fabric_facts. While it is fresh (within its ttl and the fabric fab-tid
+# unchanged) show commands it can answer are served from it without reaching
+# the switch; a change command expires the tables of the object it changes.
+#
+# In check mode change commands are not sent. They are recorded per switch
+# (see command_plan) and reported as successful so that the module's own
+# decision logic carries on. The shows which follow a withheld change must
+# see its effect, so check mode always works on fabric facts: the fresh
+# pn_fabric_facts given to the module, else facts gathered at the first show.
+# The facts are updated in memory with the recorded changes, including the
+# columns the switch would have generated (the nic of a vrouter interface,
+# the index of a loopback).
+
+import base64
+import copy
+import json
+import os
+import select
+import shlex
+import socket
+import tempfile
+import threading
+import time
+
+try:
+    import http.client as httplib
+    from urllib.parse import quote, urlencode
+except ImportError:
+    import httplib
+    from urllib import quote, urlencode
+
+try:
+    from shlex import quote as shell_quote
+except ImportError:
+    from pipes import quote as shell_quote
+
+from ansible.module_utils.pn_cassette import Cassette, CassetteTransport
+from ansible.module_utils.pn_deadline import (BREAKER_LIMIT, BREAKER_RESET,
+                                              DeadlineRunner, parse_deadlines)
+
+CLI_BINARY = '/usr/bin/cli'
+
+# Parsable delimiter requested from the cli binary when rows are needed.
+SHOW_DELIM = ';'
+
+# Seconds a batch gets for every command beyond the first one.
+BATCH_DEADLINE_STEP = 2
+
+# Display options of show commands. They shape the output and are never sent
+# to the web service as filters.
+SHOW_DISPLAY_OPTIONS = ('format', 'parsable-delim', 'layout', 'sort-asc',
+                        'sort-desc')
+SHOW_DISPLAY_FLAGS = ('no-show-headers', 'show-headers', 'show-interval',
+                      'count-output')
+
+# Columns the cli prints without being asked for (fabric wide shows, vrouter
+# sub-objects).
+SHOW_ADDED_COLUMNS = frozenset(['switch', 'vrouter-name'])
+
+# Command words which do not take a value.
+CLI_FLAGS = ('enable', 'disable', 'bfd', 'next-hop-self', 'allowas-in',
+             'no-bfd', 'no-show-headers', 'show-headers', 'count-output')
+
+# Objects which the web service exposes as a single record instead of a
+# collection.
+REST_SINGLETONS = ('switch-setup', 'fabric-local', 'stp', 'admin-service',
+                   'system-settings', 'fabric')
+
+TRANSPORTS = {}
+
+# Cassettes by path, shared by the transports recording to or replaying from
+# the same file.
+CASSETTES = {}
+
+# Fabric facts usable by this process, resolved on first use.
+FACTS = {}
+
+# Change commands withheld in check mode, in order.
+PLAN = []
+
+# Calls made to the transports by this process, see cli_stats().
+CLI_STATS = {'calls': 0, 'commands': 0, 'bytes': 0, 'seconds': 0.0,
+             'wait_seconds': 0.0}
+
+# Calls in flight and since when, for the wait_seconds of CLI_STATS.
+WAITING = {'calls': 0, 'since': 0.0}
+WAITING_LOCK = threading.Lock()
+
+
+def module_setting(module, name, default=None):
+    """
+    Method to read a transport setting from the module parameters, falling
+    back to the PN_<NAME> environment variable.
+    :param module: The Ansible module to fetch input parameters.
+    :param name: The setting name without the 'pn_' prefix.
+    :param default: Value returned when the setting is not given.
+    :return: The setting value.
+    """
+    value = module.params.get('pn_' + name)
+    if value is None:
+        value = os.environ.get('PN_' + name.upper())
+    if value is None:
+        value = default
+    return value
+
+
+def cli_prefix(module):
+    """
+    Method to build the cli prefix from the module credentials.
+    :param module: The Ansible module to fetch input parameters.
+    :return: The cli string for further processing.
+    """
+    username = module.params.get('pn_cliusername')
+    password = module.params.get('pn_clipassword')
+    if username and password:
+        return '%s --quiet --user %s:%s ' % (CLI_BINARY, username, password)
+    return '%s --quiet ' % CLI_BINARY
+
+
+class CliCommand(object):
+    """
+    A cli invocation split into its global options, switch scope and the
+    command words.
+    """
+
+    def __init__(self, cli):
+        if isinstance(cli, (list, tuple)):
+            self.argv = list(cli)
+        else:
+            self.argv = shlex.split(cli)
+        self.options = []
+        self.user = None
+        self.switch = None
+        self.words = []
+
+        args = list(self.argv)
+        if args and os.path.basename(args[0]) == os.path.basename(CLI_BINARY):
+            args.pop(0)
+
+        while args and args[0].startswith('--'):
+            option = args.pop(0)
+            if option == '--user' and args:
+                self.user = args.pop(0)
+            else:
+                self.options.append(option)
+
+        if args and args[0] == 'switch-local':
+            args.pop(0)
+            self.switch = 'local'
+        elif len(args) > 1 and args[0] == 'switch':
+            args.pop(0)
+            self.switch = args.pop(0)
+
+        self.words = args
+
+    @property
+    def verb(self):
+        return self.words[0] if self.words else ''
+
+    @property
+    def object(self):
+        return self.verb.rsplit('-', 1)[0]
+
+    @property
+    def action(self):
+        return self.verb.rsplit('-', 1)[-1]
+
+    @property
+    def is_show(self):
+        return self.action in ('show', 'info')
+
+    def arguments(self):
+        """
+        Method to pair the command words into a dictionary.
+        :return: Dictionary of command arguments, flags map to True.
+        """
+        arguments = {}
+        words = self.words[1:]
+        while words:
+            word = words.pop(0)
+            if word in CLI_FLAGS or not words:
+                arguments[word] = True
+            else:
+                arguments[word] = words.pop(0)
+        return arguments
+
+    def show_filters(self):
+        """
+        Method to return the filters of a show command.
+        :return: Dictionary of filters without the display options.
+        """
+        return dict((key, value) for key, value in self.arguments().items()
+                    if key not in SHOW_DISPLAY_OPTIONS + SHOW_DISPLAY_FLAGS)
+
+    def show_columns(self):
+        """
+        Method to return the columns requested through 'format'.
+        :return: List of column names, empty for 'all' or no format.
+        """
+        columns = self.arguments().get('format')
+        if not columns or columns is True or columns == 'all':
+            return []
+        return columns.split(',')
+
+
+def rows_to_text(command, rows):
+    """
+    Method to render web service rows the way the cli binary prints them, so
+    that callers splitting the output keep working.
+    :param command: The CliCommand the rows belong to.
+    :param rows: List of dictionaries returned by the web service.
+    :return: The rendered output.
+    """
+    arguments = command.arguments()
+    columns = command.show_columns()
+    if not columns:
+        for row in rows:
+            for key in row:
+                if key not in columns:
+                    columns.append(key)
+
+    # The cli always prints the owning vrouter of vrouter sub-objects.
+    if (command.object.startswith('vrouter-') and
+            'vrouter-name' not in columns):
+        columns.insert(0, 'vrouter-name')
+
+    delim = arguments.get('parsable-delim')
+    if not delim or delim is True:
+        delim = ' '
+
+    lines = []
+    if 'no-show-headers' not in arguments:
+        lines.append(delim.join(columns))
+    for row in rows:
+        lines.append(delim.join(str(row.get(column, '')) for column in columns))
+    return '\n'.join(lines) + '\n' if rows else ''
+
+
+def text_to_rows(out, columns=None, delim=SHOW_DELIM):
+    """
+    Method to parse parsable cli output into rows.
+    :param out: Output of a show command run with parsable-delim.
+    :param columns: Column names, taken from the first line when not given.
+    :param delim: The parsable delimiter used.
+    :return: List of dictionaries keyed by column name.
+    """
+    lines = [line for line in out.splitlines() if line.strip()]
+    if not columns:
+        if not lines:
+            return []
+        columns = lines.pop(0).split(delim)
+    return [dict(zip(columns, line.split(delim))) for line in lines]
+
+
+class CliTransport(object):
+    """ Runs commands through the cli binary on the managed node. """
+
+    name = 'cli'
+
+    def __init__(self, module):
+        self.module = module
+        self.runner = DeadlineRunner(
+            module_setting(module, 'cli_timeout'),
+            parse_deadlines(module_setting(module, 'cli_timeouts')),
+            module_setting(module, 'cli_breaker', BREAKER_LIMIT),
+            module_setting(module, 'cli_breaker_file',
+                           os.path.join(tempfile.gettempdir(),
+                                        'pn_cli_breaker.json')),
+            module_setting(module, 'cli_breaker_reset', BREAKER_RESET))
+
+    def deadline(self, commands):
+        """
+        Method to compute the deadline of one cli process: the longest
+        deadline of its commands, plus BATCH_DEADLINE_STEP seconds for every
+        further command.
+        :param commands: List of CliCommand run by the process.
+        :return: Seconds.
+        """
+        longest = max(self.runner.deadline_for(command.verb, command.is_show)
+                      for command in commands)
+        return longest + BATCH_DEADLINE_STEP * (len(commands) - 1)
+
+    def run(self, command):
+        return self.runner.execute(command.argv, None,
+                                   self.deadline([command]),
+                                   command.switch or 'local')
+
+    def batch(self, commands):
+        """
+        Method to run several commands through a single cli process which
+        reads them from stdin, one per line.
+        :param commands: List of CliCommand sharing the same global options.
+        :return: Tuple of (rc, out, err).
+        """
+        head = commands[0]
+        argv = [CLI_BINARY] + head.options
+        if head.user:
+            argv += ['--user', head.user]
+        lines = []
+        for command in commands:
+            words = list(command.words)
+            if command.switch == 'local':
+                words.insert(0, 'switch-local')
+            elif command.switch:
+                words[:0] = ['switch', command.switch]
+            lines.append(' '.join(shell_quote(word) for word in words))
+        return self.runner.execute(argv, '\n'.join(lines) + '\n',
+                                   self.deadline(commands),
+                                   head.switch or 'local')
+
+    def show(self, command):
+        """
+        Method to run a show command and return its rows.
+        :param command: The CliCommand to run.
+        :return: Tuple of (rc, rows, err).
+        """
+        argv = [word for word in command.argv if word != 'no-show-headers']
+        if 'parsable-delim' not in argv:
+            argv += ['parsable-delim', SHOW_DELIM]
+        if 'show-headers' not in argv:
+            argv.append('show-headers')
+        rc, out, err = self.runner.execute(argv, None,
+                                           self.deadline([command]),
+                                           command.switch or 'local')
+        return rc, text_to_rows(out), err
+
+    def stream(self, command, errors):
+        """
+        Method to start a show whose output is read while the cli prints it.
+        :param command: The CliCommand to run, display options included.
+        :param errors: File the cli writes its errors to.
+        :return: The running process, to hand to stop_stream().
+        """
+        return self.runner.spawn(command.argv, self.deadline([command]),
+                                 command.switch or 'local', errors)
+
+    def stop_stream(self, process):
+        """
+        Method to stop a streamed show, if it still runs.
+        :param process: The process returned by stream().
+        :return: Tuple of (rc, err), err naming the deadline if the show was
+        stopped at it.
+        """
+        return self.runner.stop(process)
+
+    def close(self):
+        self.runner.cancel()
+
+
+class RestTransport(object):
+    """
+    Runs commands against the nvOS web service. One HTTP connection is kept
+    alive per switch and authenticated once; the session cookie handed out by
+    the switch is replayed on every following request. Show tables are
+    cached for the lifetime of the transport until the next change.
+    """
+
+    name = 'rest'
+
+    def __init__(self, host, port=None, scheme='https', username=None,
+                 password=None, timeout=30, verify=True):
+        self.host = host
+        self.port = int(port) if port else None
+        self.scheme = scheme
+        self.username = username
+        self.password = password
+        self.timeout = float(timeout)
+        self.verify = verify
+        self.connection = None
+        self.cookie = None
+        self.cache = {}
+
+    def connect(self):
+        sock = getattr(self.connection, 'sock', None)
+        if sock is not None and select.select([sock], [], [], 0)[0]:
+            # The switch closed the idle keep-alive connection; reconnect
+            # before sending rather than after a change was sent.
+            self.close()
+        if self.connection is None:
+            if self.scheme == 'https':
+                kwargs = {}
+                if not self.verify:
+                    import ssl
+                    kwargs['context'] = ssl._create_unverified_context()
+                self.connection = httplib.HTTPSConnection(
+                    self.host, self.port, timeout=self.timeout, **kwargs)
+            else:
+                self.connection = httplib.HTTPConnection(
+                    self.host, self.port, timeout=self.timeout)
+        return self.connection
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def headers(self):
+        headers = {'Accept': 'application/json', 'Connection': 'keep-alive'}
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        elif self.username:
+            credentials = '%s:%s' % (self.username, self.password or '')
+            headers['Authorization'] = 'Basic ' + base64.b64encode(
+                credentials.encode('utf-8')).decode('ascii')
+        return headers
+
+    def request(self, method, path, body=None):
+        """
+        Method to send one request over the persistent connection. A dropped
+        keep-alive connection is reopened and an expired session is
+        re-authenticated, each once. A change is only sent again if it
+        never reached the switch, so that it is not applied twice.
+        :param method: HTTP method.
+        :param path: Request path including the query string.
+        :param body: Optional dictionary sent as JSON.
+        :return: Tuple of (status, decoded JSON payload or text), status
+        being None if the switch could not be reached.
+        """
+        data = json.dumps(body) if body is not None else None
+        for attempt in (0, 1):
+            headers = self.headers()
+            if data is not None:
+                headers['Content-Type'] = 'application/json'
+            sent = False
+            try:
+                connection = self.connect()
+                connection.request(method, path, data, headers)
+                sent = True
+                response = connection.getresponse()
+                payload = response.read()
+            except (httplib.HTTPException, socket.error) as error:
+                self.close()
+                if attempt or (sent and method != 'GET'):
+                    return None, '%s %s: %s' % (method, path, error)
+                continue
+
+            if response.status == 401 and self.cookie and not attempt:
+                self.cookie = None
+                continue
+
+            cookie = response.getheader('set-cookie')
+            if cookie:
+                self.cookie = cookie.split(';', 1)[0]
+            if (response.getheader('connection') or '').lower() == 'close':
+                self.close()
+
+            payload = payload.decode('utf-8') if payload else ''
+            try:
+                payload = json.loads(payload) if payload else {}
+            except ValueError:
+                pass
+            return response.status, payload
+
+    @staticmethod
+    def resource(command):
+        resource = command.object
+        if resource not in REST_SINGLETONS and not resource.endswith('s'):
+            resource += 's'
+        if command.switch and command.switch != 'local':
+            return '/vRest/switches/%s/%s' % (quote(command.switch), resource)
+        return '/vRest/' + resource
+
+    def show_path(self, command):
+        filters = command.show_filters()
+        path = self.resource(command)
+        if filters:
+            path += '?' + urlencode(sorted(filters.items()))
+        return path
+
+    def error_text(self, status, payload):
+        if status is None:
+            return 'Cannot reach the web service of %s: %s' % (self.host,
+                                                                payload)
+        if isinstance(payload, dict):
+            result = payload.get('result', {})
+            messages = [entry.get('message', '') for entry in
+                        result.get('result', []) if isinstance(entry, dict)]
+            if any(messages):
+                return '\n'.join(message for message in messages if message)
+            if result.get('message'):
+                return result['message']
+        return 'HTTP %s: %s' % (status, payload)
+
+    def show(self, command):
+        """
+        Method to fetch a show table.
+        :param command: The CliCommand to run.
+        :return: Tuple of (rc, rows, err).
+        """
+        path = self.show_path(command)
+        if path not in self.cache:
+            status, payload = self.request('GET', path)
+            if status is None or status >= 400:
+                return 1, [], self.error_text(status, payload)
+            rows = payload.get('data', []) if isinstance(payload, dict) else []
+            self.cache[path] = rows
+        return 0, self.cache[path], ''
+
+    def prefetch(self, clis):
+        """
+        Method to fetch several show tables back to back over the kept alive
+        connection, so that the following show calls are served from cache.
+        :param clis: List of cli strings of show commands.
+        """
+        for cli in clis:
+            self.show(CliCommand(cli))
+
+    def run(self, command):
+        if command.is_show:
+            rc, rows, err = self.show(command)
+            return rc, rows_to_text(command, rows) if not rc else '', err
+
+        self.cache.clear()
+        action = command.action
+        body = command.arguments()
+        path = self.resource(command)
+        if action in ('create', 'add'):
+            method = 'POST'
+        elif action == 'modify':
+            method = 'PUT'
+        elif action in ('delete', 'remove'):
+            method = 'DELETE'
+            path += '?' + urlencode(sorted(body.items()))
+            body = None
+        else:
+            method = 'POST'
+            path += '/' + action
+
+        status, payload = self.request(method, path, body)
+        if status is None or status >= 400:
+            return 1, '', self.error_text(status, payload)
+        return 0, '', ''
+
+    def batch(self, commands):
+        """
+        Method to run several commands back to back over the kept alive
+        connection, stopping at the first failure.
+        :param commands: List of CliCommand.
+        :return: Tuple of (rc, out, err).
+        """
+        output = []
+        for command in commands:
+            rc, out, err = self.run(command)
+            output.append(out)
+            if rc or err:
+                return rc or 1, ''.join(output), err
+        return 0, ''.join(output), ''
+
+
+class MeteredTransport(object):
+    """ Wraps a transport to count its calls into CLI_STATS. """
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.name = transport.name
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.transport, name)
+
+    def waiting(self, delta):
+        """
+        Method to track the calls in flight of all transports; the wall
+        time during which at least one runs is added to wait_seconds, so
+        concurrent calls count once.
+        :param delta: 1 when a call starts, -1 when it ends.
+        """
+        with WAITING_LOCK:
+            now = time.time()
+            if delta > 0 and not WAITING['calls']:
+                WAITING['since'] = now
+            WAITING['calls'] += delta
+            if delta < 0 and not WAITING['calls']:
+                CLI_STATS['wait_seconds'] += now - WAITING['since']
+
+    def count(self, commands, call):
+        started = time.time()
+        self.waiting(1)
+        try:
+            rc, out, err = call()
+        finally:
+            self.waiting(-1)
+        if isinstance(out, list):
+            size = sum(len(value) for row in out for value in row.values()
+                       if value)
+        else:
+            size = len(out or '')
+        self.account(commands, size + len(err or ''), time.time() - started)
+        return rc, out, err
+
+    def account(self, commands, size, seconds):
+        """
+        Method to add a call to CLI_STATS, also for callers which read the
+        output of a streamed show themselves.
+        :param commands: Number of commands the call carried.
+        :param size: Bytes of output and errors.
+        :param seconds: Time spent on the call.
+        """
+        with self.lock:
+            CLI_STATS['calls'] += 1
+            CLI_STATS['commands'] += commands
+            CLI_STATS['bytes'] += size
+            CLI_STATS['seconds'] += seconds
+
+    def run(self, command):
+        return self.count(1, lambda: self.transport.run(command))
+
+    def batch(self, commands):
+        return self.count(len(commands),
+                          lambda: self.transport.batch(commands))
+
+    def show(self, command):
+        return self.count(1, lambda: self.transport.show(command))
+
+    def stream(self, command, errors):
+        self.waiting(1)
+        try:
+            return self.transport.stream(command, errors)
+        except Exception:
+            self.waiting(-1)
+            raise
+
+    def stop_stream(self, process):
+        try:
+            return self.transport.stop_stream(process)
+        finally:
+            self.waiting(-1)
+
+
+def cli_stats():
+    """
+    Method to return what the module's calls to the switches cost, for the
+    pn_metrics callback.
+    :return: Dictionary with the number of transport calls (a batch is one
+    call), the commands they carried, the bytes of output, the seconds
+    spent waiting on them summed over the calls and, as wait_seconds, the
+    wall time during which any call ran, and open_circuits with the switches
+    the circuit breaker stopped, if any.
+    """
+    stats = dict(CLI_STATS)
+    stats['seconds'] = round(stats['seconds'], 3)
+    stats['wait_seconds'] = round(stats['wait_seconds'], 3)
+    for transport in list(TRANSPORTS.values()):
+        runner = getattr(transport, 'runner', None)
+        if runner is not None and runner.open_circuits():
+            stats.setdefault('open_circuits', {}).update(
+                runner.open_circuits())
+    return stats
+
+
+def get_transport(module):
+    """
+    Method to return the transport the module talks to the switch through.
+    Transports are created once per process and reused by every call.
+    :param module: The Ansible module to fetch input parameters.
+    :return: A CliTransport or RestTransport instance, wrapped in a
+    CassetteTransport when a cassette is set and in a MeteredTransport.
+    """
+    name = module_setting(module, 'transport', 'cli')
+    if name != 'rest':
+        return cli_transport(module)
+
+    host = module_setting(module, 'web_api_host')
+    if not host:
+        module.fail_json(msg='PN_WEB_API_HOST is required for the rest '
+                             'transport')
+    scheme = module_setting(module, 'web_api_scheme', 'https')
+    port = module_setting(module, 'web_api_port')
+    username = module.params.get('pn_cliusername')
+    key = ('rest', scheme, host, port, username)
+    if key not in TRANSPORTS:
+        verify = str(module_setting(module, 'web_api_verify', True))
+        TRANSPORTS[key] = MeteredTransport(with_cassette(module, RestTransport(
+            host, port=port, scheme=scheme, username=username,
+            password=module.params.get('pn_clipassword'),
+            timeout=module_setting(module, 'web_api_timeout', 30),
+            verify=verify.lower() not in ('false', 'no', '0'))))
+    return TRANSPORTS[key]
+
+
+def cli_transport(module):
+    """
+    Method to return the cli transport of the managed node whatever
+    transport the module selected, for shows streamed from the cli.
+    :param module: The Ansible module to fetch input parameters.
+    :return: The CliTransport, wrapped as get_transport() wraps it.
+    """
+    key = ('cli',)
+    if key not in TRANSPORTS:
+        TRANSPORTS[key] = MeteredTransport(
+            with_cassette(module, CliTransport(module)))
+    return TRANSPORTS[key]
+
+
+def with_cassette(module, transport):
+    """
+    Method to wrap a transport for recording or replaying its calls.
+    :param module: The Ansible module to fetch input parameters.
+    :param transport: The transport to wrap.
+    :return: The transport, wrapped if PN_CASSETTE is set.
+    """
+    path = module_setting(module, 'cassette')
+    if not path:
+        return transport
+    mode = module_setting(module, 'cassette_mode', 'replay')
+    if mode not in ('record', 'replay'):
+        module.fail_json(msg='PN_CASSETTE_MODE must be record or replay')
+    if path not in CASSETTES:
+        try:
+            CASSETTES[path] = Cassette(
+                path, mode, module_setting(module, 'cassette_latency', 0))
+        except (IOError, OSError, ValueError) as error:
+            module.fail_json(msg='Cannot use cassette %s: %s' % (path, error))
+    return CassetteTransport(transport, CASSETTES[path])
+
+
+def fabric_generation(rows):
+    """
+    Method to compute the fabric generation stamp from fabric-node-show rows.
+    :param rows: Rows with a fab-tid column.
+    :return: The highest fab-tid as string.
+    """
+    tids = [int(row['fab-tid']) for row in rows
+            if str(row.get('fab-tid', '')).isdigit()]
+    return str(max(tids)) if tids else ''
+
+
+def facts_fresh(module, facts):
+    """
+    Method to check that fabric facts are within their ttl and that the
+    fabric did not change since they were gathered.
+    :param module: The Ansible module to fetch input parameters.
+    :param facts: The pn_fabric fact.
+    :return: True if the facts can be used.
+    """
+    try:
+        age = time.time() - float(facts['gathered'])
+        if age > float(facts['ttl']) or not facts['generation']:
+            return False
+    except (KeyError, TypeError, ValueError):
+        return False
+
+    command = CliCommand(cli_prefix(module) + ' fabric-node-show '
+                                              'format name,fab-tid ')
+    rc, rows, err = get_transport(module).show(command)
+    return not rc and not err and fabric_generation(rows) == facts['generation']
+
+
+def facts_tables(module):
+    """
+    Method to return the fact tables usable by this process.
+    :param module: The Ansible module to fetch input parameters.
+    :return: Dictionary of show object: table, empty without fresh facts.
+    """
+    if 'tables' not in FACTS:
+        facts = module.params.get('pn_fabric_facts')
+        fresh = bool(facts) and facts_fresh(module, facts)
+        FACTS['tables'] = copy.deepcopy(facts['tables']) if fresh else {}
+        if not fresh and getattr(module, 'check_mode', False):
+            # Imported here as pn_fabric_facts builds on this module. Its
+            # shows find the empty tables above and go to the switches.
+            from ansible.module_utils.pn_fabric_facts import \
+                gather_fabric_facts
+            FACTS['tables'] = gather_fabric_facts(module, 0)['tables']
+    return FACTS['tables']
+
+
+def facts_rows(module, command):
+    """
+    Method to answer a show command from the fabric facts.
+    :param module: The Ansible module to fetch input parameters.
+    :param command: The CliCommand of a show.
+    :return: List of rows, or None if the facts cannot answer it.
+    """
+    table = facts_tables(module).get(command.object)
+    columns = command.show_columns()
+    if not table or not columns or not set(columns) <= set(table['columns']):
+        return None
+
+    filters = command.show_filters()
+    if table['scope'] == 'switch':
+        if not command.switch or command.switch == 'local':
+            return None
+        filters['switch'] = command.switch
+    for key, value in filters.items():
+        if value is True or key not in table['columns']:
+            return None
+
+    return [row for row in table['rows']
+            if all(str(row.get(key, '')) == str(value)
+                   for key, value in filters.items())]
+
+
+def expire_facts(command):
+    """
+    Method to drop the fact tables a change command may affect.
+    :param command: The CliCommand of a change.
+    """
+    tables = FACTS.get('tables')
+    if not tables:
+        return
+    changed = command.object
+    if changed.startswith('fabric') or changed.startswith('switch'):
+        tables.clear()
+        return
+    for name in list(tables):
+        if name == changed or name.startswith(changed + '-'):
+            del tables[name]
+
+
+def generate_columns(table, row):
+    """
+    Method to fill in the columns the switch assigns to a new row itself.
+    :param table: The fact table the row is added to.
+    :param row: The row built from the change command's arguments.
+    """
+    siblings = [existing for existing in table['rows']
+                if existing.get('vrouter-name') == row.get('vrouter-name')]
+    if 'nic' in table['columns'] and 'nic' not in row:
+        row['nic'] = 'eth%d.%s' % (len(siblings), row.get('vlan', '0'))
+    if 'index' in table['columns'] and 'index' not in row:
+        used = [int(existing['index']) for existing in siblings
+                if str(existing.get('index', '')).isdigit()]
+        row['index'] = str(max(used) + 1 if used else 0)
+
+
+def simulate_facts(module, command):
+    """
+    Method to apply a change command withheld in check mode to the fact
+    tables, so that the following shows see its effect.
+    :param module: The Ansible module to fetch input parameters.
+    :param command: The CliCommand of a change.
+    """
+    table = facts_tables(module).get(command.object)
+    if not table:
+        return
+
+    arguments = command.arguments()
+    named = command.switch and command.switch != 'local'
+    if table['scope'] == 'switch':
+        if not named:
+            return
+        arguments['switch'] = command.switch
+    if command.object == 'vrouter' and named:
+        arguments.setdefault('location', command.switch)
+    row = dict((key, str(value)) for key, value in arguments.items()
+               if key in table['columns'] and value is not True)
+
+    if command.action in ('create', 'add'):
+        generate_columns(table, row)
+        table['rows'].append(row)
+        return
+
+    if command.action in ('delete', 'remove'):
+        keys = [key for key in row]
+    else:
+        keys = [key for key in ('switch', 'vrouter-name', 'name') if key in row]
+    if not keys:
+        return
+    matching = [existing for existing in table['rows']
+                if all(str(existing.get(key, '')) == row[key] for key in keys)]
+    for existing in matching:
+        if command.action in ('delete', 'remove'):
+            table['rows'].remove(existing)
+        elif command.action == 'modify':
+            existing.update(row)
+
+
+def plan_command(module, command):
+    """
+    Method to record a change command instead of running it.
+    :param module: The Ansible module to fetch input parameters.
+    :param command: The CliCommand of a change.
+    :return: Tuple of (rc, out, err) of a successful change.
+    """
+    PLAN.append(command)
+    simulate_facts(module, command)
+    return 0, '', ''
+
+
+def command_plan():
+    """
+    Method to return the change commands recorded in check mode.
+    :return: Dictionary of switch ('local' for the managed node): list of
+    commands in the order they would have been issued.
+    """
+    plan = {}
+    for command in PLAN:
+        switch = command.switch if command.switch else 'local'
+        plan.setdefault(switch, []).append(
+            ' '.join(shell_quote(word) for word in command.words))
+    return plan
+
+
+def run_command(module, cli):
+    """
+    Method to execute a cli command through the selected transport. It is a
+    drop-in replacement for module.run_command() in the modules' run_cli().
+    :param module: The Ansible module to fetch input parameters.
+    :param cli: The cli string or its already split list.
+    :return: Tuple of (rc, out, err).
+    """
+    command = CliCommand(cli)
+    if command.is_show:
+        rows = facts_rows(module, command)
+        if rows is not None:
+            return 0, rows_to_text(command, rows), ''
+    elif getattr(module, 'check_mode', False):
+        return plan_command(module, command)
+    else:
+        expire_facts(command)
+    return get_transport(module).run(command)
+
+
+def run_batch(module, clis, size=100, progress=None):
+    """
+    Method to execute many change commands in batches instead of one cli
+    process each. Commands are grouped in order; a group is cut when it
+    reaches size or when the global options (--quiet, --user) change.
+    :param module: The Ansible module to fetch input parameters.
+    :param clis: List of cli strings.
+    :param size: Maximum number of commands per batch.
+    :param progress: Optional callable(done, total) called after each batch.
+    :return: Tuple of (rc, out, err) of the first failed batch, or of the
+    last one.
+    """
+    commands = [CliCommand(cli) for cli in clis]
+    if getattr(module, 'check_mode', False):
+        for command in commands:
+            plan_command(module, command)
+        if progress and commands:
+            progress(len(commands), len(commands))
+        return 0, '', ''
+
+    transport = get_transport(module)
+    for command in commands:
+        expire_facts(command)
+    size = max(int(size), 1)
+    rc, out, err = 0, '', ''
+    done = 0
+    while done < len(commands):
+        head = commands[done]
+        group = [head]
+        for command in commands[done + 1:done + size]:
+            if (command.options, command.user) != (head.options, head.user):
+                break
+            group.append(command)
+        rc, out, err = transport.batch(group)
+        if rc or err:
+            return rc or 1, out, err
+        done += len(group)
+        if progress:
+            progress(done, len(commands))
+    return rc, out, err
+
+
+def run_parallel(module, plans, workers=8, size=100):
+    """
+    Method to run independent command lists concurrently, each one in order
+    and through run_batch(). A bounded pool of threads picks the lists up;
+    after a failure no further list is started. The rest transport keeps a
+    single connection and runs the lists one after the other.
+    :param module: The Ansible module to fetch input parameters.
+    :param plans: List of (target, list of cli strings).
+    :param workers: Maximum number of lists run at the same time.
+    :param size: Maximum number of commands per batch.
+    :return: List of (target, clis, rc, out, err) in the order of plans,
+    None for the lists which were not started.
+    """
+    results = [None] * len(plans)
+    pending = list(range(len(plans)))
+    lock = threading.Lock()
+    failed = []
+
+    def worker():
+        while True:
+            with lock:
+                if failed or not pending:
+                    return
+                index = pending.pop(0)
+            target, clis = plans[index]
+            rc, out, err = run_batch(module, clis, size)
+            results[index] = (target, clis, rc, out, err)
+            if rc or err:
+                with lock:
+                    failed.append(index)
+
+    if get_transport(module).name != 'cli':
+        workers = 1
+    threads = [threading.Thread(target=worker)
+               for _ in range(max(1, min(int(workers), len(plans))))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def show_batch_command(command):
+    """
+    Method to prepare a show command for a shared cli session.
+    :param command: The CliCommand of a show with a format column list.
+    :return: The CliCommand asking for parsable output with headers, or None
+    if the command can not share a session (no columns, own delimiter).
+    """
+    if not command.show_columns() or 'parsable-delim' in command.argv:
+        return None
+    argv = [word for word in command.argv if word != 'no-show-headers']
+    argv += ['parsable-delim', SHOW_DELIM]
+    if 'show-headers' not in argv:
+        argv.append('show-headers')
+    return CliCommand(argv)
+
+
+def header_key(command):
+    """
+    Method to return what tells the header of a show apart: its columns
+    without the ones the cli may add on its own. Shows sharing a session
+    must have different keys.
+    :param command: The CliCommand of the show.
+    :return: Frozen set of column names.
+    """
+    return frozenset(command.show_columns()) - SHOW_ADDED_COLUMNS
+
+
+def is_show_header(fields, command):
+    """
+    Method to recognize the header line a show command prints.
+    :param fields: The fields of an output line.
+    :param command: The CliCommand of the show.
+    :return: True if the line holds the requested columns and nothing but
+    the columns the cli adds on its own.
+    """
+    columns = set(command.show_columns())
+    return (columns.issubset(fields) and
+            set(fields).issubset(columns | SHOW_ADDED_COLUMNS))
+
+
+def split_show_output(out, commands):
+    """
+    Method to split the output of several shows run in one session.
+    :param out: The concatenated output.
+    :param commands: The CliCommands in the order they were run, with
+    pairwise different header_key().
+    :return: List of row lists, one per command.
+    """
+    results = [[] for _ in commands]
+    current = None
+    columns = None
+    for line in out.splitlines():
+        if not line.strip():
+            continue
+        fields = line.split(SHOW_DELIM)
+        start = 0 if current is None else current + 1
+        for index in range(start, len(commands)):
+            if is_show_header(fields, commands[index]):
+                current, columns = index, fields
+                break
+        else:
+            if current is not None:
+                results[current].append(dict(zip(columns, fields)))
+    return results
+
+
+def run_shows(module, clis):
+    """
+    Method to execute several show commands and return their rows. Shows
+    with a format column list share a single cli session; others, and all
+    shows of the rest transport, run one by one.
+    :param module: The Ansible module to fetch input parameters.
+    :param clis: List of cli strings of show commands.
+    :return: List of (rc, rows, err), one per command.
+    """
+    commands = [CliCommand(cli) for cli in clis]
+    results = [None] * len(commands)
+    for index, command in enumerate(commands):
+        rows = facts_rows(module, command)
+        if rows is not None:
+            results[index] = (0, rows, '')
+
+    transport = get_transport(module)
+    if transport.name == 'cli':
+        groups = []
+        for index, command in enumerate(commands):
+            prepared = show_batch_command(command)
+            if results[index] is not None or prepared is None:
+                continue
+            group = groups[-1] if groups else None
+            if (group is None or
+                    (prepared.options, prepared.user) !=
+                    (group[0][1].options, group[0][1].user) or
+                    header_key(prepared) in
+                    [header_key(other) for _, other in group]):
+                group = []
+                groups.append(group)
+            group.append((index, prepared))
+
+        for group in groups:
+            if len(group) < 2:
+                continue
+            rc, out, err = transport.batch([prepared for _, prepared in group])
+            if rc or err:
+                # Leave the shows to run one by one to attribute the error.
+                continue
+            split = split_show_output(out, [prepared for _, prepared in group])
+            for (index, _), rows in zip(group, split):
+                results[index] = (0, rows, '')
+
+    for index, command in enumerate(commands):
+        if results[index] is None:
+            results[index] = transport.show(command)
+    return results
+
+
+def run_show(module, cli):
+    """
+    Method to execute a show command and return its rows instead of text.
+    :param module: The Ansible module to fetch input parameters.
+    :param cli: The cli string of a show command.
+    :return: Tuple of (rc, rows, err), rows being a list of dictionaries.
+    """
+    command = CliCommand(cli)
+    rows = facts_rows(module, command)
+    if rows is not None:
+        return 0, rows, ''
+    return get_transport(module).show(command)
@@ -0,0 +1,174 @@
+""" OSPF adjacency planning for the pn_* fabric modules """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+# The spine-leaf links are found from one interface snapshot instead of
+# asking port-show for the peer of every spine port: both ends of a link
+# carry an address of the same point-to-point network, so grouping the l3
+# interfaces of all vrouters by network pairs every spine interface with its
+# leaf interface. Each link then needs the network statement on both vrouters
+# (in the area of the leaf) and, with BFD, ospf-bfd on both nics. Statements
+# already present in the vrouter-ospf-show and vrouter-interface-config-show
+# snapshots are marked so that only the missing ones are applied.
+
+import socket
+import struct
+
+from ansible.module_utils.pn_nvos import run_show
+
+
+def ip_network(cidr):
+    """
+    Method to compute the network address of an interface ip.
+    :param cidr: The interface ip as a.b.c.d/len.
+    :return: The network as a.b.c.d/len.
+    """
+    address, bits = cidr.split('/')
+    bits = int(bits)
+    mask = (0xffffffff << (32 - bits)) & 0xffffffff
+    number = struct.unpack('!I', socket.inet_aton(address))[0] & mask
+    return '%s/%d' % (socket.inet_ntoa(struct.pack('!I', number)), bits)
+
+
+def ospf_snapshot(module, cli, bfd=False):
+    """
+    Method to read vrouters, their interfaces, loopbacks, OSPF networks and
+    (optionally) interface configs with one show each.
+    :param module: The Ansible module to fetch input parameters.
+    :param cli: The cli prefix returned by the module's pn_cli().
+    :param bfd: Whether ospf-bfd state is needed.
+    :return: Dictionary of show name: rows.
+    """
+    shows = [
+        ('vrouters', ' vrouter-show format name,location '),
+        ('interfaces',
+         ' vrouter-interface-show format vrouter-name,l3-port,ip,nic '),
+        ('loopbacks', ' vrouter-loopback-interface-show format vrouter-name,ip '),
+        ('networks', ' vrouter-ospf-show format vrouter-name,network '),
+    ]
+    if bfd:
+        shows.append(('configs', ' vrouter-interface-config-show '
+                                 'format vrouter-name,nic,ospf-bfd '))
+
+    snapshot = {}
+    for name, show in shows:
+        rc, rows, err = run_show(module, cli + show)
+        snapshot[name] = [] if rc or err else rows
+    snapshot.setdefault('configs', [])
+    return snapshot
+
+
+def spine_leaf_links(spine_list, leaf_list, snapshot):
+    """
+    Method to pair spine and leaf interfaces sharing a network.
+    :param spine_list: List of spine switches.
+    :param leaf_list: List of leaf switches.
+    :param snapshot: Output of ospf_snapshot().
+    :return: List of (network, spine interface, leaf interface) where an
+    interface is a (switch, vrouter, nic) tuple, in spine order.
+    """
+    location = dict((row['name'], row.get('location', ''))
+                    for row in snapshot['vrouters'])
+    spines = set(spine_list)
+    leafs = set(leaf_list)
+
+    ends = {}
+    for row in snapshot['interfaces']:
+        if not row.get('l3-port') or '/' not in row.get('ip', ''):
+            continue
+        switch = location.get(row['vrouter-name'])
+        if switch in spines or switch in leafs:
+            network = ip_network(row['ip'])
+            ends.setdefault(network, []).append(
+                (switch, row['vrouter-name'], row.get('nic', '')))
+
+    links = []
+    for network, interfaces in ends.items():
+        spine_ends = [end for end in interfaces if end[0] in spines]
+        leaf_ends = [end for end in interfaces if end[0] in leafs]
+        if len(spine_ends) == 1 and len(leaf_ends) == 1:
+            links.append((network, spine_ends[0], leaf_ends[0]))
+
+    position = dict((spine, index) for index, spine in enumerate(spine_list))
+    links.sort(key=lambda link: (position[link[1][0]], link[0]))
+    return links
+
+
+def plan_ospf(spine_list, leaf_list, area_map, snapshot, bfd=False,
+              loopback_area=None):
+    """
+    Method to compute the OSPF network and BFD statements of every vrouter.
+    :param spine_list: List of spine switches.
+    :param leaf_list: List of leaf switches.
+    :param area_map: Dictionary of leaf: ospf-area.
+    :param snapshot: Output of ospf_snapshot().
+    :param bfd: Whether ospf-bfd should be enabled on the link nics.
+    :param loopback_area: Area of the spines loopback network, None to skip.
+    :return: List of (switch, vrouter, bfd statements, network statements)
+    in the order they should be applied. A bfd statement is (nic, current
+    ospf-bfd or None) and a network statement is (network, area, exists).
+    """
+    existing = set((row['vrouter-name'], row['network'])
+                   for row in snapshot['networks'])
+    bfd_state = dict(((row['vrouter-name'], row['nic']), row.get('ospf-bfd'))
+                     for row in snapshot['configs'])
+
+    plan = []
+    vrouters = {}
+
+    def statements(switch, vrouter):
+        if vrouter not in vrouters:
+            vrouters[vrouter] = (switch, vrouter, [], [])
+            plan.append(vrouters[vrouter])
+        return vrouters[vrouter]
+
+    def add_network(switch, vrouter, network, area):
+        networks = statements(switch, vrouter)[3]
+        if network not in [statement[0] for statement in networks]:
+            networks.append((network, area,
+                             (vrouter, network) in existing))
+
+    if loopback_area is not None:
+        location = dict((row['name'], row.get('location', ''))
+                        for row in snapshot['vrouters'])
+        loopbacks = {}
+        for row in snapshot['loopbacks']:
+            loopbacks.setdefault(row['vrouter-name'], row['ip'].split('/')[0])
+        spine_vrouters = []
+        for spine in spine_list:
+            spine_vrouters += sorted(vrouter for vrouter in location
+                                     if location[vrouter] == spine)
+        first = [vrouter for vrouter in spine_vrouters if vrouter in loopbacks]
+        if first:
+            loopback_network = ip_network(loopbacks[first[0]] + '/24')
+            for vrouter in spine_vrouters:
+                add_network(location[vrouter], vrouter, loopback_network,
+                            loopback_area)
+
+    for network, spine_end, leaf_end in spine_leaf_links(spine_list,
+                                                         leaf_list, snapshot):
+        if leaf_end[0] not in area_map:
+            continue
+        area = area_map[leaf_end[0]]
+        for switch, vrouter, nic in (spine_end, leaf_end):
+            if bfd and nic:
+                nics = statements(switch, vrouter)[2]
+                nics.append((nic, bfd_state.get((vrouter, nic))))
+            add_network(switch, vrouter, network, area)
+
+    return plan
@@ -0,0 +1,168 @@
+""" Opt-in profiling of the pn_* modules """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+# The modules run on the switches as a single payload, where a profiler
+# cannot be attached. With PN_PROFILE set, through the 'environment' keyword,
+# run_main() runs the module's main() under cProfile and, on Python 3,
+# tracemalloc, and adds what they found to the module result as pn_profile:
+#
+#   PN_PROFILE          cpu, memory or all (any other true value)
+#   PN_PROFILE_TOP      functions and allocations listed in the result
+#                       (default 25)
+#
+# pn_profile holds the wall time, the wall time spent waiting on the switches
+# (wait_seconds of cli_stats: calls run concurrently by run_parallel count
+# once), the rest as python time, the top functions by cumulative time, the
+# top allocations by size with the peak traced memory, and the complete
+# pstats table compressed (see pn_pstats) so that
+# ansible/pn_profile_merge.py can merge it across hosts and runs.
+
+import cProfile
+import os
+import time
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.pn_nvos import cli_stats
+from ansible.module_utils.pn_pstats import encode_stats
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+PROFILE_TOP = 25
+
+
+def profile_modes(value):
+    """
+    Method to parse PN_PROFILE.
+    :param value: Its value.
+    :return: Set of cpu and memory.
+    """
+    value = (value or '').strip().lower()
+    if value in ('', '0', 'no', 'false', 'off'):
+        return set()
+    if value in ('cpu', 'memory'):
+        return set([value])
+    return set(['cpu', 'memory'])
+
+
+def top_functions(stats, top):
+    """
+    Method to list the functions taking the most cumulative time.
+    :param stats: The stats dictionary of a pstats.Stats.
+    :param top: How many to list.
+    :return: List of dictionaries, slowest first.
+    """
+    rows = sorted(stats.items(), key=lambda item: -item[1][3])[:top]
+    return [{'function': '%s:%d(%s)' % function, 'calls': timing[1],
+             'tottime': round(timing[2], 4), 'cumtime': round(timing[3], 4)}
+            for function, timing in rows]
+
+
+def top_allocations(snapshot, top):
+    """
+    Method to list the lines which allocated the most memory.
+    :param snapshot: A tracemalloc snapshot.
+    :param top: How many to list.
+    :return: List of dictionaries, largest first.
+    """
+    return [{'line': '%s:%d' % (stat.traceback[0].filename,
+                                stat.traceback[0].lineno),
+             'size': stat.size, 'count': stat.count}
+            for stat in snapshot.statistics('lineno')[:top]]
+
+
+class ModuleProfiler(object):
+    """ Profiles a module run and reports it in the module result. """
+
+    def __init__(self, modes, top=PROFILE_TOP):
+        self.modes = modes
+        self.top = int(top)
+        self.started = time.time()
+        self.profiler = cProfile.Profile() if 'cpu' in modes else None
+        self.memory = 'memory' in modes and tracemalloc is not None
+        self.report = None
+
+    def start(self):
+        if self.memory:
+            tracemalloc.start()
+        if self.profiler:
+            self.profiler.enable()
+
+    def stop(self):
+        """
+        Method to stop profiling, once.
+        :return: The pn_profile result.
+        """
+        if self.report is not None:
+            return self.report
+        if self.profiler:
+            self.profiler.disable()
+        wall = time.time() - self.started
+        cli = cli_stats()
+        report = {'wall_seconds': round(wall, 3),
+                  'cli_seconds': cli['wait_seconds'],
+                  'python_seconds': round(max(wall - cli['wait_seconds'], 0),
+                                          3)}
+        if self.profiler:
+            self.profiler.create_stats()
+            report['functions'] = top_functions(self.profiler.stats,
+                                                self.top)
+            report['pstats'] = encode_stats(self.profiler.stats)
+        if self.memory:
+            report['allocations'] = top_allocations(
+                tracemalloc.take_snapshot(), self.top)
+            report['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        elif 'memory' in self.modes:
+            report['allocations'] = []
+            report['memory'] = 'tracemalloc needs Python 3'
+        self.report = report
+        return report
+
+
+def run_main(main):
+    """
+    Method to run a module's main(), profiled when PN_PROFILE is set.
+    :param main: The module's main function.
+    """
+    modes = profile_modes(os.environ.get('PN_PROFILE'))
+    if not modes:
+        return main()
+
+    profiler = ModuleProfiler(modes, os.environ.get('PN_PROFILE_TOP',
+                                                    PROFILE_TOP))
+    exit_json, fail_json = AnsibleModule.exit_json, AnsibleModule.fail_json
+
+    # exit_json() and fail_json() end the process, add the profile on the way.
+    def profiled_exit(method):
+        def exit_profiled(self, **kwargs):
+            kwargs['pn_profile'] = profiler.stop()
+            return method(self, **kwargs)
+        return exit_profiled
+
+    AnsibleModule.exit_json = profiled_exit(exit_json)
+    AnsibleModule.fail_json = profiled_exit(fail_json)
+    profiler.start()
+    try:
+        return main()
+    finally:
+        profiler.stop()
+        AnsibleModule.exit_json, AnsibleModule.fail_json = exit_json, fail_json
@@ -0,0 +1,56 @@
+""" Packing of pstats tables for pn_profile and pn_profile_merge.py """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+# The modules pack their pstats table into the result, the merge script on
+# the controller unpacks it. The script imports this file from the
+# module_utils directory, so it only uses the standard library.
+
+import base64
+import json
+import zlib
+
+
+def encode_stats(stats):
+    """
+    Method to pack a pstats table into a JSON safe string.
+    :param stats: The stats dictionary of a pstats.Stats.
+    :return: base64 of the zlib compressed JSON rows.
+    """
+    rows = [list(function) + list(timing[:4]) +
+            [[list(caller) + list(caller_timing)
+              for caller, caller_timing in timing[4].items()]]
+            for function, timing in stats.items()]
+    text = json.dumps(rows, separators=(',', ':'))
+    return base64.b64encode(zlib.compress(text.encode('utf-8'))).decode(
+        'ascii')
+
+
+def decode_stats(data):
+    """
+    Method to unpack the output of encode_stats().
+    :param data: The packed string.
+    :return: Dictionary in the pstats format.
+    """
+    rows = json.loads(zlib.decompress(base64.b64decode(data)).decode('utf-8'))
+    stats = {}
+    for row in rows:
+        callers = dict((tuple(caller[:3]), tuple(caller[3:]))
+                       for caller in row[7])
+        stats[tuple(row[:3])] = tuple(row[3:7]) + (callers,)
+    return stats
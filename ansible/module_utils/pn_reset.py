@@ -0,0 +1,126 @@
+""" switch-config-reset and nvOSd readiness tracking for the pn_* modules """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+# After switch-config-reset nvOSd restarts, which used to be covered by a
+# fixed pause. The readiness of a switch is instead polled: nvOSd reports
+# 'online' again. Right after the reset the service may still report online
+# while it shuts down, so online only counts once the service was seen down
+# or a grace period passed. Polls start at a short interval which grows by
+# half on every miss up to a maximum. A ReadyTimes record shared by a fleet
+# reset remembers how long the switches that are back took, and later
+# switches sleep through most of that time before they start polling.
+
+import threading
+import time
+
+NVOS_STATUS = ['service', 'svc-nvOSd', 'status']
+
+# Reset outcomes, from the switch-config-reset error output.
+RESET_DONE = 'Switch config reset completed successfully.'
+RESET_ALREADY = 'Switch has been already reset.'
+RESET_JUST = 'Switch has been just reset.'
+
+
+def reset_outcome(rc, out, err):
+    """
+    Method to interpret the result of switch-config-reset.
+    :param rc: Return code of the cli.
+    :param out: Output of the cli.
+    :param err: Error output of the cli.
+    :return: Tuple of (outcome message or None if it failed, changed).
+    """
+    if err:
+        if 'User authorization failed' in err:
+            return RESET_ALREADY, False
+        if 'nvOSd not running' in err:
+            return RESET_JUST, False
+        return None, False
+    return RESET_DONE, True
+
+
+def nvos_online(rc, out, err):
+    """
+    Method to interpret the output of the nvOSd service status.
+    :return: True if nvOSd is online.
+    """
+    return not rc and out.strip() == 'online'
+
+
+class ReadyTimes(object):
+    """ Seconds to ready of the switches which came back so far. """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.times = []
+
+    def add(self, seconds):
+        with self.lock:
+            self.times.append(seconds)
+
+    def expected(self):
+        """
+        Method to estimate the seconds a reset switch needs to be ready.
+        :return: The median of the recorded times, 0 if there are none.
+        """
+        with self.lock:
+            times = sorted(self.times)
+        if not times:
+            return 0
+        return times[len(times) // 2]
+
+
+def wait_ready(probe, timeout, interval=2, max_interval=30, grace=30,
+               ready_times=None, started=None, sleep=time.sleep,
+               clock=time.time):
+    """
+    Method to poll a switch until nvOSd is back after a reset.
+    :param probe: Function returning True if nvOSd is online.
+    :param timeout: Seconds after the reset to give up at.
+    :param interval: Initial seconds between polls.
+    :param max_interval: Maximum seconds between polls.
+    :param grace: Seconds after which online counts as ready even if the
+    service was never seen down.
+    :param ready_times: ReadyTimes shared by the switches of a fleet.
+    :param started: Epoch seconds the reset was issued at, default now.
+    :return: Seconds from the reset to ready, None on timeout.
+    """
+    started = clock() if started is None else started
+    if ready_times:
+        # Sleep through most of the time the other switches took.
+        head_start = ready_times.expected() * 0.8 - (clock() - started)
+        if head_start > 0:
+            sleep(min(head_start, timeout))
+
+    went_down = False
+    delay = interval
+    while True:
+        elapsed = clock() - started
+        if probe():
+            if went_down or elapsed >= grace:
+                if ready_times:
+                    ready_times.add(elapsed)
+                return round(elapsed, 1)
+        elif not went_down:
+            went_down = True
+            delay = interval
+
+        if elapsed >= timeout:
+            return None
+        sleep(min(delay, max(timeout - elapsed, 0)))
+        delay = min(delay * 1.5, max_interval)
@@ -0,0 +1,214 @@
+""" Streaming reads of large show tables for pn_show """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+# l2-table-show, connection-show or port-stats-show on a busy fabric print
+# hundreds of MB. ShowStream reads the cli output line by line as it is
+# produced and parses one row at a time; rows are filtered and projected as
+# they arrive, counted, and either written to a local CSV/JSONL file or kept
+# up to a limit. Memory stays bounded by one row (plus the kept rows) no
+# matter how large the table is, and the cli is stopped as soon as the limit
+# is reached. The cli runs through the module's cli transport like every
+# other command: in its own process group, within the deadline of its verb
+# and counted in cli_stats().
+
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+
+from ansible.module_utils.pn_deadline import CircuitOpen
+from ansible.module_utils.pn_nvos import SHOW_DELIM, CliCommand, cli_transport
+
+
+class ShowStream(object):
+    """ The rows of one show command, read while the cli prints them. """
+
+    def __init__(self, module, cli, delim=SHOW_DELIM):
+        """
+        :param module: The Ansible module to fetch input parameters.
+        :param cli: The cli string of the show command.
+        :param delim: The parsable delimiter to request.
+        """
+        argv = [word for word in CliCommand(cli).argv
+                if word != 'no-show-headers']
+        if 'parsable-delim' not in argv:
+            argv += ['parsable-delim', delim]
+        else:
+            delim = argv[argv.index('parsable-delim') + 1]
+        if 'show-headers' not in argv:
+            argv.append('show-headers')
+        self.argv = argv
+        self.delim = delim
+        self.columns = []
+        self.rc = None
+        self.err = ''
+        self.size = 0
+        self.started = time.time()
+        self.transport = cli_transport(module)
+        self.errors = tempfile.TemporaryFile(mode='w+')
+        self.process = None
+        try:
+            self.process = self.transport.stream(CliCommand(argv),
+                                                 self.errors)
+        except CircuitOpen as error:
+            self.rc, self.err = 1, str(error)
+        except OSError as error:
+            self.rc, self.err = 127, str(error)
+        if self.process is None:
+            self.errors.close()
+
+    def __iter__(self):
+        if self.process is None:
+            return
+        for line in iter(self.process.stdout.readline, ''):
+            self.size += len(line)
+            line = line.rstrip('\n')
+            if not line.strip():
+                continue
+            if not self.columns:
+                self.columns = line.split(self.delim)
+                continue
+            yield dict(zip(self.columns, line.split(self.delim)))
+        self.close()
+
+    def close(self):
+        """
+        Method to stop the cli, if it still runs, and collect its status.
+        """
+        if self.rc is not None:
+            return
+        self.rc, timeout = self.transport.stop_stream(self.process)
+        self.errors.seek(0)
+        self.err = self.errors.read() + timeout
+        self.errors.close()
+        self.transport.account(1, self.size + len(self.err),
+                               time.time() - self.started)
+
+
+def row_matches(row, where):
+    """
+    Method to check a row against client side filters.
+    :param row: The row as a dictionary.
+    :param where: Dictionary of column: value or list of accepted values.
+    :return: True if every column has an accepted value.
+    """
+    for column, accepted in where.items():
+        if not isinstance(accepted, (list, tuple)):
+            accepted = [accepted]
+        if row.get(column) not in [str(value) for value in accepted]:
+            return False
+    return True
+
+
+class RowFile(object):
+    """ A CSV or JSONL file rows are appended to, renamed into place on
+    close. """
+
+    def __init__(self, path, output_format, columns):
+        self.path = path
+        self.temp_path = path + '.tmp'
+        self.output_format = output_format
+        self.columns = columns
+        if output_format == 'csv':
+            if sys.version_info[0] < 3:
+                self.handle = open(self.temp_path, 'wb')
+            else:
+                self.handle = open(self.temp_path, 'w', newline='')
+            self.writer = csv.DictWriter(self.handle, columns,
+                                         extrasaction='ignore')
+            self.writer.writeheader()
+        else:
+            self.handle = open(self.temp_path, 'w')
+
+    def write(self, row):
+        if self.output_format == 'csv':
+            self.writer.writerow(row)
+        else:
+            self.handle.write(json.dumps(row, sort_keys=True) + '\n')
+
+    def close(self):
+        self.handle.close()
+        os.rename(self.temp_path, self.path)
+
+
+def stream_show(module, cli, where=None, columns=None, limit=None,
+                count_by=None, output_file=None, output_format='jsonl'):
+    """
+    Method to read a show table row by row.
+    :param module: The Ansible module to fetch input parameters.
+    :param cli: The cli string of the show command.
+    :param where: Dictionary of client side filters, see row_matches().
+    :param columns: Columns to keep of each row, all when not given.
+    :param limit: Number of matching rows to stop at.
+    :param count_by: Columns to count the matching rows by.
+    :param output_file: Path of the file to write the matching rows to.
+    :param output_format: csv or jsonl.
+    :return: Dictionary with rc, err, columns, rows_read, rows_matched,
+    counts (column: value: count), truncated, output_file and, without an
+    output file, rows.
+    """
+    stream = ShowStream(module, cli)
+    result = {'rows_read': 0, 'rows_matched': 0, 'truncated': False,
+              'counts': dict((column, {}) for column in count_by or [])}
+    rows = []
+    row_file = None
+    try:
+        for row in stream:
+            result['rows_read'] += 1
+            if where and not row_matches(row, where):
+                continue
+            if limit is not None and result['rows_matched'] >= limit:
+                result['truncated'] = True
+                break
+
+            result['rows_matched'] += 1
+            for column in count_by or []:
+                counts = result['counts'][column]
+                value = row.get(column, '')
+                counts[value] = counts.get(value, 0) + 1
+
+            if columns:
+                row = dict((column, row.get(column, '')) for column in columns)
+            if output_file:
+                if row_file is None:
+                    row_file = RowFile(output_file, output_format,
+                                       columns or stream.columns)
+                row_file.write(row)
+            else:
+                rows.append(row)
+    finally:
+        stream.close()
+        if row_file is not None:
+            row_file.close()
+
+    if output_file and row_file is None and not stream.err:
+        # Nothing matched, still leave an (empty) file behind.
+        RowFile(output_file, output_format, columns or stream.columns).close()
+
+    # A cli stopped at the limit exits with a signal, which is not an error.
+    result['rc'] = 0 if result['truncated'] else stream.rc
+    result['err'] = stream.err
+    result['columns'] = columns or stream.columns
+    if output_file:
+        result['output_file'] = output_file
+    else:
+        result['rows'] = rows
+    return result
@@ -0,0 +1,155 @@
+""" Cached vrouter state for the pn_vrouter* modules """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+# The idempotency checks of pn_vrouterif, pn_vrouterlbif and pn_vrouterbgp
+# used to run a separate show for every question they asked about a vrouter,
+# often the same one twice. VrouterState reads each table of a vrouter
+# (vrouters, interfaces, loopbacks, BGP neighbors) at most once per run as
+# structured rows and answers all the checks from that record.
+
+import socket
+import struct
+
+from ansible.module_utils.pn_nvos import run_show
+
+STATES = {}
+
+
+def same_ip(ip, other):
+    """
+    Method to compare two ips of which one may lack the prefix length.
+    :param ip: The first ip, a.b.c.d or a.b.c.d/len.
+    :param other: The second ip, a.b.c.d or a.b.c.d/len.
+    :return: True if both denote the same address.
+    """
+    if not ip or not other:
+        return False
+    if '/' in ip and '/' in other:
+        return ip == other
+    return ip.split('/')[0] == other.split('/')[0]
+
+
+def in_subnet(ip, other):
+    """
+    Method to check whether an interface ip lies in the subnet of another,
+    the way the ip filter of vrouter-interface-show matches.
+    :param ip: The interface ip, a.b.c.d or a.b.c.d/len.
+    :param other: The ip whose subnet is meant, a.b.c.d/len; without the
+    prefix length the addresses are compared.
+    :return: True if ip is in the subnet of other.
+    """
+    if not ip or not other:
+        return False
+    if '/' not in other and '/' not in ip:
+        return ip == other
+    bits = int((other if '/' in other else ip).split('/')[1])
+    mask = (0xffffffff << (32 - bits)) & 0xffffffff
+    try:
+        first, second = [struct.unpack('!I', socket.inet_aton(
+            address.split('/')[0]))[0] for address in (ip, other)]
+    except (socket.error, OSError):
+        return False
+    return first & mask == second & mask
+
+
+class VrouterState(object):
+    """ The record of one vrouter, each table fetched on first use. """
+
+    def __init__(self, module, cli, vrouter_name):
+        self.module = module
+        self.cli = cli
+        self.vrouter_name = vrouter_name
+        self.tables = {}
+
+    def table(self, name, show):
+        if name not in self.tables:
+            rc, rows, err = run_show(self.module, self.cli + show)
+            self.tables[name] = [] if rc or err else rows
+        return self.tables[name]
+
+    @property
+    def exists(self):
+        rows = self.table('vrouters', ' vrouter-show format name ')
+        return any(row.get('name') == self.vrouter_name for row in rows)
+
+    @property
+    def interfaces(self):
+        return self.table('interfaces',
+                          ' vrouter-interface-show vrouter-name %s '
+                          'format ip,nic ' % self.vrouter_name)
+
+    @property
+    def loopbacks(self):
+        return self.table('loopbacks',
+                          ' vrouter-loopback-interface-show vrouter-name %s '
+                          'format ip,index ' % self.vrouter_name)
+
+    @property
+    def bgp_neighbors(self):
+        return self.table('bgp', ' vrouter-bgp-show vrouter-name %s '
+                                 'format neighbor ' % self.vrouter_name)
+
+    def interface_exists(self, ip):
+        return any(same_ip(row.get('ip'), ip) for row in self.interfaces)
+
+    def nic_exists(self, nic):
+        return any(row.get('nic') == nic for row in self.interfaces)
+
+    def loopback_exists(self, ip):
+        return any(same_ip(row.get('ip'), ip) for row in self.loopbacks)
+
+    def loopback_index(self, ip):
+        for row in self.loopbacks:
+            if same_ip(row.get('ip'), ip):
+                return row.get('index')
+        return None
+
+    def neighbor_exists(self, neighbor):
+        return any(row.get('neighbor') == neighbor
+                   for row in self.bgp_neighbors)
+
+    def vrrp_primary(self, ip):
+        """
+        Method to find the primary interface a VRRP interface with the given
+        ip would be added on.
+        :param ip: The VRRP interface ip.
+        :return: Tuple of (VRRP interface exists, nic of the primary
+        interface or None). The primary interface is the one interface in
+        the subnet of ip; a second one is the VRRP interface.
+        """
+        rows = [row for row in self.interfaces if in_subnet(row.get('ip'), ip)]
+        if len(rows) > 1:
+            return True, None
+        if rows:
+            return False, rows[0].get('nic')
+        return False, None
+
+
+def vrouter_state(module, cli, vrouter_name):
+    """
+    Method to return the cached state of a vrouter.
+    :param module: The Ansible module to fetch input parameters.
+    :param cli: The cli prefix returned by the module's pn_cli().
+    :param vrouter_name: The name of the vrouter.
+    :return: A VrouterState instance shared by every caller in this run.
+    """
+    key = (cli.strip(), vrouter_name)
+    if key not in STATES:
+        STATES[key] = VrouterState(module, cli, vrouter_name)
+    return STATES[key]
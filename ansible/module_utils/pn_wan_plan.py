@@ -0,0 +1,180 @@
+""" WAN full mesh link planning for pn_ebgp_wan """
+
+#
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+# Every pair of WAN switches is connected by one or more links, and every
+# link gets a /30 with an interface on the vrouter of both ends and an iBGP
+# neighbor towards the other end. Vrouters, interfaces and BGP neighbors are
+# read once for the whole fabric; port-show only lists the ports of the
+# switch it runs on, so LLDP links (hostname and rport) and trunk membership
+# are read once per WAN switch, all through one run_shows(). The links are walked in the order of the WAN switch
+# list and of port-show, and the /30s are numbered from the base network in
+# that order, so a rerun allocates the same addresses and only plans what
+# is missing. The result is a list of commands per switch, which do not
+# depend on the lists of the other switches.
+
+import socket
+import struct
+
+from ansible.module_utils.pn_nvos import run_shows
+
+WAN_SHOWS = (
+    ('vrouters', ' vrouter-show format name,location '),
+    ('interfaces', ' vrouter-interface-show format vrouter-name,l3-port,ip '),
+    ('neighbors', ' vrouter-bgp-show format vrouter-name,neighbor,remote-as '),
+)
+
+# Read on every WAN switch, its rows tagged with the switch.
+WAN_PORT_SHOW = ' switch %s port-show format port,hostname,rport,trunk '
+
+
+def ip_to_int(address):
+    return struct.unpack('!I', socket.inet_aton(address))[0]
+
+
+def int_to_ip(number):
+    return socket.inet_ntoa(struct.pack('!I', number & 0xffffffff))
+
+
+def wan_snapshot(module, cli, wan_switch_list):
+    """
+    Method to read the state the WAN mesh depends on with one show each,
+    and the ports with one show per WAN switch, sharing cli sessions where
+    the transport allows it.
+    :param module: The Ansible module to fetch input parameters.
+    :param cli: The cli prefix returned by the module's pn_cli().
+    :param wan_switch_list: List of WAN switches.
+    :return: Dictionary of show name: rows.
+    """
+    clis = [cli + show for _, show in WAN_SHOWS]
+    clis += [cli + WAN_PORT_SHOW % switch for switch in wan_switch_list]
+    results = run_shows(module, clis)
+    snapshot = {}
+    for (name, _), (rc, rows, err) in zip(WAN_SHOWS, results):
+        snapshot[name] = [] if rc or err else rows
+
+    snapshot['ports'] = []
+    for switch, (rc, rows, err) in zip(wan_switch_list,
+                                       results[len(WAN_SHOWS):]):
+        for row in [] if rc or err else rows:
+            row['switch'] = switch
+            snapshot['ports'].append(row)
+    return snapshot
+
+
+def wan_links(wan_switch_list, snapshot):
+    """
+    Method to list the links between every pair of WAN switches.
+    :param wan_switch_list: List of WAN switches.
+    :param snapshot: Output of wan_snapshot().
+    :return: List of (switch1, port1, trunk1, switch2, port2, trunk2), one
+    per link, pairs in the order of the switch list.
+    """
+    ports = {}
+    trunks = {}
+    for row in snapshot['ports']:
+        switch = row.get('switch')
+        trunk = row.get('trunk', '')
+        trunks[(switch, row.get('port'))] = trunk
+        if row.get('hostname') and row.get('rport'):
+            ports.setdefault((switch, row['hostname']), []).append(
+                (row['port'], row['rport'], trunk))
+
+    links = []
+    for index, switch1 in enumerate(wan_switch_list):
+        for switch2 in wan_switch_list[index + 1:]:
+            for port1, port2, trunk1 in ports.get((switch1, switch2), []):
+                links.append((switch1, port1, trunk1, switch2, port2,
+                              trunks.get((switch2, port2), '')))
+    return links
+
+
+def plan_wan_mesh(module, wan_switch_list, snapshot, wan_ip, bgp_as):
+    """
+    Method to compute the changes of every WAN switch for the full mesh.
+    :param module: The Ansible module to fetch input parameters.
+    :param wan_switch_list: List of WAN switches.
+    :param snapshot: Output of wan_snapshot().
+    :param wan_ip: The base network the /30s are allocated from.
+    :param bgp_as: The remote-as of the iBGP neighbors.
+    :return: Tuple of (list of (switch, list of cli commands without the
+    cli prefix, list of the changes as (object, key, action, msg)) in switch
+    list order, list of (switch, object, key, msg) of what already exists).
+    """
+    vrouters = {}
+    for row in snapshot['vrouters']:
+        vrouters.setdefault(row.get('location'), row['name'])
+    interfaces = set((row['vrouter-name'], row.get('l3-port'), row['ip'])
+                     for row in snapshot['interfaces'])
+    neighbors = set((row['vrouter-name'], row['neighbor'])
+                    for row in snapshot['neighbors']
+                    if row.get('remote-as') == bgp_as)
+
+    changes = dict((switch, ([], [])) for switch in wan_switch_list)
+    existing = []
+    deleted = set()
+    base = ip_to_int(wan_ip.split('/')[0]) & ~3
+
+    def add(switch, command, change):
+        changes[switch][0].append(' switch %s %s ' % (switch, command))
+        changes[switch][1].append(change)
+
+    for index, link in enumerate(wan_links(wan_switch_list, snapshot)):
+        network = base + index * 4
+        ends = ((link[0], link[1], link[2], int_to_ip(network + 1)),
+                (link[3], link[4], link[5], int_to_ip(network + 2)))
+        for end, (switch, port, trunk, ip) in enumerate(ends):
+            vrouter = vrouters.get(switch)
+            peer_ip = ends[1 - end][3]
+            if vrouter is None:
+                module.fail_json(
+                    msg='No vrouter found on WAN switch %s' % switch)
+
+            if trunk and (switch, trunk) not in deleted:
+                deleted.add((switch, trunk))
+                add(switch, 'trunk-delete name %s' % trunk,
+                    ('trunk', trunk, 'delete',
+                     'Deleted %s trunk successfully' % trunk))
+
+            interface = ip + '/30'
+            if (vrouter, port, interface) in interfaces:
+                existing.append(
+                    (switch, 'vrouter-interface', interface,
+                     'Vrouter interface %s already exists on %s' % (
+                         interface, vrouter)))
+            else:
+                add(switch, 'vrouter-interface-add vrouter-name %s ip %s '
+                            'l3-port %s' % (vrouter, interface, port),
+                    ('vrouter-interface', interface, 'create',
+                     'Added vrouter interface with ip %s on %s' % (
+                         interface, vrouter)))
+
+            if (vrouter, peer_ip) in neighbors:
+                existing.append(
+                    (switch, 'vrouter-bgp', peer_ip,
+                     'BGP Neighbor %s already exists for %s' % (
+                         peer_ip, vrouter)))
+            else:
+                add(switch, 'vrouter-bgp-add vrouter-name %s neighbor %s '
+                            'remote-as %s' % (vrouter, peer_ip, bgp_as),
+                    ('vrouter-bgp', peer_ip, 'create',
+                     'Added BGP Neighbor %s for %s' % (peer_ip, vrouter)))
+
+    plans = [(switch, changes[switch][0], changes[switch][1])
+             for switch in wan_switch_list if changes[switch][0]]
+    return plans, existing
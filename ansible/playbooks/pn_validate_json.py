@@ -2,9 +2,13 @@
 
 """
 This python script is to validate an output of a Ansible playbook.
-It validates whether output of a playbook is a valid JSON object or not.
-It also checks if all the required fields mentioned under in
-`fields_to_check` variable are present in the JSON object or not.
+It reads the output of a playbook run with the pn_json callback as a stream,
+record by record, and validates every JSON object printed between the task
+boundary markers as soon as it is complete. It stops at the first record
+which is not a valid JSON object or misses one of the required fields
+(plays, tasks, status, hosts and the task, summary, msg, failed, exception
+and unreachable attributes of every host). Only one record is held in memory
+at a time, however long the playbook runs.
 
 Example Usage:
 python pn_validate_json.py playbook.yml
@@ -12,77 +16,267 @@ python pn_validate_json.py playbook.yml
 To validate pn_initial_ztp.yml playbook, run this script as:
 python pn_validate_json.py pn_initial_ztp.yml
 
-This script takes playbook name as input and returns a string describing if
-output of the playbook is a valid/invalid JSON object and if all required
-fields (like status, summary, msg etc) are present in the JSON object or not.
+To validate an output captured elsewhere, read it from a pipe or a file
+(optionally following the file while the playbook still writes to it):
+ansible-playbook -i hosts pn_initial_ztp.yml | python pn_validate_json.py -
+python pn_validate_json.py --file output.log --follow
+
+This script returns a string describing if output of the playbook is a
+valid/invalid JSON object and if all required fields are present in it.
 """
 
 import json
 import shlex
 import subprocess
 import sys
+import time
+
+BOUNDARY_STARTS = '__________ANSIBLE_TASK_BOUNDARY_STARTS__________'
+BOUNDARY_ENDS = '__________ANSIBLE_TASK_BOUNDARY_ENDS__________'
+STATS_MARKER = '"stats": {'
+
+HOST_FIELDS = ('task', 'summary', 'msg', 'failed', 'exception', 'unreachable')
+SUMMARY_FIELDS = ('switch', 'output')
+
+# Schema of a record: a type, and for dictionaries the required keys with
+# their schema, for lists the schema of every item. A callable checks the
+# value itself and returns an error string or None.
+STRING = (str, type(u''))
+
+
+def check_summary(task):
+    """
+    Method to check the summary of every host against the task status.
+    With status 0 summary entries report switch and output, with status 1
+    they must not.
+    :param task: The task record.
+    :return: Error string or None.
+    """
+    for host, result in task['hosts'].items():
+        summary = result.get('summary')
+        if not isinstance(summary, list):
+            continue
+        for entry in summary:
+            if not isinstance(entry, dict):
+                return 'summary of %s is not a list of objects' % host
+            for field in SUMMARY_FIELDS:
+                if task['status'] == '0' and field not in entry:
+                    return '"%s" field is missing from the summary of %s' % (
+                        field, host)
+                if task['status'] == '1' and field in entry:
+                    return ('Since value of status is 1, "%s" field should '
+                            'not be present in the summary of %s' % (
+                                field, host))
+    return None
+
+
+def check_status(status):
+    if status not in ('0', '1'):
+        return 'status %r is neither "0" nor "1"' % (status,)
+    return None
+
+
+SCHEMA = (dict, {
+    'plays': (list, (dict, {
+        'play': (dict, {'name': STRING, 'id': STRING}),
+        'tasks': (list, (dict, {
+            'task': (dict, {'name': STRING, 'id': STRING}),
+            'status': check_status,
+            'hosts': (dict, None),
+        }, check_summary)),
+    })),
+})
+
+
+def compile_schema(schema, path='record'):
+    """
+    Method to compile a schema into a function checking a value.
+    :param schema: The schema, see SCHEMA.
+    :param path: Where in the record the value is, for error messages.
+    :return: Function returning an error string or None.
+    """
+    if callable(schema) and not isinstance(schema, (type, tuple)):
+        return schema
+    if not isinstance(schema, tuple) or schema[0] not in (dict, list):
+        def check_type(value):
+            if not isinstance(value, schema):
+                return '%s is not a string' % path
+            return None
+        return check_type
+
+    if schema[0] is list:
+        check_item = compile_schema(schema[1], path + '[]')
 
-if len(sys.argv) != 2:
-    msg = 'Execution Error: Please provide Ansible playbook name!\n'
-    msg += 'Example usage: python validate_json.py playbook.yml'
-    exit(msg)
+        def check_list(value):
+            if not isinstance(value, list):
+                return '%s is not a list' % path
+            for item in value:
+                error = check_item(item)
+                if error:
+                    return error
+            return None
+        return check_list
 
-playbook = sys.argv[1]
-command = ' ansible-playbook -i hosts ' + playbook
-command += ' --vault-password-file ~/.vault_pass.txt '
+    fields = [(key, compile_schema(sub, '%s.%s' % (path, key)))
+              for key, sub in sorted((schema[1] or {}).items())]
+    check_whole = schema[2] if len(schema) > 2 else None
 
-print('')
-print('Started executing playbook {}'.format(playbook))
-print('')
-print('A message will appear when playbook execution is finished')
-print('')
-print('Kindly wait until then as it may take some time')
-print('')
+    def check_dict(value):
+        if not isinstance(value, dict):
+            return '%s is not an object' % path
+        for key, check in fields:
+            if key not in value:
+                return '"%s" field is missing from %s' % (key, path)
+            error = check(value[key])
+            if error:
+                return error
+        if check_whole:
+            return check_whole(value)
+        return None
+    return check_dict
 
-std_out = subprocess.check_output(shlex.split(command))
 
-print('Finished executing playbook {}'.format(playbook))
-print('')
-print('Validating JSON output')
-print('')
+CHECK_RECORD = compile_schema(SCHEMA)
 
-delimiter = "Pausing for 2 seconds\n"
-delimiter += "(ctrl+C then 'C' = continue early, ctrl+C then 'A' = abort)"
 
-json_object_list = std_out.split(delimiter)
-json_object_list = json_object_list[:-1]
+def check_hosts(record):
+    """
+    Method to check the fixed attributes pn_json gives every host result.
+    :param record: The record.
+    :return: Error string or None.
+    """
+    for play in record['plays']:
+        for task in play['tasks']:
+            for host, result in task['hosts'].items():
+                if not isinstance(result, dict):
+                    return 'result of %s is not an object' % host
+                for field in HOST_FIELDS:
+                    if field not in result:
+                        return '"%s" field is missing from the result of ' \
+                               '%s' % (field, host)
+    return None
 
-msg = ''
-print('Validation Complete')
-print('')
 
-for json_object in json_object_list:
+def validate_record(text):
+    """
+    Method to validate one record.
+    :param text: The text between the task boundary markers.
+    :return: Tuple of (error string or None, task name).
+    """
     try:
-        json.loads(json_object)
+        record = json.loads(text)
     except ValueError:
-        exit('Result: Output of {} is an INVALID JSON object'.format(playbook))
+        return 'INVALID JSON object', ''
+
+    error = CHECK_RECORD(record) or check_hosts(record)
+    try:
+        task = record['plays'][-1]['tasks'][-1]['task']['name']
+    except (KeyError, IndexError, TypeError):
+        task = ''
+    return error, task
+
+
+def follow(stream, tail):
+    """
+    Method to yield the lines of a stream, waiting for more at its end if
+    tail is set.
+    :param stream: File object to read.
+    :param tail: Whether to keep waiting for lines at the end of the stream.
+    """
+    while True:
+        line = stream.readline()
+        if line:
+            yield line
+        elif tail:
+            time.sleep(0.5)
+        else:
+            return
+
+
+def records(lines):
+    """
+    Method to cut the lines into records at the task boundary markers.
+    Lines outside the markers (warnings) are skipped; the playbook stats
+    pn_json prints at the end finish the output.
+    :param lines: Iterable of output lines.
+    :return: Generator of record texts.
+    """
+    record = None
+    for line in lines:
+        marker = line.strip()
+        if record is None and marker == STATS_MARKER:
+            return
+        if marker == BOUNDARY_STARTS:
+            record = []
+        elif marker == BOUNDARY_ENDS:
+            if record is not None:
+                yield ''.join(record)
+            record = None
+        elif record is not None:
+            record.append(line)
 
-    fields_to_check = [r'"task":', r'"summary":', r'"msg":', r'"status":']
-    extra_fields = [r'"output":', r'"switch":']
 
-    if r'"status": "0"' in json_object:
-        fields_to_check += extra_fields
-    elif r'"status": "1"' in json_object:
-        for field in extra_fields:
-            if field in json_object:
-                msg += 'Since value of status is 1, '
-                msg += '{} field should not be present '.format(field)
-                msg += 'in the JSON output\n'
+def validate(lines, source):
+    """
+    Method to validate the records of an output as they arrive.
+    :param lines: Iterable of output lines.
+    :param source: Name of what produced the output, for messages.
+    :return: Tuple of (number of valid records, error message or None).
+    """
+    count = 0
+    for text in records(lines):
+        count += 1
+        error, task = validate_record(text)
+        if error:
+            return count - 1, 'Result: Output of {} is INVALID at record {} ' \
+                              '({}): {}'.format(source, count, task, error)
+    return count, None
 
-    for field in fields_to_check:
-        if field not in json_object:
-            msg += '{} field is missing from the JSON output\n'.format(field)
 
-print('Result: Output of {} is a VALID JSON object'.format(playbook))
+def main(argv):
+    """
+    Method to run the validator from the command line.
+    :param argv: The command line arguments.
+    """
+    if len(argv) < 2:
+        msg = 'Execution Error: Please provide Ansible playbook name!\n'
+        msg += 'Example usage: python pn_validate_json.py playbook.yml'
+        exit(msg)
 
-if msg == '':
+    process = None
+    if argv[1] == '-':
+        source = 'stdin'
+        lines = follow(sys.stdin, False)
+    elif argv[1] == '--file' and len(argv) > 2:
+        source = argv[2]
+        lines = follow(open(argv[2]), '--follow' in argv[3:])
+    else:
+        source = argv[1]
+        command = ' ansible-playbook -i hosts ' + source
+        command += ' --vault-password-file ~/.vault_pass.txt '
+        print('')
+        print('Started executing playbook {}'.format(source))
+        print('')
+        process = subprocess.Popen(shlex.split(command),
+                                   stdout=subprocess.PIPE,
+                                   universal_newlines=True)
+        lines = follow(process.stdout, False)
+
+    count, error = validate(lines, source)
+    if process:
+        if error:
+            process.terminate()
+        process.wait()
+
+    print('Validation Complete, {} records checked'.format(count))
+    print('')
+    if error:
+        exit(error)
+
+    print('Result: Output of {} is a VALID JSON object'.format(source))
     print('And, all the required fields are present in this JSON object')
     print('')
-else:
-    print('But,')
-    exit(msg)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,71 @@
+#!/usr/bin/python
+
+"""
+This python script is to validate csv input files before running a playbook.
+
+Every file is given as format:path, files given together are also checked
+against each other. With --hosts, switches named in the files must be in
+the Ansible hosts file.
+
+Formats: l2_vrrp, l3_vrrp, fabric_over_l3, dci, third_party_dci, vxlan and
+cli_commands.
+
+Example Usage:
+python pn_csv_validation.py l3_vrrp:l3_auto_setup.csv
+python pn_csv_validation.py --hosts playbooks/hosts dci:dci.csv \
+    third_party_dci:third_party_dci.csv
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                'module_utils'))
+
+from pn_csv_schema import validate_files
+
+
+def read_inventory(path):
+    """
+    Method to read the switch names of an Ansible hosts file.
+    :param path: Path of the hosts file.
+    :return: List of switch names.
+    """
+    names = []
+    for line in open(path):
+        line = line.strip()
+        if line and not line.startswith(('#', '[', ';')):
+            names.append(line.split()[0])
+    return names
+
+
+def main(argv):
+    """
+    Method to run the validator from the command line.
+    :param argv: The command line arguments.
+    """
+    args = argv[1:]
+    inventory = None
+    if args[:1] == ['--hosts'] and len(args) > 1:
+        inventory = read_inventory(args[1])
+        args = args[2:]
+
+    if not args or any(':' not in arg for arg in args):
+        msg = 'Execution Error: Please provide format:csv_file arguments!\n'
+        msg += 'Example usage: python pn_csv_validation.py l3_vrrp:l3.csv'
+        exit(msg)
+
+    files = []
+    for arg in args:
+        file_format, path = arg.split(':', 1)
+        with open(path) as csv_file:
+            files.append((path, file_format, csv_file.read()))
+
+    errors = validate_files(files, inventory)
+    if errors:
+        exit('\n'.join(errors))
+    print('Valid csv file')
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -76,7 +76,18 @@ class CallbackModule(CallbackBase):
             result._result['exception'] = ''
         if 'unreachable' not in result._result.keys():
             result._result['unreachable'] = ''
-        self.results[-1]['tasks'][-1]['hosts'][host.name] = result._result
+        # Change events are streamed one per line instead of being repeated
+        # in every task output below.
+        values = dict(result._result)
+        events = values.pop('events', None) or []
+        self.results[-1]['tasks'][-1]['hosts'][host.name] = values
+        if events:
+            task = self.results[-1]['tasks'][-1]['task']
+            print('__________ANSIBLE_EVENTS_STARTS__________')
+            for event in events:
+                event = dict(event, host=host.name, task=task['name'])
+                print(json.dumps(event, sort_keys=True, separators=(',', ':')))
+            print('__________ANSIBLE_EVENTS_ENDS__________')
 
         if result._result['unreachable'] == True or result._result[
             'failed'] == True:
@@ -0,0 +1,273 @@
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+
+# Run metrics for fabric playbooks. Durations per play, per task and per
+# host, changed/failed counts and, for modules returning cli_stats, the cli
+# calls, commands and bytes per host are collected while the playbook runs
+# and written when it ends:
+#
+#   PN_METRICS_TEXTFILE  Prometheus textfile collector file (default
+#                        ./pn_ansible.prom), e.g. in the directory given to
+#                        node_exporter --collector.textfile.directory
+#   PN_METRICS_JSON      compact JSON summary (default the textfile with a
+#                        .json extension)
+#   PN_METRICS_LABELS    labels added to every series, e.g. fabric=lab1
+#
+# Both files are written to a temporary file and renamed, so a scrape never
+# reads a half written file. Enable it next to the stdout callback with
+# callback_whitelist = pn_metrics in ansible.cfg.
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+from ansible.plugins.callback import CallbackBase
+import json
+import os
+import tempfile
+import time
+
+__metaclass__ = type
+
+STATUSES = ('ok', 'changed', 'failed', 'skipped', 'unreachable')
+CLI_STATS = ('calls', 'commands', 'bytes', 'seconds')
+
+
+def label_value(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def parse_labels(value):
+    """
+    Method to parse the labels added to every series.
+    :param value: String like 'fabric=lab1,site=sjc'.
+    :return: List of (name, value).
+    """
+    labels = []
+    for item in (value or '').split(','):
+        if '=' in item:
+            name, label = item.split('=', 1)
+            labels.append((name.strip(), label.strip()))
+    return labels
+
+
+def write_atomic(path, text):
+    """
+    Method to replace a file in one rename, so readers never see it half
+    written.
+    :param path: The file to write.
+    :param text: Its new content.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, temp_path = tempfile.mkstemp(dir=directory, prefix='.pn_metrics')
+    try:
+        with os.fdopen(handle, 'w') as temp_file:
+            temp_file.write(text)
+        os.chmod(temp_path, 0o644)
+        os.rename(temp_path, path)
+    except (IOError, OSError):
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+class CallbackModule(CallbackBase):
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'aggregate'
+    CALLBACK_NAME = 'pn_metrics'
+    CALLBACK_NEEDS_WHITELIST = True
+
+    def __init__(self, display=None):
+        super(CallbackModule, self).__init__(display)
+        self.textfile = os.environ.get('PN_METRICS_TEXTFILE',
+                                       'pn_ansible.prom')
+        self.json_path = os.environ.get(
+            'PN_METRICS_JSON', os.path.splitext(self.textfile)[0] + '.json')
+        self.labels = parse_labels(os.environ.get('PN_METRICS_LABELS'))
+        self.playbook = ''
+        self.started = time.time()
+        self.plays = []
+        self.hosts = {}
+        self.task = None
+        self.host_started = {}
+
+    def _close_task(self):
+        if self.task is not None:
+            self.task['duration'] = round(time.time() - self.task['started'],
+                                          3)
+            self.task = None
+
+    def _close_play(self):
+        self._close_task()
+        if self.plays and 'duration' not in self.plays[-1]:
+            play = self.plays[-1]
+            play['duration'] = round(time.time() - play['started'], 3)
+
+    def _host(self, name):
+        if name not in self.hosts:
+            self.hosts[name] = {'duration': 0.0, 'tasks': 0,
+                                'cli': dict((key, 0) for key in CLI_STATS)}
+        return self.hosts[name]
+
+    def v2_playbook_on_start(self, playbook):
+        self.playbook = os.path.basename(playbook._file_name)
+        self.started = time.time()
+
+    def v2_playbook_on_play_start(self, play):
+        self._close_play()
+        self.plays.append({'name': play.get_name(), 'started': time.time(),
+                           'tasks': []})
+
+    def v2_playbook_on_task_start(self, task, is_conditional):
+        self._close_task()
+        self.task = {'name': task.get_name(), 'started': time.time(),
+                     'hosts': {}}
+        self.plays[-1]['tasks'].append(self.task)
+        self.host_started = {}
+
+    v2_playbook_on_handler_task_start = v2_playbook_on_task_start
+
+    def v2_runner_on_start(self, host, task):
+        self.host_started[host.get_name()] = time.time()
+
+    def _record(self, result, status):
+        if self.task is None:
+            return
+        name = result._host.get_name()
+        started = self.host_started.get(name, self.task['started'])
+        duration = round(time.time() - started, 3)
+        values = result._result
+        if status == 'ok' and values.get('changed'):
+            status = 'changed'
+        self.task['hosts'][name] = {'status': status, 'duration': duration}
+        host = self._host(name)
+        host['duration'] += duration
+        host['tasks'] += 1
+        cli = values.get('cli_stats')
+        if isinstance(cli, dict):
+            self.task['hosts'][name]['cli'] = cli
+            for key in CLI_STATS:
+                host['cli'][key] += cli.get(key, 0) or 0
+
+    def v2_runner_on_ok(self, result, **kwargs):
+        self._record(result, 'ok')
+
+    def v2_runner_on_failed(self, result, **kwargs):
+        self._record(result, 'failed')
+
+    def v2_runner_on_skipped(self, result, **kwargs):
+        self._record(result, 'skipped')
+
+    def v2_runner_on_unreachable(self, result, **kwargs):
+        self._record(result, 'unreachable')
+
+    def summary(self, stats):
+        """
+        Method to build the JSON summary of the run.
+        :param stats: The AggregateStats of the playbook.
+        :return: Dictionary of the playbook, its plays with their tasks and
+        the hosts.
+        """
+        hosts = {}
+        for name in sorted(stats.processed.keys()):
+            host = dict(self._host(name))
+            host['duration'] = round(host['duration'], 3)
+            host['stats'] = stats.summarize(name)
+            hosts[name] = host
+        plays = []
+        for play in self.plays:
+            tasks = []
+            play_hosts = set()
+            for task in play['tasks']:
+                play_hosts.update(task['hosts'])
+                statuses = [value['status']
+                            for value in task['hosts'].values()]
+                tasks.append({'name': task['name'],
+                              'duration': task.get('duration', 0),
+                              'changed': statuses.count('changed'),
+                              'failed': statuses.count('failed') +
+                              statuses.count('unreachable'),
+                              'hosts': task['hosts']})
+            plays.append({'name': play['name'],
+                          'duration': play.get('duration', 0),
+                          'hosts': len(play_hosts), 'tasks': tasks})
+        return {'playbook': self.playbook, 'started': round(self.started, 3),
+                'duration': round(time.time() - self.started, 3),
+                'labels': dict(self.labels), 'plays': plays, 'hosts': hosts}
+
+    def textfile_lines(self, summary):
+        """
+        Method to write the summary in the Prometheus text format.
+        :param summary: Output of summary().
+        :return: List of lines.
+        """
+        series = {}
+
+        def add(metric, labels, value):
+            labels = ([('playbook', summary['playbook'])] + self.labels +
+                      labels)
+            text = ','.join('%s="%s"' % (name, label_value(label))
+                            for name, label in labels)
+            key = (metric, text)
+            series[key] = series.get(key, 0) + value
+
+        add('playbook_duration_seconds', [], summary['duration'])
+        add('playbook_last_run_timestamp_seconds', [], summary['started'])
+        add('playbook_hosts', [], len(summary['hosts']))
+        for play in summary['plays']:
+            add('play_duration_seconds', [('play', play['name'])],
+                play['duration'])
+            add('play_hosts', [('play', play['name'])], play['hosts'])
+            for task in play['tasks']:
+                labels = [('play', play['name']), ('task', task['name'])]
+                add('task_duration_seconds', labels, task['duration'])
+                add('task_changed_hosts', labels, task['changed'])
+                add('task_failed_hosts', labels, task['failed'])
+        for name, host in summary['hosts'].items():
+            add('host_duration_seconds', [('host', name)], host['duration'])
+            stats = host['stats']
+            counts = {'ok': stats.get('ok', 0),
+                      'changed': stats.get('changed', 0),
+                      'failed': stats.get('failures', 0),
+                      'skipped': stats.get('skipped', 0),
+                      'unreachable': stats.get('unreachable', 0)}
+            for status in STATUSES:
+                add('host_tasks', [('host', name), ('status', status)],
+                    counts[status])
+            for key in CLI_STATS:
+                add('host_cli_%s' % key, [('host', name)], host['cli'][key])
+
+        lines = []
+        for metric in sorted(set(metric for metric, _ in series)):
+            lines.append('# TYPE pn_ansible_%s gauge' % metric)
+            for (name, text), value in sorted(series.items()):
+                if name == metric:
+                    value = round(float(value), 3)
+                    lines.append('pn_ansible_%s{%s} %s' % (
+                        metric, text, int(value) if value.is_integer()
+                        else repr(value)))
+        return lines
+
+    def v2_playbook_on_stats(self, stats):
+        self._close_play()
+        summary = self.summary(stats)
+        try:
+            write_atomic(self.textfile,
+                         '\n'.join(self.textfile_lines(summary)) + '\n')
+            write_atomic(self.json_path,
+                         json.dumps(summary, sort_keys=True,
+                                    separators=(',', ':')) + '\n')
+        except (IOError, OSError) as error:
+            self._display.warning('pn_metrics could not write %s: %s' % (
+                self.textfile, error))
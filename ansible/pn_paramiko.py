@@ -24,11 +24,16 @@
 
 from __future__ import (absolute_import, division, print_function)
 
+import atexit
+import base64
+import hashlib
+import hmac
 import warnings
 import os
 import socket
 import logging
-import tempfile
+import multiprocessing.util
+import threading
 import traceback
 import fcntl
 import sys
@@ -123,6 +128,140 @@ class MyAddPolicy(object):
         # in order to control ordering.
 
 
+def hashed_host_matches(field, hostname):
+    """
+    Method to check a hostname against a hashed known_hosts hostname.
+    :param field: The hashed hostname "|1|base64 salt|base64 hash".
+    :param hostname: The hostname as bytes.
+    :return: True if the hash is the HMAC-SHA1 of the hostname.
+    """
+    parts = field.split(b'|')
+    if len(parts) != 4 or parts[1] != b'1':
+        return False
+    try:
+        salt = base64.b64decode(parts[2])
+        digest = base64.b64decode(parts[3])
+    except (TypeError, ValueError):
+        return False
+    return hmac.new(salt, hostname, hashlib.sha1).digest() == digest
+
+
+class KnownHostsRecorder(object):
+    """
+    Host keys accepted by the connections of this process, appended to their
+    known_hosts file in one batch.
+
+    Rewriting the whole known_hosts file under an exclusive lock on every
+    close made bringing up many new switches quadratic in file I/O. Keys are
+    now queued in memory and written when the process exits (the forked
+    worker at the end of its task, or the controller at the end of the
+    playbook). The flush takes the lock once, reads only what other
+    processes appended since the last flush into a set of known entries,
+    and appends the entries still missing in the OpenSSH format
+    "hostname keytype base64key". Hostnames hashed by HashKnownHosts are
+    matched through their salt.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.known = {}
+        self.registered = False
+
+    def add(self, filename, hostname, keytype, key):
+        with self.lock:
+            entry = (hostname, keytype, key)
+            queue = self.pending.setdefault(filename, [])
+            if entry not in queue:
+                queue.append(entry)
+            if not self.registered:
+                # Forked workers leave through multiprocessing, which runs
+                # its finalizers but not atexit handlers.
+                atexit.register(self.flush)
+                multiprocessing.util.Finalize(None, self.flush,
+                                              exitpriority=10)
+                self.registered = True
+
+    def _read_known(self, handle, filename):
+        """
+        Method to index the entries of a known_hosts file, reading only the
+        part appended since the last call.
+        :param handle: The file opened for appending and reading.
+        :param filename: Path of the file.
+        :return: Tuple of (set of entries, dictionary of (keytype, key): list
+        of hashed hostnames, whether the file ends in a newline).
+        """
+        stat = os.fstat(handle.fileno())
+        inode, offset, entries, hashed, newline = self.known.get(
+            filename, (None, 0, set(), {}, True))
+        if inode != stat.st_ino or stat.st_size < offset:
+            offset, entries, hashed = 0, set(), {}
+
+        handle.seek(offset)
+        data = handle.read()
+        if data:
+            for line in data.splitlines():
+                fields = line.split()
+                if len(fields) >= 3 and not line.startswith(b'#'):
+                    for hostname in fields[0].split(b','):
+                        if hostname.startswith(b'|1|'):
+                            hashed.setdefault((fields[1], fields[2]),
+                                              []).append(hostname)
+                        else:
+                            entries.add((hostname, fields[1], fields[2]))
+            newline = data.endswith(b'\n')
+
+        self.known[filename] = (stat.st_ino, stat.st_size, entries, hashed,
+                                newline)
+        return entries, hashed, newline
+
+    def flush(self):
+        """ append the queued host keys to their known_hosts files """
+        with self.lock:
+            pending, self.pending = self.pending, {}
+
+        for filename, queue in iteritems(pending):
+            dirname = os.path.dirname(filename)
+            makedirs_safe(dirname)
+            lockfile = filename.replace("known_hosts", ".known_hosts.lock")
+
+            KEY_LOCK = open(lockfile, 'w')
+            fcntl.lockf(KEY_LOCK, fcntl.LOCK_EX)
+            try:
+                fd = os.open(filename, os.O_RDWR | os.O_APPEND | os.O_CREAT,
+                             0o644)
+                with os.fdopen(fd, 'a+b') as handle:
+                    entries, hashed, newline = self._read_known(handle,
+                                                                filename)
+                    lines = []
+                    for hostname, keytype, key in queue:
+                        entry = tuple(to_bytes(field) for field in
+                                      (hostname, keytype, key))
+                        if entry not in entries and not any(
+                                hashed_host_matches(field, entry[0])
+                                for field in hashed.get(entry[1:], ())):
+                            entries.add(entry)
+                            lines.append(b' '.join(entry) + b'\n')
+                    if lines:
+                        if not newline:
+                            lines.insert(0, b'\n')
+                        handle.write(b''.join(lines))
+                        handle.flush()
+                        self.known[filename] = (
+                            os.fstat(handle.fileno()).st_ino,
+                            os.fstat(handle.fileno()).st_size, entries,
+                            hashed, True)
+            except:
+                # unable to save keys, including scenario when key was invalid
+                # and caught earlier
+                traceback.print_exc()
+            finally:
+                fcntl.lockf(KEY_LOCK, fcntl.LOCK_UN)
+                KEY_LOCK.close()
+
+
+KNOWN_HOSTS = KnownHostsRecorder()
+
 # keep connection objects on a per host basis
 # to avoid repeated attempts to reconnect
 
@@ -398,39 +537,19 @@ class Connection(ConnectionBase):
                     return True
         return False
 
-    def _save_ssh_host_keys(self, filename):
+    def _record_ssh_host_keys(self):
         """
         not using the paramiko save_ssh_host_keys function as we want to
         add new SSH keys at the bottom so folks don't complain about it :)
+        The keys are only queued here, see KnownHostsRecorder.
         """
 
-        if not self._any_keys_added():
-            return False
-
-        path = os.path.expanduser("~/.ssh")
-        makedirs_safe(path)
-
-        f = open(filename, 'w')
-
-        for hostname, keys in iteritems(self.ssh._host_keys):
-
-            for keytype, key in iteritems(keys):
-                # was f.write
-                added_this_time = getattr(key,
-                                          '_added_by_ansible_this_time', False)
-                if not added_this_time:
-                    f.write(
-                        "%s %s %s\n" % (hostname, keytype, key.get_base64()))
-
         for hostname, keys in iteritems(self.ssh._host_keys):
             for keytype, key in iteritems(keys):
-                added_this_time = getattr(key, '_added_by_ansible_this_time',
-                                          False)
-                if added_this_time:
-                    f.write(
-                        "%s %s %s\n" % (hostname, keytype, key.get_base64()))
-
-        f.close()
+                if getattr(key, '_added_by_ansible_this_time', False):
+                    KNOWN_HOSTS.add(self.keyfile, hostname, keytype,
+                                    key.get_base64())
+                    key._added_by_ansible_this_time = False
 
     def close(self):
         """ terminate the connection """
@@ -439,55 +558,8 @@ class Connection(ConnectionBase):
 
         if (C.HOST_KEY_CHECKING and C.PARAMIKO_RECORD_HOST_KEYS and
                 self._any_keys_added()):
-            # add any new SSH host keys -- warning -- this could be slow
-            # (This doesn't acquire the connection lock because it needs
-            # to exclude only other known_hosts writers, not connections
-            # that are starting up.)
-            lockfile = self.keyfile.replace("known_hosts", ".known_hosts.lock")
-            dirname = os.path.dirname(self.keyfile)
-            makedirs_safe(dirname)
-
-            KEY_LOCK = open(lockfile, 'w')
-            fcntl.lockf(KEY_LOCK, fcntl.LOCK_EX)
-
-            try:
-                # just in case any were added recently
-                self.ssh.load_system_host_keys()
-                self.ssh._host_keys.update(self.ssh._system_host_keys)
-
-                # gather information about the current key file, so
-                # we can ensure the new file has the correct mode/owner
-
-                key_dir = os.path.dirname(self.keyfile)
-                if os.path.exists(self.keyfile):
-                    key_stat = os.stat(self.keyfile)
-                    mode = key_stat.st_mode
-                    uid = key_stat.st_uid
-                    gid = key_stat.st_gid
-                else:
-                    mode = 33188
-                    uid = os.getuid()
-                    gid = os.getgid()
-
-                # Save the new keys to a temporary file and move it into place
-                # rather than rewriting the file. We set delete=False because
-                # the file will be moved into place rather than cleaned up.
-
-                tmp_keyfile = tempfile.NamedTemporaryFile(dir=key_dir,
-                                                          delete=False)
-                os.chmod(tmp_keyfile.name, mode & 0o7777)
-                os.chown(tmp_keyfile.name, uid, gid)
-
-                self._save_ssh_host_keys(tmp_keyfile.name)
-                tmp_keyfile.close()
-
-                os.rename(tmp_keyfile.name, self.keyfile)
-            except:
-                # unable to save keys, including scenario when key was invalid
-                # and caught earlier
-                traceback.print_exc()
-                pass
-            fcntl.lockf(KEY_LOCK, fcntl.LOCK_UN)
+            # new SSH host keys are appended to known_hosts in one batch when
+            # the process exits, instead of rewriting the file on every close
+            self._record_ssh_host_keys()
 
         self.ssh.close()
-
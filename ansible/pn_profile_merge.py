@@ -0,0 +1,178 @@
+#!/usr/bin/python
+
+"""
+This python script is to merge the profiles of pn_* modules run with
+PN_PROFILE set, across hosts and runs.
+
+The files are the JSON output of the pn_json callback, or module results
+saved with register, in any nesting; every pn_profile found in them is
+merged. Profiles printed more than once by pn_json are counted once.
+
+Options:
+--sort KEY   pstats sort key of the function table (default cumulative)
+--limit N    rows of the function and allocation tables (default 30)
+--dump FILE  also write the merged pstats, for snakeviz or pstats
+
+Example Usage:
+python pn_profile_merge.py run1.json run2.json
+python pn_profile_merge.py --sort tottime --dump merged.prof run1.json
+"""
+
+import json
+import os
+import pstats
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                'module_utils'))
+
+from pn_pstats import decode_stats
+
+
+class MergedStats(object):
+    """ Profile table in the form pstats.Stats() loads. """
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def json_documents(text):
+    """
+    Method to read the JSON documents of a file, which is either one
+    document or pn_json output with documents between other lines.
+    :param text: The file content.
+    :return: List of documents.
+    """
+    try:
+        return [json.loads(text)]
+    except ValueError:
+        pass
+    decoder = json.JSONDecoder()
+    documents = []
+    position = text.find('{')
+    while position != -1:
+        try:
+            document, end = decoder.raw_decode(text, position)
+        except ValueError:
+            position = text.find('{', position + 1)
+            continue
+        documents.append(document)
+        position = text.find('{', end)
+    return documents
+
+
+def find_profiles(document, host=None, found=None):
+    """
+    Method to collect the pn_profile results of a document.
+    :param document: A decoded JSON document.
+    :param host: The host the document is for, if known.
+    :param found: Dictionary the profiles are added to.
+    :return: Dictionary of packed pstats (or id): (host, pn_profile).
+    """
+    if found is None:
+        found = {}
+    if isinstance(document, dict):
+        profile = document.get('pn_profile')
+        if isinstance(profile, dict):
+            key = profile.get('pstats') or json.dumps(profile, sort_keys=True)
+            found.setdefault(key, (host, profile))
+        for name, value in document.items():
+            if name == 'hosts' and isinstance(value, dict):
+                for host_name, result in value.items():
+                    find_profiles(result, host_name, found)
+            elif name != 'pn_profile':
+                find_profiles(value, host, found)
+    elif isinstance(document, list):
+        for value in document:
+            find_profiles(value, host, found)
+    return found
+
+
+def merge_profiles(profiles):
+    """
+    Method to merge profiles.
+    :param profiles: List of (host, pn_profile).
+    :return: Tuple of (totals, pstats.Stats or None, allocations), where
+    allocations is a list of (size, count, line), largest first.
+    """
+    totals = {'wall_seconds': 0.0, 'cli_seconds': 0.0,
+              'python_seconds': 0.0, 'peak_bytes': 0}
+    merged = None
+    allocations = {}
+    for _, profile in profiles:
+        for key in totals:
+            if key == 'peak_bytes':
+                totals[key] = max(totals[key], profile.get(key, 0))
+            else:
+                totals[key] += profile.get(key, 0)
+        if profile.get('pstats'):
+            stats = pstats.Stats(MergedStats(decode_stats(profile['pstats'])))
+            if merged is None:
+                merged = stats
+            else:
+                merged.add(stats)
+        for allocation in profile.get('allocations', []):
+            size, count = allocations.get(allocation['line'], (0, 0))
+            allocations[allocation['line']] = (size + allocation['size'],
+                                               count + allocation['count'])
+    allocations = sorted(((size, count, line)
+                          for line, (size, count) in allocations.items()),
+                         reverse=True)
+    return totals, merged, allocations
+
+
+def main(argv):
+    """
+    Method to run the merge from the command line.
+    :param argv: The command line arguments.
+    """
+    args = argv[1:]
+    sort, limit, dump = 'cumulative', 30, None
+    while args[:1] and args[0] in ('--sort', '--limit', '--dump'):
+        if len(args) < 2:
+            exit('Execution Error: %s needs a value!' % args[0])
+        if args[0] == '--sort':
+            sort = args[1]
+        elif args[0] == '--limit':
+            limit = int(args[1])
+        else:
+            dump = args[1]
+        args = args[2:]
+
+    if not args:
+        msg = 'Execution Error: Please provide the files to merge!\n'
+        msg += 'Example usage: python pn_profile_merge.py run1.json run2.json'
+        exit(msg)
+
+    found = {}
+    for path in args:
+        with open(path) as result_file:
+            for document in json_documents(result_file.read()):
+                find_profiles(document, None, found)
+    profiles = list(found.values())
+    if not profiles:
+        exit('No pn_profile found, run the modules with PN_PROFILE set')
+
+    totals, merged, allocations = merge_profiles(profiles)
+    hosts = sorted(set(host for host, _ in profiles if host))
+    print('Profiles: %d, hosts: %s' % (len(profiles),
+                                       ', '.join(hosts) or 'unknown'))
+    print('Wall: %.3fs, waiting on the switches: %.3fs, python: %.3fs' % (
+        totals['wall_seconds'], totals['cli_seconds'],
+        totals['python_seconds']))
+    if merged is not None:
+        merged.sort_stats(sort).print_stats(limit)
+        if dump:
+            merged.dump_stats(dump)
+    if allocations:
+        print('Peak traced memory of a run: %d bytes' % totals['peak_bytes'])
+        print('%12s %8s  line' % ('bytes', 'blocks'))
+        for size, count, line in allocations[:limit]:
+            print('%12d %8d  %s' % (size, count, line))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,67 @@
+""" Test setup for the shared code of the pn_* modules """
+
+import os
+import sys
+
+import pytest
+
+import ansible.module_utils
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The modules import their shared code as ansible.module_utils.pn_*, the way
+# Ansible ships it to the switch; serve it from the repository.
+ansible.module_utils.__path__.append(os.path.join(ROOT, 'ansible',
+                                                  'module_utils'))
+sys.path[:0] = [os.path.join(ROOT, 'ansible', 'library'),
+                os.path.join(ROOT, 'ZTP')]
+
+
+class ModuleFailed(Exception):
+    pass
+
+
+class FakeModule(object):
+    """ The part of AnsibleModule the shared code uses. """
+
+    def __init__(self, params=None, check_mode=False):
+        self.params = dict(params or {})
+        self.check_mode = check_mode
+        self.logged = []
+
+    def log(self, msg):
+        self.logged.append(msg)
+
+    def fail_json(self, **kwargs):
+        raise ModuleFailed(kwargs)
+
+    def exit_json(self, **kwargs):
+        self.result = kwargs
+
+
+@pytest.fixture
+def make_module():
+    return FakeModule
+
+
+@pytest.fixture(autouse=True)
+def breaker_file(tmpdir, monkeypatch):
+    """ Keep the circuit breaker of every test to itself. """
+    path = str(tmpdir.join('pn_cli_breaker.json'))
+    monkeypatch.setenv('PN_CLI_BREAKER_FILE', path)
+    return path
+
+
+@pytest.fixture(autouse=True)
+def fresh_nvos():
+    """ Forget the transports, facts and plan of the previous test. """
+    from ansible.module_utils import pn_nvos
+    pn_nvos.TRANSPORTS.clear()
+    pn_nvos.CASSETTES.clear()
+    pn_nvos.FACTS.clear()
+    del pn_nvos.PLAN[:]
+    yield
+    for transport in pn_nvos.TRANSPORTS.values():
+        transport.close()
+    pn_nvos.TRANSPORTS.clear()
+    pn_nvos.CASSETTES.clear()
@@ -0,0 +1,167 @@
+""" ArtifactCache against a local stand-in of the ONIE image server """
+
+import hashlib
+import os
+import threading
+
+import pytest
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+import pn_artifacts
+from pn_artifacts import Artifact, ArtifactCache, fetch_all
+
+IMAGE = b''.join(b'%06d\n' % number for number in range(20000))
+IMAGE_SHA256 = hashlib.sha256(IMAGE).hexdigest()
+KEYS = b'activation keys\n'
+
+
+class ImageServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), Handler)
+        self.files = {'/onie-installer': IMAGE, '/keys': KEYS}
+        self.requests = []
+
+    def url(self, path):
+        return 'http://127.0.0.1:%d%s' % (self.server_address[1], path)
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get('Range')))
+        body = self.server.files.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        offset = 0
+        byte_range = self.headers.get('Range')
+        if byte_range:
+            offset = int(byte_range[len('bytes='):].rstrip('-'))
+            if offset >= len(body):
+                self.send_error(416)
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes %d-%d/%d' % (
+                offset, len(body) - 1, len(body)))
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(body) - offset))
+        self.end_headers()
+        self.wfile.write(body[offset:])
+
+
+@pytest.fixture
+def server():
+    image_server = ImageServer()
+    thread = threading.Thread(target=image_server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield image_server
+    image_server.shutdown()
+    image_server.server_close()
+
+
+@pytest.fixture
+def dirs(tmpdir):
+    return str(tmpdir.join('cache')), str(tmpdir.join('root'))
+
+
+def partial_path(cache, artifact):
+    name = hashlib.sha1((artifact.url + '\n' + artifact.version)
+                        .encode('utf-8')).hexdigest()
+    return os.path.join(cache.partial, name + '.part')
+
+
+def read(path):
+    with open(path, 'rb') as handle:
+        return handle.read()
+
+
+def test_cached_artifacts_are_not_downloaded_again(server, dirs):
+    cache_dir, root = dirs
+    artifacts = [Artifact('onie-installer', '2.5.1',
+                          server.url('/onie-installer')),
+                 Artifact('license_10g/keys', 'order-1', server.url('/keys'))]
+    assert fetch_all(ArtifactCache(cache_dir), artifacts, root) == []
+    assert read(os.path.join(root, 'onie-installer')) == IMAGE
+    assert read(os.path.join(root, 'license_10g', 'keys')) == KEYS
+    assert len(server.requests) == 2
+
+    again = [Artifact('onie-installer', '2.5.1', server.url('/onie-installer'))]
+    assert fetch_all(ArtifactCache(cache_dir), again, root) == []
+    assert len(server.requests) == 2
+    assert again[0].source == IMAGE_SHA256
+
+
+def test_interrupted_download_is_resumed(server, dirs):
+    cache = ArtifactCache(dirs[0])
+    artifact = Artifact('onie-installer', '2.5.1',
+                        server.url('/onie-installer'), IMAGE_SHA256)
+    with open(partial_path(cache, artifact), 'wb') as handle:
+        handle.write(IMAGE[:50000])
+    assert cache.download(artifact) == (IMAGE_SHA256, len(IMAGE))
+    assert server.requests == [('/onie-installer', 'bytes=50000-')]
+    assert read(cache.object_path(IMAGE_SHA256)) == IMAGE
+
+
+def test_complete_partial_file_is_taken_on_416(server, dirs):
+    cache = ArtifactCache(dirs[0])
+    artifact = Artifact('onie-installer', '2.5.1',
+                        server.url('/onie-installer'))
+    with open(partial_path(cache, artifact), 'wb') as handle:
+        handle.write(IMAGE)
+    assert cache.download(artifact) == (IMAGE_SHA256, len(IMAGE))
+    assert server.requests == [('/onie-installer',
+                                'bytes=%d-' % len(IMAGE))]
+
+
+def test_checksum_mismatch_is_not_placed(server, dirs):
+    cache_dir, root = dirs
+    cache = ArtifactCache(cache_dir)
+    artifact = Artifact('onie-installer', '2.5.1',
+                        server.url('/onie-installer'), '0' * 64)
+    errors = fetch_all(cache, [artifact], root)
+    assert 'sha256 %s, expected %s' % (IMAGE_SHA256, '0' * 64) in errors[0]
+    assert errors[1] == 'Not placed: onie-installer (2.5.1)'
+    assert not os.path.exists(os.path.join(root, 'onie-installer'))
+    assert not os.path.exists(partial_path(cache, artifact))
+
+
+def test_missing_artifact_fails_the_script(server, dirs):
+    cache_dir, root = dirs
+    url = server.url('/onie-installer-9.9.9')
+    with pytest.raises(SystemExit) as exit_info:
+        pn_artifacts.main(['pn_artifacts.py', '--root', root, '--cache',
+                           cache_dir, '--retries', '3', 'onie-installer',
+                           '9.9.9', url])
+    assert 'HTTP Error 404' in str(exit_info.value.code)
+    assert 'Not placed: onie-installer (9.9.9)' in str(exit_info.value.code)
+    # A client error is not retried.
+    assert len(server.requests) == 1
+
+
+def test_unexpected_error_is_reported(server, dirs, monkeypatch):
+    cache_dir, root = dirs
+    cache = ArtifactCache(cache_dir)
+
+    def broken(artifact):
+        raise ValueError('bad content length')
+
+    monkeypatch.setattr(cache, 'download', broken)
+    errors = fetch_all(cache, [Artifact('onie-installer', '2.5.1',
+                                        server.url('/onie-installer'))], root)
+    assert errors == [
+        'Download failed: %s: bad content length' % server.url(
+            '/onie-installer'),
+        'Not placed: onie-installer (2.5.1)']
@@ -0,0 +1,42 @@
+""" BGP AS planning of pn_bgp_plan """
+
+from ansible.module_utils.pn_bgp_plan import configured_as_map, plan_bgp_as
+
+CLUSTERS = [('c2', 'leaf3', 'leaf4'), ('c1', 'leaf1', 'leaf2')]
+LEAFS = ['leaf6', 'leaf1', 'leaf2', 'leaf5', 'leaf3', 'leaf4']
+
+
+def test_clusters_are_numbered_before_the_other_leafs():
+    as_map = plan_bgp_as(['spine1'], LEAFS, CLUSTERS, '65000')
+    assert as_map == {'spine1': '65000',
+                      'leaf3': '65001', 'leaf4': '65001',
+                      'leaf1': '65002', 'leaf2': '65002',
+                      'leaf5': '65003', 'leaf6': '65004'}
+
+
+def test_other_leafs_are_numbered_before_the_clusters():
+    clusters = [['leaf1', 'leaf2'], ['leaf3', 'leaf4']]
+    as_map = plan_bgp_as(['spine1'], LEAFS, clusters, '65000',
+                         clusters_first=False)
+    assert as_map == {'spine1': '65000',
+                      'leaf5': '65001', 'leaf6': '65002',
+                      'leaf1': '65003', 'leaf2': '65003',
+                      'leaf3': '65004', 'leaf4': '65004'}
+
+
+def test_configured_switches_keep_their_as(make_module, monkeypatch):
+    rows = [{'location': 'leaf5', 'bgp-as': '65010'},
+            {'location': 'leaf3', 'bgp-as': '65001'},
+            {'location': 'leaf4', 'bgp-as': '65001'},
+            {'location': 'spine1', 'bgp-as': '65000'},
+            {'location': 'leaf7', 'bgp-as': ''}]
+    monkeypatch.setattr('ansible.module_utils.pn_bgp_plan.run_show',
+                        lambda module, cli: (0, rows, ''))
+    previous = configured_as_map(make_module({}), '/usr/bin/cli --quiet')
+    assert 'leaf7' not in previous
+
+    as_map = plan_bgp_as(['spine1'], LEAFS, CLUSTERS, '65000', previous)
+    assert as_map['leaf3'] == as_map['leaf4'] == '65001'
+    assert as_map['leaf5'] == '65010'
+    assert as_map['leaf1'] == as_map['leaf2'] == '65011'
+    assert as_map['leaf6'] == '65012'
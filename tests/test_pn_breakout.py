@@ -0,0 +1,56 @@
+""" Breakout of 40G ports of pn_breakout """
+
+from ansible.module_utils.pn_breakout import wait_breakout
+from ansible.module_utils.pn_nvos import TRANSPORTS
+
+
+class Switch(object):
+    """ Ports 49-52 still at 40g for the first polls, then at 10g. """
+
+    name = 'rest'
+
+    def __init__(self, polls_until_ready):
+        self.polls = 0
+        self.polls_until_ready = polls_until_ready
+        self.verbs = []
+
+    def show(self, command):
+        self.polls += 1
+        self.verbs.append(command.verb)
+        if self.polls < self.polls_until_ready:
+            return 0, [{'port': '49', 'speed': '40g', 'enable': 'off'}], ''
+        return 0, [{'port': str(port), 'speed': '10g', 'enable': 'on'}
+                   for port in range(49, 53)], ''
+
+    def close(self):
+        pass
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 0
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    def time(self):
+        return self.now
+
+
+def test_ports_without_a_link_are_ready_once_configured(make_module):
+    # No port of the group has a link, so port-show would not list them.
+    switch = TRANSPORTS[('cli',)] = Switch(polls_until_ready=3)
+    clock = Clock()
+    took = wait_breakout(make_module({}), '/usr/bin/cli --quiet ', [49],
+                         sleep=clock.sleep, clock=clock.time)
+    assert took == 2
+    assert set(switch.verbs) == set(['port-config-show'])
+
+
+def test_gives_up_after_the_timeout(make_module):
+    TRANSPORTS[('cli',)] = Switch(polls_until_ready=100)
+    clock = Clock()
+    assert wait_breakout(make_module({}), '/usr/bin/cli --quiet ', [49],
+                         timeout=5, sleep=clock.sleep,
+                         clock=clock.time) is None
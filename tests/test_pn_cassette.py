@@ -0,0 +1,125 @@
+""" Record and replay of pn_cassette, streamed shows included """
+
+import json
+import os
+import stat
+
+import pytest
+
+from ansible.module_utils import pn_nvos
+from ansible.module_utils.pn_cassette import load_cassette
+from ansible.module_utils.pn_nvos import CliCommand, with_cassette
+from ansible.module_utils.pn_show_stream import stream_show
+
+# Prints a header and 20 rows of l2-table-show.
+FAKE_CLI = """#!/bin/sh
+echo 'mac;vlan'
+i=0
+while [ $i -lt 20 ]; do
+    echo "00:00:00:00:00:$i;10"
+    i=$((i + 1))
+done
+echo 'partial table' >&2
+"""
+
+CREATE = CliCommand('/usr/bin/cli --quiet --user admin:secret switch sw1 '
+                    'vlan-create id 10 scope fabric')
+SHOW = CliCommand('/usr/bin/cli --quiet switch sw1 vlan-show format id')
+
+
+class Switch(object):
+    """ Answers the calls of the recording. """
+
+    name = 'cli'
+
+    def run(self, command):
+        return 0, '', ''
+
+    def show(self, command):
+        return 0, [{'id': '10'}], ''
+
+    def close(self):
+        pass
+
+
+class NoSwitch(Switch):
+    """ Fails the test when a replayed call reaches the switch. """
+
+    def run(self, command):
+        raise AssertionError('replay reached the switch')
+
+    show = run
+
+
+@pytest.fixture
+def cli(tmpdir):
+    path = str(tmpdir.join('cli'))
+    with open(path, 'w') as script:
+        script.write(FAKE_CLI)
+    os.chmod(path, stat.S_IRWXU)
+    return path
+
+
+def start(make_module, path, mode):
+    """ Start a module run on the cassette, as a new process would. """
+    for transport in pn_nvos.TRANSPORTS.values():
+        transport.close()
+    pn_nvos.TRANSPORTS.clear()
+    pn_nvos.CASSETTES.clear()
+    return make_module({'pn_cassette': path, 'pn_cassette_mode': mode})
+
+
+def calls(module, transport, cli):
+    return (transport.run(CREATE), transport.show(SHOW),
+            stream_show(module, cli + ' --quiet l2-table-show format mac,vlan',
+                        limit=5))
+
+
+def test_recorded_calls_and_streams_are_replayed(make_module, tmpdir, cli):
+    path = str(tmpdir.join('cassette.jsonl.gz'))
+    module = start(make_module, path, 'record')
+    recorded = calls(module, with_cassette(module, Switch()), cli)
+    assert recorded[2]['rows'][4] == {'mac': '00:00:00:00:00:4', 'vlan': '10'}
+
+    module = start(make_module, path, 'replay')
+    entries = load_cassette(path)
+    # Both transports of the module wrote to the one cassette.
+    assert [entry['op'] for entry in entries] == ['run', 'show', 'stream']
+    assert 'secret' not in json.dumps(entries)
+    # Only the lines read are recorded: the header, the rows up to the limit
+    # and the one showing the output was truncated.
+    assert len(entries[2]['out'].splitlines()) == 7
+
+    # No cli is started when streams are replayed.
+    os.remove(cli)
+    assert calls(module, with_cassette(module, NoSwitch()), cli) == recorded
+    pn_nvos.CASSETTES[path].report()
+    assert not os.path.exists(path + '.replay.json')
+
+
+def test_divergences_are_reported(make_module, tmpdir, cli):
+    path = str(tmpdir.join('cassette.jsonl'))
+    module = start(make_module, path, 'record')
+    calls(module, with_cassette(module, Switch()), cli)
+
+    module = start(make_module, path, 'replay')
+    transport = with_cassette(module, NoSwitch())
+    assert transport.show(SHOW) == (0, [{'id': '10'}], '')
+    rc, out, err = transport.run(CliCommand('/usr/bin/cli --quiet switch '
+                                            'sw1 vlan-delete id 10'))
+    assert rc == 1 and err.startswith('Not in cassette ')
+    pn_nvos.CASSETTES[path].report()
+
+    with open(path + '.replay.json') as handle:
+        report = json.load(handle)
+    assert (report['calls'], report['recorded']) == (2, 3)
+    assert report['divergences'] == [
+        {'call': 0, 'op': 'show', 'problem': 'recorded as call 1',
+         'cmd': '--quiet switch sw1 vlan-show format id'},
+        {'call': 1, 'op': 'run', 'problem': 'not recorded',
+         'cmd': '--quiet switch sw1 vlan-delete id 10'},
+        {'call': 0, 'op': 'run', 'problem': 'not made',
+         'cmd': '--quiet switch sw1 vlan-create id 10 scope fabric'},
+        {'call': 2, 'op': 'stream', 'problem': 'not made',
+         'cmd': '--quiet l2-table-show format mac,vlan parsable-delim ; '
+                'show-headers'}]
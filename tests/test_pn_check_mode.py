@@ -0,0 +1,222 @@
+""" Check mode of the pn_* modules against fabric facts """
+
+import time
+
+import pn_l2_ztp
+import pn_l3_ztp
+import pn_vxlan
+import pn_ztp_vrrp_l2_tasks
+from ansible.module_utils.pn_events import ChangeEvents
+from ansible.module_utils.pn_nvos import (TRANSPORTS, command_plan,
+                                          rows_to_text)
+
+FABRIC_NODES = [{'name': 'leaf1', 'fab-tid': '7'}]
+
+PARAMS = {'pn_cliusername': None, 'pn_clipassword': None,
+          'pn_bfd': True, 'pn_bfd_min_rx': '200', 'pn_bfd_multiplier': '3'}
+
+
+class FabricStandIn(object):
+    """ A fabric answering shows from its tables and refusing changes. """
+
+    name = 'cli'
+
+    def __init__(self, tables=None):
+        self.shows = []
+        self.tables = tables or {'fabric-node': FABRIC_NODES}
+
+    def show(self, command):
+        self.shows.append(command.verb)
+        filters = dict((key, value)
+                       for key, value in command.show_filters().items()
+                       if value is not True)
+        if command.switch and command.switch != 'local':
+            filters['switch'] = command.switch
+        rows = [dict(row) for row in self.tables.get(command.object, [])
+                if all(row.get(key, value) == value
+                       for key, value in filters.items())]
+        for row in rows:
+            row.pop('switch', None)
+        return 0, rows, ''
+
+    def run(self, command):
+        assert command.is_show, 'change sent in check mode'
+        rc, rows, err = self.show(command)
+        return rc, rows_to_text(command, rows), err
+
+    def batch(self, commands):
+        raise AssertionError('batch sent in check mode')
+
+    def close(self):
+        pass
+
+
+def snapshot():
+    tables = {}
+    for name, columns in (('vrouter', 'name,location,router-id,bgp-as'),
+                          ('vrouter-interface', 'vrouter-name,nic,ip,l3-port,'
+                                                'vlan'),
+                          ('vrouter-loopback-interface',
+                           'vrouter-name,index,ip')):
+        tables[name] = {'scope': 'fabric', 'columns': columns.split(','),
+                        'rows': []}
+    return {'generation': '7', 'gathered': int(time.time()), 'ttl': 600,
+            'tables': tables}
+
+
+def plan_interface(module):
+    pn_l3_ztp.create_vrouter(module, 'leaf1', 'fab-global')
+    pn_l3_ztp.create_interface(module, 'leaf1', '10.0.0.1/31', '49')
+    return command_plan()
+
+
+def test_l3_ztp_plans_against_a_facts_snapshot(make_module):
+    fabric = TRANSPORTS[('cli',)] = FabricStandIn()
+    params = dict(PARAMS, pn_fabric_facts=snapshot())
+    plan = plan_interface(make_module(params, check_mode=True))
+
+    assert plan['leaf1'] == ['vrouter-create name leaf1-vrouter vnet fab-global']
+    assert plan['local'] == [
+        'vrouter-interface-add vrouter-name leaf1-vrouter ip 10.0.0.1/31 '
+        'l3-port 49',
+        'vrouter-interface-config-add vrouter-name leaf1-vrouter nic eth0.0 '
+        'bfd-min-rx 200 bfd-multiplier 3']
+    # Only the freshness of the snapshot was read from the fabric.
+    assert fabric.shows.count('fabric-node-show') == 1
+    assert 'vrouter-show' not in fabric.shows
+
+
+def test_check_mode_gathers_facts_when_none_are_given(make_module):
+    fabric = TRANSPORTS[('cli',)] = FabricStandIn()
+    plan = plan_interface(make_module(PARAMS, check_mode=True))
+
+    assert 'vrouter-show' in fabric.shows
+    assert plan['local'][0].startswith(
+        'vrouter-interface-add vrouter-name leaf1-vrouter ')
+    assert ' nic eth0.0 ' in plan['local'][1]
+
+
+def port_rows(links):
+    return [{'switch': switch, 'port': port, 'hostname': peer, 'status': 'up'}
+            for switch, port, peer in links]
+
+
+def trunks(commands):
+    """ Trunk name: ports of the trunk-create commands, ports sorted. """
+    created = {}
+    for command in commands:
+        words = command.split()
+        if words[0] == 'trunk-create':
+            created[words[2]] = sorted(words[4].split(','))
+    return created
+
+
+def test_l2_ztp_plans_clusters_trunks_and_vlags(make_module):
+    leafs = ('leaf1', 'leaf2', 'leaf3')
+    links = []
+    for number, leaf in enumerate(leafs):
+        links += [(leaf, '1', 'spine1'), (leaf, '2', 'spine2'),
+                  ('spine1', str(number + 1), leaf),
+                  ('spine2', str(number + 1), leaf)]
+    links += [('leaf1', '3', 'leaf2'), ('leaf2', '3', 'leaf1')]
+    fabric = TRANSPORTS[('cli',)] = FabricStandIn({
+        'fabric-node': [{'name': name, 'fab-tid': '7'}
+                        for name in ('spine1', 'spine2') + leafs],
+        'lldp': [{'switch': switch, 'local-port': port, 'sys-name': peer}
+                 for switch, port, peer in links],
+        'port': port_rows(links)})
+    module = make_module(dict(PARAMS, pn_spine_list=['spine1', 'spine2'],
+                              pn_leaf_list=list(leafs)), check_mode=True)
+    pn_l2_ztp.configure_auto_vlag(module)
+    plan = command_plan()
+
+    assert plan['spine1'][0] == ('cluster-create name spine-cluster '
+                                 'cluster-node-1 spine1 cluster-node-2 spine2')
+    assert plan['leaf2'][0] == ('cluster-create name leaf1-to-leaf2-cluster '
+                                'cluster-node-1 leaf1 cluster-node-2 leaf2')
+    assert trunks(plan['leaf1']) == {'leaf1-to-spine1spine2': ['1', '2']}
+    assert trunks(plan['leaf3']) == {'leaf3-to-spine1spine2': ['1', '2']}
+    # leaf3 is left without a peer and gets its vlag on the spines only.
+    assert trunks(plan['spine1']) == {'spine1-to-leaf1leaf2': ['1', '2'],
+                                      'spine1-to-leaf3': ['3']}
+    assert plan['leaf1'][-1] == (
+        'vlag-create name leaf1-leaf2-to-spine port leaf1-to-spine1spine2 '
+        'peer-switch leaf2 peer-port leaf2-to-spine1spine2 mode active-active')
+    assert plan['spine1'][-1] == (
+        'vlag-create name spine-to-leaf3 port spine1-to-leaf3 '
+        'peer-switch spine2 peer-port spine2-to-leaf3 mode active-active')
+    assert 'vlag-create' not in ' '.join(plan['leaf3'])
+    # Trunks and vlags are no facts, their shows still went to the fabric.
+    assert 'trunk-show' in fabric.shows and 'vlag-show' in fabric.shows
+
+
+def test_vrrp_l2_batches_are_planned(make_module, monkeypatch):
+    monkeypatch.setattr(pn_ztp_vrrp_l2_tasks, 'CHANGED_FLAG', [],
+                        raising=False)
+    monkeypatch.setattr(pn_ztp_vrrp_l2_tasks, 'EVENTS', ChangeEvents(),
+                        raising=False)
+    fabric = TRANSPORTS[('cli',)] = FabricStandIn({
+        'fabric-node': [{'name': 'spine1', 'fab-tid': '7'},
+                        {'name': 'spine2', 'fab-tid': '7'}],
+        'vlan': [{'id': '101'}],
+        'vrouter': [{'name': 'spine1-vrouter', 'location': 'spine1'}],
+        'vrouter-interface': [{'vrouter-name': 'spine1-vrouter',
+                               'nic': 'eth0.101', 'ip': '10.10.101.2/24',
+                               'vlan': '101'}]})
+    module = make_module(dict(PARAMS, pn_fabric_name='fab', pn_batch_size=2,
+                              pn_spine_list=['spine1', 'spine2']),
+                         check_mode=True)
+    pn_ztp_vrrp_l2_tasks.configure_vrrp(module, '18', '2', '10.10.$.0/24',
+                                        'spine1', '101-200')
+    plan = command_plan()
+
+    assert plan['spine2'] == [
+        'vrouter-create name spine2-vrouter vnet fab-global hw-vrrp-id 18 '
+        'enable']
+    assert plan['local'] == [
+        'vlan-create id 102 scope fabric',
+        'vrouter-interface-add vrouter-name spine1-vrouter ip 10.10.102.2/24 '
+        'vlan 102 if data',
+        'vrouter-interface-add vrouter-name spine2-vrouter ip 10.10.101.3/24 '
+        'vlan 101 if data',
+        'vrouter-interface-add vrouter-name spine2-vrouter ip 10.10.102.3/24 '
+        'vlan 102 if data',
+        'vrouter-interface-add vrouter-name spine1-vrouter ip 10.10.101.1/24 '
+        'vlan 101 if data vrrp-id 18 vrrp-primary eth0.101 vrrp-priority 110',
+        'vrouter-interface-add vrouter-name spine1-vrouter ip 10.10.102.1/24 '
+        'vlan 102 if data vrrp-id 18 vrrp-primary eth1.102 vrrp-priority 110',
+        'vrouter-interface-add vrouter-name spine2-vrouter ip 10.10.101.1/24 '
+        'vlan 101 if data vrrp-id 18 vrrp-primary eth0.101 vrrp-priority 100',
+        'vrouter-interface-add vrouter-name spine2-vrouter ip 10.10.102.1/24 '
+        'vlan 102 if data vrrp-id 18 vrrp-primary eth1.102 vrrp-priority 100']
+    assert 'vlan-show' in fabric.shows
+
+
+def test_vxlan_plans_tunnels_between_leafs(make_module, monkeypatch):
+    monkeypatch.setattr(pn_vxlan, 'CHANGED_FLAG', [])
+    monkeypatch.setattr(pn_vxlan, 'EVENTS', ChangeEvents())
+    fabric = TRANSPORTS[('cli',)] = FabricStandIn({
+        'fabric-node': [{'name': 'leaf1', 'fab-tid': '7'},
+                        {'name': 'leaf2', 'fab-tid': '7'}],
+        'vrouter': [{'name': 'leaf1-vrouter', 'location': 'leaf1'},
+                    {'name': 'leaf2-vrouter', 'location': 'leaf2'}],
+        'vrouter-loopback-interface': [
+            {'vrouter-name': 'leaf1-vrouter', 'index': '0', 'ip': '10.9.0.1'},
+            {'vrouter-name': 'leaf2-vrouter', 'index': '0', 'ip': '10.9.0.2'}],
+        'tunnel': [{'switch': 'leaf2', 'name': 'leaf2-to-leaf1-tunnel'}]})
+    module = make_module(dict(PARAMS, pn_leaf_list=['leaf1', 'leaf2']),
+                         check_mode=True)
+    pn_vxlan.configure_vxlan(module, '100, web, leaf1, 10100, 49')
+    plan = command_plan()
+
+    assert plan['local'] == [
+        'vlan-modify id 100 vxlan 10100',
+        'trunk-modify name vxlan-loopback-trunk ports 49']
+    assert plan['leaf1'] == [
+        'tunnel-create name leaf1-to-leaf2-tunnel scope local local-ip '
+        '10.9.0.1 remote-ip 10.9.0.2 vrouter-name leaf1-vrouter',
+        'tunnel-vxlan-add name leaf1-to-leaf2-tunnel vxlan 10100']
+    # The existing tunnel of leaf2 only gets the vxlan.
+    assert plan['leaf2'] == [
+        'tunnel-vxlan-add name leaf2-to-leaf1-tunnel vxlan 10100']
+    assert fabric.shows.count('tunnel-show') == 2
@@ -0,0 +1,37 @@
+""" Failed batches of the pn_run_cli_commands modules """
+
+import pn_run_cli_commands
+import pn_run_cli_commands_json
+
+PREFIX = '/usr/bin/cli --quiet --user admin:secret '
+
+BATCH = [PREFIX + ' switch sw1 vlan-create id 10 scope local ',
+         PREFIX + ' switch sw1 vlan-create id 11 scope local ',
+         PREFIX + ' switch sw1 trunk-create name t1 ports 1,2 ']
+
+ERR = 'vlan-create: vlan 11 already exists\n'
+
+
+def test_only_the_failed_command_is_reported(make_module):
+    module = make_module({})
+    pn_run_cli_commands.batch_failed(module, 'sw1', BATCH, ERR)
+    assert module.result['msg'] == (
+        'Operation Failed on sw1: switch sw1 vlan-create id 11 scope local')
+    assert module.result['stderr'] == ERR.strip()
+
+
+def test_json_result_carries_no_credentials(make_module):
+    module = make_module({})
+    pn_run_cli_commands_json.batch_failed(module, 'sw1', BATCH, ERR)
+    assert module.result['summary'] == [
+        {'switch': 'sw1',
+         'output': 'Operation Failed: switch sw1 vlan-create id 11 scope '
+                   'local'}]
+    assert 'secret' not in str(module.result)
+
+
+def test_unknown_error_names_no_command(make_module):
+    module = make_module({})
+    pn_run_cli_commands.batch_failed(module, 'sw1', BATCH, 'cli: timed out')
+    assert module.result['msg'] == 'Operation Failed on sw1: one of 3 commands'
+    assert 'secret' not in str(module.result)
@@ -0,0 +1,26 @@
+""" Csv validation of pn_csv_schema """
+
+import os
+
+import pytest
+
+from ansible.module_utils.pn_csv_schema import validate_files
+
+ANSIBLE = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'ansible')
+
+
+@pytest.mark.parametrize('file_format', ['dci', 'fabric_over_l3'])
+def test_sample_files_are_valid(file_format):
+    path = os.path.join(ANSIBLE, file_format + '.csv')
+    with open(path) as csv_file:
+        assert validate_files([(path, file_format, csv_file.read())]) == []
+
+
+def test_dci_vxlan_is_shared_by_rows_but_not_files():
+    rows = '101, 10.0.1.0/24, leaf1, 1000\n102, 10.0.2.0/24, leaf2, 1000\n'
+    assert validate_files([('a.csv', 'dci', rows)]) == []
+    errors = validate_files([('a.csv', 'dci', rows),
+                             ('b.csv', 'vxlan', '200, 10.1.0.0/24, leaf3, '
+                                                '1000, 49')])
+    assert errors == ['b.csv:1: vxlan 1000 is also used in a.csv line 1']
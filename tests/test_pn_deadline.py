@@ -0,0 +1,75 @@
+""" Deadlines and the circuit breaker of pn_deadline """
+
+import json
+import os
+import time
+
+from ansible.module_utils.pn_deadline import TIMEOUT_RC, DeadlineRunner
+from ansible.module_utils.pn_nvos import cli_stats, cli_transport
+
+
+def gone(pid):
+    """ Wait for a process to be reaped, True once it is. """
+    for _ in range(50):
+        try:
+            os.kill(pid, 0)
+        except OSError:
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def test_command_is_stopped_at_its_deadline():
+    started = time.time()
+    rc, out, err = DeadlineRunner().execute(['sleep', '30'], deadline=1)
+    assert rc == TIMEOUT_RC
+    assert err == 'Timed out after 1s on local: sleep 30'
+    assert time.time() - started < 10
+
+
+def test_whole_process_group_is_killed():
+    # The shell prints the pid of its child, which keeps stdout open.
+    started = time.time()
+    rc, out, err = DeadlineRunner().execute(
+        ['sh', '-c', 'sleep 30 & echo $!; wait'], deadline=1)
+    assert rc == TIMEOUT_RC
+    assert time.time() - started < 10
+    assert gone(int(out))
+
+
+def test_credentials_are_masked_in_the_timeout():
+    rc, out, err = DeadlineRunner().execute(
+        ['sh', '-c', 'sleep 30', '--user', 'admin:secret'], deadline=1,
+        target='sw1')
+    assert rc == TIMEOUT_RC
+    assert err.endswith('on sw1: sh -c sleep 30 --user ********')
+
+
+def test_breaker_counts_timeouts_across_runs(breaker_file):
+    for _ in range(3):
+        runner = DeadlineRunner(breaker_path=breaker_file)
+        assert runner.execute(['sleep', '30'], deadline=0.2,
+                              target='sw1')[0] == TIMEOUT_RC
+    runner = DeadlineRunner(breaker_path=breaker_file)
+    assert runner.open_circuits() == {'sw1': 3}
+    assert runner.execute(['true'], target='sw1') == (
+        1, '', 'Not sent to sw1: it timed out 3 times in a row')
+    # Other switches are still sent commands.
+    assert runner.execute(['true'], target='sw2') == (0, '', '')
+
+
+def test_open_circuit_is_tried_again_after_the_reset(breaker_file):
+    with open(breaker_file, 'w') as handle:
+        json.dump({'sw1': [3, time.time()], 'sw2': [1, time.time()]}, handle)
+    runner = DeadlineRunner(breaker_path=breaker_file, breaker_reset=0)
+    assert runner.open_circuits() == {}
+    assert runner.execute(['true'], target='sw1') == (0, '', '')
+    with open(breaker_file) as handle:
+        assert list(json.load(handle)) == ['sw2']
+
+
+def test_open_circuits_are_reported_in_cli_stats(make_module, breaker_file):
+    with open(breaker_file, 'w') as handle:
+        json.dump({'sw1': [3, time.time()]}, handle)
+    cli_transport(make_module({}))
+    assert cli_stats()['open_circuits'] == {'sw1': 3}
@@ -0,0 +1,37 @@
+""" Results of the pn_* modules built from pn_events """
+
+import pytest
+
+import pn_l2_ztp
+import pn_l3_ztp
+from ansible.module_utils.pn_nvos import TRANSPORTS
+
+
+class FailingSwitch(object):
+
+    name = 'cli'
+
+    def run(self, command):
+        return 1, '', 'vlan 10 already exists\n'
+
+    def close(self):
+        pass
+
+
+@pytest.mark.parametrize('module_code, task', [
+    (pn_l2_ztp, 'CLI command to configure L2 zero touch provisioning'),
+    (pn_l3_ztp, 'CLI commands to configure L3 zero touch provisioning'),
+])
+def test_json_failure_keeps_the_former_json_result(make_module, module_code,
+                                                   task):
+    TRANSPORTS[('cli',)] = FailingSwitch()
+    module = make_module({'pn_output': 'json'})
+    module_code.run_cli(module, '/usr/bin/cli --quiet --user admin:secret '
+                                'vlan-create id 10 scope fabric')
+    result = module.result
+    assert result['failed'] and result['task'] == task
+    assert result['stderr'] == 'vlan 10 already exists'
+    assert result['summary'] == [{
+        'switch': '', 'output': 'Operation Failed: /usr/bin/cli --quiet '
+                                '--user ******** vlan-create id 10 scope '
+                                'fabric'}]
@@ -0,0 +1,62 @@
+""" Input/state fingerprints of pn_fingerprint """
+
+from ansible.module_utils.pn_fingerprint import Fingerprints
+from ansible.module_utils.pn_nvos import TRANSPORTS
+
+SHOWS = [' trunk-show format name,ports ']
+
+
+class Switches(object):
+    """ Trunk tables of two switches, counting the shows per switch. """
+
+    name = 'cli'
+
+    def __init__(self):
+        self.trunks = {'sw1': [{'name': 't1', 'ports': '1,2'}],
+                       'sw2': [{'name': 't2', 'ports': '3,4'}]}
+        self.reads = []
+
+    def show(self, command):
+        self.reads.append(command.switch)
+        return 0, self.trunks[command.switch], ''
+
+    def close(self):
+        pass
+
+
+def run_module(make_module, path, events):
+    module = make_module({'pn_fingerprint_file': path, 'pn_mtu': '9216'})
+    fingerprints = Fingerprints(module, 'pn_test', ['sw1', 'sw2'], SHOWS)
+    fingerprints.save(events)
+    return fingerprints
+
+
+def test_unchanged_switches_are_skipped(make_module, tmpdir):
+    switches = TRANSPORTS[('cli',)] = Switches()
+    path = str(tmpdir.join('fingerprints.json'))
+    first = run_module(make_module, path, [])
+    assert not first.unchanged('sw1') and not first.unchanged('sw2')
+    # Nothing was stored yet, so the state is read once, when saving.
+    assert sorted(switches.reads) == ['sw1', 'sw2']
+
+    del switches.reads[:]
+    second = run_module(make_module, path, [])
+    assert second.all_unchanged(['sw1', 'sw2'])
+    assert sorted(switches.reads) == ['sw1', 'sw2']
+
+
+def test_only_changed_switches_are_read_again(make_module, tmpdir):
+    switches = TRANSPORTS[('cli',)] = Switches()
+    path = str(tmpdir.join('fingerprints.json'))
+    run_module(make_module, path, [])
+    switches.trunks['sw1'] = []
+
+    del switches.reads[:]
+    run_module(make_module, path, [
+        {'switch': 'sw1', 'result': 'changed'},
+        {'switch': 'sw2', 'result': 'unchanged'}])
+    # sw1 is read to check it and again after the change, sw2 only once.
+    assert sorted(switches.reads) == ['sw1', 'sw1', 'sw2']
+
+    del switches.reads[:]
+    assert run_module(make_module, path, []).unchanged('sw1')
@@ -0,0 +1,58 @@
+""" Worker pool of pn_fleet_reset """
+
+import threading
+import time
+
+import pn_fleet_reset
+
+from conftest import FakeModule
+
+# Seconds the reset of each switch takes.
+RESET_SECONDS = {'sw1': 0.5, 'sw2': 0.05, 'sw3': 0.05, 'sw4': 0.05,
+                 'sw5': 0.05}
+
+
+class Fleet(FakeModule):
+    """ Switches resetting over ssh, nvOSd going down and back up. """
+
+    def __init__(self, params):
+        FakeModule.__init__(self, params)
+        self.lock = threading.Lock()
+        self.running = 0
+        self.most = 0
+        self.started = []
+        self.finished = []
+        self.polls = {}
+
+    def run_command(self, argv):
+        switch, command = argv[-2], argv[-1]
+        if 'switch-config-reset' not in command:
+            with self.lock:
+                self.polls[switch] = self.polls.get(switch, 0) + 1
+                online = self.polls[switch] > 1
+            return 0, 'online\n' if online else 'offline\n', ''
+        with self.lock:
+            self.running += 1
+            self.most = max(self.most, self.running)
+            self.started.append(switch)
+        time.sleep(RESET_SECONDS[switch])
+        with self.lock:
+            self.running -= 1
+            self.finished.append(switch)
+        return 0, '', ''
+
+
+def test_next_switch_starts_when_a_slot_frees():
+    fleet = Fleet({'pn_switches': sorted(RESET_SECONDS), 'pn_wave_size': 2,
+                   'pn_switch_hosts': None, 'pn_ssh_user': None,
+                   'pn_cliusername': None, 'pn_clipassword': None,
+                   'pn_ready_timeout': 60, 'pn_poll_interval': 0,
+                   'pn_poll_max_interval': 0})
+    results = pn_fleet_reset.reset_fleet(fleet)
+
+    assert fleet.most == 2
+    assert fleet.started == sorted(RESET_SECONDS)
+    # The slow sw1 did not hold back sw3 to sw5, as a wave would.
+    assert fleet.finished[-1] == 'sw1'
+    assert all(not result['failed'] and result['changed']
+               for result in results.values())
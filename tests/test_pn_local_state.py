@@ -0,0 +1,51 @@
+""" Local state snapshot of pn_local_state """
+
+import pytest
+
+from ansible.module_utils.pn_local_state import LocalState
+from ansible.module_utils.pn_nvos import TRANSPORTS
+
+from conftest import ModuleFailed
+
+CLI = '/usr/bin/cli --quiet --user admin:secret '
+
+
+class Switch(object):
+    """ A switch outside any fabric, answering shows one by one. """
+
+    name = 'cli'
+
+    def __init__(self, failing=()):
+        self.failing = failing
+
+    def batch(self, commands):
+        return 1, '', 'batch refused'
+
+    def show(self, command):
+        if command.verb in self.failing:
+            return 1, [], 'nvOSd not responding\n'
+        if command.verb == 'fabric-info':
+            return 1, [], 'switch is not part of a fabric\n'
+        if command.verb == 'port-config-show':
+            return 0, [{'port': '1', 'enable': 'on', 'speed': '10g'}], ''
+        return 0, [], ''
+
+    def close(self):
+        pass
+
+
+def test_switch_outside_a_fabric_has_no_fabric_info(make_module):
+    TRANSPORTS[('cli',)] = Switch()
+    state = LocalState(make_module({}), CLI)
+    assert state.fabric is None
+    assert state.ports_with('enable', 'on') == ['1']
+
+
+def test_failed_show_fails_the_module(make_module):
+    TRANSPORTS[('cli',)] = Switch(failing=('port-config-show',))
+    with pytest.raises(ModuleFailed) as failed:
+        LocalState(make_module({}), CLI)
+    assert failed.value.args[0] == {
+        'msg': 'Operation Failed: /usr/bin/cli --quiet --user ******** '
+               'switch-local port-config-show format port,enable,speed',
+        'stderr': 'nvOSd not responding'}
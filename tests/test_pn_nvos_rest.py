@@ -0,0 +1,222 @@
+""" RestTransport against a local stand-in of the nvOS web service """
+
+import json
+import select
+import socket
+import threading
+
+import pytest
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+from ansible.module_utils.pn_nvos import (CliCommand, RestTransport,
+                                          run_shows)
+
+VLANS = [{'id': '10', 'scope': 'fabric'}, {'id': '20', 'scope': 'local'}]
+PORTS = [{'switch': 'sw1', 'port': '1', 'hostname': 'sw2'}]
+
+
+class WebService(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), Handler)
+        self.connections = 0
+        self.requests = []
+        self.session = 'session-1'
+        self.drop = set()
+        self.close_after = False
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.connections += 1
+
+    def reply(self, status, payload, headers=()):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_request(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        server.requests.append((self.command, self.path,
+                                self.headers.get('Cookie'),
+                                self.headers.get('Authorization'), body))
+        if self.command in server.drop:
+            # The switch went away after the request reached it.
+            server.drop.discard(self.command)
+            self.close_connection = True
+            return
+
+        headers = []
+        if self.headers.get('Cookie') != 'pn-session=' + server.session:
+            if not self.headers.get('Authorization'):
+                self.reply(401, {'result': {'message': 'login required'}})
+                return
+            headers.append(('Set-Cookie',
+                            'pn-session=%s; Path=/' % server.session))
+
+        path = self.path.split('?')[0]
+        if self.command == 'GET' and path == '/vRest/vlans':
+            self.reply(200, {'data': VLANS}, headers)
+        elif self.command == 'GET' and path == '/vRest/ports':
+            self.reply(200, {'data': PORTS}, headers)
+        elif self.command == 'POST' and path == '/vRest/vlans':
+            if body and body.get('id') == '10':
+                self.reply(409, {'result': {'result': [
+                    {'message': 'vlan 10 already exists'}]}}, headers)
+            else:
+                self.reply(200, {'result': {'status': 'Success'}}, headers)
+        else:
+            self.reply(404, {'result': {'message': 'no such object'}},
+                       headers)
+        if server.close_after:
+            # Close the kept alive connection once the reply is out.
+            server.close_after = False
+            self.close_connection = True
+
+    do_GET = do_POST = do_PUT = do_DELETE = handle_request
+
+
+@pytest.fixture
+def service():
+    server = WebService()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def transport_for(service):
+    return RestTransport('127.0.0.1', service.server_address[1], 'http',
+                         'admin', 'secret', timeout=5)
+
+
+def show(cli):
+    return CliCommand('/usr/bin/cli --quiet ' + cli)
+
+
+def wait_closed(transport):
+    # The switch closes an idle connection some time after the reply.
+    select.select([transport.connection.sock], [], [], 2)
+
+
+def test_keep_alive_connection_and_session_are_reused(service):
+    transport = transport_for(service)
+    assert transport.show(show('vlan-show format id,scope'))[1] == VLANS
+    assert transport.show(show('port-show format port,hostname'))[1] == PORTS
+    assert service.connections == 1
+    first, second = service.requests
+    assert first[3].startswith('Basic ') and first[2] is None
+    assert second[2] == 'pn-session=session-1' and second[3] is None
+
+
+def test_expired_session_is_authenticated_again(service):
+    transport = transport_for(service)
+    transport.show(show('vlan-show format id'))
+    service.session = 'session-2'
+    rc, rows, err = transport.show(show('port-show format port'))
+    assert (rc, rows, err) == (0, PORTS, '')
+    assert transport.cookie == 'pn-session=session-2'
+    assert [request[3] is not None for request in service.requests] == [
+        True, False, True]
+
+
+def test_shows_are_fetched_once_until_a_change(service):
+    transport = transport_for(service)
+    transport.prefetch(['/usr/bin/cli --quiet vlan-show format id',
+                        '/usr/bin/cli --quiet port-show format port'])
+    transport.show(show('vlan-show format id'))
+    transport.run(show('port-show format port'))
+    assert len(service.requests) == 2
+
+    assert transport.run(show('vlan-create id 30 scope local')) == (0, '', '')
+    transport.show(show('vlan-show format id'))
+    assert [request[0] for request in service.requests] == [
+        'GET', 'GET', 'POST', 'GET']
+    assert service.connections == 1
+
+
+def test_run_shows_over_one_connection(service, make_module):
+    module = make_module({'pn_transport': 'rest',
+                          'pn_web_api_host': '127.0.0.1',
+                          'pn_web_api_port': service.server_address[1],
+                          'pn_web_api_scheme': 'http',
+                          'pn_cliusername': 'admin',
+                          'pn_clipassword': 'secret'})
+    results = run_shows(module, [
+        '/usr/bin/cli --quiet vlan-show format id,scope',
+        '/usr/bin/cli --quiet port-show format port,hostname',
+        '/usr/bin/cli --quiet vlan-show format id,scope'])
+    assert results == [(0, VLANS, ''), (0, PORTS, ''), (0, VLANS, '')]
+    assert len(service.requests) == 2
+    assert service.connections == 1
+
+
+def test_change_error_is_returned(service):
+    transport = transport_for(service)
+    rc, out, err = transport.run(show('vlan-create id 10 scope fabric'))
+    assert (rc, out) == (1, '')
+    assert err == 'vlan 10 already exists'
+    rc, rows, err = transport.show(show('bogus-show format x'))
+    assert (rc, rows, err) == (1, [], 'no such object')
+
+
+def test_unreachable_switch_is_an_error_not_an_exception():
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    port = listener.getsockname()[1]
+    listener.close()
+    transport = RestTransport('127.0.0.1', port, 'http', 'admin', 'secret',
+                              timeout=2)
+    rc, rows, err = transport.show(show('vlan-show format id'))
+    assert (rc, rows) == (1, [])
+    assert 'Cannot reach the web service of 127.0.0.1' in err
+    rc, out, err = transport.run(show('vlan-create id 30 scope local'))
+    assert rc == 1 and '127.0.0.1' in err
+
+
+def test_show_is_retried_after_a_dropped_connection(service):
+    transport = transport_for(service)
+    service.drop.add('GET')
+    assert transport.show(show('vlan-show format id')) == (0, VLANS, '')
+    assert [request[0] for request in service.requests] == ['GET', 'GET']
+
+
+def test_change_which_reached_the_switch_is_not_sent_again(service):
+    transport = transport_for(service)
+    transport.show(show('vlan-show format id'))
+    service.drop.add('POST')
+    rc, out, err = transport.run(show('vlan-create id 30 scope local'))
+    assert rc == 1 and 'Cannot reach' in err
+    assert [request[0] for request in service.requests] == ['GET', 'POST']
+
+
+def test_change_after_the_switch_closed_the_idle_connection(service):
+    transport = transport_for(service)
+    service.close_after = True
+    transport.show(show('vlan-show format id'))
+    wait_closed(transport)
+    assert transport.run(show('vlan-create id 30 scope local')) == (0, '', '')
+    assert [request[0] for request in service.requests] == ['GET', 'POST']
+    assert service.connections == 2
@@ -0,0 +1,58 @@
+""" Host keys appended to known_hosts by the paramiko connection plugin """
+
+import base64
+import hashlib
+import hmac
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'ansible'))
+
+# The plugin builds on the Ansible 2.x connection API.
+pn_paramiko = pytest.importorskip('pn_paramiko')
+
+
+def hashed(hostname, salt=b'0123456789abcdefghij'):
+    digest = hmac.new(salt, hostname, hashlib.sha1).digest()
+    return b'|1|' + base64.b64encode(salt) + b'|' + base64.b64encode(digest)
+
+
+def read(path):
+    with open(path, 'rb') as handle:
+        return handle.read()
+
+
+def test_host_keys_are_appended_once(tmpdir):
+    path = str(tmpdir.join('known_hosts'))
+    with open(path, 'wb') as handle:
+        handle.write(hashed(b'sw1') + b' ssh-rsa AAAA1\n'
+                     b'sw2,10.0.0.2 ssh-rsa AAAA2')
+    recorder = pn_paramiko.KnownHostsRecorder()
+    recorder.add(path, 'sw1', 'ssh-rsa', 'AAAA1')
+    recorder.add(path, '10.0.0.2', 'ssh-rsa', 'AAAA2')
+    recorder.add(path, 'sw3', 'ssh-rsa', 'AAAA3')
+    recorder.add(path, 'sw3', 'ssh-rsa', 'AAAA3')
+    # A host whose key changed gets the new key next to the old one.
+    recorder.add(path, 'sw1', 'ssh-rsa', 'AAAA9')
+    recorder.flush()
+
+    assert read(path).split(b'\n')[2:] == [
+        b'sw3 ssh-rsa AAAA3', b'sw1 ssh-rsa AAAA9', b'']
+
+    # Entries appended by another process are seen by the next flush.
+    with open(path, 'ab') as handle:
+        handle.write(hashed(b'sw4', b'another salt') + b' ssh-rsa AAAA4\n')
+    recorder.add(path, 'sw3', 'ssh-rsa', 'AAAA3')
+    recorder.add(path, 'sw4', 'ssh-rsa', 'AAAA4')
+    recorder.flush()
+    assert read(path).count(b'\n') == 5
+
+
+def test_hashed_hostname_is_matched_by_its_salt():
+    assert pn_paramiko.hashed_host_matches(hashed(b'[sw1]:2222'),
+                                           b'[sw1]:2222')
+    assert not pn_paramiko.hashed_host_matches(hashed(b'sw1'), b'sw10')
+    assert not pn_paramiko.hashed_host_matches(b'|1|not base64|x', b'sw1')
@@ -0,0 +1,65 @@
+""" Module profiles of pn_profile and their merge by pn_profile_merge.py """
+
+import cProfile
+import os
+import runpy
+import time
+
+from ansible.module_utils.pn_nvos import (CLI_STATS, CliCommand,
+                                          MeteredTransport, TRANSPORTS,
+                                          cli_stats, run_parallel)
+from ansible.module_utils.pn_profile import ModuleProfiler
+from ansible.module_utils.pn_pstats import encode_stats
+
+MERGE = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'ansible', 'pn_profile_merge.py')
+
+
+class SlowSwitches(object):
+    """ Takes a while for every batch. """
+
+    name = 'cli'
+
+    def batch(self, commands):
+        time.sleep(0.5)
+        return 0, '', ''
+
+    def close(self):
+        pass
+
+
+def test_parallel_calls_count_once_as_waiting(make_module, monkeypatch):
+    for key in CLI_STATS:
+        monkeypatch.setitem(CLI_STATS, key, 0)
+    TRANSPORTS[('cli',)] = MeteredTransport(SlowSwitches())
+    profiler = ModuleProfiler(set(['cpu']))
+    profiler.start()
+    plans = [(switch, ['/usr/bin/cli --quiet switch %s vlan-create id 10 '
+                       'scope local' % switch])
+             for switch in ('sw1', 'sw2', 'sw3', 'sw4')]
+    run_parallel(make_module({}), plans, workers=4)
+    report = profiler.stop()
+
+    stats = cli_stats()
+    assert stats['seconds'] >= 2
+    assert 0.5 <= stats['wait_seconds'] < 1.5
+    assert report['cli_seconds'] <= report['wall_seconds']
+    assert report['python_seconds'] == round(
+        report['wall_seconds'] - report['cli_seconds'], 3)
+
+
+def test_profiles_are_merged_by_the_script():
+    profiler = cProfile.Profile()
+    profiler.runcall(CliCommand, '/usr/bin/cli --quiet vlan-show')
+    profiler.create_stats()
+    profile = {'wall_seconds': 1.0, 'cli_seconds': 0.25,
+               'python_seconds': 0.75,
+               'pstats': encode_stats(profiler.stats)}
+
+    merge = runpy.run_path(MERGE)
+    totals, merged, allocations = merge['merge_profiles'](
+        [('sw1', profile), ('sw2', profile)])
+    assert totals['python_seconds'] == 1.5
+    calls = dict((function[2], timing[1])
+                 for function, timing in merged.stats.items())
+    assert calls['__init__'] == 2
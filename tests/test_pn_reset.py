@@ -0,0 +1,60 @@
+""" Readiness polls of pn_reset after switch-config-reset """
+
+from ansible.module_utils.pn_reset import ReadyTimes, wait_ready
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 0
+        self.sleeps = []
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def time(self):
+        return self.now
+
+
+def probe(answers):
+    """ A readiness probe answering from a list, the last answer after. """
+    answers = list(answers)
+    return lambda: answers.pop(0) if len(answers) > 1 else answers[0]
+
+
+def test_polls_back_off_up_to_the_maximum():
+    clock = Clock()
+    took = wait_ready(probe([False] * 9 + [True]), 900, interval=2,
+                      max_interval=30, sleep=clock.sleep, clock=clock.time)
+    assert clock.sleeps == [2, 3, 4.5, 6.75, 10.125, 15.1875, 22.78125, 30,
+                            30]
+    assert took == round(sum(clock.sleeps), 1)
+
+
+def test_online_before_going_down_waits_for_the_grace():
+    clock = Clock()
+    took = wait_ready(probe([True]), 900, grace=30, sleep=clock.sleep,
+                      clock=clock.time)
+    assert took == 41.6
+
+
+def test_gives_up_at_the_timeout():
+    clock = Clock()
+    assert wait_ready(probe([False]), 60, sleep=clock.sleep,
+                      clock=clock.time) is None
+    assert sum(clock.sleeps) == 60
+
+
+def test_later_switches_sleep_through_the_ready_times():
+    clock = Clock()
+    ready_times = ReadyTimes()
+    for seconds in (100, 140, 120):
+        ready_times.add(seconds)
+    clock.now = 10
+    took = wait_ready(probe([True]), 900, ready_times=ready_times,
+                      started=0, sleep=clock.sleep, clock=clock.time)
+    # 80% of the median, less the time since the reset.
+    assert clock.sleeps == [86]
+    assert took == 96
+    assert ready_times.expected() == 120 and 96 in ready_times.times
@@ -0,0 +1,58 @@
+""" Streamed shows of pn_show_stream through the cli transport """
+
+import os
+import stat
+
+import pytest
+
+from ansible.module_utils.pn_nvos import CLI_STATS, cli_stats
+from ansible.module_utils.pn_show_stream import stream_show
+
+# Prints a header and 1000 rows of the parsable output, then waits for
+# $PAUSE seconds.
+FAKE_CLI = """#!/bin/sh
+echo 'mac;vlan'
+i=0
+while [ $i -lt 1000 ]; do
+    echo "00:00:00:00:00:$i;$((i % 2 + 10))"
+    i=$((i + 1))
+done
+sleep ${PAUSE:-0}
+"""
+
+
+@pytest.fixture
+def cli(tmpdir, monkeypatch):
+    path = str(tmpdir.join('cli'))
+    with open(path, 'w') as script:
+        script.write(FAKE_CLI)
+    os.chmod(path, stat.S_IRWXU)
+    for key in CLI_STATS:
+        monkeypatch.setitem(CLI_STATS, key, 0)
+    return path + ' --quiet l2-table-show format mac,vlan '
+
+
+def test_rows_are_counted_and_accounted(make_module, cli):
+    result = stream_show(make_module({}), cli, where={'vlan': '10'},
+                         count_by=['vlan'], limit=None)
+    assert (result['rc'], result['err']) == (0, '')
+    assert result['rows_read'] == 1000 and result['rows_matched'] == 500
+    assert result['counts'] == {'vlan': {'10': 500}}
+    stats = cli_stats()
+    assert stats['calls'] == 1 and stats['bytes'] > 1000
+
+
+def test_cli_is_stopped_at_the_limit(make_module, cli, monkeypatch):
+    monkeypatch.setenv('PAUSE', '60')
+    result = stream_show(make_module({}), cli, limit=5)
+    assert result['truncated'] and len(result['rows']) == 5
+    assert result['rc'] == 0
+    # Stopped at once instead of waiting for the cli to finish.
+    assert cli_stats()['seconds'] < 30
+
+
+def test_cli_is_stopped_at_its_deadline(make_module, cli, monkeypatch):
+    monkeypatch.setenv('PAUSE', '60')
+    result = stream_show(make_module({'pn_cli_timeout': '1'}), cli)
+    assert result['rc'] == 124 and result['rows_read'] == 1000
+    assert 'Timed out after 1s on local' in result['err']
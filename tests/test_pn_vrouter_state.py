@@ -0,0 +1,33 @@
+""" Vrouter idempotency checks of pn_vrouter_state """
+
+from ansible.module_utils.pn_vrouter_state import VrouterState, in_subnet
+
+
+def state_with(rows):
+    state = VrouterState(None, '/usr/bin/cli --quiet ', 'spine1-vrouter')
+    state.tables['interfaces'] = rows
+    return state
+
+
+def test_vrrp_ip_finds_the_primary_interface_of_its_subnet():
+    state = state_with([{'ip': '101.101.101.2/24', 'nic': 'eth0.101'},
+                        {'ip': '10.0.0.1/30', 'nic': 'eth1.4092'}])
+    assert state.vrrp_primary('101.101.101.1/24') == (False, 'eth0.101')
+
+
+def test_second_interface_in_the_subnet_is_the_vrrp_interface():
+    state = state_with([{'ip': '101.101.101.2/24', 'nic': 'eth0.101'},
+                        {'ip': '101.101.101.1/24', 'nic': 'eth0.101.vrrp'}])
+    assert state.vrrp_primary('101.101.101.1/24') == (True, None)
+
+
+def test_no_interface_in_the_subnet():
+    state = state_with([{'ip': '101.101.102.2/24', 'nic': 'eth0.102'}])
+    assert state.vrrp_primary('101.101.101.1/24') == (False, None)
+
+
+def test_in_subnet():
+    assert in_subnet('10.1.1.200/24', '10.1.1.1/24')
+    assert not in_subnet('10.1.2.1/24', '10.1.1.1/24')
+    assert in_subnet('10.1.1.1', '10.1.1.1')
+    assert in_subnet('10.1.1.7/30', '10.1.1.5')
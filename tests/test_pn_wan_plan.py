@@ -0,0 +1,40 @@
+""" WAN mesh snapshot of pn_wan_plan """
+
+from ansible.module_utils.pn_nvos import TRANSPORTS
+from ansible.module_utils.pn_wan_plan import wan_links, wan_snapshot
+
+# port-show of each switch lists its own ports only.
+PORTS = {
+    'wan1': [{'port': '1', 'hostname': 'wan2', 'rport': '5', 'trunk': 't12'},
+             {'port': '2', 'hostname': 'wan2', 'rport': '6', 'trunk': 't12'}],
+    'wan2': [{'port': '5', 'hostname': 'wan1', 'rport': '1', 'trunk': 't21'},
+             {'port': '6', 'hostname': 'wan1', 'rport': '2', 'trunk': 't21'}],
+}
+
+
+class Fabric(object):
+
+    name = 'rest'
+
+    def __init__(self):
+        self.shows = []
+
+    def show(self, command):
+        self.shows.append((command.switch, command.verb))
+        if command.verb == 'port-show':
+            return 0, [dict(row) for row in PORTS[command.switch]], ''
+        return 0, [], ''
+
+    def close(self):
+        pass
+
+
+def test_ports_are_read_on_every_wan_switch(make_module):
+    fabric = TRANSPORTS[('cli',)] = Fabric()
+    snapshot = wan_snapshot(make_module({}), '/usr/bin/cli --quiet ',
+                            ['wan1', 'wan2'])
+    assert ('wan1', 'port-show') in fabric.shows
+    assert ('wan2', 'port-show') in fabric.shows
+    assert wan_links(['wan1', 'wan2'], snapshot) == [
+        ('wan1', '1', 't12', 'wan2', '5', 't21'),
+        ('wan1', '2', 't12', 'wan2', '6', 't21')]
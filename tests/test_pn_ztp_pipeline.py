@@ -0,0 +1,52 @@
+""" Lease and log sources of pn_ztp_pipeline """
+
+import time
+
+from pn_ztp_pipeline import LeaseSource, LogSource, lease_time
+
+LEASE = """lease %s {
+  starts %s;
+  binding state active;
+  hardware ethernet %s;
+}
+"""
+
+
+def stamp(seconds):
+    return time.strftime('0 %Y/%m/%d %H:%M:%S', time.gmtime(seconds))
+
+
+def test_leases_before_the_start_are_not_events(tmpdir):
+    path = tmpdir.join('dhcpd.leases')
+    now = time.time()
+    path.write(LEASE % ('10.0.0.2', stamp(now - 3600), '00:0a:00:00:00:02'))
+    source = LeaseSource(str(path), now - 60)
+    assert source.events() == []
+
+    path.write(LEASE % ('10.0.0.2', stamp(now - 3600), '00:0a:00:00:00:02') +
+               LEASE % ('10.0.0.3', 'epoch %d' % now, '00:0a:00:00:00:03'))
+    assert source.events() == [('00:0a:00:00:00:03', '10.0.0.3')]
+
+
+def test_lease_times():
+    assert lease_time('4 2026/10/15 09:12:01') == 1792055521
+    assert lease_time('epoch 1792055521') == 1792055521
+    assert lease_time('never') is None
+
+
+def test_log_is_read_from_its_end(tmpdir):
+    path = tmpdir.join('syslog')
+    ack = 'dhcpd[1]: DHCPACK on %s to %s via eth0\n'
+    path.write(ack % ('10.0.0.2', '0:a:0:0:0:2'))
+    source = LogSource(str(path))
+    assert source.events() == []
+
+    path.write(ack % ('10.0.0.3', '0:a:0:0:0:3'), mode='a')
+    assert source.events() == [('00:0a:00:00:00:03', '10.0.0.3')]
+
+
+def test_log_created_later_is_read_from_its_start(tmpdir):
+    path = tmpdir.join('syslog')
+    source = LogSource(str(path))
+    path.write('dhcpd[1]: DHCPACK on 10.0.0.2 to 0:a:0:0:0:2 via eth0\n')
+    assert source.events() == [('00:0a:00:00:00:02', '10.0.0.2')]